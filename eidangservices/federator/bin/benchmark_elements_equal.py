@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark comparing StationXML elements while excluding child elements: the
+previous implementation (deep copies with excluded child elements removed)
+versus walking both trees without copying.
+
+Synthetic level=response <Network></Network> epoch elements are created.
+Comparisons are performed the way the StationXML combiner does i.e. network
+epochs excluding <Station></Station> elements (recursively) and station
+epochs excluding <Channel></Channel> elements.
+"""
+
+from __future__ import print_function
+
+import argparse
+import copy
+import time
+
+from lxml import etree
+
+from eidangservices import settings
+from eidangservices.federator.server.misc import (element_fingerprint,
+                                                  elements_equal)
+
+
+NS = settings.STATIONXML_NAMESPACES[0]
+
+STAGE = """<Stage number="{number}">
+  <PolesZeros>
+    <InputUnits><Name>M/S</Name></InputUnits>
+    <OutputUnits><Name>V</Name></OutputUnits>
+    <PzTransferFunctionType>LAPLACE (RADIANS/SECOND)</PzTransferFunctionType>
+    <NormalizationFactor>1.0</NormalizationFactor>
+    <NormalizationFrequency>1.0</NormalizationFrequency>
+    {poles}
+  </PolesZeros>
+  <StageGain><Value>1.0</Value><Frequency>1.0</Frequency></StageGain>
+</Stage>"""
+
+POLE = """<Pole number="{number}">
+  <Real>-0.037</Real><Imaginary>0.037</Imaginary>
+</Pole>"""
+
+
+def elements_equal_copy(e, e_other, exclude_tags=[], recursive=True):
+    """
+    Previous implementation of
+    :py:func:`eidangservices.federator.server.misc.elements_equal`.
+    """
+    local_e = e
+    local_e_other = e_other
+
+    def remove_elements(t, exclude_tags, recursive):
+        for tag in exclude_tags:
+            xpath = tag
+            if recursive:
+                xpath = ".//{}".format(tag)
+            for n in t.findall(xpath):
+                n.getparent().remove(n)
+
+    if exclude_tags:
+        local_e = copy.deepcopy(e)
+        local_e_other = copy.deepcopy(e_other)
+        remove_elements(local_e, exclude_tags, recursive)
+        remove_elements(local_e_other, exclude_tags, recursive)
+
+    if local_e.tag != local_e_other.tag:
+        return False
+    if local_e.text != local_e_other.text:
+        return False
+    if local_e.tail != local_e_other.tail:
+        return False
+    if local_e.attrib != local_e_other.attrib:
+        return False
+    if len(local_e) != len(local_e_other):
+        return False
+    return all(elements_equal_copy(c, c_other)
+               for c, c_other in zip(local_e, local_e_other))
+
+
+def create_network(num_stations, num_channels, num_stages):
+    response = '<Response>{}</Response>'.format(''.join(
+        STAGE.format(number=i + 1, poles=''.join(
+            POLE.format(number=j) for j in range(10)))
+        for i in range(num_stages)))
+
+    stations = []
+    for i in range(num_stations):
+        channels = ''.join(
+            '<Channel code="HH{}" locationCode="" '
+            'startDate="2000-01-01T00:00:00">'
+            '<Latitude>46.0</Latitude><Longitude>8.0</Longitude>'
+            '<Elevation>500.0</Elevation><Depth>0.0</Depth>'
+            '<SampleRate>100.0</SampleRate>{}</Channel>'.format(j, response)
+            for j in range(num_channels))
+        stations.append(
+            '<Station code="S{:04d}" startDate="2000-01-01T00:00:00">'
+            '<Latitude>46.0</Latitude><Longitude>8.0</Longitude>'
+            '<Elevation>500.0</Elevation><Site><Name>S{:04d}</Name></Site>'
+            '{}</Station>'.format(i, i, channels))
+
+    net_element = etree.fromstring(
+        '<Network xmlns="{}" code="CH" startDate="1980-01-01T00:00:00">'
+        '<Description>Switzerland Seismological Network</Description>'
+        '{}</Network>'.format(NS[1:-1], ''.join(stations)))
+    net_element[:] = sorted(net_element, key=lambda c: c.tag)
+    for sta_element in net_element:
+        sta_element[:] = sorted(sta_element, key=lambda c: c.tag)
+    return net_element
+
+
+def timeit(func, repeat):
+    t_start = time.time()
+    for _ in range(repeat):
+        result = func()
+    return (time.time() - t_start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stations', type=int, default=50,
+                        help=('Number of stations per network '
+                              '(default: %(default)s)'))
+    parser.add_argument('--channels', type=int, default=6,
+                        help=('Number of channels per station '
+                              '(default: %(default)s)'))
+    parser.add_argument('--stages', type=int, default=4,
+                        help=('Number of response stages per channel '
+                              '(default: %(default)s)'))
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Number of repetitions (default: %(default)s)')
+    args = parser.parse_args()
+
+    net_element = create_network(args.stations, args.channels, args.stages)
+    net_other = copy.deepcopy(net_element)
+    print('<Network></Network> element: {:.1f} MB'.format(
+        len(etree.tostring(net_element)) / 1024. ** 2))
+
+    cases = (
+        ('network', net_element, net_other,
+         ['{}{}'.format(ns, settings.STATIONXML_ELEMENT_STATION)
+          for ns in settings.STATIONXML_NAMESPACES], True),
+        ('station', net_element[-1], net_other[-1],
+         ['{}{}'.format(ns, settings.STATIONXML_ELEMENT_CHANNEL)
+          for ns in settings.STATIONXML_NAMESPACES], False))
+
+    for name, e, e_other, exclude_tags, recursive in cases:
+        results = []
+        for label, func in (
+                ('copy', lambda: elements_equal_copy(
+                    e, e_other, exclude_tags, recursive)),
+                ('copy-free', lambda: elements_equal(
+                    e, e_other, exclude_tags, recursive)),
+                ('fingerprint', lambda: element_fingerprint(
+                    e, exclude_tags, recursive) == element_fingerprint(
+                        e_other, exclude_tags, recursive))):
+            t, result = timeit(func, args.repeat)
+            results.append(result)
+            print('{:<8} {:<12} {:10.3f}ms'.format(name, label, t * 1000))
+
+        assert all(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the StationXML network combiners used by the federator: tree based
+(lxml.etree.parse) versus streaming (lxml.etree.iterparse) combining.
+
+Synthetic level=response StationXML documents for a single network are
+created, one per EIDA node. Each combiner is run within a separate process
+such that the peak memory (maximum resident set size) is reported per
+combiner.
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+from eidangservices.federator.server.task import (
+    Result, StationXMLNetworkCombinerTask,
+    StationXMLStreamingNetworkCombinerTask)
+from eidangservices.utils import Route
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+COMBINERS = (('tree', StationXMLNetworkCombinerTask),
+             ('streaming', StationXMLStreamingNetworkCombinerTask))
+
+CHANNELS = ('HHZ', 'HHN', 'HHE', 'BHZ', 'BHN', 'BHE')
+
+STAGE = """<Stage number="{number}">
+  <PolesZeros>
+    <InputUnits><Name>M/S</Name></InputUnits>
+    <OutputUnits><Name>V</Name></OutputUnits>
+    <PzTransferFunctionType>LAPLACE (RADIANS/SECOND)</PzTransferFunctionType>
+    <NormalizationFactor>1.0</NormalizationFactor>
+    <NormalizationFrequency>1.0</NormalizationFrequency>
+    {poles}
+  </PolesZeros>
+  <StageGain><Value>1.0</Value><Frequency>1.0</Frequency></StageGain>
+</Stage>"""
+
+POLE = """<Pole number="{number}">
+  <Real>-0.037</Real><Imaginary>0.037</Imaginary>
+</Pole>"""
+
+
+def create_stationxml(path, node, num_stations, num_stages):
+    response = '<Response>{}</Response>'.format(''.join(
+        STAGE.format(number=i + 1, poles=''.join(
+            POLE.format(number=j) for j in range(10)))
+        for i in range(num_stages)))
+
+    with open(path, 'w') as ofd:
+        ofd.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" '
+                  'schemaVersion="1.0">'
+                  '<Source>node{}</Source>'
+                  '<Created>2018-09-20T00:00:00</Created>'
+                  '<Network code="CH" startDate="1980-01-01T00:00:00">'
+                  '<Description>Switzerland Seismological Network'
+                  '</Description>'.format(node))
+        for i in range(num_stations):
+            ofd.write(
+                '<Station code="S{:04d}" startDate="2000-01-01T00:00:00">'
+                '<Latitude>46.0</Latitude><Longitude>8.0</Longitude>'
+                '<Elevation>500.0</Elevation><Site><Name>S{:04d}</Name>'
+                '</Site>'.format(i, i))
+            for cha in CHANNELS:
+                # NOTE: every node provides different location codes
+                ofd.write(
+                    '<Channel code="{}" locationCode="{:02d}" '
+                    'startDate="2000-01-01T00:00:00">'
+                    '<Latitude>46.0</Latitude><Longitude>8.0</Longitude>'
+                    '<Elevation>500.0</Elevation><Depth>0.0</Depth>'
+                    '<SampleRate>100.0</SampleRate>{}</Channel>'.format(
+                        cha, node, response))
+            ofd.write('</Station>')
+        ofd.write('</Network></FDSNStationXML>\n')
+
+
+def run(combiner, paths, tmpdir, results):
+    tempfile.tempdir = tmpdir
+
+    def download_task(request_handler, **kwargs):
+        path = paths[int(request_handler.url.split('/')[2][4:])]
+        _path = os.path.join(tmpdir, 'download-{}'.format(
+            os.path.basename(path)))
+        shutil.copyfile(path, _path)
+        return lambda: Result.ok(data=_path, length=os.path.getsize(_path))
+
+    routes = [Route(url='http://node{}/fdsnws/station/1/query'.format(i),
+                    streams=[StreamEpoch(Stream(network='CH'))])
+              for i in range(len(paths))]
+    task = dict(COMBINERS)[combiner](
+        routes, {'format': 'xml', 'level': 'response'}, max_threads=1)
+
+    t_start = time.time()
+    with mock.patch('eidangservices.federator.server.task.RawDownloadTask',
+                    side_effect=download_task):
+        result = task()
+    t_total = time.time() - t_start
+
+    assert result.status_code == 200, result
+    os.remove(result.data)
+    results.put((combiner, t_total, result.length,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--nodes', type=int, default=3,
+                        help='Number of EIDA nodes (default: %(default)s)')
+    parser.add_argument('--stations', type=int, default=300,
+                        help=('Number of stations per node '
+                              '(default: %(default)s)'))
+    parser.add_argument('--stages', type=int, default=4,
+                        help=('Number of response stages per channel '
+                              '(default: %(default)s)'))
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        paths = []
+        for i in range(args.nodes):
+            paths.append(os.path.join(tmpdir, 'node{}.xml'.format(i)))
+            create_stationxml(paths[-1], i, args.stations, args.stages)
+        print('{} nodes, {:.1f} MB StationXML (level=response)'.format(
+            args.nodes, sum(os.path.getsize(p) for p in paths) / 1024. ** 2))
+
+        results = multiprocessing.Queue()
+        for combiner, _ in COMBINERS:
+            # NOTE: a process per combiner for a separate peak memory
+            proc = multiprocessing.Process(
+                target=run, args=(combiner, paths, tmpdir, results))
+            proc.start()
+            combiner, t_total, length, maxrss = results.get()
+            proc.join()
+
+            print('{:<9} {:8.3f}s  peak memory (max RSS): {:8.1f} MB  '
+                  '({:.1f} MB combined)'.format(
+                      combiner, t_total, maxrss / 1024., length / 1024. ** 2))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the throughput of federated fdsnws-station responses streamed to
+the client: the previous implementation (temporary files read in text mode,
+1 KiB chunks (StationXML) and single lines (text), respectively, encoded
+again by the WSGI layer) versus binary passthrough.
+
+Synthetic temporary result files (as written by the download and combiner
+tasks) are created. The processors' response iterators are consumed by means
+of a :py:class:`flask.Response`, the way a WSGI server does.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from flask import Response
+
+from eidangservices import settings
+from eidangservices.federator.server import create_app
+from eidangservices.federator.server.process import StationRequestProcessor
+from eidangservices.federator.server.task import Result
+
+
+CHANNEL = ('<Channel code="HH{cha}" locationCode="" '
+           'startDate="2000-01-01T00:00:00">'
+           '<Latitude>46.0</Latitude><Longitude>8.0</Longitude>'
+           '<Elevation>500.0</Elevation><Depth>0.0</Depth>'
+           '<SampleRate>100.0</SampleRate></Channel>\n')
+
+LINE = ('CH|S{sta:04d}||HH{cha}|46.0|8.0|500.0|0.0|0.0|-90.0|'
+        'STS-2/N seismometer|600000000.0|1.0|M/S|100.0|'
+        '2000-01-01T00:00:00|\n')
+
+
+def create_files(tmpdir, fmt, num_files, size):
+    paths = []
+    for i in range(num_files):
+        path = os.path.join(tmpdir, '{}-{}'.format(fmt, i))
+        with open(path, 'w') as ofd:
+            written, sta = 0, 0
+            if fmt == 'xml':
+                ofd.write('<Network code="CH" '
+                          'startDate="1980-01-01T00:00:00">\n')
+            while written < size:
+                if fmt == 'xml':
+                    s = '<Station code="S{:04d}">\n{}</Station>\n'.format(
+                        sta, ''.join(CHANNEL.format(cha=cha)
+                                     for cha in 'ZNE'))
+                else:
+                    s = ''.join(LINE.format(sta=sta, cha=cha)
+                                for cha in 'ZNE')
+                ofd.write(s)
+                written += len(s)
+                sta += 1
+            if fmt == 'xml':
+                ofd.write('</Network>\n')
+        paths.append(path)
+    return paths
+
+
+def iter_previous(proc):
+    """
+    Previous implementation of the processors' response iterators.
+    """
+    # NOTE: Errors and HTTP status code 413 are not taken into account.
+    while proc._results:
+        _result = proc._results.get()
+        if proc.query_params['format'] == 'xml':
+            if not sum(proc._sizes):
+                yield proc.HEADER.format(
+                    proc.SOURCE, datetime.datetime.utcnow().isoformat())
+            proc._sizes.append(_result.length)
+            with open(_result.data, 'r', encoding='utf-8') as fd:
+                while True:
+                    data = fd.read(1024)
+                    if not data:
+                        break
+                    yield data
+        else:
+            if not sum(proc._sizes):
+                yield '{}\n'.format(proc.HEADER_CHANNEL)
+            proc._sizes.append(_result.length)
+            with open(_result.data, 'r', encoding='utf-8') as fd:
+                for line in fd:
+                    yield line
+        os.remove(_result.data)
+
+    if proc.query_params['format'] == 'xml':
+        yield proc.FOOTER
+
+
+def run(app, fmt, paths, tmpdir, previous):
+    with app.app_context():
+        mimetype = (settings.MIMETYPE_XML if fmt == 'xml' else
+                    settings.MIMETYPE_TEXT)
+        proc = StationRequestProcessor.create(
+            fmt, mimetype, query_params={'format': fmt, 'level': 'channel'})
+
+        for i, path in enumerate(paths):
+            # NOTE: processors remove the files streamed
+            _path = os.path.join(tmpdir, 'result-{}'.format(i))
+            os.link(path, _path)
+            proc._results.put(Result.ok(data=_path,
+                                        length=os.path.getsize(_path)))
+
+        resp = Response(iter_previous(proc) if previous else iter(proc),
+                        mimetype=proc.mimetype,
+                        content_type=proc.content_type)
+
+        t_start = time.time()
+        num_bytes, num_chunks = 0, 0
+        for chunk in resp.iter_encoded():
+            num_bytes += len(chunk)
+            num_chunks += 1
+        return time.time() - t_start, num_bytes, num_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=300,
+                        help=('Size of the response in MB '
+                              '(default: %(default)s)'))
+    parser.add_argument('--files', type=int, default=10,
+                        help=('Number of temporary result files '
+                              '(default: %(default)s)'))
+    args = parser.parse_args()
+
+    app = create_app(config_dict={'ROUTING_SERVICE': 'http://localhost'})
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for fmt in ('xml', 'text'):
+            paths = create_files(tmpdir, fmt, args.files,
+                                 args.size * 1024 ** 2 // args.files)
+            # warm up the page cache
+            run(app, fmt, paths, tmpdir, False)
+
+            results = {}
+            for label, previous in (('previous', True),
+                                    ('binary', False)):
+                t, num_bytes, num_chunks = run(app, fmt, paths, tmpdir,
+                                               previous)
+                results[label] = num_bytes
+                print('{:<5} {:<9} {:7.3f}s  {:8.1f} MB/s  '
+                      '({:.1f} MB, {} chunks)'.format(
+                          fmt, label, t, num_bytes / 1024. ** 2 / t,
+                          num_bytes / 1024. ** 2, num_chunks))
+
+            # NOTE: The <Created></Created> timestamps might differ.
+            assert abs(results['previous'] - results['binary']) < 10
+
+            for path in paths:
+                os.remove(path)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
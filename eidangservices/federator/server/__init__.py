@@ -38,7 +38,10 @@ from flask import Flask, make_response, g
 
 from eidangservices import settings
 from eidangservices.federator import __version__
+from eidangservices.federator.server.cache import RoutingCache
+from eidangservices.federator.server.executor import TaskExecutor
 from eidangservices.utils import httperrors
+from eidangservices.utils.request import SESSIONS
 from eidangservices.utils.fdsnws import register_parser_errorhandler
 
 def create_app(config_dict={}, service_version=__version__):
@@ -52,6 +55,23 @@ def create_app(config_dict={}, service_version=__version__):
     app = Flask(__name__)
     app.config.update(config_dict)
 
+    # NOTE: Worker pools are shared by all requests; pools are created
+    # lazily i.e. not before the first request (and after forking).
+    app.extensions['federator_executor'] = TaskExecutor(
+        app.config.get('FED_THREAD_CONFIG',
+                       settings.EIDA_FEDERATOR_THREAD_CONFIG))
+    app.extensions['federator_routing_cache'] = RoutingCache(
+        maxsize=app.config.get('FED_ROUTING_CACHE_SIZE',
+                               settings.EIDA_FEDERATOR_ROUTING_CACHE_SIZE),
+        ttl=app.config.get('FED_ROUTING_CACHE_TTL',
+                           settings.EIDA_FEDERATOR_ROUTING_CACHE_TTL),
+        path=app.config.get('FED_ROUTING_CACHE_DIR'))
+    # keep-alive connections to endpoints are shared by all requests
+    SESSIONS.configure(
+        pool_maxsize=app.config.get(
+            'FED_ENDPOINT_CONNECTIONS',
+            settings.EIDA_FEDERATOR_ENDPOINT_CONNECTIONS))
+
     # app.config['PROFILE'] = True
     # app.wsgi_app = ProfilerMiddleware(app.wsgi_app, restrictions=[10])
 
@@ -82,6 +82,25 @@ def thread_config(config_dict):
 
 # thread_config ()
 
+def positive_int(value):
+    """
+    Parse a positive integer.
+
+    :param str value: Value to be parsed
+    :retval: int
+    """
+    try:
+        value = int(value)
+        if value < 1:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'Invalid positive integer: {!r}.'.format(value))
+
+    return value
+
+# positive_int ()
+
 # -----------------------------------------------------------------------------
 class FederatorWebservice(App):
     """
@@ -137,6 +156,64 @@ class FederatorWebservice(App):
                             help=('Endpoint download thread configuration '
                                   'dictionary (JSON syntax). '
                                   '(default: %(default)s)'))
+        parser.add_argument('--endpoint-connections', type=int,
+                            metavar='NUM', dest='endpoint_connections',
+                            default=(
+                                settings.EIDA_FEDERATOR_ENDPOINT_CONNECTIONS),
+                            help=('Maximum number of persistent connections '
+                                  'per endpoint. (default: %(default)s)'))
+        parser.add_argument('--batch-lines', type=positive_int,
+                            metavar='NUM', dest='batch_max_lines',
+                            default=settings.EIDA_FEDERATOR_BATCH_MAX_LINES,
+                            help=('Maximum number of stream epochs batched '
+                                  'into a single endpoint request. A value '
+                                  'of 1 disables batching. '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--batch-timespan', type=positive_int,
+                            metavar='SECONDS', dest='batch_max_timespan',
+                            default=settings.EIDA_FEDERATOR_BATCH_MAX_TIMESPAN,
+                            help=('Maximum accumulated timespan of stream '
+                                  'epochs batched into a single endpoint '
+                                  'request (dataselect, wfcatalog). '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--routing-cache-size', type=int,
+                            metavar='NUM', dest='routing_cache_size',
+                            default=settings.EIDA_FEDERATOR_ROUTING_CACHE_SIZE,
+                            help=('Maximum number of routing tables cached. '
+                                  'A value of 0 disables caching. Note that '
+                                  'cached routing tables do not reflect '
+                                  'routing updates (e.g. harvested by '
+                                  'StationLite) until they expire (see '
+                                  '--routing-cache-ttl). '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--routing-cache-ttl', type=positive_int,
+                            metavar='SECONDS', dest='routing_cache_ttl',
+                            default=settings.EIDA_FEDERATOR_ROUTING_CACHE_TTL,
+                            help=('Time to live of cached routing tables. '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--routing-cache-dir', type=str, metavar='PATH',
+                            dest='routing_cache_dir', default=None,
+                            help=('Directory for routing tables shared '
+                                  'between processes. If not specified, '
+                                  'routing tables are cached in memory, '
+                                  'only.'))
+        parser.add_argument('--stationxml-combiner', type=str,
+                            dest='stationxml_combiner',
+                            default=settings.\
+                            EIDA_FEDERATOR_STATIONXML_COMBINER,
+                            choices=settings.\
+                            EIDA_FEDERATOR_STATIONXML_COMBINERS,
+                            help=('fdsnws-station XML combiner '
+                                  'implementation. The streaming combiner '
+                                  'spills station elements to disk such that '
+                                  'memory usage is bounded. The incremental '
+                                  'combiner additionally streams station '
+                                  'elements as soon as they are downloaded. '
+                                  'It applies to level=station, only; for '
+                                  'other levels the streaming combiner takes '
+                                  'precedence. '
+                                  '(default: %(default)s) '
+                                  '(choices: {%(choices)s})'))
         parser.add_argument('--tmpdir', type=str, default='',
                             help='directory for temp files')
 
@@ -250,6 +327,13 @@ class FederatorWebservice(App):
             PROPAGATE_EXCEPTIONS=True,
             ROUTING_SERVICE=self.args.routing,
             FED_THREAD_CONFIG=self.args.thread_config,
+            FED_ENDPOINT_CONNECTIONS=self.args.endpoint_connections,
+            FED_BATCH_MAX_LINES=self.args.batch_max_lines,
+            FED_BATCH_MAX_TIMESPAN=self.args.batch_max_timespan,
+            FED_ROUTING_CACHE_SIZE=self.args.routing_cache_size,
+            FED_ROUTING_CACHE_TTL=self.args.routing_cache_ttl,
+            FED_ROUTING_CACHE_DIR=self.args.routing_cache_dir,
+            FED_STATIONXML_COMBINER=self.args.stationxml_combiner,
             TMPDIR=tempfile.gettempdir())
 
         app = create_app(config_dict=app_config)
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <cache.py>
+# -----------------------------------------------------------------------------
+# This file is part of EIDA NG webservices (eida-federator).
+#
+# eida-federator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-federator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/06        V0.1    Daniel Armbruster
+# -----------------------------------------------------------------------------
+"""
+Federator caching facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import collections
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from eidangservices import utils
+from eidangservices.utils.sncl import StreamEpoch
+
+
+# -----------------------------------------------------------------------------
+def substitute_open_endtimes(routing_table, endtime):
+    """
+    Substitute open endtimes of the stream epochs of a routing table.
+
+    :param list routing_table: List of :py:class:`eidangservices.utils.Route`
+        objects
+    :param endtime: Endtime substituted
+    :type endtime: :py:class:`datetime.datetime`
+    :rtype: list
+    """
+    return [utils.Route(
+        url=route.url,
+        streams=[se if se.endtime is not None else
+                 StreamEpoch(stream=se.stream, starttime=se.starttime,
+                             endtime=endtime)
+                 for se in route.streams])
+            for route in routing_table]
+
+# substitute_open_endtimes ()
+
+
+class RoutingCache(object):
+    """
+    Size bounded LRU cache for parsed routing tables with a time to live
+    (TTL).
+
+    Routing tables are cached with open endtimes i.e. stream epochs without
+    endtime. When fetching a routing table from the cache open endtimes are
+    substituted with the :code:`default_endtime` passed.
+
+    Optionally, the cache is shared (e.g. between processes) by means of a
+    directory. The in-memory cache is backed by the directory's entries.
+
+    :param int maxsize: Maximum number of routing tables cached (per layer).
+        If :code:`0` caching is disabled.
+    :param float ttl: Time to live of cache entries in seconds
+    :param path: Path to a directory for on-disk caching
+    :type path: str or None
+    """
+
+    LOGGER = 'flask.app.federator.routing_cache'
+
+    SUFFIX = '.routes'
+
+    def __init__(self, maxsize, ttl, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+        self.logger = logging.getLogger(self.LOGGER)
+
+        if self.path and not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    # __init__ ()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'size': len(self._entries)}
+
+    @staticmethod
+    def create_key(query_params, stream_epochs, keys):
+        """
+        Create a normalized cache key.
+
+        :param dict query_params: Query parameters
+        :param list stream_epochs: List of
+            :py:class:`eidangservices.utils.sncl.StreamEpoch` objects
+        :param keys: Query parameters relevant for routing
+        :rtype: str
+        """
+        def normalize_datetime(dt):
+            return '' if dt is None else utils.fdsnws_isoformat(dt)
+
+        qp = sorted('{}={}'.format(k, v) for k, v in query_params.items()
+                    if k in keys and v is not None)
+        stream_epochs = sorted(set(
+            ' '.join([se.network, se.station, se.location, se.channel,
+                      normalize_datetime(se.starttime),
+                      normalize_datetime(se.endtime)])
+            for se in stream_epochs))
+
+        return hashlib.sha1(
+            '\n'.join(qp + stream_epochs).encode('utf-8')).hexdigest()
+
+    # create_key ()
+
+    def get(self, key, default_endtime):
+        """
+        Fetch a routing table from the cache.
+
+        :param str key: Cache key
+        :param default_endtime: Substitute open endtimes with the datetime
+            passed
+        :type default_endtime: :py:class:`datetime.datetime`
+        :returns: Routing table or :code:`None` if not cached
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            try:
+                timestamp, routing_table = self._entries[key]
+            except KeyError:
+                timestamp, routing_table = None, None
+            else:
+                if now - timestamp > self.ttl:
+                    del self._entries[key]
+                    timestamp, routing_table = None, None
+                else:
+                    self._entries.move_to_end(key)
+
+        if routing_table is None and self.path:
+            timestamp, routing_table = self._load(key)
+            if (routing_table is not None and now - timestamp <= self.ttl):
+                self._put(key, timestamp, routing_table)
+            else:
+                routing_table = None
+
+        with self._lock:
+            if routing_table is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return substitute_open_endtimes(routing_table, default_endtime)
+
+    # get ()
+
+    def set(self, key, routing_table):
+        """
+        Cache a routing table.
+
+        :param str key: Cache key
+        :param list routing_table: List of
+            :py:class:`eidangservices.utils.Route` objects. Stream epochs
+            without endtime are cached as open stream epochs.
+        """
+        if not self.enabled:
+            return
+
+        timestamp = time.time()
+        self._put(key, timestamp, routing_table)
+
+        if self.path:
+            self._dump(key, timestamp, routing_table)
+
+    # set ()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _put(self, key, timestamp, routing_table):
+        with self._lock:
+            self._entries[key] = (timestamp, routing_table)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    # _put ()
+
+    def _path(self, key):
+        return os.path.join(self.path, key + self.SUFFIX)
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), 'rb') as ifd:
+                return pickle.load(ifd)
+        except (OSError, IOError, EOFError, pickle.UnpicklingError):
+            return None, None
+
+    # _load ()
+
+    def _dump(self, key, timestamp, routing_table):
+        # NOTE: Write to a temporary file which is renamed afterwards
+        # such that concurrent readers never read partial entries.
+        try:
+            fd, path_tmp = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, 'wb') as ofd:
+                pickle.dump((timestamp, routing_table), ofd,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.rename(path_tmp, self._path(key))
+        except (OSError, IOError) as err:
+            self.logger.warning(
+                'Error while caching routing table: {}'.format(err))
+            return
+
+        self._evict_disk()
+
+    # _dump ()
+
+    def _evict_disk(self):
+        try:
+            paths = [os.path.join(self.path, f) for f in os.listdir(self.path)
+                     if f.endswith(self.SUFFIX)]
+            if len(paths) <= self.maxsize:
+                return
+
+            paths = sorted(paths, key=os.path.getmtime)
+            for path in paths[:len(paths) - self.maxsize]:
+                os.remove(path)
+        except OSError:
+            # NOTE: Concurrent evictions are not harmful.
+            pass
+
+    # _evict_disk ()
+
+# class RoutingCache
+
+
+# ---- END OF <cache.py> ----
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <executor.py>
+# -----------------------------------------------------------------------------
+# This file is part of EIDA NG webservices (eida-federator).
+#
+# eida-federator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-federator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/03        V0.1    Daniel Armbruster
+# -----------------------------------------------------------------------------
+"""
+Federator task execution facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import logging
+import os
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+from eidangservices.federator.server.task import Result
+
+
+# -----------------------------------------------------------------------------
+class CancellationHandle(object):
+    """
+    Handle allowing to cancel all tasks belonging to a single federated
+    request.
+
+    Tasks are wrapped by means of calling the handle. Wrapped tasks not yet
+    started when the handle is cancelled are skipped. Results of wrapped tasks
+    finishing after the handle was cancelled are discarded i.e. temporary
+    files are removed.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __call__(self, task):
+        return CancellableTask(task, self)
+
+# class CancellationHandle
+
+
+class CancellableTask(object):
+    """
+    Wrapper for tasks controlled by a :py:class:`CancellationHandle`.
+
+    :param task: Task to be wrapped
+    :param handle: Controlling handle
+    :type handle: :py:class:`CancellationHandle`
+    """
+
+    def __init__(self, task, handle):
+        self._task = task
+        self._handle = handle
+
+    def __call__(self):
+        if self._handle.cancelled:
+            return Result.nocontent(status='Cancelled')
+
+        result = self._task()
+
+        if self._handle.cancelled:
+            # NOTE: Data of successful task results are paths to
+            # temporary files.
+            if result.status_code == 200:
+                try:
+                    os.remove(result.data)
+                except (OSError, TypeError):
+                    pass
+            return Result.nocontent(status='Cancelled')
+
+        return result
+
+    # __call__ ()
+
+    def __repr__(self):
+        return '<{}: {!r}>'.format(type(self).__name__, self._task)
+
+# class CancellableTask
+
+
+class TaskExecutor(object):
+    """
+    Long-lived, application scoped executor shared by all federator request
+    processors. For each key of the thread configuration the executor
+    maintains a worker pool limiting the overall number of concurrent
+    tasks. Pools are created lazily.
+
+    :param dict thread_config: Thread configuration dictionary mapping pool
+        identifiers to pool sizes
+    """
+
+    LOGGER = 'flask.app.federator.executor'
+
+    def __init__(self, thread_config):
+        self._thread_config = dict(thread_config)
+        self._pools = {}
+        self._lock = threading.Lock()
+
+        self.logger = logging.getLogger(self.LOGGER)
+
+    def pool(self, pool_id):
+        """
+        Return the worker pool for :code:`pool_id`.
+
+        :param str pool_id: Pool identifier
+        :rtype: :py:class:`multiprocessing.pool.ThreadPool`
+        :raises KeyError: If :code:`pool_id` is not configured
+        """
+        with self._lock:
+            try:
+                return self._pools[pool_id]
+            except KeyError:
+                pool_size = self._thread_config[pool_id]
+                self.logger.debug(
+                    'Init worker pool {!r} (size={}).'.format(pool_id,
+                                                              pool_size))
+                self._pools[pool_id] = ThreadPool(processes=pool_size)
+                return self._pools[pool_id]
+
+    # pool ()
+
+    def shutdown(self):
+        """
+        Terminate all worker pools.
+        """
+        with self._lock:
+            for pool in self._pools.values():
+                pool.terminate()
+            self._pools = {}
+
+    # shutdown ()
+
+# class TaskExecutor
+
+
+# ---- END OF <executor.py> ----
@@ -31,9 +31,12 @@ from __future__ import (absolute_import, division, print_function,
 
 from builtins import * # noqa
 
+import collections
 import os
+import queue
 import random
 import tempfile
+import threading
 
 
 def get_temp_filepath():
@@ -57,46 +60,171 @@ def elements_equal(e, e_other, exclude_tags=[], recursive=True):
     :type e: :py:class:`lxml.etree`
     :type e_other: :py:class:`lxml.etree`
     :param list exclude_tags: List of child element tags to be excluded
-        while comparing. When excluding child elements the function
-        makes use of :py:func:`copy.deepcopy`
+        while comparing. Excluded child elements are skipped while walking
+        both trees i.e. the elements are neither copied nor modified.
     :param bool recursive: Recursively exclude matching child elements.
 
     .. note:: The function expects child elements to be ordered.
     """
-    local_e = e
-    local_e_other = e_other
-
-    def remove_elements(t, exclude_tags, recursive):
-        for tag in exclude_tags:
-            xpath = tag
-            if recursive:
-                xpath = ".//{}".format(tag)
-            for n in t.findall(xpath):
-                n.getparent().remove(n)
-
-    if exclude_tags:
-        # XXX(damb): In order to make use of len(e) to increase
-        # performance we create local copies of the elements with child
-        # elements excluded
-        from copy import deepcopy
-        local_e = deepcopy(e)
-        local_e_other = deepcopy(e_other)
-        remove_elements(local_e, exclude_tags, recursive)
-        remove_elements(local_e_other, exclude_tags, recursive)
-
-    if local_e.tag != local_e_other.tag:
+    return _elements_equal(e, e_other, frozenset(exclude_tags), recursive)
+
+# elements_equal ()
+
+def _elements_equal(e, e_other, exclude_tags, recursive):
+    if e.tag != e_other.tag:
         return False
-    if local_e.text != local_e_other.text:
+    if e.text != e_other.text:
         return False
-    if local_e.tail != local_e_other.tail:
+    if e.tail != e_other.tail:
         return False
-    if local_e.attrib != local_e_other.attrib:
+    if e.attrib != e_other.attrib:
         return False
-    if len(local_e) != len(local_e_other):
+
+    if not exclude_tags:
+        if len(e) != len(e_other):
+            return False
+        return all(_elements_equal(c, c_other, exclude_tags, False)
+                   for c, c_other in zip(e, e_other))
+
+    children = [c for c in e if c.tag not in exclude_tags]
+    children_other = [c for c in e_other if c.tag not in exclude_tags]
+    if len(children) != len(children_other):
         return False
-    return all(elements_equal(c, c_other)
-               for c, c_other in zip(local_e, local_e_other))
 
-# elements_equal ()
+    child_exclude_tags = exclude_tags if recursive else frozenset()
+    return all(_elements_equal(c, c_other, child_exclude_tags, recursive)
+               for c, c_other in zip(children, children_other))
+
+# _elements_equal ()
+
+def element_fingerprint(e, exclude_tags=[], recursive=True):
+    """
+    Compute a hashable fingerprint of a XML :py:class:`lxml.etree` element.
+    Two elements compare equal by means of :py:func:`elements_equal` if and
+    only if their fingerprints (computed with the same :code:`exclude_tags`
+    and :code:`recursive` arguments) are equal. Hence, fingerprints allow
+    matching elements by means of dictionary lookups.
+
+    :param e: Element the fingerprint is computed for
+    :type e: :py:class:`lxml.etree`
+    :param list exclude_tags: List of child element tags to be excluded
+    :param bool recursive: Recursively exclude matching child elements.
+
+    .. note:: The function expects child elements to be ordered.
+    """
+    return _element_fingerprint(e, frozenset(exclude_tags), recursive)
+
+# element_fingerprint ()
+
+def _element_fingerprint(e, exclude_tags, recursive):
+    child_exclude_tags = exclude_tags if recursive else frozenset()
+    return (e.tag, e.text, e.tail, tuple(sorted(e.attrib.items())),
+            tuple(_element_fingerprint(c, child_exclude_tags, recursive)
+                  for c in e if c.tag not in exclude_tags))
+
+# _element_fingerprint ()
+
+class CompletionQueue(object):
+    """
+    Collect the results of tasks applied asynchronously to a worker pool in
+    the order of their completion.
+
+    Rather than polling :py:meth:`multiprocessing.pool.AsyncResult.ready`
+    results are pushed to a queue by means of the pool's callbacks. Hence,
+    consumers are woken up exactly when a task finishes.
+
+    The length of a :py:class:`CompletionQueue` corresponds to the number of
+    results submitted but not fetched, yet.
+    """
+
+    class _Failure(object):
+        """
+        Container for exceptions raised while executing a task.
+        """
+        def __init__(self, err):
+            self.err = err
+
+    # class _Failure
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._requeued = collections.deque()
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    # __init__ ()
+
+    def submit(self, pool, func, args=()):
+        """
+        Apply :code:`func` asynchronously to :code:`pool`.
+
+        :param pool: Worker pool
+        :type pool: :py:class:`multiprocessing.pool.Pool`
+        :param func: Callable to be executed
+        :param tuple args: Positional arguments passed to :code:`func`
+        :rtype: :py:class:`multiprocessing.pool.AsyncResult`
+        """
+        with self._lock:
+            self._pending += 1
+
+        return pool.apply_async(func, args, callback=self._queue.put,
+                                error_callback=self._put_error)
+
+    # submit ()
+
+    def get(self, timeout=None):
+        """
+        Return the next result available. Blocks until a result is available.
+
+        :param timeout: Timeout in seconds. If :code:`None` block until a
+            result is available.
+        :type timeout: float or None
+        :raises queue.Empty: If no result was available within
+            :code:`timeout`.
+        """
+        if self._requeued:
+            result = self._requeued.popleft()
+        else:
+            result = self._queue.get(timeout=timeout)
+
+        with self._lock:
+            self._pending -= 1
+
+        if isinstance(result, self._Failure):
+            raise result.err
+
+        return result
+
+    # get ()
+
+    def requeue(self, result):
+        """
+        Put a result already fetched back in front of the queue.
+        """
+        with self._lock:
+            self._pending += 1
+        self._requeued.appendleft(result)
+
+    # requeue ()
+
+    def put(self, result):
+        """
+        Put a result published by a task which is still running (i.e. a
+        partial result).
+        """
+        with self._lock:
+            self._pending += 1
+        self._queue.put(result)
+
+    # put ()
+
+    def _put_error(self, err):
+        self._queue.put(self._Failure(err))
+
+    def __len__(self):
+        with self._lock:
+            return self._pending
+
+# class CompletionQueue
 
 # ---- END OF <misc.py> ----
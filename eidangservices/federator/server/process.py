@@ -35,23 +35,28 @@ from builtins import * # noqa
 import collections
 import datetime
 import logging
-import multiprocessing as mp
 import os
-import time
+import queue
 
 from flask import current_app, stream_with_context, Response
 
 from eidangservices import utils, settings
 from eidangservices.federator import __version__
+from eidangservices.federator.server.cache import (RoutingCache,
+                                                   substitute_open_endtimes)
+from eidangservices.federator.server.executor import CancellationHandle
+from eidangservices.federator.server.misc import CompletionQueue
 from eidangservices.federator.server.request import (
-    RoutingRequestHandler, GranularFdsnRequestHandler)
+    RoutingRequestHandler, FdsnRequestHandler)
 from eidangservices.federator.server.task import (
-    RawDownloadTask, RawSplitAndAlignTask, StationTextDownloadTask,
-    StationXMLNetworkCombinerTask, WFCatalogSplitAndAlignTask)
+    NetworkResult, RawDownloadTask, RawSplitAndAlignTask,
+    StationTextDownloadTask, StationXMLIncrementalNetworkCombinerTask,
+    StationXMLNetworkCombinerTask, StationXMLStreamingNetworkCombinerTask,
+    WFCatalogSplitAndAlignTask)
 from eidangservices.utils.error import ErrorWithTraceback
 from eidangservices.utils.httperrors import FDSNHTTPError
-from eidangservices.utils.request import (binary_request, RequestsError,
-                                          NoContent)
+from eidangservices.utils.request import (stream_request, RequestsError,
+                                          NoContent, SESSIONS)
 from eidangservices.utils.sncl import StreamEpoch
 
 
@@ -66,6 +71,117 @@ def demux_routes(routes):
 
 # demux_routes ()
 
+def parse_routes(lines):
+    """
+    Generator function parsing the output of a routing service (i.e.
+    :code:`format=post`). Routes are yielded as soon as a route's block of
+    lines is complete. Blocks are separated by blank lines. The first line of
+    a block contains the URL while the subsequent lines contain stream
+    epochs. Open endtimes are preserved.
+
+    :param lines: Iterable of lines
+    :returns: Generator yielding :py:class:`eidangservices.utils.Route`
+        objects
+    """
+    url = None
+    stream_epochs = []
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+
+        if not line:
+            if url and stream_epochs:
+                yield utils.Route(url=url, streams=stream_epochs)
+            url = None
+            stream_epochs = []
+        elif url is None:
+            url = line
+        else:
+            stream_epochs.append(StreamEpoch.from_snclline(line))
+
+    if url and stream_epochs:
+        yield utils.Route(url=url, streams=stream_epochs)
+
+# parse_routes ()
+
+def batch_routes(routes, max_lines=1, max_timespan=None,
+                 default_endtime=None):
+    """
+    Batch the stream epochs of routes sharing the same URL. Each resulting
+    route contains at most :code:`max_lines` stream epochs. Optionally, the
+    accumulated timespan of a route's stream epochs (i.e. an estimate of the
+    data volume requested) is bounded by :code:`max_timespan`. A stream epoch
+    exceeding :code:`max_timespan` on its own makes up a route.
+
+    :param list routes: List of :py:class:`eidangservices.utils.Route` objects
+    :param int max_lines: Maximum number of stream epochs per route. A value
+        of 1 is equivalent to :py:func:`demux_routes`.
+    :param max_timespan: Maximum accumulated timespan in seconds
+    :type max_timespan: float or None
+    :param default_endtime: Endtime used for stream epochs without endtime
+    :type default_endtime: :py:class:`datetime.datetime`
+    """
+    return list(iter_batched_routes(routes, max_lines=max_lines,
+                                    max_timespan=max_timespan,
+                                    default_endtime=default_endtime))
+
+# batch_routes ()
+
+def iter_batched_routes(routes, max_lines=1, max_timespan=None,
+                        default_endtime=None):
+    """
+    Generator function batching the stream epochs of routes sharing the same
+    URL (see :py:func:`batch_routes`). A pending batch is kept per URL while
+    routes are consumed. A batch is yielded as soon as it is full (i.e. it
+    contains :code:`max_lines` stream epochs or the next stream epoch would
+    exceed :code:`max_timespan`); the remaining batches are yielded when
+    :code:`routes` is exhausted. Hence, routes for the same URL received in
+    different blocks of a routing response still make up a single batch.
+
+    :param routes: Iterable of :py:class:`eidangservices.utils.Route` objects
+    :param int max_lines: Maximum number of stream epochs per route
+    :param max_timespan: Maximum accumulated timespan in seconds
+    :type max_timespan: float or None
+    :param default_endtime: Endtime used for stream epochs without endtime
+    :type default_endtime: :py:class:`datetime.datetime`
+    """
+    if max_lines <= 1:
+        for route in routes:
+            for demuxed_route in demux_routes([route]):
+                yield demuxed_route
+        return
+
+    if default_endtime is None:
+        default_endtime = datetime.datetime.utcnow()
+
+    # pending batches by URL: [stream_epochs, timespan]
+    pending = collections.OrderedDict()
+    for route in routes:
+        batch = pending.setdefault(route.url, [[], 0])
+        for se in route.streams:
+            se_timespan = ((se.endtime or default_endtime) -
+                           se.starttime).total_seconds()
+
+            if (batch[0] and max_timespan is not None and
+                    batch[1] + se_timespan > max_timespan):
+                yield utils.Route(route.url, streams=batch[0])
+                batch[0], batch[1] = [], 0
+
+            batch[0].append(se)
+            batch[1] += se_timespan
+
+            if len(batch[0]) >= max_lines:
+                yield utils.Route(route.url, streams=batch[0])
+                batch[0], batch[1] = [], 0
+
+    for url, (stream_epochs, _) in pending.items():
+        if stream_epochs:
+            yield utils.Route(url, streams=stream_epochs)
+
+# iter_batched_routes ()
+
 def group_routes_by(routes, key='network'):
     """
     Group routes by a certain :py:class:`eidangservices.sncl.Stream` keyword.
@@ -104,6 +220,23 @@ def group_routes_by(routes, key='network'):
 def flatten_routes(grouped_routes):
     return [route for routes in grouped_routes.values() for route in routes]
 
+# flatten_routes ()
+
+def generate_chunks(fd, chunk_size=settings.EIDA_FEDERATOR_CHUNK_SIZE):
+    """
+    Generator function reading a file in binary chunks.
+
+    :param fd: File-like object opened in binary mode
+    :param int chunk_size: Chunk size in bytes
+    """
+    while True:
+        data = fd.read(chunk_size)
+        if not data:
+            break
+        yield data
+
+# generate_chunks ()
+
 
 class RequestProcessorError(ErrorWithTraceback):
     """Base RequestProcessor error ({})."""
@@ -119,8 +252,9 @@ class RequestProcessor(object):
 
     LOGGER = "flask.app.federator.request_processor"
 
-    POOL_SIZE = 5
-    # MAX_TASKS_PER_CHILD = 4
+    POOL_ID = None
+    CHUNK_SIZE = settings.EIDA_FEDERATOR_CHUNK_SIZE
+    CHUNK_SIZE_ROUTING = 64 * 1024
     TIMEOUT_STREAMING = settings.EIDA_FEDERATOR_STREAMING_TIMEOUT
 
     def __init__(self, mimetype, query_params={}, stream_epochs=[], post=True,
@@ -134,13 +268,21 @@ class RequestProcessor(object):
         self.post = post
 
         self._routing_service = current_app.config['ROUTING_SERVICE']
+        self._batch_max_lines = current_app.config.get(
+            'FED_BATCH_MAX_LINES', settings.EIDA_FEDERATOR_BATCH_MAX_LINES)
+        self._batch_max_timespan = current_app.config.get(
+            'FED_BATCH_MAX_TIMESPAN',
+            settings.EIDA_FEDERATOR_BATCH_MAX_TIMESPAN)
 
         self.logger = logging.getLogger(
             self.LOGGER if kwargs.get('logger') is None
             else kwargs.get('logger'))
 
-        self._pool = None
-        self._results = []
+        self._executor = current_app.extensions['federator_executor']
+        self._routing_cache = current_app.extensions[
+            'federator_routing_cache']
+        self._handle = CancellationHandle()
+        self._results = CompletionQueue()
         self._sizes = []
 
         self._default_endtime = datetime.datetime.utcnow()
@@ -173,16 +315,28 @@ class RequestProcessor(object):
     def DEFAULT_ENDTIME(self):
         return self._default_endtime
 
+    @property
+    def _pool(self):
+        """
+        The application scoped worker pool tasks are submitted to.
+        """
+        return self._executor.pool(self.POOL_ID)
+
     @property
     def streamed_response(self):
         """
         Return a streamed :py:class:`flask.Response`.
         """
-        self._request()
+        try:
+            self._request()
 
-        # XXX(damb): Only return a streamed response as soon as valid data
-        # is available. Use a timeout and process errors here.
-        self._wait()
+            # XXX(damb): Only return a streamed response as soon as valid data
+            # is available. Use a timeout and process errors here.
+            self._wait()
+        except Exception:
+            # NOTE: Tasks might have been submitted while routing.
+            self._call_on_close()
+            raise
 
         resp = Response(stream_with_context(self), mimetype=self.mimetype,
                         content_type=self.content_type)
@@ -195,8 +349,38 @@ class RequestProcessor(object):
 
     def _route(self):
         """
-        Create the routing table using the routing service provided.
+        Create the routing table using the routing service provided. Routing
+        tables are cached.
         """
+        routing_table = list(self._iter_routes())
+        self.logger.debug(
+            'Number of routes received: {}'.format(len(routing_table)))
+        return routing_table
+
+    # _route ()
+
+    def _iter_routes(self):
+        """
+        Generator function yielding routes (i.e.
+        :py:class:`eidangservices.utils.Route` objects) as soon as they are
+        received from the routing service provided. Routing tables are cached.
+        """
+        cache_key = None
+        if self._routing_cache.enabled:
+            cache_key = RoutingCache.create_key(
+                self.query_params, self.stream_epochs,
+                RoutingRequestHandler.QUERY_PARAMS)
+            routing_table = self._routing_cache.get(
+                cache_key, default_endtime=self.DEFAULT_ENDTIME)
+            self.logger.debug(
+                'Routing cache {} (stats={}).'.format(
+                    ('miss' if routing_table is None else 'hit'),
+                    self._routing_cache.stats))
+            if routing_table is not None:
+                for route in routing_table:
+                    yield route
+                return
+
         routing_request = RoutingRequestHandler(
             self._routing_service, self.query_params,
             self.stream_epochs)
@@ -207,32 +391,13 @@ class RequestProcessor(object):
         routing_table = []
 
         try:
-            with binary_request(req) as fd:
-                # parse the routing service's output stream; create a routing
-                # table
-                urlline = None
-                stream_epochs = []
-
-                while True:
-                    line = fd.readline()
-
-                    if not urlline:
-                        urlline = line.strip()
-                    elif not line.strip():
-                        # set up the routing table
-                        if stream_epochs:
-                            routing_table.append(
-                                utils.Route(url=urlline,
-                                            streams=stream_epochs))
-                        urlline = None
-                        stream_epochs = []
-
-                        if not line:
-                            break
-                    else:
-                        stream_epochs.append(
-                            StreamEpoch.from_snclline(
-                                line, default_endtime=self.DEFAULT_ENDTIME))
+            # NOTE: Open endtimes are substituted after caching.
+            for route in parse_routes(
+                    stream_request(req, chunk_size=self.CHUNK_SIZE_ROUTING,
+                                   method='iter_lines')):
+                routing_table.append(route)
+                yield substitute_open_endtimes(
+                    [route], self.DEFAULT_ENDTIME)[0]
 
         except NoContent as err:
             self.logger.warning(err)
@@ -243,18 +408,22 @@ class RequestProcessor(object):
         except RequestsError as err:
             self.logger.error(err)
             raise FDSNHTTPError.create(500, service_version=__version__)
-        else:
-            self.logger.debug(
-                'Number of routes received: {}'.format(len(routing_table)))
 
-        return routing_table
+        if cache_key is not None:
+            self._routing_cache.set(cache_key, routing_table)
 
-    # _route ()
+    # _iter_routes ()
 
     def _handle_error(self, err):
+        if self._is_batch(err):
+            return self._request_granular(err)
+
         self.logger.warning(str(err))
 
     def _handle_413(self, result):
+        if len(result.data.stream_epochs) > 1:
+            return self._request_granular(result)
+
         self.logger.warning(
             'Handle endpoint HTTP status code 413 (url={}, '
             'stream_epochs={}).'.format(result.data.url,
@@ -263,6 +432,54 @@ class RequestProcessor(object):
 
     # _handle_413 ()
 
+    @staticmethod
+    def _is_batch(result):
+        """
+        Check if :code:`result` is the erroneous result of a batched request
+        (i.e. a request for more than a single stream epoch).
+        """
+        return (isinstance(result.data, FdsnRequestHandler) and
+                len(result.data.stream_epochs) > 1)
+
+    def _request_granular(self, result):
+        """
+        Fall back to granular requests (i.e. one request per stream epoch) for
+        an erroneous batched request. Hence, an erroneous stream epoch does
+        not discard the data of the remaining stream epochs of a batch.
+        """
+        self.logger.info(
+            'Handle endpoint HTTP status code {} (url={}, '
+            'stream_epochs={}) by means of granular requests.'.format(
+                result.status_code, result.data.url,
+                result.data.stream_epochs))
+        for route in demux_routes([utils.Route(
+                result.data.url, streams=result.data.stream_epochs)]):
+            self._results.submit(self._pool,
+                                 self._handle(self._create_task(route)))
+
+    # _request_granular ()
+
+    def _iter_batched_routes(self, max_timespan=None):
+        """
+        Generator function yielding batched routes while the routing response
+        is received. Routes sharing a URL are batched across the blocks of the
+        routing response; a batch is yielded as soon as it is full (see
+        :py:func:`iter_batched_routes`).
+        """
+        for route in iter_batched_routes(
+                self._iter_routes(), max_lines=self._batch_max_lines,
+                max_timespan=max_timespan,
+                default_endtime=self.DEFAULT_ENDTIME):
+            yield route
+
+    # _iter_batched_routes ()
+
+    def _create_task(self, route):
+        """
+        Template method creating the download task for a route.
+        """
+        raise NotImplementedError
+
     def _wait(self, timeout=None):
         """
         Wait for a valid endpoint response.
@@ -272,45 +489,38 @@ class RequestProcessor(object):
         if timeout is None:
             timeout = self.TIMEOUT_STREAMING
 
-        result_with_data = False
-        while True:
-            ready = []
-            for result in self._results:
-                if result.ready():
-                    _result = result.get()
-                    if _result.status_code == 200:
-                        result_with_data = True
-                        break
-                    elif _result.status_code == 413:
-                        self._handle_413(_result)
-                        ready.append(result)
-                    else:
-                        self._handle_error(_result)
-                        self._sizes.append(0)
-                        ready.append(result)
-
-                # NOTE(damb): We have to handle responses > 5MB. Blocking the
-                # processor by means of time.sleep makes executing
-                # *DownloadTasks IO bound.
-                time.sleep(0.01)
-
-            for result in ready:
-                self._results.remove(result)
-
-            if result_with_data:
+        deadline = (self.DEFAULT_ENDTIME +
+                    datetime.timedelta(seconds=timeout))
+
+        while self._results:
+            remaining = (deadline -
+                         datetime.datetime.utcnow()).total_seconds()
+            if remaining <= 0:
+                break
+
+            try:
+                _result = self._results.get(timeout=remaining)
+            except queue.Empty:
                 break
 
-            if (not self._results or datetime.datetime.utcnow() >
-                self.DEFAULT_ENDTIME +
-                    datetime.timedelta(seconds=timeout)):
-                self.logger.warning(
-                    'No valid results to be federated. ({})'.format(
-                        ('No valid results.' if not self._results else
-                         'Timeout ({}).'.format(timeout))))
-                raise FDSNHTTPError.create(
-                    int(self.query_params.get(
-                        'nodata',
-                        settings.FDSN_DEFAULT_NO_CONTENT_ERROR_CODE)))
+            if _result.status_code == 200:
+                # NOTE: The result is streamed by __iter__ ().
+                self._results.requeue(_result)
+                return
+            elif _result.status_code == 413:
+                self._handle_413(_result)
+            else:
+                self._handle_error(_result)
+                self._sizes.append(0)
+
+        self.logger.warning(
+            'No valid results to be federated. ({})'.format(
+                ('No valid results.' if not self._results else
+                 'Timeout ({}).'.format(timeout))))
+        raise FDSNHTTPError.create(
+            int(self.query_params.get(
+                'nodata',
+                settings.FDSN_DEFAULT_NO_CONTENT_ERROR_CODE)))
 
     # _wait ()
 
@@ -323,7 +533,8 @@ class RequestProcessor(object):
     def _call_on_close(self):
         """
         Template method which will be called when :py:class:`flask.Response` is
-        closed. By default pending tasks are terminated.
+        closed. By default pending tasks of the request are cancelled and
+        temporary files of results not streamed are removed.
 
         When using `mod_wsgi <http://modwsgi.readthedocs.io/en/latest/>`_ the
         method is called either in case the request successfully was responded
@@ -333,8 +544,28 @@ class RequestProcessor(object):
         <https://groups.google.com/forum/#!topic/modwsgi/jr2ayp0xesk>`_ very
         detailed.
         """
-        self._pool.terminate()
-        self._pool = None
+        self._handle.cancel()
+
+        while self._results:
+            try:
+                _result = self._results.get(timeout=0)
+            except queue.Empty:
+                # NOTE: Results of tasks still running are discarded by
+                # the cancellation handle.
+                break
+            except Exception as err:
+                self.logger.warning(err)
+                continue
+
+            if _result.status_code == 200:
+                try:
+                    os.remove(_result.data)
+                except OSError:
+                    pass
+
+        self.logger.debug(
+            'Endpoint connection pool statistics: {}.'.format(
+                SESSIONS.stats()))
 
     # _call_on_close ()
 
@@ -352,43 +583,36 @@ class RawRequestProcessor(RequestProcessor):
 
     LOGGER = "flask.app.federator.request_processor_raw"
 
-    CHUNK_SIZE = 1024
-
-    @property
-    def POOL_SIZE(self):
-        return current_app.config['FED_THREAD_CONFIG']['fdsnws-dataselect']
+    POOL_ID = 'fdsnws-dataselect'
 
     def _request(self):
         """
         process a federated request
         """
-        routes = demux_routes(self._route())
-
-        pool_size = (len(routes) if
-                     len(routes) < self.POOL_SIZE else self.POOL_SIZE)
-
-        self.logger.debug('Init worker pool (size={}).'.format(pool_size))
-        self._pool = mp.pool.ThreadPool(processes=pool_size)
-        # NOTE(damb): With pleasure I'd like to define the parameter
-        # maxtasksperchild=self.MAX_TASKS_PER_CHILD)
-        # However, using this parameter seems to lead to processes unexpectedly
-        # terminated. Hence some tasks never return a *ready* result.
-
-        for route in routes:
+        # NOTE: Tasks are submitted while routing.
+        for route in self._iter_batched_routes(
+                max_timespan=self._batch_max_timespan):
             self.logger.debug(
                 'Creating DownloadTask for {!r} ...'.format(
                     route))
-            t = RawDownloadTask(
-                GranularFdsnRequestHandler(
-                    route.url,
-                    route.streams[0],
-                    query_params=self.query_params))
-            result = self._pool.apply_async(t)
-            self._results.append(result)
+            t = self._create_task(route)
+            self._results.submit(self._pool, self._handle(t))
 
     # _request ()
 
+    def _create_task(self, route):
+        return RawDownloadTask(
+            FdsnRequestHandler(
+                route.url,
+                route.streams,
+                query_params=self.query_params))
+
+    # _create_task ()
+
     def _handle_413(self, result):
+        if len(result.data.stream_epochs) > 1:
+            return super()._handle_413(result)
+
         self.logger.info(
             'Handle endpoint HTTP status code 413 (url={}, '
             'stream_epochs={}).'.format(result.data.url,
@@ -402,8 +626,7 @@ class RawRequestProcessor(RequestProcessor):
             query_params=self.query_params,
             endtime=self.DEFAULT_ENDTIME)
 
-        result = self._pool.apply_async(t)
-        self._results.append(result)
+        self._results.submit(self._pool, self._handle(t))
 
     # _handle_413 ()
 
@@ -414,65 +637,37 @@ class RawRequestProcessor(RequestProcessor):
         # TODO(damb): The processor has to write metadata to the log database.
         # Also in case of errors.
 
-        def generate_chunks(fd, chunk_size=self.CHUNK_SIZE):
-            while True:
-                data = fd.read(chunk_size)
-                if not data:
-                    break
-                yield data
-
-        while True:
-
-            ready = []
-            for result in self._results:
-
-                if result.ready():
-                    _result = result.get()
-
-                    if _result.status_code == 200:
-                        self._sizes.append(_result.length)
-                        self.logger.debug(
-                            'Streaming from file {!r} (chunk_size={}).'.format(
-                                _result.data, self.CHUNK_SIZE))
-                        try:
-                            with open(_result.data, 'rb') as fd:
-                                for chunk in generate_chunks(fd):
-                                    yield chunk
-                        except Exception as err:
-                            raise StreamingError(err)
-
-                        self.logger.debug(
-                            'Removing temporary file {!r} ...'.format(
-                                _result.data))
-                        try:
-                            os.remove(_result.data)
-                        except OSError as err:
-                            RequestProcessorError(err)
-
-                    elif _result.status_code == 413:
-                        self._handle_413(_result)
-
-                    else:
-                        self._handle_error(_result)
-                        self._sizes.append(0)
-
-                    ready.append(result)
-
-                # NOTE(damb): We have to handle responses > 5MB. Blocking the
-                # processor by means of time.sleep makes executing
-                # *DownloadTasks IO bound.
-                time.sleep(0.01)
-
-            # TODO(damb): Implement a timeout solution in case results are
-            # never ready.
-            for result in ready:
-                self._results.remove(result)
-
-            if not self._results:
-                break
+        # TODO(damb): Implement a timeout solution in case results are never
+        # ready.
+        while self._results:
+            _result = self._results.get()
+
+            if _result.status_code == 200:
+                self._sizes.append(_result.length)
+                self.logger.debug(
+                    'Streaming from file {!r} (chunk_size={}).'.format(
+                        _result.data, self.CHUNK_SIZE))
+                try:
+                    with open(_result.data, 'rb') as fd:
+                        for chunk in generate_chunks(fd, self.CHUNK_SIZE):
+                            yield chunk
+                except Exception as err:
+                    raise StreamingError(err)
+
+                self.logger.debug(
+                    'Removing temporary file {!r} ...'.format(_result.data))
+                try:
+                    os.remove(_result.data)
+                except OSError as err:
+                    RequestProcessorError(err)
+
+            elif _result.status_code == 413:
+                self._handle_413(_result)
+
+            else:
+                self._handle_error(_result)
+                self._sizes.append(0)
 
-        self._pool.close()
-        self._pool.join()
         self.logger.debug('Result sizes: {}.'.format(self._sizes))
         self.logger.info(
             'Results successfully processed (Total bytes: {}).'.format(
@@ -533,22 +728,25 @@ class StationXMLRequestProcessor(StationRequestProcessor):
 
     This processor implementation implements federatation using a two-level
     approach.
-    On the first level the processor maintains a worker pool (implemented by
-    means of the python multiprocessing module). Special *CombiningTask* object
-    instances are mapped to the pool managing the download for a certain
-    network code.
+    On the first level special *CombiningTask* object instances are mapped to
+    the application scoped combiner worker pool managing the download for a
+    certain network code.
     On a second level RawCombinerTask implementations demultiplex the routing
-    information, again. Multiple DownloadTask object instances (implemented
-    using multiprocessing.pool.ThreadPool) are executed requesting granular
-    stream epoch information (i.e. one task per fully resolved stream
-    epoch).
+    information, again. Multiple DownloadTask object instances are executed by
+    the application scoped download worker pool requesting granular stream
+    epoch information (i.e. one task per fully resolved stream epoch).
     Combining tasks collect the information from their child downloading
     threads. As soon the information for an entire network code is fetched the
     resulting data is combined and temporarly saved. Finally
     StationRequestProcessor implementations merge the final result.
-    """
-    CHUNK_SIZE = 1024
 
+    With the :code:`incremental` combiner and :code:`level=station`
+    combining tasks publish the :code:`<Station></Station>` elements of a
+    network as soon as a download task finishes (see
+    :py:class:`StationXMLIncrementalNetworkCombinerTask`). The processor
+    streams the results of a single network at a time and buffers the
+    results of the remaining networks meanwhile.
+    """
     SOURCE = 'EIDA'
     HEADER = ('<?xml version="1.0" encoding="UTF-8"?>'
               '<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" '
@@ -557,97 +755,150 @@ class StationXMLRequestProcessor(StationRequestProcessor):
               '<Created>{}</Created>')
     FOOTER = '</FDSNStationXML>'
 
+    POOL_ID = 'fdsnws-station-xml-combiner'
+
+    COMBINERS = {
+        'incremental': StationXMLIncrementalNetworkCombinerTask,
+        'streaming': StationXMLStreamingNetworkCombinerTask,
+        'tree': StationXMLNetworkCombinerTask}
+
+    def __init__(self, mimetype, query_params={}, stream_epochs=[], post=True,
+                 **kwargs):
+        super().__init__(mimetype, query_params, stream_epochs, post, **kwargs)
+
+        combiner = current_app.config.get(
+            'FED_STATIONXML_COMBINER',
+            settings.EIDA_FEDERATOR_STATIONXML_COMBINER)
+        # NOTE: <Station></Station> elements are published incrementally
+        # with level=station, only.
+        if combiner == 'incremental' and self._level != 'station':
+            combiner = 'streaming'
+        self._combiner = self.COMBINERS[combiner]
+        self._incremental = combiner == 'incremental'
+
+        # NOTE: The network of the results currently streamed. Results of
+        # other networks are buffered (in the order of their first
+        # occurrence) until the network is complete.
+        self._open_network = None
+        self._buffered = collections.OrderedDict()
+
+    # __init__ ()
+
     def _request(self):
         """
         Process a federated fdsnws-station XML request.
         """
         routes = self._route()
 
-        pool_size = (len(routes) if
-                     len(routes) < self.POOL_SIZE else self.POOL_SIZE)
-
-        self.logger.debug('Init worker pool (size={}).'.format(pool_size))
-        self._pool = mp.pool.Pool(processes=pool_size)
-        # NOTE(damb): With pleasure I'd like to define the parameter
-        # maxtasksperchild=self.MAX_TASKS_PER_CHILD)
-        # However, using this parameter seems to lead to processes unexpectedly
-        # terminated. Hence some tasks never return a *ready* result.
-
         for net, routes in routes.items():
             self.logger.debug(
                 'Creating CombinerTask for {!r} ...'.format(net))
-            t = StationXMLNetworkCombinerTask(
-                routes, self.query_params, name=net)
-            result = self._pool.apply_async(t)
-            self._results.append(result)
-
-        self._pool.close()
+            # NOTE: Combiners are executed by means of a separate pool.
+            # Since combiners wait for download tasks (but not vice versa) the
+            # pools cannot deadlock.
+            kwargs = {}
+            if self._incremental:
+                kwargs['sink'] = self._results
+            t = self._combiner(
+                routes, self.query_params, name=net,
+                executor=self._executor, handle=self._handle, **kwargs)
+            self._results.submit(self._pool, self._handle(t))
 
     # _request ()
 
+    def _order(self, result):
+        """
+        Order the results of incremental combiners such that network elements
+        do not interleave.
+
+        :param result: Result fetched
+        :returns: :code:`True` if :code:`result` is to be processed,
+            :code:`False` if it was buffered
+        """
+        if not isinstance(result, NetworkResult):
+            return True
+
+        if self._open_network is None:
+            self._open_network = result.network
+        if result.network != self._open_network:
+            self._buffered.setdefault(result.network, []).append(result)
+            return False
+
+        if not result.partial:
+            # the network is complete; continue with the results buffered of
+            # the next network
+            self._open_network = None
+            if self._buffered:
+                _, buffered = self._buffered.popitem(last=False)
+                for _result in reversed(buffered):
+                    self._results.requeue(_result)
+
+        return True
+
+    # _order ()
+
+    def _call_on_close(self):
+        for results in self._buffered.values():
+            for _result in results:
+                if _result.status_code == 200:
+                    try:
+                        os.remove(_result.data)
+                    except OSError:
+                        pass
+        self._buffered.clear()
+
+        super()._call_on_close()
+
+    # _call_on_close ()
+
     def __iter__(self):
         """
         Make the processor *streamable*.
         """
-        def generate_chunks(fd, chunk_size=self.CHUNK_SIZE):
-            while True:
-                data = fd.read(chunk_size)
-                if not data:
-                    break
-                yield data
-
-        while True:
-            ready = []
-            for result in self._results:
-                if result.ready():
-
-                    _result = result.get()
-                    if _result.status_code == 200:
-                        if not sum(self._sizes):
-                            yield self.HEADER.format(
-                                self.SOURCE,
-                                datetime.datetime.utcnow().isoformat())
-
-                        self._sizes.append(_result.length)
-                        self.logger.debug(
-                            'Streaming from file {!r} (chunk_size={}).'.format(
-                                _result.data, self.CHUNK_SIZE))
-                        try:
-                            with open(_result.data, 'r', encoding='utf-8') \
-                                    as fd:
-                                for chunk in generate_chunks(fd):
-                                    yield chunk
-                        except Exception as err:
-                            raise StreamingError(err)
-
-                        self.logger.debug(
-                            'Removing temporary file {!r} ...'.format(
-                                _result.data))
-                        try:
-                            os.remove(_result.data)
-                        except OSError as err:
-                            RequestProcessorError(err)
-
-                    elif _result.status_code == 413:
-                        self._handle_413(_result)
-
-                    else:
-                        self._handle_error(_result)
-                        self._sizes.append(0)
-
-                    ready.append(result)
-
-            # TODO(damb): Implement a timeout solution in case results are
-            # never ready.
-            for result in ready:
-                self._results.remove(result)
-
-            if not self._results:
-                break
-
-        yield self.FOOTER
+        # NOTE: Temporary files are streamed as they are i.e. without
+        # decoding.
+
+        # TODO(damb): Implement a timeout solution in case results are never
+        # ready.
+        while self._results:
+            _result = self._results.get()
+            if not self._order(_result):
+                continue
+
+            if _result.status_code == 200:
+                if not sum(self._sizes):
+                    yield self.HEADER.format(
+                        self.SOURCE,
+                        datetime.datetime.utcnow().isoformat()).encode(
+                            'utf-8')
+
+                self._sizes.append(_result.length)
+                self.logger.debug(
+                    'Streaming from file {!r} (chunk_size={}).'.format(
+                        _result.data, self.CHUNK_SIZE))
+                try:
+                    with open(_result.data, 'rb') as fd:
+                        for chunk in generate_chunks(fd, self.CHUNK_SIZE):
+                            yield chunk
+                except Exception as err:
+                    raise StreamingError(err)
+
+                self.logger.debug(
+                    'Removing temporary file {!r} ...'.format(_result.data))
+                try:
+                    os.remove(_result.data)
+                except OSError as err:
+                    RequestProcessorError(err)
+
+            elif _result.status_code == 413:
+                self._handle_413(_result)
+
+            else:
+                self._handle_error(_result)
+                self._sizes.append(0)
+
+        yield self.FOOTER.encode('utf-8')
 
-        self._pool.join()
         self.logger.debug('Result sizes: {}.'.format(self._sizes))
         self.logger.info(
             'Results successfully processed (Total bytes: {}).'.format(
@@ -674,95 +925,78 @@ class StationTextRequestProcessor(StationRequestProcessor):
         'Longitude|Elevation|Depth|Azimuth|Dip|SensorDescription|Scale|'
         'ScaleFreq|ScaleUnits|SampleRate|StartTime|EndTime')
 
-    @property
-    def POOL_SIZE(self):
-        return current_app.config['FED_THREAD_CONFIG']['fdsnws-station-text']
+    POOL_ID = 'fdsnws-station-text'
 
     def _request(self):
         """
         Process a federated fdsnws-station text request
         """
-        routes = flatten_routes(self._route())
-
-        pool_size = (len(routes) if
-                     len(routes) < self.POOL_SIZE else self.POOL_SIZE)
-
-        self.logger.debug('Init worker pool (size={}).'.format(pool_size))
-        self._pool = mp.pool.ThreadPool(processes=pool_size)
-
-        for route in routes:
+        # NOTE: Tasks are submitted while routing. Routes are not
+        # required to be grouped by network.
+        for route in self._iter_batched_routes():
             self.logger.debug(
                 'Creating DownloadTask for {!r} ...'.format(
                     route))
-            t = StationTextDownloadTask(
-                GranularFdsnRequestHandler(
-                    route.url,
-                    route.streams[0],
-                    query_params=self.query_params))
-            result = self._pool.apply_async(t)
-            self._results.append(result)
-
-        self._pool.close()
+            t = self._create_task(route)
+            self._results.submit(self._pool, self._handle(t))
 
     # _request ()
 
+    def _create_task(self, route):
+        return StationTextDownloadTask(
+            FdsnRequestHandler(
+                route.url,
+                route.streams,
+                query_params=self.query_params))
+
+    # _create_task ()
+
     def __iter__(self):
         """
         Make the processor *streamable*.
         """
-        while True:
-            ready = []
-            for result in self._results:
-                if result.ready():
-
-                    _result = result.get()
-                    if _result.status_code == 200:
-                        if not sum(self._sizes):
-                            # add header
-                            if self._level == 'network':
-                                yield '{}\n'.format(self.HEADER_NETWORK)
-                            elif self._level == 'station':
-                                yield '{}\n'.format(self.HEADER_STATION)
-                            elif self._level == 'channel':
-                                yield '{}\n'.format(self.HEADER_CHANNEL)
-
-                        self._sizes.append(_result.length)
-                        self.logger.debug(
-                            'Streaming from file {!r}.'.format(_result.data))
-                        try:
-                            with open(_result.data, 'r', encoding='utf-8') \
-                                    as fd:
-                                for line in fd:
-                                    yield line
-                        except Exception as err:
-                            raise StreamingError(err)
-
-                        self.logger.debug(
-                            'Removing temporary file {!r} ...'.format(
-                                _result.data))
-                        try:
-                            os.remove(_result.data)
-                        except OSError as err:
-                            RequestProcessorError(err)
-
-                    elif _result.status_code == 413:
-                        self._handle_413(_result)
-
-                    else:
-                        self._handle_error(_result)
-                        self._sizes.append(0)
-
-                    ready.append(result)
-
-            # TODO(damb): Implement a timeout solution in case results are
-            # never ready.
-            for result in ready:
-                self._results.remove(result)
-
-            if not self._results:
-                break
+        # TODO(damb): Implement a timeout solution in case results are never
+        # ready.
+        while self._results:
+            _result = self._results.get()
+            if not self._order(_result):
+                continue
+
+            if _result.status_code == 200:
+                if not sum(self._sizes):
+                    # add header
+                    if self._level == 'network':
+                        yield '{}\n'.format(self.HEADER_NETWORK).encode()
+                    elif self._level == 'station':
+                        yield '{}\n'.format(self.HEADER_STATION).encode()
+                    elif self._level == 'channel':
+                        yield '{}\n'.format(self.HEADER_CHANNEL).encode()
+
+                self._sizes.append(_result.length)
+                self.logger.debug(
+                    'Streaming from file {!r} (chunk_size={}).'.format(
+                        _result.data, self.CHUNK_SIZE))
+                try:
+                    with open(_result.data, 'rb') as fd:
+                        for chunk in generate_chunks(fd, self.CHUNK_SIZE):
+                            yield chunk
+                except Exception as err:
+                    raise StreamingError(err)
+
+                self.logger.debug(
+                    'Removing temporary file {!r} ...'.format(_result.data))
+                try:
+                    os.remove(_result.data)
+                except OSError as err:
+                    RequestProcessorError(err)
+
+            elif _result.status_code == 413:
+                self._handle_413(_result)
+
+            else:
+                self._handle_error(_result)
+                self._sizes.append(0)
 
-        self._pool.join()
         self.logger.debug('Result sizes: {}.'.format(self._sizes))
         self.logger.info(
             'Results successfully processed (Total bytes: {}).'.format(
@@ -779,47 +1013,40 @@ class WFCatalogRequestProcessor(RequestProcessor):
     """
     LOGGER = "flask.app.federator.request_processor_wfcatalog"
 
-    CHUNK_SIZE = 1024
-
     JSON_LIST_START = '['
     JSON_LIST_END = ']'
     JSON_LIST_SEP = ','
 
-    @property
-    def POOL_SIZE(self):
-        return current_app.config['FED_THREAD_CONFIG']['eidaws-wfcatalog']
+    POOL_ID = 'eidaws-wfcatalog'
 
     def _request(self):
         """
         process a federated fdsnws-station text request
         """
-        routes = demux_routes(self._route())
-
-        pool_size = (len(routes) if
-                     len(routes) < self.POOL_SIZE else self.POOL_SIZE)
-
-        self.logger.debug('Init worker pool (size={}).'.format(pool_size))
-        self._pool = mp.pool.ThreadPool(processes=pool_size)
-        # NOTE(damb): With pleasure I'd like to define the parameter
-        # maxtasksperchild=self.MAX_TASKS_PER_CHILD)
-        # However, using this parameter seems to lead to processes unexpectedly
-        # terminated. Hence some tasks never return a *ready* result.
-
-        for route in routes:
+        # NOTE: Tasks are submitted while routing.
+        for route in self._iter_batched_routes(
+                max_timespan=self._batch_max_timespan):
             self.logger.debug(
                 'Creating DownloadTask for {!r} ...'.format(
                     route))
-            t = RawDownloadTask(
-                GranularFdsnRequestHandler(
-                    route.url,
-                    route.streams[0],
-                    query_params=self.query_params))
-            result = self._pool.apply_async(t)
-            self._results.append(result)
+            t = self._create_task(route)
+            self._results.submit(self._pool, self._handle(t))
 
     # _request ()
 
+    def _create_task(self, route):
+        return RawDownloadTask(
+            FdsnRequestHandler(
+                route.url,
+                route.streams,
+                query_params=self.query_params))
+
+    # _create_task ()
+
     def _handle_413(self, result):
+        if len(result.data.stream_epochs) > 1:
+            return super()._handle_413(result)
+
         self.logger.info(
             'Handle endpoint HTTP status code 413 (url={}, '
             'stream_epochs={}).'.format(result.data.url,
@@ -833,8 +1060,7 @@ class WFCatalogRequestProcessor(RequestProcessor):
             query_params=self.query_params,
             endtime=self.DEFAULT_ENDTIME)
 
-        result = self._pool.apply_async(t)
-        self._results.append(result)
+        self._results.submit(self._pool, self._handle(t))
 
     # _handle_413 ()
 
@@ -857,71 +1083,54 @@ class WFCatalogRequestProcessor(RequestProcessor):
 
                 yield buf
 
-        while True:
-            ready = []
-            for result in self._results:
-                if result.ready():
-                    _result = result.get()
-                    if _result.status_code == 200:
-                        if not sum(self._sizes):
-                            # add header
-                            yield self.JSON_LIST_START
-
-                        self.logger.debug(
-                            'Streaming from file {!r} (chunk_size={}).'.format(
-                                _result.data, self.CHUNK_SIZE))
-                        try:
-                            with open(_result.data, 'rb') as fd:
-                                # skip leading bracket (from JSON list)
-                                size = 0
-                                for chunk in generate_chunks(fd,
-                                                             self.CHUNK_SIZE):
-                                    size += len(chunk)
-                                    yield chunk
-
-                            self._sizes.append(size)
-
-                        except Exception as err:
-                            raise StreamingError(err)
-
-                        if len(self._results) > 1:
-                            # append comma if not last stream epoch data
-                            yield self.JSON_LIST_SEP
-
-                        self.logger.debug(
-                            'Removing temporary file {!r} ...'.format(
-                                _result.data))
-                        try:
-                            os.remove(_result.data)
-                        except OSError as err:
-                            RequestProcessorError(err)
-
-                    elif _result.status_code == 413:
-                        self._handle_413(_result)
-
-                    else:
-                        self._handle_error(_result)
-                        self._sizes.append(0)
-
-                    ready.append(result)
-
-                # NOTE(damb): We have to handle responses > 5MB. Blocking the
-                # processor by means of time.sleep makes executing
-                # *DownloadTasks IO bound.
-                time.sleep(0.01)
-
-            # TODO(damb): Implement a timeout solution in case results are
-            # never ready.
-            for result in ready:
-                self._results.remove(result)
-
-            if not self._results:
-                break
+        # TODO(damb): Implement a timeout solution in case results are never
+        # ready.
+        while self._results:
+            _result = self._results.get()
+            if not self._order(_result):
+                continue
+
+            if _result.status_code == 200:
+                if not sum(self._sizes):
+                    # add header
+                    yield self.JSON_LIST_START
+
+                self.logger.debug(
+                    'Streaming from file {!r} (chunk_size={}).'.format(
+                        _result.data, self.CHUNK_SIZE))
+                try:
+                    with open(_result.data, 'rb') as fd:
+                        # skip leading bracket (from JSON list)
+                        size = 0
+                        for chunk in generate_chunks(fd, self.CHUNK_SIZE):
+                            size += len(chunk)
+                            yield chunk
+
+                    self._sizes.append(size)
+
+                except Exception as err:
+                    raise StreamingError(err)
+
+                if self._results:
+                    # append comma if not last stream epoch data
+                    yield self.JSON_LIST_SEP
+
+                self.logger.debug(
+                    'Removing temporary file {!r} ...'.format(_result.data))
+                try:
+                    os.remove(_result.data)
+                except OSError as err:
+                    RequestProcessorError(err)
+
+            elif _result.status_code == 413:
+                self._handle_413(_result)
+
+            else:
+                self._handle_error(_result)
+                self._sizes.append(0)
 
         yield self.JSON_LIST_END
 
-        self._pool.close()
-        self._pool.join()
         self.logger.debug('Result sizes: {}.'.format(self._sizes))
         self.logger.info(
             'Results successfully processed (Total bytes: {}).'.format(
@@ -35,20 +35,20 @@ from builtins import * # noqa
 from future.standard_library import install_aliases
 install_aliases()
 
-import functools
-
 from urllib.parse import urlparse, urlunparse
 
 import requests
 
 from eidangservices import settings, utils
-from eidangservices.utils.schema import StreamEpochSchema
+from eidangservices.utils import sncl
 from eidangservices.federator import __version__
 
 
 class RequestHandlerBase(object):
     """
-    RequestHandler base class implementation.
+    RequestHandler base class implementation. Request handlers create
+    :py:class:`requests.Request` objects which are sent by means of the pooled
+    sessions from :py:mod:`eidangservices.utils.request`.
 
     :param str url: URL
     :param dict query_params: Dictionary of query parameters
@@ -103,7 +103,8 @@ class RequestHandlerBase(object):
         raise NotImplementedError
 
     def post(self):
-        return [functools.partial(requests.post, self.url, data=p)
+        return [requests.Request('POST', self.url, data=p,
+                                 headers=self.HEADERS)
                 for p in self.payload_post]
 
     def __str__(self):
@@ -133,7 +134,11 @@ class RoutingRequestHandler(RequestHandlerBase):
                         'minlatitude',
                         'maxlatitude',
                         'minlongitude',
-                        'maxlongitude'))
+                        'maxlongitude',
+                        'latitude',
+                        'longitude',
+                        'minradius',
+                        'maxradius'))
 
     class GET(object):
         """
@@ -156,11 +161,10 @@ class RoutingRequestHandler(RequestHandlerBase):
 
     @property
     def payload_get(self):
-        se_schema = StreamEpochSchema(many=True, context={'request': self.GET})
-
         qp = self._query_params
         qp.update(utils.convert_sncl_dicts_to_query_params(
-                  se_schema.dump(self._stream_epochs)))
+                  [sncl.dump_stream_epoch(se, method=self.GET.method)
+                   for se in self._stream_epochs]))
         return qp
 
     # payload_get ()
@@ -176,25 +180,31 @@ class RoutingRequestHandler(RequestHandlerBase):
     # payload_post ()
 
     def get(self):
-        return functools.partial(requests.get, self.url,
-                                 params=self.payload_get, headers=self.HEADERS)
+        return requests.Request('GET', self.url, params=self.payload_get,
+                                headers=self.HEADERS)
 
     def post(self):
-        return functools.partial(requests.post, self.url,
-                                 data=self.payload_post, headers=self.HEADERS)
+        return requests.Request('POST', self.url, data=self.payload_post,
+                                headers=self.HEADERS)
 
 # class RoutingURL
 
 
-class GranularFdsnRequestHandler(RequestHandlerBase):
+class FdsnRequestHandler(RequestHandlerBase):
     """
-    Representation of a FDSN webservice request handler.
+    Representation of a FDSN webservice request handler. The request's POST
+    payload contains a line for each stream epoch.
+
+    :param str url: URL
+    :param list stream_epochs: List of
+        :py:class:`eidangservices.utils.sncl.StreamEpoch` objects
+    :param dict query_params: Dictionary of query parameters
     """
     QUERY_PARAMS = set(('service',
                         'nodata'))
 
-    def __init__(self, url, stream_epoch, query_params={}):
-        super().__init__(url, query_params, [stream_epoch])
+    def __init__(self, url, stream_epochs, query_params={}):
+        super().__init__(url, query_params, stream_epochs)
         self._query_params = dict((p, v)
                                   for p, v in self._query_params.items()
                                   if p not in self.QUERY_PARAMS)
@@ -204,11 +214,24 @@ class GranularFdsnRequestHandler(RequestHandlerBase):
     def payload_post(self):
         data = '\n'.join('{}={}'.format(p, v)
                          for p, v in self._query_params.items())
-        return '{}\n{}'.format(data, self.stream_epochs[0])
+        return '{}\n{}'.format(
+            data, '\n'.join(str(se) for se in self.stream_epochs))
 
     def post(self):
-        return functools.partial(requests.post, self.url,
-                                 data=self.payload_post, headers=self.HEADERS)
+        return requests.Request('POST', self.url, data=self.payload_post,
+                                headers=self.HEADERS)
+
+# class FdsnRequestHandler
+
+
+class GranularFdsnRequestHandler(FdsnRequestHandler):
+    """
+    Representation of a FDSN webservice request handler for a single stream
+    epoch.
+    """
+
+    def __init__(self, url, stream_epoch, query_params={}):
+        super().__init__(url, [stream_epoch], query_params)
 
 # class GranularFdsnRequestHandler
 
@@ -131,15 +131,15 @@ class StationSchema(ServiceSchema):
     maxlatitude = Latitude()
     maxlat = Latitude(load_only=True)
     minlongitude = Longitude()
-    minlon = Latitude(load_only=True)
+    minlon = Longitude(load_only=True)
     maxlongitude = Longitude()
-    maxlon = Latitude(load_only=True)
+    maxlon = Longitude(load_only=True)
 
     # geographic (circular spatial) options
     latitude = Latitude()
     lat = Latitude(load_only=True)
     longitude = Longitude()
-    lon = Latitude(load_only=True)
+    lon = Longitude(load_only=True)
     minradius = Radius()
     maxradius = Radius()
 
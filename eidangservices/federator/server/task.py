@@ -37,17 +37,18 @@ import datetime
 import json
 import logging
 import os
+import resource
 
 from multiprocessing.pool import ThreadPool
 
 import ijson
 
-from flask import current_app
 from lxml import etree
 
 from eidangservices import settings
-from eidangservices.federator.server.misc import (get_temp_filepath,
-                                                  elements_equal)
+from eidangservices.federator.server.misc import (CompletionQueue,
+                                                  get_temp_filepath,
+                                                  element_fingerprint)
 from eidangservices.federator.server.request import GranularFdsnRequestHandler
 from eidangservices.utils.request import (binary_request, raw_request,
                                           stream_request, RequestsError)
@@ -118,6 +119,18 @@ class Result(collections.namedtuple('Result', ['status',
 # class Result
 
 
+class NetworkResult(collections.namedtuple(
+        'NetworkResult', Result._fields + ('network', 'partial'))):
+    """
+    :py:class:`Result` tagged with the network code of the task it was
+    created by. :code:`partial` is :code:`True` for results published while
+    the task is running (see
+    :py:class:`StationXMLIncrementalNetworkCombinerTask`).
+    """
+
+# class NetworkResult
+
+
 # -----------------------------------------------------------------------------
 class TaskBase(object):
     """
@@ -156,11 +169,19 @@ class CombinerTask(TaskBase):
     """
     Task downloading and combining the information for a network. Downloading
     is performed concurrently.
+
+    If an :code:`executor` (i.e. a
+    :py:class:`eidangservices.federator.server.executor.TaskExecutor`) is
+    passed download tasks are submitted to the executor's worker pool
+    identified by :code:`POOL_ID`. Else the task maintains a worker pool on
+    its own. Download tasks are wrapped by an optional cancellation
+    :code:`handle`.
     """
 
     LOGGER = 'flask.app.federator.task_combiner_raw'
 
     MAX_THREADS_DOWNLOADING = 5
+    POOL_ID = None
 
     def __init__(self, routes, query_params, **kwargs):
         super().__init__((kwargs['logger'] if kwargs.get('logger') else
@@ -180,8 +201,12 @@ class CombinerTask(TaskBase):
             else
             kwargs.get('max_threads', self.MAX_THREADS_DOWNLOADING))
         self._pool = None
+        self._executor = kwargs.get('executor')
+        self._handle = kwargs.get('handle')
 
-        self._results = []
+        # NOTE: The CompletionQueue is created when running the task
+        # since tasks must be picklable.
+        self._results = None
         self._sizes = []
 
     # __init__ ()
@@ -189,6 +214,31 @@ class CombinerTask(TaskBase):
     def _handle_error(self, err):
         self.logger.warning(str(err))
 
+    def _init_pool(self):
+        if self._executor is not None:
+            self._pool = self._executor.pool(self.POOL_ID)
+        else:
+            self._pool = ThreadPool(processes=self._num_workers)
+
+    # _init_pool ()
+
+    def _submit(self, task):
+        if self._handle is not None:
+            task = self._handle(task)
+        return self._results.submit(self._pool, task)
+
+    # _submit ()
+
+    def _close_pool(self):
+        # NOTE: Application scoped worker pools are shared and must not
+        # be closed.
+        if self._executor is None:
+            self._pool.close()
+            self._pool.join()
+        self._pool = None
+
+    # _close_pool ()
+
     def _run(self):
         """
         Template method for CombinerTask declarations. Must be reimplemented.
@@ -227,6 +277,9 @@ class StationXMLNetworkCombinerTask(CombinerTask):
     STATION_TAG = settings.STATIONXML_ELEMENT_STATION
     CHANNEL_TAG = settings.STATIONXML_ELEMENT_CHANNEL
 
+    MAX_THREADS_DOWNLOADING = settings.EIDA_FEDERATOR_THREADS_STATION_XML
+    POOL_ID = 'fdsnws-station-xml'
+
     def __init__(self, routes, query_params, **kwargs):
 
         nets = set([se.network for route in routes for se in route.streams])
@@ -238,14 +291,15 @@ class StationXMLNetworkCombinerTask(CombinerTask):
         super().__init__(routes, query_params, logger=self.LOGGER, **kwargs)
         self._level = self.query_params.get('level', 'station')
         self._network_elements = []
+        # NOTE: Network and station epoch elements are indexed by
+        # means of their fingerprints (see
+        # eidangservices.federator.server.misc.element_fingerprint).
+        self._network_index = {}
+        self._station_index = {}
         self.path_tempfile = None
 
     # __init__ ()
 
-    @property
-    def MAX_THREADS_DOWNLOADING(self):
-        return current_app.config['FED_THREAD_CONFIG']['fdsnws-station-xml']
-
     def _clean(self, result):
         self.logger.debug(
             'Removing temporary file {!r} ...'.format(
@@ -262,7 +316,8 @@ class StationXMLNetworkCombinerTask(CombinerTask):
         Combine StationXML `<Network></Network>` information.
         """
         self.logger.info('Executing task {!r}.'.format(self))
-        self._pool = ThreadPool(processes=self._num_workers)
+        self._init_pool()
+        self._results = CompletionQueue()
 
         for route in self._routes:
             self.logger.debug(
@@ -275,92 +330,77 @@ class StationXMLNetworkCombinerTask(CombinerTask):
                 decode_unicode=True)
 
             # apply DownloadTask asynchronoulsy to the worker pool
-            result = self._pool.apply_async(t)
-
-            self._results.append(result)
-
-        self._pool.close()
-
-        # fetch results ready
-        while True:
-            ready = []
-            for result in self._results:
-                if result.ready():
-                    _result = result.get()
-                    if _result.status_code == 200:
-                        if self._level in ('channel', 'response'):
-                            # merge <Channel></Channel> elements into
-                            # <Station></Station> from the correct
-                            # <Network></Network> epoch element
-                            for _net_element in self._extract_net_elements(
-                                    _result.data):
-
-                                # find the correct <Network></Network> epoch
-                                # element
-                                net_element, known = self._emerge_net_element(
-                                    _net_element,
-                                    exclude_tags=[
-                                        '{}{}'.format(ns, self.STATION_TAG)
-                                        for ns in \
-                                        settings.STATIONXML_NAMESPACES])
-
-                                if not known:
-                                    continue
-
-                                # append/merge station elements
-                                for sta_element in \
-                                        self._emerge_sta_elements(
-                                            _net_element):
-                                    self._merge_sta_element(
-                                        net_element,
-                                        sta_element)
-
-                        elif self._level == 'station':
-                            # append <Station></Station> elements to the
-                            # corresponding <Network></Network> epoch
-                            for _net_element in self._extract_net_elements(
-                                    _result.data):
-
-                                net_element, known = self._emerge_net_element(
-                                    _net_element,
-                                    exclude_tags=[
-                                        '{}{}'.format(ns, self.STATION_TAG)
-                                        for ns in \
-                                        settings.STATIONXML_NAMESPACES])
-
-                                if not known:
-                                    continue
-
-                                # append station elements
-                                # NOTE(damb): <Station></Station> elements
-                                # defined by multiple EIDA nodes are simply
-                                # appended; no merging is performed
-                                for sta_element in \
-                                        self._emerge_sta_elements(
-                                            _net_element):
-                                    net_element.append(sta_element)
-
-                        elif self._level == 'network':
-                            for net_element in self._extract_net_elements(
-                                    _result.data):
-                                _, _ = self._emerge_net_element(net_element)
+            self._submit(t)
+
+        # fetch results as soon as they are ready
+        while self._results:
+            _result = self._results.get()
+            if _result.status_code == 200:
+                if self._level in ('channel', 'response'):
+                    # merge <Channel></Channel> elements into
+                    # <Station></Station> from the correct
+                    # <Network></Network> epoch element
+                    for _net_element in self._extract_net_elements(
+                            _result.data):
+
+                        # find the correct <Network></Network> epoch
+                        # element
+                        net_element, known = self._emerge_net_element(
+                            _net_element,
+                            exclude_tags=[
+                                '{}{}'.format(ns, self.STATION_TAG)
+                                for ns in \
+                                settings.STATIONXML_NAMESPACES])
+
+                        if not known:
+                            continue
 
-                        self._clean(_result)
-                        self._sizes.append(_result.length)
+                        # append/merge station elements
+                        for sta_element in \
+                                self._emerge_sta_elements(
+                                    _net_element):
+                            self._merge_sta_element(
+                                net_element,
+                                sta_element)
+
+                elif self._level == 'station':
+                    # append <Station></Station> elements to the
+                    # corresponding <Network></Network> epoch
+                    for _net_element in self._extract_net_elements(
+                            _result.data):
+
+                        net_element, known = self._emerge_net_element(
+                            _net_element,
+                            exclude_tags=[
+                                '{}{}'.format(ns, self.STATION_TAG)
+                                for ns in \
+                                settings.STATIONXML_NAMESPACES])
+
+                        if not known:
+                            continue
 
-                    else:
-                        self._handle_error(_result)
-                        self._sizes.append(0)
+                        # append station elements
+                        # NOTE(damb): <Station></Station> elements
+                        # defined by multiple EIDA nodes are simply
+                        # appended; no merging is performed
+                        for sta_element in \
+                                self._emerge_sta_elements(
+                                    _net_element):
+                            net_element.append(sta_element)
 
-                    ready.append(result)
+                elif self._level == 'network':
+                    for net_element in self._extract_net_elements(
+                            _result.data):
+                        _, _ = self._emerge_net_element(net_element)
 
-            for result in ready:
-                self._results.remove(result)
+                self._clean(_result)
+                self._sizes.append(_result.length)
 
-            if not self._results:
-                break
+            else:
+                self._handle_error(_result)
+                self._sizes.append(0)
 
-        self._pool.join()
+        self._close_pool()
 
         if not sum(self._sizes):
             self.logger.warning(
@@ -401,14 +441,14 @@ class StationXMLNetworkCombinerTask(CombinerTask):
         # order child elements by tag
         net_element[:] = sorted(net_element, key=lambda c: c.tag)
 
-        for existing_net_element in self._network_elements:
-            if elements_equal(
-                net_element,
-                existing_net_element,
-                exclude_tags,
-                    recursive=True):
-                return existing_net_element, True
+        fingerprint = element_fingerprint(net_element, exclude_tags,
+                                          recursive=True)
+        try:
+            return self._network_index[fingerprint], True
+        except KeyError:
+            pass
 
+        self._network_index[fingerprint] = net_element
         self._network_elements.append(net_element)
         return net_element, False
 
@@ -470,34 +510,541 @@ class StationXMLNetworkCombinerTask(CombinerTask):
     def _merge_sta_element(self, net_element, sta_element,
                            namespaces=settings.STATIONXML_NAMESPACES):
 
+        exclude_tags = ['{}{}'.format(ns, self.CHANNEL_TAG)
+                        for ns in namespaces]
+
         # order child elements by tag
         sta_element[:] = sorted(sta_element, key=lambda c: c.tag)
 
+        station_index = self._station_index.get(net_element)
+        if station_index is None:
+            # NOTE: Index the <Station></Station> epoch elements of a
+            # network epoch element when merging for the first time.
+            station_index = self._station_index[net_element] = {}
+            for _sta_element in self._emerge_sta_elements(net_element,
+                                                          namespaces):
+                _sta_element[:] = sorted(_sta_element, key=lambda c: c.tag)
+                station_index.setdefault(
+                    element_fingerprint(_sta_element, exclude_tags,
+                                        recursive=False),
+                    _sta_element)
+
         # XXX(damb): Check if <Station></Station> epoch element is already
         # available - if not simply append.
-        for _sta_element in net_element.iterfind(sta_element.tag):
-
-            _sta_element[:] = sorted(_sta_element, key=lambda c: c.tag)
-            if elements_equal(sta_element,
-                              _sta_element,
-                              exclude_tags=[
-                                  '{}{}'.format(ns, self.CHANNEL_TAG)
-                                  for ns in namespaces],
-                              recursive=False):
-                # XXX(damb): Channels are ALWAYS appended; no merging is
-                # performed
-                for _cha_element in self._emerge_cha_elements(sta_element,
-                                                              namespaces):
-                    _sta_element.append(_cha_element)
-                break
-
-        else:
+        fingerprint = element_fingerprint(sta_element, exclude_tags,
+                                          recursive=False)
+        _sta_element = station_index.get(fingerprint)
+        if _sta_element is None:
+            station_index[fingerprint] = sta_element
             net_element.append(sta_element)
+        else:
+            # XXX(damb): Channels are ALWAYS appended; no merging is
+            # performed
+            for _cha_element in self._emerge_cha_elements(sta_element,
+                                                          namespaces):
+                self._append_ordered(_sta_element, _cha_element)
 
     # _merge_sta_element ()
 
+    @staticmethod
+    def _append_ordered(element, child):
+        """
+        Append :code:`child` to :code:`element` with its child elements
+        ordered by tag, such that :code:`element` keeps on being ordered.
+        """
+        # NOTE: Use negative indices; child elements following the
+        # <Channel></Channel> elements are few.
+        i = 0
+        while i < len(element) and element[-(i + 1)].tag > child.tag:
+            i += 1
+
+        if i:
+            element[-i].addprevious(child)
+        else:
+            element.append(child)
+
+    # _append_ordered ()
+
 # class StationXMLNetworkCombinerTask
 
+
+class StationXMLStreamingNetworkCombinerTask(StationXMLNetworkCombinerTask):
+    """
+    Streaming implementation of :py:class:`StationXMLNetworkCombinerTask`.
+
+    Downloaded `StationXML <http://www.fdsn.org/xml/station/>`_ is parsed
+    incrementally by means of :py:func:`lxml.etree.iterparse`. Completed
+    :code:`<Station></Station>` subtrees are spilled to a temporary file in
+    the order they are parsed. In memory the task keeps exclusively the
+    serialized :code:`<Network></Network>` headers (i.e. network epoch
+    elements without stations) and an index of station epochs referencing
+    chunks of the spill file. Hence, memory usage is bounded by the largest
+    :code:`<Station></Station>` element instead of an entire network.
+
+    Combining is performed the same way as
+    :py:class:`StationXMLNetworkCombinerTask` does; however, within the
+    result the child elements of
+    :code:`<Network></Network>` and :code:`<Station></Station>` epoch
+    elements precede the merged station and channel elements, respectively.
+    """
+
+    LOGGER = 'flask.app.federator.task_combiner_stationxml_streaming'
+
+    SPLIT_MARKER = 'eida-federator-split'
+
+    class NetworkEpoch(collections.namedtuple(
+            'NetworkEpoch', ['head', 'tail', 'stations', 'station_index'])):
+        """
+        Serialized :code:`<Network></Network>` epoch header.
+
+        :code:`stations` is a list of :code:`<Station></Station>` epochs. A
+        station epoch is a list of spill file chunks i.e.
+        :code:`(offset, length)` tuples. :code:`station_index` maps station
+        epoch fingerprints to station epochs.
+        """
+
+    def __init__(self, routes, query_params, **kwargs):
+        super().__init__(routes, query_params, **kwargs)
+        self._spill = None
+        self._spill_length = 0
+        self._mem_index = 0
+        self._mem_peak = 0
+
+    # __init__ ()
+
+    def _run(self):
+        """
+        Combine StationXML `<Network></Network>` information by means of
+        streamed parsing.
+        """
+        self.logger.info('Executing task {!r}.'.format(self))
+        self._init_pool()
+        self._results = CompletionQueue()
+
+        for route in self._routes:
+            self.logger.debug(
+                'Creating DownloadTask for route {!r} ...'.format(route))
+            t = RawDownloadTask(
+                GranularFdsnRequestHandler(
+                    route.url,
+                    route.streams[0],
+                    query_params=self.query_params),
+                decode_unicode=True)
+
+            # apply DownloadTask asynchronoulsy to the worker pool
+            self._submit(t)
+
+        path_spill = get_temp_filepath()
+        try:
+            with open(path_spill, 'w+b') as self._spill:
+                # fetch results as soon as they are ready
+                while self._results:
+                    _result = self._results.get()
+                    if _result.status_code == 200:
+                        self._combine(_result.data)
+                        self._clean(_result)
+                        self._sizes.append(_result.length)
+                    else:
+                        self._handle_error(_result)
+                        self._sizes.append(0)
+
+                self._close_pool()
+
+                if not sum(self._sizes):
+                    self.logger.warning(
+                        'Task {!r} terminates with no valid result.'.format(
+                            self))
+                    return Result.nocontent()
+
+                _length = self._dump()
+        finally:
+            self._spill = None
+            try:
+                os.remove(path_spill)
+            except OSError:
+                pass
+
+        self.logger.info(
+            ('Task {!r} sucessfully finished '
+             '(total bytes processed: {}, after processing: {}, '
+             'peak memory (estimated): {}, '
+             'max. RSS (process): {} kB).').format(
+                 self, sum(self._sizes), _length, self._mem_peak,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+        return Result.ok(data=self.path_tempfile, length=_length)
+
+    # _run ()
+
+    def _combine(self, path_xml, namespaces=settings.STATIONXML_NAMESPACES):
+        """
+        Combine the :code:`<Network></Network>` epoch elements of a
+        `StationXML <http://www.fdsn.org/xml/station/>`_ file with the
+        network epochs already known.
+
+        :param str path_xml: Path to `StationXML
+            <http://www.fdsn.org/xml/station/>`_ file.
+        :param list namespaces: List of XML namespaces to be taken into
+            consideration.
+        """
+        network_tags = ['{}{}'.format(ns, self.NETWORK_TAG)
+                        for ns in namespaces]
+        station_tags = ['{}{}'.format(ns, self.STATION_TAG)
+                        for ns in namespaces]
+
+        def release(element):
+            # remove the processed element and its predecessors
+            element.clear()
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
+
+        net_element, net_epoch = None, None
+        with open(path_xml, 'rb') as ifd:
+            for event, element in etree.iterparse(
+                    ifd, events=('end', ),
+                    tag=network_tags + station_tags):
+
+                if element.tag in station_tags:
+                    # NOTE: <Station></Station> elements follow the
+                    # network epoch's header elements.
+                    if element.getparent() is not net_element:
+                        net_element = element.getparent()
+                        net_epoch = self._emerge_net_header(net_element,
+                                                            station_tags)
+                    self._spill_sta_element(net_epoch, element, namespaces)
+
+                elif element is not net_element:
+                    # network epoch without stations
+                    self._emerge_net_header(element, station_tags)
+
+                release(element)
+
+    # _combine ()
+
+    def _emerge_net_header(self, net_element, station_tags):
+        """
+        Emerge the header of a :code:`<Network></Network>` epoch element.
+
+        The header's child elements are moved from :code:`net_element`.
+
+        :param net_element: Network epoch element parsed so far
+        :type net_element: :py:class:`lxml.etree.Element`
+        :param list station_tags: List of station element tags
+        :returns: The corresponding :py:class:`NetworkEpoch`
+        """
+        header = etree.Element(net_element.tag, attrib=net_element.attrib,
+                               nsmap=net_element.nsmap)
+        header.text = net_element.text
+        # order child elements by tag
+        header.extend(sorted((c for c in net_element
+                              if c.tag not in station_tags),
+                             key=lambda c: c.tag))
+
+        fingerprint = element_fingerprint(header, recursive=True)
+        try:
+            return self._network_index[fingerprint]
+        except KeyError:
+            pass
+
+        head, tail = self._split_element(header)
+        net_epoch = self.NetworkEpoch(head=head, tail=tail, stations=[],
+                                      station_index={})
+        self._network_index[fingerprint] = net_epoch
+        self._network_elements.append(net_epoch)
+        self._mem_index += len(head) + len(tail)
+        return net_epoch
+
+    # _emerge_net_header ()
+
+    def _spill_sta_element(self, net_epoch, sta_element,
+                           namespaces=settings.STATIONXML_NAMESPACES):
+        """
+        Spill a :code:`<Station></Station>` epoch element and merge it into
+        :code:`net_epoch`.
+
+        :param net_epoch: Network epoch the station element belongs to
+        :type net_epoch: :py:class:`NetworkEpoch`
+        :param sta_element: Station epoch element
+        :type sta_element: :py:class:`lxml.etree.Element`
+        :param list namespaces: List of XML namespaces to be taken into
+            consideration.
+        """
+        # NOTE: The tail of an element is not necessarily available
+        # when iterparse emits the element's end event.
+        sta_element.tail = None
+
+        if self._level == 'station':
+            # NOTE: <Station></Station> elements defined by multiple
+            # EIDA nodes are simply appended; no merging is performed
+            s = etree.tostring(sta_element)
+            net_epoch.stations.append([self._spill_write(s)])
+            self._mem_peak = max(self._mem_peak, self._mem_index + len(s))
+            return
+
+        channel_tags = ['{}{}'.format(ns, self.CHANNEL_TAG)
+                        for ns in namespaces]
+        # NOTE: Serialize <Channel></Channel> elements while they are
+        # still within the scope of their namespace declarations.
+        channels = []
+        for cha_element in [c for c in sta_element
+                            if c.tag in channel_tags]:
+            channels.append(etree.tostring(cha_element, with_tail=False))
+            sta_element.remove(cha_element)
+        # order child elements by tag
+        sta_element[:] = sorted(sta_element, key=lambda c: c.tag)
+
+        fingerprint = element_fingerprint(sta_element, recursive=False)
+        sta_epoch = net_epoch.station_index.get(fingerprint)
+        if sta_epoch is None:
+            head, tail = self._split_element(sta_element)
+            sta_epoch = [self._spill_write(head), self._spill_write(tail)]
+            net_epoch.station_index[fingerprint] = sta_epoch
+            net_epoch.stations.append(sta_epoch)
+            self._mem_index += len(head)
+
+        # XXX(damb): Channels are ALWAYS appended; no merging is performed
+        for s in channels:
+            sta_epoch.insert(-1, self._spill_write(s))
+
+        self._mem_peak = max(self._mem_peak,
+                             self._mem_index + sum(len(s) for s in channels))
+
+    # _spill_sta_element ()
+
+    def _spill_write(self, data):
+        """
+        Append :code:`data` to the spill file.
+
+        :returns: Spill file chunk i.e. a :code:`(offset, length)` tuple
+        """
+        self._spill.write(data)
+        chunk = (self._spill_length, len(data))
+        self._spill_length += len(data)
+        return chunk
+
+    # _spill_write ()
+
+    def _dump(self):
+        """
+        Dump the combined :code:`<Network></Network>` epochs to a temporary
+        file.
+
+        :returns: Number of bytes written
+        :rtype: int
+        """
+        _length = 0
+        self.path_tempfile = get_temp_filepath()
+        with open(self.path_tempfile, 'wb') as ofd:
+            for net_epoch in self._network_elements:
+                _length += self._write_net_epoch(ofd, net_epoch)
+
+        return _length
+
+    # _dump ()
+
+    def _write_net_epoch(self, ofd, net_epoch):
+        """
+        Write a :code:`<Network></Network>` epoch to :code:`ofd`.
+
+        :param ofd: File-like object opened for writing in binary mode
+        :param net_epoch: Network epoch to be written
+        :type net_epoch: :py:class:`NetworkEpoch`
+        :returns: Number of bytes written
+        :rtype: int
+        """
+        ofd.write(net_epoch.head)
+        _length = self._copy_stations(ofd, net_epoch.stations)
+        ofd.write(net_epoch.tail)
+        return _length + len(net_epoch.head) + len(net_epoch.tail)
+
+    # _write_net_epoch ()
+
+    def _copy_stations(self, ofd, stations):
+        """
+        Copy spilled :code:`<Station></Station>` epochs to :code:`ofd`.
+
+        :param ofd: File-like object opened for writing in binary mode
+        :param list stations: List of station epochs
+        :returns: Number of bytes written
+        :rtype: int
+        """
+        self._spill.flush()
+
+        _length = 0
+        for sta_epoch in stations:
+            for offset, length in sta_epoch:
+                self._spill.seek(offset)
+                ofd.write(self._spill.read(length))
+                _length += length
+
+        # NOTE: Spilling appends.
+        self._spill.seek(0, os.SEEK_END)
+        return _length
+
+    # _copy_stations ()
+
+    @classmethod
+    def _split_element(cls, element):
+        """
+        Serialize :code:`element` split at the end of its child elements.
+
+        :returns: Tuple of the serialized element's head and tail
+        :rtype: tuple
+        """
+        marker = etree.Comment(cls.SPLIT_MARKER)
+        element.append(marker)
+        try:
+            head, tail = etree.tostring(element, with_tail=False).rsplit(
+                etree.tostring(marker), 1)
+        finally:
+            element.remove(marker)
+
+        return head, tail
+
+    # _split_element ()
+
+# class StationXMLStreamingNetworkCombinerTask
+
+
+class StationXMLIncrementalNetworkCombinerTask(
+        StationXMLStreamingNetworkCombinerTask):
+    """
+    Incremental implementation of
+    :py:class:`StationXMLStreamingNetworkCombinerTask` for
+    :code:`level=station`.
+
+    Since :code:`<Station></Station>` elements are appended without merging,
+    the stations of the first network epoch are published (i.e. put to
+    :code:`sink` as partial results) as soon as a download is combined. The
+    remaining network epochs are returned once all downloads are combined.
+
+    Both partial results and the final result are tagged with the network
+    code (i.e. the :code:`name` keyword argument) of the task (see
+    :py:class:`NetworkResult`). The task never waits for other tasks. Hence,
+    consumers are responsible for network elements not interleaving.
+
+    :param sink: Queue partial results are published to
+    :type sink:
+        :py:class:`eidangservices.federator.server.misc.CompletionQueue`
+    """
+
+    LOGGER = 'flask.app.federator.task_combiner_stationxml_incremental'
+
+    def __init__(self, routes, query_params, sink, **kwargs):
+        super().__init__(routes, query_params, **kwargs)
+
+        if self._level != 'station':
+            raise ValueError(
+                'Incremental combining requires level=station.')
+
+        self._sink = sink
+        self._network = kwargs.get('name')
+        # NOTE: Number of station epochs of the first network epoch
+        # published. None, if nothing was published, yet.
+        self._num_published = None
+        self._open = False
+
+    # __init__ ()
+
+    def _run(self):
+        """
+        Combine StationXML `<Network></Network>` information and publish it
+        incrementally.
+
+        :returns: A :py:class:`Result` with the information not published,
+            yet
+        """
+        try:
+            result = super()._run()
+            if result.status_code == 200:
+                # the result closes the network element published
+                self._open = False
+            return result
+
+        finally:
+            if self._open:
+                # close the network element already published
+                self._publish_data(self._network_elements[0].tail)
+                self._open = False
+
+    # _run ()
+
+    def _combine(self, path_xml, namespaces=settings.STATIONXML_NAMESPACES):
+        super()._combine(path_xml, namespaces)
+
+        if not self._network_elements:
+            return
+
+        net_epoch = self._network_elements[0]
+        if len(net_epoch.stations) == (self._num_published or 0):
+            return
+
+        head = b''
+        if self._num_published is None:
+            head = net_epoch.head
+            self._num_published = 0
+            self._open = True
+
+        self._publish_data(head, net_epoch.stations[self._num_published:])
+        self._num_published = len(net_epoch.stations)
+
+    # _combine ()
+
+    def _write_net_epoch(self, ofd, net_epoch):
+        if (self._num_published is None or
+                net_epoch is not self._network_elements[0]):
+            return super()._write_net_epoch(ofd, net_epoch)
+
+        # the network epoch's head was published, already
+        _length = self._copy_stations(
+            ofd, net_epoch.stations[self._num_published:])
+        ofd.write(net_epoch.tail)
+        return _length + len(net_epoch.tail)
+
+    # _write_net_epoch ()
+
+    def _publish_data(self, data, stations=[]):
+        """
+        Publish :code:`data` followed by spilled :code:`<Station></Station>`
+        epochs.
+        """
+        path = get_temp_filepath()
+        with open(path, 'wb') as ofd:
+            ofd.write(data)
+            _length = len(data)
+            if stations:
+                _length += self._copy_stations(ofd, stations)
+
+        self._publish(self._tag(Result.ok(data=path, length=_length),
+                                partial=True))
+
+    # _publish_data ()
+
+    def _tag(self, result, partial=False):
+        return NetworkResult(network=self._network, partial=partial,
+                             **result._asdict())
+
+    # _tag ()
+
+    def _publish(self, result):
+        if self._handle is not None and self._handle.cancelled:
+            # NOTE: Results published after cancelling are not consumed
+            # anymore.
+            self._clean(result)
+            return
+
+        self.logger.debug(
+            'Task {!r} publishing {!r} ...'.format(self, result.data))
+        self._sink.put(result)
+
+    # _publish ()
+
+    def __call__(self):
+        return self._tag(super().__call__())
+
+# class StationXMLIncrementalNetworkCombinerTask
+
 # -----------------------------------------------------------------------------
 class SplitAndAlignTask(TaskBase):
     """
@@ -818,7 +1365,13 @@ class RawDownloadTask(TaskBase):
                                 warning='Unhandled exception.',
                                 data=str(err))
         else:
-            if resp.status_code == 413:
+            # NOTE: Batched requests (and requests answered with HTTP status
+            # code 413) are retried by the processor, which requires the
+            # request handler.
+            if (resp.status_code == 413 or
+                    (len(self._request_handler.stream_epochs) > 1 and
+                     resp.status_code not in
+                     settings.FDSN_NO_CONTENT_CODES)):
                 data = self._request_handler
 
             return Result.error(status='EndpointError',
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <cache.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices .
+#
+# EIDA NG webservices is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EIDA NG webservices is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/06        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+Federator cache related test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+import shutil
+import tempfile
+import unittest
+
+from eidangservices import utils
+from eidangservices.federator.server.cache import RoutingCache
+from eidangservices.federator.server.request import RoutingRequestHandler
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+
+# -----------------------------------------------------------------------------
+class RoutingCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.url = 'http://eida.ethz.ch/fdsnws/dataselect/1/query'
+        self.stream = Stream(network='CH', station='DAVOX', location='',
+                             channel='HHZ')
+        self.routing_table = [
+            utils.Route(self.url, streams=[
+                StreamEpoch(self.stream,
+                            starttime=datetime.datetime(2018, 1, 1),
+                            endtime=datetime.datetime(2018, 1, 2)),
+                StreamEpoch(self.stream,
+                            starttime=datetime.datetime(2018, 1, 2))])]
+        self.default_endtime = datetime.datetime(2018, 9, 6)
+
+    def create_key(self, query_params, stream_epochs):
+        return RoutingCache.create_key(query_params, stream_epochs,
+                                       RoutingRequestHandler.QUERY_PARAMS)
+
+    def test_key_normalization(self):
+        se_davox = StreamEpoch(self.stream,
+                               starttime=datetime.datetime(2018, 1, 1))
+        se_balst = StreamEpoch(
+            Stream(network='CH', station='BALST', location='',
+                   channel='HHZ'),
+            starttime=datetime.datetime(2018, 1, 1))
+
+        key = self.create_key({'service': 'dataselect', 'quality': 'B'},
+                              [se_davox, se_balst])
+        self.assertEqual(
+            key, self.create_key({'service': 'dataselect', 'quality': 'M'},
+                                 [se_balst, se_davox, se_davox]))
+        self.assertNotEqual(
+            key, self.create_key({'service': 'station'},
+                                 [se_davox, se_balst]))
+        self.assertNotEqual(
+            key, self.create_key({'service': 'dataselect', 'quality': 'B'},
+                                 [se_davox]))
+
+        key = self.create_key({'service': 'station', 'latitude': '46.8',
+                               'longitude': '8.2', 'maxradius': '1.5'},
+                              [se_davox])
+        self.assertNotEqual(
+            key, self.create_key({'service': 'station', 'latitude': '46.8',
+                                  'longitude': '8.2', 'maxradius': '2.5'},
+                                 [se_davox]))
+
+    # test_key_normalization ()
+
+    def test_open_endtime(self):
+        cache = RoutingCache(maxsize=10, ttl=60)
+        cache.set('foo', self.routing_table)
+
+        routing_table = cache.get('foo', self.default_endtime)
+        self.assertEqual(routing_table[0].streams[0],
+                         self.routing_table[0].streams[0])
+        self.assertEqual(routing_table[0].streams[1].endtime,
+                         self.default_endtime)
+
+        other_endtime = datetime.datetime(2018, 9, 7)
+        self.assertEqual(
+            cache.get('foo', other_endtime)[0].streams[1].endtime,
+            other_endtime)
+
+    # test_open_endtime ()
+
+    def test_stats(self):
+        cache = RoutingCache(maxsize=10, ttl=60)
+        self.assertIsNone(cache.get('foo', self.default_endtime))
+        cache.set('foo', self.routing_table)
+        cache.get('foo', self.default_endtime)
+
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 1, 'size': 1})
+
+    # test_stats ()
+
+    def test_lru(self):
+        cache = RoutingCache(maxsize=2, ttl=60)
+        cache.set('foo', self.routing_table)
+        cache.set('bar', self.routing_table)
+        cache.get('foo', self.default_endtime)
+        cache.set('baz', self.routing_table)
+
+        self.assertIsNotNone(cache.get('foo', self.default_endtime))
+        self.assertIsNone(cache.get('bar', self.default_endtime))
+        self.assertIsNotNone(cache.get('baz', self.default_endtime))
+
+    # test_lru ()
+
+    @mock.patch('eidangservices.federator.server.cache.time')
+    def test_ttl(self, mock_time):
+        mock_time.time.return_value = 0
+        cache = RoutingCache(maxsize=10, ttl=60)
+        cache.set('foo', self.routing_table)
+
+        mock_time.time.return_value = 61
+        self.assertIsNone(cache.get('foo', self.default_endtime))
+        self.assertEqual(cache.stats['size'], 0)
+
+    # test_ttl ()
+
+    def test_disabled(self):
+        cache = RoutingCache(maxsize=0, ttl=60)
+        cache.set('foo', self.routing_table)
+        self.assertIsNone(cache.get('foo', self.default_endtime))
+
+    # test_disabled ()
+
+    def test_shared(self):
+        path = tempfile.mkdtemp()
+        try:
+            cache = RoutingCache(maxsize=10, ttl=60, path=path)
+            cache.set('foo', self.routing_table)
+
+            other = RoutingCache(maxsize=10, ttl=60, path=path)
+            self.assertEqual(
+                other.get('foo', self.default_endtime),
+                cache.get('foo', self.default_endtime))
+            self.assertEqual(other.stats['hits'], 1)
+        finally:
+            shutil.rmtree(path)
+
+    # test_shared ()
+
+# class RoutingCacheTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <cache.py> ----
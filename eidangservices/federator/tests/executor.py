@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <executor.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices .
+#
+# EIDA NG webservices is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EIDA NG webservices is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/03        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+Federator executor related test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from eidangservices.federator.server.executor import (CancellationHandle,
+                                                      TaskExecutor)
+from eidangservices.federator.server.misc import CompletionQueue
+from eidangservices.federator.server.task import Result
+
+
+# -----------------------------------------------------------------------------
+class TaskExecutorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = TaskExecutor({'foo': 2, 'bar': 1})
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_pool_persistent(self):
+        pool = self.executor.pool('foo')
+        self.assertIs(pool, self.executor.pool('foo'))
+        self.assertIsNot(pool, self.executor.pool('bar'))
+
+    # test_pool_persistent ()
+
+    def test_pool_invalid(self):
+        with self.assertRaises(KeyError):
+            self.executor.pool('baz')
+
+    # test_pool_invalid ()
+
+    def test_pool_size(self):
+        lock = threading.Lock()
+        running = []
+        concurrency = []
+
+        def task():
+            with lock:
+                running.append(1)
+                concurrency.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+
+        q = CompletionQueue()
+        for i in range(6):
+            q.submit(self.executor.pool('foo'), task)
+
+        for i in range(6):
+            q.get(timeout=5)
+        self.assertEqual(max(concurrency), 2)
+
+    # test_pool_size ()
+
+# class TaskExecutorTestCase
+
+
+class CancellationHandleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.handle = CancellationHandle()
+
+    def test_not_cancelled(self):
+        t = self.handle(lambda: Result.ok(data='foo'))
+        self.assertEqual(t(), Result.ok(data='foo'))
+
+    # test_not_cancelled ()
+
+    def test_cancelled_before(self):
+        called = []
+
+        def task():
+            called.append(True)
+            return Result.ok(data='foo')
+
+        t = self.handle(task)
+        self.handle.cancel()
+        self.assertTrue(self.handle.cancelled)
+        self.assertEqual(t().status_code, 204)
+        self.assertFalse(called)
+
+    # test_cancelled_before ()
+
+    def test_cancelled_while_running(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+
+        def task():
+            self.handle.cancel()
+            return Result.ok(data=path, length=0)
+
+        t = self.handle(task)
+        self.assertEqual(t().status_code, 204)
+        self.assertFalse(os.path.exists(path))
+
+    # test_cancelled_while_running ()
+
+    def test_independent_handles(self):
+        other = CancellationHandle()
+        t = other(lambda: Result.ok(data='foo'))
+        self.handle.cancel()
+        self.assertEqual(t().status_code, 200)
+
+    # test_independent_handles ()
+
+# class CancellationHandleTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <executor.py> ----
@@ -35,12 +35,24 @@ from builtins import * # noqa
 
 import copy
 import io
+import queue
+import threading
 import unittest
 
+from multiprocessing.pool import ThreadPool
+
 from lxml import etree
 
 from eidangservices import settings
-from eidangservices.federator.server.misc import elements_equal
+from eidangservices.federator.server.misc import (CompletionQueue,
+                                                  element_fingerprint,
+                                                  elements_equal)
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
 
 # -----------------------------------------------------------------------------
 class ElementsEqualTestCase(unittest.TestCase):
@@ -100,9 +112,134 @@ class ElementsEqualTestCase(unittest.TestCase):
 
     # test_unequal_with_exclude_nonrecursive ()
 
+    def test_fingerprint(self):
+        t = etree.parse(self.ifd).getroot()
+        t[:] = sorted(t, key=lambda c: c.tag)
+        exclude_tags = ['{}{}'.format(ns, 'Description') for ns in
+                        settings.STATIONXML_NAMESPACES]
+
+        for recursive in (True, False):
+            t_other = copy.deepcopy(t)
+            t_other[1][0].text = 'FOO'
+            for e, e_other in ((t, copy.deepcopy(t)), (t, t_other),
+                               (t[2], t[3]), (t[2], t_other[2])):
+                self.assertEqual(
+                    element_fingerprint(e, exclude_tags, recursive) ==
+                    element_fingerprint(e_other, exclude_tags, recursive),
+                    elements_equal(e, e_other, exclude_tags, recursive))
+
+        self.assertEqual(
+            len(set(element_fingerprint(c, exclude_tags) for c in t)), len(t))
+
+    # test_fingerprint ()
+
+    def test_exclude_without_copy(self):
+        t = etree.parse(self.ifd).getroot()
+        t[:] = sorted(t, key=lambda c: c.tag)
+        t_other = copy.deepcopy(t)
+        serialized = etree.tostring(t)
+
+        with mock.patch('copy.deepcopy', side_effect=AssertionError):
+            self.assertTrue(
+                elements_equal(
+                    t, t_other,
+                    exclude_tags=['{}{}'.format(ns, 'Network') for ns in
+                                  settings.STATIONXML_NAMESPACES]))
+        self.assertEqual(etree.tostring(t), serialized)
+
+    # test_exclude_without_copy ()
+
 # class ElementsEqualTestCasel
 
 
+class CompletionQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ThreadPool(processes=2)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.pool = None
+
+    def test_completion_order(self):
+        event = threading.Event()
+
+        def blocking():
+            event.wait()
+            return 'slow'
+
+        q = CompletionQueue()
+        q.submit(self.pool, blocking)
+        q.submit(self.pool, lambda: 'fast')
+        self.assertEqual(len(q), 2)
+
+        self.assertEqual(q.get(timeout=5), 'fast')
+        self.assertEqual(len(q), 1)
+        event.set()
+        self.assertEqual(q.get(timeout=5), 'slow')
+        self.assertEqual(len(q), 0)
+        self.assertFalse(q)
+
+    # test_completion_order ()
+
+    def test_requeue(self):
+        q = CompletionQueue()
+        q.submit(self.pool, lambda: 'foo')
+        result = q.get(timeout=5)
+        self.assertFalse(q)
+
+        q.requeue(result)
+        self.assertEqual(len(q), 1)
+        self.assertEqual(q.get(), 'foo')
+        self.assertFalse(q)
+
+    # test_requeue ()
+
+    def test_put(self):
+        event = threading.Event()
+
+        def publishing():
+            q.put('partial')
+            event.wait()
+            return 'final'
+
+        q = CompletionQueue()
+        q.submit(self.pool, publishing)
+        self.assertEqual(q.get(timeout=5), 'partial')
+        self.assertEqual(len(q), 1)
+        event.set()
+        self.assertEqual(q.get(timeout=5), 'final')
+        self.assertFalse(q)
+
+    # test_put ()
+
+    def test_error(self):
+        def fail():
+            raise ValueError('foo')
+
+        q = CompletionQueue()
+        q.submit(self.pool, fail)
+        with self.assertRaises(ValueError):
+            q.get(timeout=5)
+        self.assertFalse(q)
+
+    # test_error ()
+
+    def test_timeout(self):
+        event = threading.Event()
+
+        q = CompletionQueue()
+        q.submit(self.pool, event.wait)
+        with self.assertRaises(queue.Empty):
+            q.get(timeout=0.01)
+        self.assertEqual(len(q), 1)
+        event.set()
+
+    # test_timeout ()
+
+# class CompletionQueueTestCase
+
+
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <process.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices .
+#
+# EIDA NG webservices is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EIDA NG webservices is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/05        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+Federator processing related test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+import os
+import tempfile
+import unittest
+
+from future.standard_library import install_aliases
+install_aliases()
+
+from urllib.parse import parse_qs, urlparse
+
+from eidangservices import utils
+from eidangservices.federator.server import create_app
+from eidangservices.federator.server.process import (
+    batch_routes, demux_routes, iter_batched_routes, parse_routes,
+    RawRequestProcessor, StationXMLRequestProcessor)
+from eidangservices.federator.server.request import (FdsnRequestHandler,
+                                                     RoutingRequestHandler)
+from eidangservices.federator.server.task import (
+    NetworkResult, Result, StationXMLIncrementalNetworkCombinerTask,
+    StationXMLNetworkCombinerTask, StationXMLStreamingNetworkCombinerTask)
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+# -----------------------------------------------------------------------------
+class BatchRoutesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.url_ch = 'http://eida.ethz.ch/fdsnws/dataselect/1/query'
+        self.url_gr = 'http://eida.bgr.de/fdsnws/dataselect/1/query'
+
+        self.stream_epochs = [
+            StreamEpoch(
+                Stream(network='CH', station=sta, location='',
+                       channel='HHZ'),
+                starttime=datetime.datetime(2018, 1, 1),
+                endtime=datetime.datetime(2018, 1, 2))
+            for sta in ('DAVOX', 'BALST', 'LLS', 'MUO', 'ZUR')]
+
+    def test_disabled(self):
+        routes = [utils.Route(self.url_ch, streams=self.stream_epochs)]
+        self.assertEqual(batch_routes(routes, max_lines=1),
+                         demux_routes(routes))
+
+    # test_disabled ()
+
+    def test_max_lines(self):
+        routes = [utils.Route(self.url_ch, streams=self.stream_epochs)]
+        reference_result = [
+            utils.Route(self.url_ch, streams=self.stream_epochs[:2]),
+            utils.Route(self.url_ch, streams=self.stream_epochs[2:4]),
+            utils.Route(self.url_ch, streams=self.stream_epochs[4:])]
+
+        self.assertEqual(batch_routes(routes, max_lines=2), reference_result)
+
+    # test_max_lines ()
+
+    def test_merge_by_url(self):
+        routes = [
+            utils.Route(self.url_ch, streams=self.stream_epochs[:1]),
+            utils.Route(self.url_gr, streams=self.stream_epochs[1:2]),
+            utils.Route(self.url_ch, streams=self.stream_epochs[2:])]
+        reference_result = [
+            utils.Route(self.url_ch,
+                        streams=(self.stream_epochs[:1] +
+                                 self.stream_epochs[2:])),
+            utils.Route(self.url_gr, streams=self.stream_epochs[1:2])]
+
+        self.assertEqual(batch_routes(routes, max_lines=10), reference_result)
+
+    # test_merge_by_url ()
+
+    def test_max_timespan(self):
+        routes = [utils.Route(self.url_ch, streams=self.stream_epochs)]
+        reference_result = [
+            utils.Route(self.url_ch, streams=self.stream_epochs[:3]),
+            utils.Route(self.url_ch, streams=self.stream_epochs[3:])]
+
+        self.assertEqual(
+            batch_routes(routes, max_lines=10, max_timespan=3 * 86400),
+            reference_result)
+
+    # test_max_timespan ()
+
+    def test_max_timespan_exceeded(self):
+        routes = [utils.Route(self.url_ch, streams=self.stream_epochs[:2])]
+
+        self.assertEqual(
+            batch_routes(routes, max_lines=10, max_timespan=3600),
+            demux_routes(routes))
+
+    # test_max_timespan_exceeded ()
+
+    def test_open_endtime(self):
+        se = StreamEpoch(
+            Stream(network='CH', station='DAVOX', location='', channel='HHZ'),
+            starttime=datetime.datetime(2018, 1, 1))
+        routes = [utils.Route(self.url_ch, streams=[se, se])]
+
+        self.assertEqual(
+            batch_routes(routes, max_lines=10, max_timespan=86400 * 1.5,
+                         default_endtime=datetime.datetime(2018, 1, 2)),
+            demux_routes(routes))
+
+    # test_open_endtime ()
+
+    def test_iter_merge_across_blocks(self):
+        routes = [
+            utils.Route(self.url_ch, streams=self.stream_epochs[:2]),
+            utils.Route(self.url_gr, streams=self.stream_epochs[2:3]),
+            utils.Route(self.url_ch, streams=self.stream_epochs[3:])]
+        reference_result = [
+            utils.Route(self.url_ch,
+                        streams=(self.stream_epochs[:2] +
+                                 self.stream_epochs[3:])),
+            utils.Route(self.url_gr, streams=self.stream_epochs[2:3])]
+
+        self.assertEqual(
+            list(iter_batched_routes(iter(routes), max_lines=10)),
+            reference_result)
+
+    # test_iter_merge_across_blocks ()
+
+    def test_iter_yield_full(self):
+        def routes():
+            yield utils.Route(self.url_ch, streams=self.stream_epochs[:3])
+            raise AssertionError('Routes consumed eagerly.')
+
+        batched_routes = iter_batched_routes(routes(), max_lines=2)
+        self.assertEqual(
+            next(batched_routes),
+            utils.Route(self.url_ch, streams=self.stream_epochs[:2]))
+
+    # test_iter_yield_full ()
+
+# class BatchRoutesTestCase
+
+
+class ParseRoutesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = [
+            b'http://eida.ethz.ch/fdsnws/dataselect/1/query',
+            b'CH DAVOX -- HHZ 2018-01-01T00:00:00 2018-01-02T00:00:00',
+            b'CH BALST -- HHZ 2018-01-01T00:00:00',
+            b'',
+            b'http://eida.bgr.de/fdsnws/dataselect/1/query',
+            b'GR BFO -- HHZ 2018-01-01T00:00:00 2018-01-02T00:00:00']
+
+        self.reference_result = [
+            utils.Route(
+                'http://eida.ethz.ch/fdsnws/dataselect/1/query',
+                streams=[
+                    StreamEpoch(
+                        Stream(network='CH', station='DAVOX', location='--',
+                               channel='HHZ'),
+                        starttime=datetime.datetime(2018, 1, 1),
+                        endtime=datetime.datetime(2018, 1, 2)),
+                    StreamEpoch(
+                        Stream(network='CH', station='BALST', location='--',
+                               channel='HHZ'),
+                        starttime=datetime.datetime(2018, 1, 1))]),
+            utils.Route(
+                'http://eida.bgr.de/fdsnws/dataselect/1/query',
+                streams=[
+                    StreamEpoch(
+                        Stream(network='GR', station='BFO', location='--',
+                               channel='HHZ'),
+                        starttime=datetime.datetime(2018, 1, 1),
+                        endtime=datetime.datetime(2018, 1, 2))])]
+
+    def test_parse(self):
+        self.assertEqual(list(parse_routes(self.lines)),
+                         self.reference_result)
+
+    # test_parse ()
+
+    def test_parse_trailing_blank_lines(self):
+        self.assertEqual(list(parse_routes(self.lines + [b'', b'\n'])),
+                         self.reference_result)
+
+    # test_parse_trailing_blank_lines ()
+
+    def test_pipelined(self):
+        consumed = []
+
+        def lines():
+            for line in self.lines:
+                consumed.append(line)
+                yield line
+
+        routes = parse_routes(lines())
+        self.assertEqual(next(routes), self.reference_result[0])
+        # the first route is yielded before the entire input is consumed
+        self.assertEqual(len(consumed), 4)
+        self.assertEqual(list(routes), self.reference_result[1:])
+
+    # test_pipelined ()
+
+# class ParseRoutesTestCase
+
+
+class FdsnRequestHandlerTestCase(unittest.TestCase):
+
+    def test_payload_post(self):
+        stream_epochs = [
+            StreamEpoch(
+                Stream(network='CH', station=sta, location='',
+                       channel='HHZ'),
+                starttime=datetime.datetime(2018, 1, 1),
+                endtime=datetime.datetime(2018, 1, 2))
+            for sta in ('DAVOX', 'BALST')]
+
+        handler = FdsnRequestHandler(
+            'http://eida.ethz.ch/fdsnws/dataselect/1/query', stream_epochs,
+            query_params={'quality': 'B', 'nodata': '404'})
+
+        self.assertEqual(
+            handler.payload_post,
+            'quality=B\n'
+            'CH DAVOX -- HHZ 2018-01-01T00:00:00 2018-01-02T00:00:00\n'
+            'CH BALST -- HHZ 2018-01-01T00:00:00 2018-01-02T00:00:00')
+
+    # test_payload_post ()
+
+# class FdsnRequestHandlerTestCase
+
+
+class RoutingRequestHandlerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.url = 'http://localhost/eidaws/routing/1/query'
+        self.stream_epochs = [
+            StreamEpoch(
+                Stream(network='CH', station='*', location='*', channel='*'),
+                starttime=datetime.datetime(2018, 1, 1),
+                endtime=datetime.datetime(2018, 1, 2))]
+        self.query_params = {'service': 'station', 'level': 'station',
+                             'format': 'xml', 'nodata': '204',
+                             'latitude': '46.8', 'longitude': '8.2',
+                             'minradius': '0.5', 'maxradius': '1.5'}
+
+    def test_circular_get(self):
+        req = RoutingRequestHandler(
+            self.url, self.query_params, self.stream_epochs).get()
+        qp = parse_qs(urlparse(req.prepare().url).query)
+
+        for p in ('latitude', 'longitude', 'minradius', 'maxradius'):
+            self.assertEqual(qp[p], [self.query_params[p]])
+        self.assertEqual(qp['format'], ['post'])
+        self.assertNotIn('nodata', qp)
+
+    # test_circular_get ()
+
+    def test_circular_post(self):
+        req = RoutingRequestHandler(
+            self.url, self.query_params, self.stream_epochs).post()
+        lines = req.data.split('\n')
+
+        for p in ('latitude', 'longitude', 'minradius', 'maxradius'):
+            self.assertIn('{}={}'.format(p, self.query_params[p]), lines)
+        self.assertNotIn('nodata=204', lines)
+        self.assertEqual(
+            lines[-1], 'CH * * * 2018-01-01T00:00:00 2018-01-02T00:00:00')
+
+    # test_circular_post ()
+
+# class RoutingRequestHandlerTestCase
+
+
+class RawRequestProcessorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(
+            config_dict={'ROUTING_SERVICE': 'http://localhost',
+                         'FED_ROUTING_CACHE_SIZE': 0,
+                         'FED_BATCH_MAX_LINES': 10})
+
+    @mock.patch('eidangservices.federator.server.process.stream_request')
+    def test_batch_across_routing_blocks(self, mock_stream_request):
+        url = 'http://eida.ethz.ch/fdsnws/dataselect/1/query'
+        mock_stream_request.return_value = iter([
+            url,
+            'CH DAVOX -- HHZ 2018-01-01T00:00:00 2018-01-02T00:00:00',
+            '',
+            'http://eida.bgr.de/fdsnws/dataselect/1/query',
+            'GR BFO -- BHZ 2018-01-01T00:00:00 2018-01-02T00:00:00',
+            '',
+            url,
+            'CH BALST -- HHZ 2018-01-01T00:00:00 2018-01-02T00:00:00'])
+
+        with self.app.app_context():
+            proc = RawRequestProcessor(
+                'application/vnd.fdsn.mseed',
+                query_params={'service': 'dataselect'})
+            with mock.patch.object(proc, '_create_task') as mock_create_task, \
+                    mock.patch.object(proc._results, 'submit'):
+                proc._request()
+
+        routes = [c[0][0] for c in mock_create_task.call_args_list]
+        self.assertEqual(len(routes), 2)
+        self.assertEqual([route.url for route in routes].count(url), 1)
+        self.assertEqual(
+            [str(se) for route in routes if route.url == url
+             for se in route.streams],
+            ['CH DAVOX -- HHZ 2018-01-01T00:00:00 2018-01-02T00:00:00',
+             'CH BALST -- HHZ 2018-01-01T00:00:00 2018-01-02T00:00:00'])
+
+    # test_batch_across_routing_blocks ()
+
+    def test_batch_error(self):
+        url = 'http://eida.ethz.ch/fdsnws/dataselect/1/query'
+        stream_epochs = [
+            StreamEpoch(
+                Stream(network='CH', station=sta, location='',
+                       channel='HHZ'),
+                starttime=datetime.datetime(2018, 1, 1),
+                endtime=datetime.datetime(2018, 1, 2))
+            for sta in ('DAVOX', 'BALST')]
+
+        with self.app.app_context():
+            proc = RawRequestProcessor(
+                'application/vnd.fdsn.mseed',
+                query_params={'service': 'dataselect'})
+            for status_code in (400, 500):
+                with mock.patch.object(proc, '_create_task') as \
+                        mock_create_task, \
+                        mock.patch.object(proc._results, 'submit') as \
+                        mock_submit:
+                    proc._handle_error(Result.error(
+                        'EndpointError', status_code,
+                        data=FdsnRequestHandler(url, stream_epochs)))
+
+                    # granular requests i.e. one per stream epoch
+                    self.assertEqual(mock_submit.call_count, 2)
+                    self.assertEqual(
+                        [c[0][0] for c in mock_create_task.call_args_list],
+                        [utils.Route(url, streams=[se])
+                         for se in stream_epochs])
+
+            with mock.patch.object(proc._results, 'submit') as mock_submit:
+                proc._handle_error(Result.error(
+                    'EndpointError', 500, data='Error'))
+                self.assertFalse(mock_submit.called)
+
+    # test_batch_error ()
+
+# class RawRequestProcessorTestCase
+
+
+class StationXMLRequestProcessorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(
+            config_dict={'ROUTING_SERVICE': 'http://localhost',
+                         'FED_ROUTING_CACHE_SIZE': 0,
+                         'FED_STATIONXML_COMBINER': 'incremental'})
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def result(self, network, data, partial=True):
+        fd, path = tempfile.mkstemp()
+        os.write(fd, data)
+        os.close(fd)
+        self.paths.append(path)
+        return NetworkResult(network=network, partial=partial,
+                             **Result.ok(data=path)._asdict())
+
+    def test_combiner(self):
+        with self.app.app_context():
+            for level, combiner in (
+                    ('station', StationXMLIncrementalNetworkCombinerTask),
+                    ('channel', StationXMLStreamingNetworkCombinerTask)):
+                proc = StationXMLRequestProcessor(
+                    'application/xml',
+                    query_params={'service': 'station', 'level': level})
+                self.assertIs(proc._combiner, combiner)
+
+            self.app.config['FED_STATIONXML_COMBINER'] = 'tree'
+            proc = StationXMLRequestProcessor(
+                'application/xml',
+                query_params={'service': 'station', 'level': 'station'})
+            self.assertIs(proc._combiner, StationXMLNetworkCombinerTask)
+
+    # test_combiner ()
+
+    def test_order(self):
+        results = [
+            self.result('CH', b'<CH1/>'),
+            self.result('GR', b'<GR1/>'),
+            self.result('GR', b'<GR2/>', partial=False),
+            self.result('CH', b'<CH2/>'),
+            self.result('NL', b'<NL1/>', partial=False),
+            self.result('CH', b'<CH3/>', partial=False)]
+
+        with self.app.app_context():
+            proc = StationXMLRequestProcessor(
+                'application/xml',
+                query_params={'service': 'station', 'level': 'station'})
+            for result in results:
+                proc._results.put(result)
+            streamed = b''.join(proc)
+
+        self.assertIn(b'<CH1/><CH2/><CH3/><GR1/><GR2/><NL1/>' +
+                      StationXMLRequestProcessor.FOOTER.encode('utf-8'),
+                      streamed)
+        self.assertFalse(proc._buffered)
+
+    # test_order ()
+
+    def test_call_on_close(self):
+        with self.app.app_context():
+            proc = StationXMLRequestProcessor(
+                'application/xml',
+                query_params={'service': 'station', 'level': 'station'})
+            proc._results.put(self.result('CH', b'<CH1/>'))
+            proc._results.put(self.result('GR', b'<GR1/>'))
+            # NOTE: The CH combiner does not finish. Hence, the results of
+            # GR stay buffered.
+            list(proc)
+            self.assertIn('GR', proc._buffered)
+            proc._call_on_close()
+
+        self.assertFalse(proc._buffered)
+        self.assertFalse(any(os.path.exists(path) for path in self.paths))
+
+    # test_call_on_close ()
+
+# class StationXMLRequestProcessorTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <process.py> ----
@@ -40,8 +40,18 @@ import os
 import tempfile
 import unittest
 
+from lxml import etree
+
+from eidangservices import settings
+from eidangservices.federator.server.misc import (CompletionQueue,
+                                                  elements_equal)
+from eidangservices.federator.server.request import FdsnRequestHandler
 from eidangservices.federator.server.task import (
-    SplitAndAlignTask, WFCatalogSplitAndAlignTask, Result)
+    NetworkResult, RawDownloadTask, SplitAndAlignTask,
+    StationXMLIncrementalNetworkCombinerTask, StationXMLNetworkCombinerTask,
+    StationXMLStreamingNetworkCombinerTask, WFCatalogSplitAndAlignTask,
+    Result)
+from eidangservices.utils import Route
 from eidangservices.utils.request import RequestsError
 from eidangservices.utils.sncl import Stream, StreamEpoch
 
@@ -70,6 +80,297 @@ class HTTP500(RequestsError):
         self.response = Response(status_code=500,
                                  data='InternalServerError')
 
+
+# -----------------------------------------------------------------------------
+# Combiner task related test cases
+
+STATION_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" schemaVersion="1.0">
+  <Source>{node}</Source>
+  <Created>2018-09-20T00:00:00</Created>
+  {networks}</FDSNStationXML>
+"""
+
+NETWORK = """<Network code="CH" startDate="1980-01-01T00:00:00">
+    <Description>{description}</Description>
+    {stations}
+  </Network>
+  """
+
+STATION = """<Station code="{sta}" startDate="{start}">
+      <Latitude>46.0</Latitude>
+      <Longitude>8.0</Longitude>
+      <Elevation>500.0</Elevation>
+      <Site><Name>{sta}</Name></Site>
+      {channels}
+    </Station>
+    """
+
+CHANNEL = """<Channel code="{cha}" locationCode="" startDate="{start}">
+        <Latitude>46.0</Latitude>
+        <Longitude>8.0</Longitude>
+        <Elevation>500.0</Elevation>
+        <Depth>0.0</Depth>
+      </Channel>
+      """
+
+
+def station_xml(node, networks):
+    """
+    Create a StationXML document.
+
+    :param list networks: List of :code:`(description, stations)` tuples
+        where :code:`stations` is a list of :code:`(sta, start, channels)`
+        tuples
+    """
+    return STATION_XML.format(node=node, networks=''.join(
+        NETWORK.format(description=description, stations=''.join(
+            STATION.format(sta=sta, start=start, channels=''.join(
+                CHANNEL.format(cha=cha, start=start) for cha in chas))
+            for sta, start, chas in stations))
+        for description, stations in networks)).encode('utf-8')
+
+
+def combine_linear(docs, level):
+    """
+    Reference implementation combining network epochs by means of linear
+    scans.
+    """
+    station_tags = ['{}{}'.format(ns, settings.STATIONXML_ELEMENT_STATION)
+                    for ns in settings.STATIONXML_NAMESPACES]
+    channel_tags = ['{}{}'.format(ns, settings.STATIONXML_ELEMENT_CHANNEL)
+                    for ns in settings.STATIONXML_NAMESPACES]
+    network_elements = []
+    for doc in docs:
+        root = etree.parse(io.BytesIO(doc)).getroot()
+        for net_element in root.iter('{}Network'.format(
+                settings.STATIONXML_NAMESPACES[0])):
+            net_element[:] = sorted(net_element, key=lambda c: c.tag)
+            for existing in network_elements:
+                if elements_equal(net_element, existing, station_tags,
+                                  recursive=True):
+                    break
+            else:
+                network_elements.append(net_element)
+                continue
+
+            for sta_element in net_element.findall(station_tags[0]):
+                if level == 'station':
+                    existing.append(sta_element)
+                    continue
+
+                sta_element[:] = sorted(sta_element, key=lambda c: c.tag)
+                for _sta_element in existing.iterfind(sta_element.tag):
+                    _sta_element[:] = sorted(_sta_element,
+                                             key=lambda c: c.tag)
+                    if elements_equal(sta_element, _sta_element,
+                                      channel_tags, recursive=False):
+                        for cha in sta_element.findall(channel_tags[0]):
+                            _sta_element.append(cha)
+                        break
+                else:
+                    existing.append(sta_element)
+
+    return b''.join(etree.tostring(e) for e in network_elements)
+
+
+def canonicalize(combined):
+    """
+    Order the child elements of <Station></Station> elements by tag. Blank
+    text and redundant namespace declarations are removed.
+    """
+    root = etree.fromstring(b'<root>' + combined + b'</root>',
+                            etree.XMLParser(remove_blank_text=True))
+    for sta_element in root.iter('{}Station'.format(
+            settings.STATIONXML_NAMESPACES[0])):
+        sta_element[:] = sorted(sta_element, key=lambda c: c.tag)
+    return etree.tostring(root, method='c14n')
+
+# -----------------------------------------------------------------------------
+class StationXMLNetworkCombinerTaskTestCase(unittest.TestCase):
+
+    TASK = StationXMLNetworkCombinerTask
+
+    DOCS = [
+        station_xml('node1', [
+            ('CH network', [('DAVOX', '2000-01-01T00:00:00', ['HHZ']),
+                            ('BALST', '2000-01-01T00:00:00', ['HHZ'])])]),
+        station_xml('node2', [
+            ('CH network', [('DAVOX', '2000-01-01T00:00:00', ['BHZ']),
+                            ('DAVOX', '1990-01-01T00:00:00', ['BHZ']),
+                            ('ZUR', '2000-01-01T00:00:00', ['HHZ', 'BHZ'])]),
+            ('CH network (old)', [('DAVOX', '2000-01-01T00:00:00',
+                                   ['LHZ'])])]),
+        station_xml('node3', [
+            ('CH network', [('DAVOX', '2000-01-01T00:00:00', ['LHZ']),
+                            ('BALST', '2000-01-01T00:00:00', ['BHZ'])])])]
+
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run_task(self, level, **kwargs):
+        def download_task(request_handler, **kwargs):
+            doc = self.DOCS[len(self.paths)]
+            fd, path = tempfile.mkstemp()
+            os.write(fd, doc)
+            os.close(fd)
+            self.paths.append(path)
+            return lambda: Result.ok(data=path, length=len(doc))
+
+        routes = [Route(url='http://node{}/fdsnws/station/1/query'.format(i),
+                        streams=[StreamEpoch(Stream(network='CH'))])
+                  for i in range(len(self.DOCS))]
+        # NOTE: A single worker preserves the order of the results.
+        self.task = self.TASK(
+            routes, {'format': 'xml', 'level': level}, max_threads=1,
+            **kwargs)
+        with mock.patch('eidangservices.federator.server.task.'
+                        'RawDownloadTask', side_effect=download_task):
+            return self.task()
+
+    def combine(self, level):
+        result = self.run_task(level)
+        self.assertEqual(result.status_code, 200)
+        self.paths.append(result.data)
+        with open(result.data, 'rb') as ifd:
+            return ifd.read()
+
+    def test_channel(self):
+        combined = self.combine('channel')
+        # NOTE: The reference implementation leaves <Station></Station>
+        # elements not scanned after appending channels unordered.
+        self.assertEqual(canonicalize(combined),
+                         canonicalize(combine_linear(self.DOCS, 'channel')))
+
+        root = etree.fromstring(b'<root>' + combined + b'</root>')
+        ns = settings.STATIONXML_NAMESPACES[0]
+        self.assertEqual(len(root), 2)
+        self.assertEqual(
+            [(sta.get('code'), sta.get('startDate'),
+              [cha.get('code') for cha in sta.iter(ns + 'Channel')])
+             for sta in root[0].iter(ns + 'Station')],
+            [('DAVOX', '2000-01-01T00:00:00', ['HHZ', 'BHZ', 'LHZ']),
+             ('BALST', '2000-01-01T00:00:00', ['HHZ', 'BHZ']),
+             ('DAVOX', '1990-01-01T00:00:00', ['BHZ']),
+             ('ZUR', '2000-01-01T00:00:00', ['HHZ', 'BHZ'])])
+
+    # test_channel ()
+
+    def test_station(self):
+        self.assertEqual(self.combine('station'),
+                         combine_linear(self.DOCS, 'station'))
+
+    # test_station ()
+
+# class StationXMLNetworkCombinerTaskTestCase
+
+
+class StationXMLStreamingNetworkCombinerTaskTestCase(
+        StationXMLNetworkCombinerTaskTestCase):
+
+    TASK = StationXMLStreamingNetworkCombinerTask
+
+    def test_station(self):
+        combined = self.combine('station')
+        self.assertEqual(canonicalize(combined),
+                         canonicalize(combine_linear(self.DOCS, 'station')))
+        self.assertLess(self.task._mem_peak, max(len(d) for d in self.DOCS))
+
+    # test_station ()
+
+    def test_response(self):
+        combined = self.combine('response')
+        self.assertEqual(canonicalize(combined),
+                         canonicalize(combine_linear(self.DOCS, 'response')))
+        # the largest <Station></Station> element is held in memory, only
+        self.assertLess(self.task._mem_peak, max(len(d) for d in self.DOCS))
+
+    # test_response ()
+
+    def test_network(self):
+        combined = self.combine('network')
+        self.assertEqual(canonicalize(combined),
+                         canonicalize(combine_linear(self.DOCS, 'network')))
+
+        root = etree.fromstring(b'<root>' + combined + b'</root>')
+        self.assertEqual(
+            [net.findtext('{}Description'.format(
+                settings.STATIONXML_NAMESPACES[0])) for net in root],
+            ['CH network', 'CH network (old)'])
+
+    # test_network ()
+
+# class StationXMLStreamingNetworkCombinerTaskTestCase
+
+
+class StationXMLIncrementalNetworkCombinerTaskTestCase(
+        StationXMLNetworkCombinerTaskTestCase):
+
+    TASK = StationXMLIncrementalNetworkCombinerTask
+
+    def publish(self):
+        sink = CompletionQueue()
+        result = self.run_task('station', sink=sink, name='CH')
+        self.assertIsInstance(result, NetworkResult)
+        self.assertEqual((result.network, result.partial), ('CH', False))
+
+        published = []
+        while sink:
+            _result = sink.get(timeout=0)
+            self.assertEqual(_result.status_code, 200)
+            self.assertEqual((_result.network, _result.partial),
+                             ('CH', True))
+            self.paths.append(_result.data)
+            with open(_result.data, 'rb') as ifd:
+                published.append(ifd.read())
+        return result, published
+
+    def test_channel(self):
+        with self.assertRaises(ValueError):
+            self.run_task('channel', sink=CompletionQueue())
+
+    # test_channel ()
+
+    def test_station(self):
+        result, published = self.publish()
+        self.assertEqual(result.status_code, 200)
+        self.paths.append(result.data)
+        with open(result.data, 'rb') as ifd:
+            published.append(ifd.read())
+
+        # a partial result per download (the first network epoch) and the
+        # remaining network epochs
+        self.assertEqual(len(published), len(self.DOCS) + 1)
+        self.assertTrue(published[0].startswith(b'<Network'))
+        self.assertEqual(canonicalize(b''.join(published)),
+                         canonicalize(combine_linear(self.DOCS, 'station')))
+
+    # test_station ()
+
+    def test_station_error(self):
+        # NOTE: The task fails after having published the first network
+        # epoch partially.
+        self.DOCS = self.DOCS[:1] + [b'<FDSNStationXML']
+        result, published = self.publish()
+        self.assertEqual(result.status_code, 500)
+
+        # the network element published is closed
+        self.assertEqual(len(published), 2)
+        self.assertTrue(published[-1].startswith(b'</'))
+        self.assertEqual(canonicalize(b''.join(published)),
+                         canonicalize(combine_linear(self.DOCS[:1],
+                                                     'station')))
+
+    # test_station_error ()
+
+# class StationXMLIncrementalNetworkCombinerTaskTestCase
+
+
 # -----------------------------------------------------------------------------
 # SplitAndAlign task related test cases
 
@@ -153,6 +454,57 @@ class SplitAndAlignTaskTestCase(unittest.TestCase):
 # class SplitAndAlignTaskTestCase
 
 
+class RawDownloadTaskTestCase(unittest.TestCase):
+
+    class HTTPError(RequestsError):
+        def __init__(self, status_code):
+            self.response = Response(status_code=status_code)
+            self.response.text = 'Error'
+
+    def setUp(self):
+        self.url = 'http://eida.ethz.ch/fdsnws/dataselect/1/query'
+        self.stream_epochs = [
+            StreamEpoch(
+                Stream(network='CH', station=sta, location='',
+                       channel='HHZ'),
+                starttime=datetime.datetime(2018, 1, 1),
+                endtime=datetime.datetime(2018, 1, 2))
+            for sta in ('DAVOX', 'BALST')]
+
+    def download(self, stream_epochs, status_code):
+        t = RawDownloadTask(FdsnRequestHandler(self.url, stream_epochs))
+        with mock.patch('eidangservices.federator.server.task.'
+                        'stream_request',
+                        side_effect=self.HTTPError(status_code)):
+            return t()
+
+    def test_batch_error(self):
+        for status_code in (400, 413, 500):
+            result = self.download(self.stream_epochs, status_code)
+            self.assertEqual(result.status_code, status_code)
+            self.assertIsInstance(result.data, FdsnRequestHandler)
+            self.assertEqual(result.data.stream_epochs, self.stream_epochs)
+
+    # test_batch_error ()
+
+    def test_batch_no_content(self):
+        for status_code in settings.FDSN_NO_CONTENT_CODES:
+            result = self.download(self.stream_epochs, status_code)
+            self.assertEqual(result.status_code, status_code)
+            self.assertEqual(result.data, 'Error')
+
+    # test_batch_no_content ()
+
+    def test_error(self):
+        result = self.download(self.stream_epochs[:1], 500)
+        self.assertEqual(result.status_code, 500)
+        self.assertEqual(result.data, 'Error')
+
+    # test_error ()
+
+# class RawDownloadTaskTestCase
+
+
 class WFCatalogSAATaskTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -531,6 +531,11 @@ EIDA_WFCATALOG_WADL_FILENAME = 'wfcatalog.wadl'
 
 EIDA_ROUTING_PATH = '/eidaws/routing/1/'
 
+# number of connection pools cached per endpoint session
+EIDA_ENDPOINT_POOL_CONNECTIONS = 10
+# maximum number of persistent connections per endpoint
+EIDA_ENDPOINT_POOL_MAXSIZE = 10
+
 # -----------------------------------------------------------------------------
 # EIDA NG webservice specific
 
@@ -576,6 +581,29 @@ EIDA_FEDERATOR_STREAMING_TIMEOUT = 600
 # timeout (federator) for endpoint requests. Should be <
 # EIDA_FEDERATOR_STREAMING_TIMEOUT
 EIDA_FEDERATOR_ENDPOINT_TIMEOUT = 540
+# maximum number of persistent (i.e. keep-alive) connections per endpoint
+EIDA_FEDERATOR_ENDPOINT_CONNECTIONS = EIDA_ENDPOINT_POOL_MAXSIZE
+# maximum number of stream epochs (i.e. lines) per endpoint request. A value
+# of 1 disables batching.
+EIDA_FEDERATOR_BATCH_MAX_LINES = 50
+# maximum accumulated timespan (in seconds) of stream epochs per endpoint
+# request (fdsnws-dataselect, eidaws-wfcatalog)
+EIDA_FEDERATOR_BATCH_MAX_TIMESPAN = 7 * 86400
+# maximum number of routing tables cached. A value of 0 disables caching
+# (default). Cached routing tables do not reflect routing updates until they
+# expire.
+EIDA_FEDERATOR_ROUTING_CACHE_SIZE = 0
+# time to live (in seconds) of cached routing tables
+EIDA_FEDERATOR_ROUTING_CACHE_TTL = 600
+# chunk size (in bytes) when streaming results to the client
+EIDA_FEDERATOR_CHUNK_SIZE = 256 * 1024
+# StationXML combiner implementation. The streaming combiner spills
+# <Station></Station> elements to disk instead of keeping entire
+# <Network></Network> trees in memory. The incremental combiner additionally
+# publishes <Station></Station> elements as soon as they are downloaded
+# (level=station, only; other levels use the streaming combiner).
+EIDA_FEDERATOR_STATIONXML_COMBINERS = ('incremental', 'streaming', 'tree')
+EIDA_FEDERATOR_STATIONXML_COMBINER = 'tree'
 
 # number of federator-dataselect download threads
 EIDA_FEDERATOR_THREADS_DATASELECT = 10
@@ -585,12 +613,16 @@ EIDA_FEDERATOR_THREADS_STATION_XML = 5
 EIDA_FEDERATOR_THREADS_STATION_TEXT = 10
 # number of federator-WFCatalog download threads
 EIDA_FEDERATOR_THREADS_WFCATALOG = 10
+# number of federator-station-xml threads combining network information
+EIDA_FEDERATOR_THREADS_STATION_XML_COMBINER = 5
 
 EIDA_FEDERATOR_THREAD_CONFIG = {
     "fdsnws-dataselect": EIDA_FEDERATOR_THREADS_DATASELECT,
     "fdsnws-station-xml": EIDA_FEDERATOR_THREADS_STATION_XML,
     "fdsnws-station-text": EIDA_FEDERATOR_THREADS_STATION_TEXT,
-    "eidaws-wfcatalog": EIDA_FEDERATOR_THREADS_WFCATALOG}
+    "eidaws-wfcatalog": EIDA_FEDERATOR_THREADS_WFCATALOG,
+    "fdsnws-station-xml-combiner":
+    EIDA_FEDERATOR_THREADS_STATION_XML_COMBINER}
 
 EIDA_FEDERATOR_SHARE_DIR = FDSN_WADL_DIR
 EIDA_FEDERATOR_APP_SHARE = os.path.join(APP_ROOT, EIDA_FEDERATOR_SERVICE_ID,
@@ -604,6 +636,8 @@ EIDA_STATIONLITE_SERVICE_ID = 'stationlite'
 
 # default port configuration for flask test wsgi stationlite instance
 EIDA_STATIONLITE_DEFAULT_SERVER_PORT = 5002
+EIDA_STATIONLITE_ROUTING_INDEX_CHECK_INTERVAL = 30
+EIDA_STATIONLITE_DB_CHECK_INTERVAL = 5
 
 EIDA_STATIONLITE_SHARE_DIR = FDSN_WADL_DIR
 EIDA_STATIONLITE_APP_SHARE = os.path.join(APP_ROOT,
@@ -615,6 +649,13 @@ EIDA_ROUTING_WADL_FILENAME = 'routing.wadl'
 EIDA_STATIONLITE_HARVEST_CONFIG_SECTION = 'CONFIG_STATIONLITE_HARVEST'
 EIDA_STATIONLITE_HARVEST_PATH_PIDFILE = \
     os.path.join(PATH_VAR_TMP, 'eida-stationlite-harvesting.pid')
+EIDA_STATIONLITE_HARVEST_WORKERS = 1
+# maximum number of routes prefetched per EIDA node while harvesting
+# concurrently
+EIDA_STATIONLITE_HARVEST_PREFETCH_SIZE = 32
+# timeout (in seconds) waiting for the DB to leave WAL mode before it is
+# replaced by a staging DB
+EIDA_STATIONLITE_HARVEST_STAGING_TIMEOUT = 10
 
 # -----------------------------------------------------------------------------
 # Mediator related
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark resolving multi-line StationLite POST requests: one query per
+stream epoch versus set-based (batch) queries.
+
+A synthetic routing DB (SQLite) is created. Then, routes are resolved for a
+POST body with --lines stream epoch lines.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from eidangservices.stationlite.engine import dbquery, orm
+from eidangservices.utils.sncl import StreamEpoch
+
+
+CHANNELS = ('HHZ', 'HHN', 'HHE', 'BHZ', 'BHN', 'BHE')
+
+
+def create_db(path, num_networks, num_stations):
+    engine = create_engine('sqlite:///{}'.format(path))
+
+    @event.listens_for(engine, 'connect')
+    def configure_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA case_sensitive_like=on')
+
+    orm.ORMBase.metadata.create_all(engine)
+
+    t = datetime.datetime(2000, 1, 1)
+    networks, stations, station_epochs = [], [], []
+    channel_epochs, routings = [], []
+    for i in range(num_networks):
+        net_oid = i + 1
+        networks.append({'oid': net_oid, 'name': 'N{:d}'.format(i)})
+        for j in range(num_stations):
+            sta_oid = len(stations) + 1
+            stations.append({'oid': sta_oid, 'name': 'S{:04d}'.format(j)})
+            station_epochs.append({
+                'station_ref': sta_oid, 'starttime': t, 'endtime': None,
+                'latitude': random.uniform(-90, 90),
+                'longitude': random.uniform(-180, 180)})
+            for cha in CHANNELS:
+                cha_oid = len(channel_epochs) + 1
+                channel_epochs.append({
+                    'oid': cha_oid, 'network_ref': net_oid,
+                    'station_ref': sta_oid, 'channel': cha,
+                    'locationcode': '', 'starttime': t, 'endtime': None})
+                routings.append({
+                    'channel_epoch_ref': cha_oid,
+                    'endpoint_ref': i % 10 + 1,
+                    'starttime': t, 'endtime': None})
+
+    with engine.begin() as conn:
+        conn.execute(orm.Service.__table__.insert(),
+                     [{'oid': 1, 'name': 'dataselect'}])
+        conn.execute(orm.Endpoint.__table__.insert(),
+                     [{'oid': i + 1, 'service_ref': 1,
+                       'url': 'http://node{}/fdsnws/dataselect/1/query'.format(
+                           i)} for i in range(10)])
+        conn.execute(orm.Network.__table__.insert(), networks)
+        conn.execute(orm.Station.__table__.insert(), stations)
+        conn.execute(orm.StationEpoch.__table__.insert(), station_epochs)
+        conn.execute(orm.ChannelEpoch.__table__.insert(), channel_epochs)
+        conn.execute(orm.Routing.__table__.insert(), routings)
+
+    return engine
+
+
+def create_lines(num_lines, num_networks, num_stations):
+    lines = []
+    for i in range(num_lines):
+        start = datetime.datetime(2010, 1, 1) + datetime.timedelta(
+            days=random.randint(0, 3000))
+        lines.append('N{} S{:04d} -- HH? {} {}'.format(
+            random.randrange(num_networks), random.randrange(num_stations),
+            start.isoformat(), (start + datetime.timedelta(
+                days=1)).isoformat()))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lines', type=int, default=10000,
+                        help='Number of POST lines (default: %(default)s)')
+    parser.add_argument('--networks', type=int, default=20,
+                        help='Number of networks (default: %(default)s)')
+    parser.add_argument('--stations', type=int, default=200,
+                        help=('Number of stations per network '
+                              '(default: %(default)s)'))
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        engine = create_db(path, args.networks, args.stations)
+        session = sessionmaker(bind=engine)()
+
+        stream_epochs = []
+        for line in create_lines(args.lines, args.networks, args.stations):
+            se = StreamEpoch.from_snclline(line)
+            # NOTE: the schema replaces '--' with the empty location code
+            stream_epochs.append(StreamEpoch.from_sncl(
+                network=se.network, station=se.station, location='',
+                channel=se.channel, starttime=se.starttime,
+                endtime=se.endtime))
+
+        t_start = time.time()
+        reference_result = [
+            dbquery.find_streamepochs_and_routes(session, se, 'dataselect')
+            for se in stream_epochs]
+        t_single = time.time() - t_start
+
+        t_start = time.time()
+        result = dbquery.find_streamepochs_and_routes_batch(
+            session, stream_epochs, 'dataselect')
+        t_batch = time.time() - t_start
+
+        num_routes = sum(len(r) for r in result)
+        assert num_routes == sum(len(r) for r in reference_result)
+
+        print('{} lines, {} channel epochs, {} routes'.format(
+            args.lines, args.networks * args.stations * len(CHANNELS),
+            num_routes))
+        print('per stream epoch: {:8.3f}s'.format(t_single))
+        print('batch:            {:8.3f}s'.format(t_batch))
+        print('speedup:          {:8.1f}x'.format(t_single / t_batch))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
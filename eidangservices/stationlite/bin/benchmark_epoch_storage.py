@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark StationLite routing queries regarding the epoch storage: ISO
+strings (default) versus integer microseconds.
+
+A synthetic routing DB (SQLite) is created and copied. The copy is converted
+to integer epochs. Then, the same routing queries are issued against both
+DBs.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from eidangservices.stationlite.engine import db, dbquery, orm
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+CHANNELS = ('HHZ', 'HHN', 'HHE', 'BHZ', 'BHN', 'BHE')
+
+
+def create_engine_sqlite(path):
+    engine = create_engine('sqlite:///{}'.format(path))
+
+    @event.listens_for(engine, 'connect')
+    def configure_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA case_sensitive_like=on')
+
+    return engine
+
+
+def create_db(path, num_networks, num_stations, num_epochs):
+    engine = create_engine_sqlite(path)
+    orm.ORMBase.metadata.create_all(engine)
+
+    t = datetime.datetime(2000, 1, 1)
+    epoch_length = datetime.timedelta(days=365 * 18 // num_epochs)
+    networks, stations, station_epochs = [], [], []
+    channel_epochs, routings = [], []
+    for i in range(num_networks):
+        net_oid = i + 1
+        networks.append({'oid': net_oid, 'name': 'N{:d}'.format(i)})
+        for j in range(num_stations):
+            sta_oid = len(stations) + 1
+            stations.append({'oid': sta_oid, 'name': 'S{:04d}'.format(j)})
+            station_epochs.append({
+                'station_ref': sta_oid, 'starttime': t, 'endtime': None,
+                'latitude': random.uniform(-90, 90),
+                'longitude': random.uniform(-180, 180)})
+            for cha in CHANNELS:
+                for k in range(num_epochs):
+                    cha_oid = len(channel_epochs) + 1
+                    channel_epochs.append({
+                        'oid': cha_oid, 'network_ref': net_oid,
+                        'station_ref': sta_oid, 'channel': cha,
+                        'locationcode': '',
+                        'starttime': t + k * epoch_length,
+                        'endtime': (None if k == num_epochs - 1 else
+                                    t + (k + 1) * epoch_length)})
+                    routings.append({
+                        'channel_epoch_ref': cha_oid,
+                        'endpoint_ref': i % 10 + 1,
+                        'starttime': t, 'endtime': None})
+
+    with engine.begin() as conn:
+        conn.execute(orm.Service.__table__.insert(),
+                     [{'oid': 1, 'name': 'dataselect'}])
+        conn.execute(orm.Endpoint.__table__.insert(),
+                     [{'oid': i + 1, 'service_ref': 1,
+                       'url': 'http://node{}/fdsnws/dataselect/1/query'.format(
+                           i)} for i in range(10)])
+        conn.execute(orm.Network.__table__.insert(), networks)
+        conn.execute(orm.Station.__table__.insert(), stations)
+        conn.execute(orm.StationEpoch.__table__.insert(), station_epochs)
+        conn.execute(orm.ChannelEpoch.__table__.insert(), channel_epochs)
+        conn.execute(orm.Routing.__table__.insert(), routings)
+
+    engine.execute('ANALYZE')
+    engine.dispose()
+
+    return len(channel_epochs)
+
+
+def create_stream_epochs(num_queries, num_networks, num_stations):
+    stream_epochs = []
+    for i in range(num_queries):
+        start = datetime.datetime(2000, 1, 1) + datetime.timedelta(
+            days=random.randint(0, 365 * 19))
+        end = start + datetime.timedelta(days=random.randint(1, 30))
+        net = 'N{}'.format(random.randrange(num_networks))
+        if i % 2:
+            # single station
+            stream = Stream(network=net,
+                            station='S{:04d}'.format(
+                                random.randrange(num_stations)),
+                            location='*', channel='HH?')
+        else:
+            # entire network
+            stream = Stream(network=net, station='*', location='*',
+                            channel='BHZ')
+        stream_epochs.append(StreamEpoch(stream, starttime=start,
+                                         endtime=end))
+    return stream_epochs
+
+
+def run_queries(path, stream_epochs):
+    engine = create_engine_sqlite(path)
+    session = sessionmaker(bind=engine)()
+    try:
+        latencies, num_routes = [], 0
+        for se in stream_epochs:
+            t_start = time.time()
+            routes = dbquery.find_streamepochs_and_routes(
+                session, se, 'dataselect')
+            latencies.append(time.time() - t_start)
+            num_routes += len(routes)
+        return latencies, num_routes
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', type=int, default=2000,
+                        help='Number of queries (default: %(default)s)')
+    parser.add_argument('--networks', type=int, default=100,
+                        help='Number of networks (default: %(default)s)')
+    parser.add_argument('--stations', type=int, default=100,
+                        help=('Number of stations per network '
+                              '(default: %(default)s)'))
+    parser.add_argument('--epochs', type=int, default=3,
+                        help=('Number of epochs per channel '
+                              '(default: %(default)s)'))
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path_datetime = os.path.join(tmpdir, 'datetime.sqlite')
+        path_integer = os.path.join(tmpdir, 'integer.sqlite')
+
+        num_channel_epochs = create_db(path_datetime, args.networks,
+                                       args.stations, args.epochs)
+        shutil.copyfile(path_datetime, path_integer)
+        engine = create_engine_sqlite(path_integer)
+        t_start = time.time()
+        db.convert_epochs(engine, integer=True)
+        t_convert = time.time() - t_start
+        engine.dispose()
+
+        stream_epochs = create_stream_epochs(args.queries, args.networks,
+                                             args.stations)
+        # warm up the page cache
+        run_queries(path_datetime, stream_epochs[:100])
+        run_queries(path_integer, stream_epochs[:100])
+
+        print('{} channel epochs, {} queries (conversion: {:.1f}s)'.format(
+            num_channel_epochs, args.queries, t_convert))
+        results = {}
+        for name, path in (('datetime', path_datetime),
+                           ('integer', path_integer)):
+            latencies, num_routes = run_queries(path, stream_epochs)
+            latencies.sort()
+            results[name] = num_routes
+            print('{:<8} total: {:7.3f}s  median: {:6.2f}ms  '
+                  'p95: {:6.2f}ms  ({} routes)'.format(
+                      name, sum(latencies),
+                      latencies[len(latencies) // 2] * 1000,
+                      latencies[int(len(latencies) * .95)] * 1000,
+                      num_routes))
+
+        assert results['datetime'] == results['integer']
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
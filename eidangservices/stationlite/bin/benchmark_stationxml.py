@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the StationXML extractors used by the StationLite harvester: ObsPy
+inventories versus streamed (lxml.etree.iterparse) extraction.
+
+A large synthetic level=channel StationXML file (including responses) is
+created. Each extractor is run within a separate process such that the peak
+memory (maximum resident set size) is reported per extractor.
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from eidangservices.stationlite.harvest import stationxml
+
+
+CHANNELS = ('HHZ', 'HHN', 'HHE', 'BHZ', 'BHN', 'BHE')
+
+STAGE = """          <Stage number="{number}">
+            <PolesZeros>
+              <InputUnits><Name>M/S</Name></InputUnits>
+              <OutputUnits><Name>V</Name></OutputUnits>
+              <PzTransferFunctionType>LAPLACE (RADIANS/SECOND)
+              </PzTransferFunctionType>
+              <NormalizationFactor>1.0</NormalizationFactor>
+              <NormalizationFrequency>1.0</NormalizationFrequency>
+{poles}
+            </PolesZeros>
+            <StageGain><Value>1.0</Value><Frequency>1.0</Frequency></StageGain>
+          </Stage>
+"""
+
+POLE = """              <Pole number="{number}">
+                <Real>-0.037</Real><Imaginary>0.037</Imaginary>
+              </Pole>"""
+
+
+def create_stationxml(path, num_networks, num_stations, num_epochs,
+                      num_stages):
+    response = '        <Response>\n{}        </Response>\n'.format(''.join(
+        STAGE.format(number=i + 1, poles='\n'.join(
+            POLE.format(number=j) for j in range(10)))
+        for i in range(num_stages)))
+
+    num_channels = 0
+    with open(path, 'w') as ofd:
+        ofd.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" '
+                  'schemaVersion="1.0">\n'
+                  '  <Source>benchmark</Source>\n'
+                  '  <Created>2018-09-18T00:00:00</Created>\n')
+        for i in range(num_networks):
+            ofd.write('  <Network code="N{}" '
+                      'startDate="1990-01-01T00:00:00">\n'
+                      '    <Description>Network {}</Description>\n'.format(
+                          i, i))
+            for j in range(num_stations):
+                lat = -80 + 160. * j / num_stations
+                ofd.write(
+                    '    <Station code="S{:04d}" '
+                    'startDate="1990-01-01T00:00:00">\n'
+                    '      <Latitude>{}</Latitude>\n'
+                    '      <Longitude>8.0</Longitude>\n'
+                    '      <Elevation>500.0</Elevation>\n'
+                    '      <Site><Name>Site</Name></Site>\n'.format(j, lat))
+                for cha in CHANNELS:
+                    for k in range(num_epochs):
+                        ofd.write(
+                            '      <Channel code="{}" locationCode="" '
+                            'startDate="{}-01-01T00:00:00"{}>\n'
+                            '        <Latitude>{}</Latitude>\n'
+                            '        <Longitude>8.0</Longitude>\n'
+                            '        <Elevation>500.0</Elevation>\n'
+                            '        <Depth>0.0</Depth>\n'
+                            '        <SampleRate>100.0</SampleRate>\n'.format(
+                                cha, 1990 + k,
+                                '' if k == num_epochs - 1 else
+                                ' endDate="{}-01-01T00:00:00"'.format(
+                                    1991 + k), lat))
+                        ofd.write(response)
+                        ofd.write('      </Channel>\n')
+                        num_channels += 1
+                ofd.write('    </Station>\n')
+            ofd.write('  </Network>\n')
+        ofd.write('</FDSNStationXML>\n')
+
+    return num_channels
+
+
+def run(extractor, path, results):
+    t_start = time.time()
+    with open(path, 'rb') as ifd:
+        networks = stationxml.EXTRACTORS[extractor](ifd)
+    t_total = time.time() - t_start
+
+    num_channels = sum(len(sta.channels) for net in networks
+                       for sta in net.stations)
+    results.put((extractor, t_total, num_channels,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--networks', type=int, default=5,
+                        help='Number of networks (default: %(default)s)')
+    parser.add_argument('--stations', type=int, default=200,
+                        help=('Number of stations per network '
+                              '(default: %(default)s)'))
+    parser.add_argument('--epochs', type=int, default=3,
+                        help=('Number of epochs per channel '
+                              '(default: %(default)s)'))
+    parser.add_argument('--stages', type=int, default=3,
+                        help=('Number of response stages per channel '
+                              '(default: %(default)s)'))
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        num_channels = create_stationxml(path, args.networks, args.stations,
+                                         args.epochs, args.stages)
+        print('{} channel epochs, {:.1f} MB StationXML'.format(
+            num_channels, os.path.getsize(path) / 1024. ** 2))
+
+        results = multiprocessing.Queue()
+        for extractor in stationxml.EXTRACTORS:
+            # NOTE: a process per extractor for a separate peak memory
+            proc = multiprocessing.Process(target=run,
+                                           args=(extractor, path, results))
+            proc.start()
+            extractor, t_total, num_extracted, maxrss = results.get()
+            proc.join()
+
+            assert num_extracted == num_channels
+            print('{:<6} {:8.3f}s  peak memory (max RSS): {:8.1f} MB'.format(
+                extractor, t_total, maxrss / 1024.))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -32,14 +32,23 @@ from __future__ import (absolute_import, division, print_function,
 
 from builtins import * # noqa
 
+import datetime
 import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
 
 from contextlib import contextmanager
 
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.event import listens_for
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import scoped_session, sessionmaker
 
+from eidangservices import settings
 from eidangservices.stationlite.engine import orm
 from eidangservices.utils.error import Error, ErrorWithTraceback
 
@@ -65,6 +74,13 @@ class InvalidDBUrl(StationLiteDBEngineError):
 class DBEmptyQueryResultError(StationLiteDBEngineError):
     """Query '{}' returned no results."""
 
+class StagingDBError(StationLiteDBEngineError):
+    """Staging DB error ({})."""
+
+
+STAGING_SUFFIX = '.staging'
+SQLITE_VERSION_VACUUM_INTO = (3, 27, 0)
+
 # -----------------------------------------------------------------------------
 class ScopedSession:
     """
@@ -140,6 +156,173 @@ def configure_db(pragmas):
 # configure_db ()
 
 
+def migrate(engine):
+    """
+    Migrate an existing DB to the current schema. Missing tables and indexes
+    (including the spatial index) are created while existing data is
+    preserved.
+
+    :param engine: SQLAlchemy engine
+    :type engine: :py:class:`sqlalchemy.engine.Engine`
+    :returns: Names of the tables and indexes created
+    :rtype: list
+    """
+    inspector = inspect(engine)
+    tables_available = set(inspector.get_table_names())
+
+    retval = []
+    for table in orm.ORMBase.metadata.sorted_tables:
+        if table.name not in tables_available:
+            logger.debug('Creating table {!r} ...'.format(table.name))
+            # NOTE: indexes are created along with the table
+            table.create(engine)
+            retval.append(table.name)
+            continue
+
+        indexes_available = set(
+            idx['name'] for idx in inspector.get_indexes(table.name))
+        for idx in table.indexes:
+            if idx.name not in indexes_available:
+                logger.debug('Creating index {!r} ...'.format(idx.name))
+                idx.create(engine)
+                retval.append(idx.name)
+
+    if orm.STATIONEPOCH_RTREE not in tables_available:
+        with engine.begin() as conn:
+            if orm.create_spatial_index(conn):
+                logger.debug('Created spatial index {!r}.'.format(
+                    orm.STATIONEPOCH_RTREE))
+                retval.append(orm.STATIONEPOCH_RTREE)
+
+    if retval and engine.dialect.name == 'sqlite':
+        # NOTE: Gather statistics such that the query planner takes the
+        # new indexes into account.
+        engine.execute('ANALYZE')
+
+    return retval
+
+# migrate ()
+
+def uses_integer_epochs(engine):
+    """
+    Return :code:`True` if the DB stores epochs as integer microseconds.
+
+    :param engine: SQLAlchemy engine
+    :type engine: :py:class:`sqlalchemy.engine.Engine`
+    :rtype: bool
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    conn = engine.raw_connection()
+    try:
+        return orm.detect_integer_epochs(conn)
+    finally:
+        conn.close()
+
+# uses_integer_epochs ()
+
+def convert_epochs(engine, integer=True):
+    """
+    Convert the epoch storage of an existing (SQLite) DB, i.e. either from
+    ISO strings to integer microseconds or vice versa.
+
+    .. note::
+
+        Engines connected to the DB before the conversion must be recreated
+        since the epoch storage is detected when connecting. Until then,
+        checking out a connection raises
+        :py:class:`eidangservices.stationlite.engine.orm.EpochStorageChanged`.
+
+    :param engine: SQLAlchemy engine
+    :type engine: :py:class:`sqlalchemy.engine.Engine`
+    :param bool integer: Convert to integer epochs if :code:`True` else to
+        ISO strings
+    :returns: Number of rows converted
+    :rtype: int
+    :raises: :py:class:`StationLiteDBEngineError` if the dialect does not
+        support integer epochs
+    """
+    if engine.dialect.name != 'sqlite':
+        raise StationLiteDBEngineError(
+            'Integer epochs are not supported for dialect {!r}.'.format(
+                engine.dialect.name))
+
+    if integer:
+        convert = _convert_to_epoch
+    else:
+        convert = _convert_to_isoformat
+
+    retval = 0
+    # NOTE: A DBAPI connection is used, i.e. the epoch storage detected for
+    # the engine is bypassed (including the storage verification on
+    # checkout).
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        cursor.execute('PRAGMA user_version')
+        user_version = cursor.fetchone()[0]
+        if bool(user_version & orm.USER_VERSION_INTEGER_EPOCHS) == integer:
+            conn.rollback()
+            return retval
+
+        for table in orm.ORMBase.metadata.sorted_tables:
+            column = table.c.get('starttime')
+            if column is None or not isinstance(column.type,
+                                                orm.EpochDateTime):
+                continue
+
+            logger.debug('Converting epochs of table {!r} ...'.format(
+                table.name))
+            cursor.execute('SELECT oid, starttime, endtime FROM {}'.format(
+                table.name))
+            values = [
+                {'oid': oid, 'starttime': convert(starttime),
+                 'endtime': convert(endtime)}
+                for oid, starttime, endtime in cursor.fetchall()]
+            if values:
+                cursor.executemany(
+                    'UPDATE {} SET starttime=:starttime, endtime=:endtime '
+                    'WHERE oid=:oid'.format(table.name), values)
+            retval += len(values)
+
+        cursor.execute('PRAGMA user_version = {}'.format(
+            user_version ^ orm.USER_VERSION_INTEGER_EPOCHS))
+        conn.commit()
+
+        cursor.execute('ANALYZE')
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return retval
+
+# convert_epochs ()
+
+def _convert_to_epoch(value):
+    if value is None:
+        return orm.EPOCH_OPEN
+    return orm.datetime_to_epoch(datetime.datetime(
+        int(value[0:4]), int(value[5:7]), int(value[8:10]),
+        int(value[11:13]), int(value[14:16]), int(value[17:19]),
+        int(value[20:26] or 0)))
+
+# _convert_to_epoch ()
+
+def _convert_to_isoformat(value):
+    dt = orm.epoch_to_datetime(value)
+    if dt is None:
+        return None
+    # NOTE: Use SQLAlchemy's default storage format for SQLite.
+    return '{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}.{:06d}'.format(
+        dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second,
+        dt.microsecond)
+
+# _convert_to_isoformat ()
+
 def clean(session, timestamp):
     """
     Clean DB from data older than timestamp.
@@ -156,7 +339,8 @@ def clean(session, timestamp):
                               orm.ChannelEpoch,
                               orm.StationEpoch,
                               orm.Routing,
-                              orm.StreamEpoch)
+                              orm.StreamEpoch,
+                              orm.HTTPValidator)
     retval = 0
     for m in MAPPINGS_WITH_LASTSEEN:
         retval += session.query(m).\
@@ -191,5 +375,258 @@ def clean(session, timestamp):
 
 # clean ()
 
+def sqlite_path(engine):
+    """
+    Return the path of a SQLite file DB.
+
+    :param engine: SQLAlchemy engine
+    :type engine: :py:class:`sqlalchemy.engine.Engine`
+    :raises: :py:class:`InvalidDBUrl` if the engine does not refer to a
+        SQLite file DB
+    :rtype: str
+    """
+    if (engine.dialect.name != 'sqlite' or
+            engine.url.database in (None, '', ':memory:')):
+        raise InvalidDBUrl(engine.url)
+    return engine.url.database
+
+# sqlite_path ()
+
+def create_staging_db(engine):
+    """
+    Create a staging DB from a SQLite file DB. The staging DB is a compacted
+    copy (i.e. created by means of :code:`VACUUM INTO`) located next to the
+    DB. :code:`VACUUM INTO` requires SQLite >= 3.27.0. With older SQLite
+    versions the DB is copied by means of :py:func:`_copy_sqlite_db`
+    (without being compacted).
+
+    :param engine: SQLAlchemy engine of the DB
+    :type engine: :py:class:`sqlalchemy.engine.Engine`
+    :returns: SQLAlchemy engine of the staging DB
+    :rtype: :py:class:`sqlalchemy.engine.Engine`
+    """
+    path = sqlite_path(engine)
+    if not os.path.isfile(path):
+        raise StagingDBError('DB not found: {}'.format(path))
+
+    path_staging = path + STAGING_SUFFIX
+    # NOTE: Remove the leftovers of a previous (failed) run.
+    remove_staging_db(path_staging)
+
+    try:
+        if sqlite3.sqlite_version_info >= SQLITE_VERSION_VACUUM_INTO:
+            with engine.connect() as conn:
+                conn.execute(text('VACUUM INTO :path'), path=path_staging)
+        else:
+            _copy_sqlite_db(path, path_staging)
+    except (OperationalError, sqlite3.Error, OSError) as err:
+        remove_staging_db(path_staging)
+        raise StagingDBError(err)
+
+    staging_engine = create_engine('sqlite:///{}'.format(path_staging))
+
+    @listens_for(staging_engine, 'connect')
+    def configure_pragmas(dbapi_connection, connection_record):
+        # XXX: A crash corrupts the staging DB, only. It is recreated by the
+        # next run.
+        dbapi_connection.execute('PRAGMA synchronous=OFF')
+
+    return staging_engine
+
+# create_staging_db ()
+
+def _copy_sqlite_db(path, path_staging):
+    """
+    Copy a SQLite file DB consistently. The sqlite3 backup API is used if
+    available (Python >= 3.7). Else, the DB file (including a WAL file) is
+    copied while writers are locked out.
+
+    :param str path: Path of the DB
+    :param str path_staging: Path of the copy
+    """
+    src = sqlite3.connect(path, isolation_level=None)
+    try:
+        if hasattr(src, 'backup'):
+            dst = sqlite3.connect(path_staging)
+            try:
+                src.backup(dst)
+            finally:
+                dst.close()
+            return
+
+        # NOTE: An immediate transaction prevents other connections from
+        # writing while still allowing them to read. In WAL mode, committed
+        # transactions not yet checkpointed are contained in the WAL file
+        # which is copied, too.
+        src.execute('BEGIN IMMEDIATE')
+        try:
+            for suffix in ('', '-wal'):
+                if os.path.isfile(path + suffix):
+                    shutil.copyfile(path + suffix, path_staging + suffix)
+        finally:
+            src.execute('ROLLBACK')
+    finally:
+        src.close()
+
+# _copy_sqlite_db ()
+
+def finalize_staging_db(engine):
+    """
+    Finalize a staging DB i.e. update the statistics of the query planner,
+    switch to rollback journal mode and compact the DB.
+
+    :param engine: SQLAlchemy engine of the staging DB
+    :type engine: :py:class:`sqlalchemy.engine.Engine`
+    """
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.execute('VACUUM')
+    engine.dispose()
+
+# finalize_staging_db ()
+
+def swap_staging_db(engine, staging_engine,
+                    timeout=settings.EIDA_STATIONLITE_HARVEST_STAGING_TIMEOUT):
+    """
+    Atomically replace a SQLite file DB with a (finalized) staging DB.
+    Readers keep on reading the generation replaced until they reopen the
+    DB.
+
+    :param engine: SQLAlchemy engine of the DB
+    :type engine: :py:class:`sqlalchemy.engine.Engine`
+    :param staging_engine: SQLAlchemy engine of the staging DB
+    :type staging_engine: :py:class:`sqlalchemy.engine.Engine`
+    :param float timeout: Timeout in seconds waiting for the DB to leave
+        WAL mode
+    :raises StagingDBError: If the DB did not leave WAL mode within
+        :code:`timeout` (e.g. since StationLite workers keep connections
+        open). The DB is not replaced.
+
+    .. note::
+
+        A DB in WAL mode cannot be replaced as long as other processes keep
+        it open. Once in rollback journal mode, workers holding a
+        connection keep on using the unlinked generation replaced until
+        :py:class:`DBFileWatcher` detects the replacement.
+    """
+    path = sqlite_path(engine)
+    path_staging = sqlite_path(staging_engine)
+    staging_engine.dispose()
+
+    # NOTE: SQLite applies an existing WAL file to whatever DB file
+    # is found at the path. Hence, a DB in WAL mode must not be replaced.
+    # Leaving WAL mode requires the DB not to be opened by other
+    # connections.
+    t_start = time.time()
+    while True:
+        try:
+            mode = engine.execute('PRAGMA journal_mode=DELETE').scalar()
+        except OperationalError as err:
+            mode = str(err)
+        finally:
+            engine.dispose()
+
+        if mode == 'delete':
+            break
+
+        remaining = timeout - (time.time() - t_start)
+        if remaining <= 0:
+            raise StagingDBError(
+                'DB {!r} not replaced: unable to leave WAL mode within {}s '
+                '(journal_mode: {}). The DB is still opened by other '
+                'connections (e.g. StationLite workers).'.format(
+                    path, timeout, mode))
+        logger.debug(
+            'Waiting for DB {!r} to leave WAL mode (journal_mode: '
+            '{}).'.format(path, mode))
+        time.sleep(min(remaining, 0.5))
+
+    os.rename(path_staging, path)
+    # make the rename durable
+    fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# swap_staging_db ()
+
+def remove_staging_db(path_staging):
+    """
+    Remove a staging DB (including journal files).
+
+    :param str path_staging: Path of the staging DB
+    """
+    for suffix in ('', '-journal', '-wal', '-shm'):
+        try:
+            os.remove(path_staging + suffix)
+        except OSError:
+            pass
+
+# remove_staging_db ()
+
+
+# -----------------------------------------------------------------------------
+class DBFileWatcher(object):
+    """
+    Watches a SQLite file DB for being replaced (e.g. by means of
+    :py:func:`swap_staging_db`) or its epoch storage being converted (see
+    :py:func:`convert_epochs`). In both cases engines must be recreated.
+
+    :param str path: Path of the DB
+    :param float check_interval: Minimum interval in seconds between checks
+    """
+
+    def __init__(self, path, check_interval=5):
+        self.path = path
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._last_check = time.time()
+        self._identity = self._stat()
+
+    # __init__ ()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            conn = sqlite3.connect(self.path)
+            try:
+                integer_epochs = orm.detect_integer_epochs(conn)
+            finally:
+                conn.close()
+        except (OSError, sqlite3.Error):
+            return None
+        return st.st_dev, st.st_ino, integer_epochs
+
+    def replaced(self):
+        """
+        Check if the DB file was replaced (or its epoch storage converted)
+        since the previous check. Checks are performed at most every
+        :code:`check_interval` seconds and by a single thread at a time.
+
+        :rtype: bool
+        """
+        if (time.time() - self._last_check < self.check_interval or
+                not self._lock.acquire(False)):
+            return False
+
+        try:
+            self._last_check = time.time()
+            identity = self._stat()
+            if identity is None or identity == self._identity:
+                return False
+
+            self._identity = identity
+            return True
+        finally:
+            self._lock.release()
+
+    # replaced ()
+
+# class DBFileWatcher
+
 
 # ---- END OF <db.py> ----
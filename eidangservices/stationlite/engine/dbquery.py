@@ -33,7 +33,12 @@ from __future__ import (absolute_import, division, print_function,
 from builtins import * # noqa
 
 import collections
+import datetime
 import logging
+import math
+
+from sqlalchemy import (and_, Boolean, Column, Index, Integer, MetaData,
+                        String, Table)
 
 from eidangservices import utils, settings
 from eidangservices.utils.sncl import (StreamEpochs, StreamEpochsHandler,
@@ -43,6 +48,21 @@ from eidangservices.stationlite.engine import orm
 
 logger = logging.getLogger('flask.app.stationlite.dbquery')
 
+# NOTE: Temporary table for set-based (batch) queries. Temporary tables
+# are private to the DB connection such that a fixed name is sufficient.
+_request_table = Table(
+    'stationlite_request', MetaData(),
+    Column('line', Integer, primary_key=True),
+    Column('exact', Boolean, nullable=False),
+    Column('network', String(orm.LENGTH_STD_CODE), nullable=False),
+    Column('station', String(orm.LENGTH_STD_CODE), nullable=False),
+    Column('location', String(orm.LENGTH_STD_CODE), nullable=False),
+    Column('channel', String(orm.LENGTH_STD_CODE), nullable=False),
+    Column('starttime', orm.EpochDateTime, nullable=False),
+    Column('endtime', orm.EpochDateTime, nullable=False),
+    Index('stationlite_request_network_station_idx', 'network', 'station'),
+    prefixes=['TEMPORARY'])
+
 # ----------------------------------------------------------------------------
 def resolve_vnetwork(session, stream_epoch, like_escape='/'):
     """
@@ -52,10 +72,7 @@ def resolve_vnetwork(session, stream_epoch, like_escape='/'):
         instances.
     :rtype: list
     """
-    if (stream_epoch.network == settings.FDSNWS_QUERY_WILDCARD_MULT_CHAR or
-        (len(stream_epoch.network) <= 2 and
-         set(stream_epoch.network) ==
-            set([settings.FDSNWS_QUERY_WILDCARD_SINGLE_CHAR]))):
+    if not is_vnetwork_candidate(stream_epoch):
         logger.debug(
             'Not resolving VNETs (stream_epoch.network == {})'.format(
                 stream_epoch.network))
@@ -78,43 +95,109 @@ def resolve_vnetwork(session, stream_epoch, like_escape='/'):
                                              escape=like_escape))
 
     if sql_stream_epoch.starttime:
-        # NOTE(damb): compare to None for undefined endtime (i.e. instrument
-        # currently operating)
+        # NOTE: undefined endtime (i.e. instrument currently
+        # operating) is taken into account
         query = query.\
-            filter((orm.StreamEpoch.endtime > sql_stream_epoch.starttime) |
-                   (orm.StreamEpoch.endtime == None))  # noqa
+            filter(orm.epoch_ends_after(orm.StreamEpoch.endtime,
+                                        sql_stream_epoch.starttime))
     if sql_stream_epoch.endtime:
         query = query.\
             filter(orm.StreamEpoch.starttime < sql_stream_epoch.endtime)
 
-    # slice the stream epoch
+    rows = ((s.network.name, s.station.name, s.location, s.channel,
+             s.starttime, s.endtime) for s in query.all())
+
+    return vnetwork_stream_epochs_from_rows(rows, stream_epoch)
+
+# resolve_vnetwork ()
+
+def is_vnetwork_candidate(stream_epoch):
+    """
+    Check if the network code of a stream epoch possibly refers to a virtual
+    network.
+
+    :param stream_epoch: StreamEpoch to be checked
+    :type stream_epoch: :py:class:`eidangservices.utils.sncl.StreamEpoch`
+    :rtype: bool
+    """
+    return not (
+        stream_epoch.network == settings.FDSNWS_QUERY_WILDCARD_MULT_CHAR or
+        (len(stream_epoch.network) <= 2 and
+         set(stream_epoch.network) ==
+            set([settings.FDSNWS_QUERY_WILDCARD_SINGLE_CHAR])))
+
+# is_vnetwork_candidate ()
+
+def vnetwork_stream_epochs_from_rows(rows, stream_epoch):
+    """
+    Slice the stream epochs of a virtual network with respect to the temporal
+    constraints of :code:`stream_epoch`.
+
+    :param rows: Iterable of tuples :code:`(network, station, location,
+        channel, starttime, endtime)` of the stream epochs the virtual network
+        is composed of
+    :param stream_epoch: StreamEpoch providing the temporal constraints
+    :type stream_epoch: :py:class:`eidangservices.utils.sncl.StreamEpoch`
+    :returns: List of :py:class:`eidangservices.utils.sncl.StreamEpoch` object
+        instances.
+    :rtype: list
+    """
     sliced_ses = []
-    for s in query.all():
-        #print('Query response: {0!r}'.format(StreamEpoch.from_orm(s)))
-        with none_as_max(s.endtime) as end:
+    for net, sta, loc, cha, starttime, endtime in rows:
+        with none_as_max(endtime) as end:
             se = StreamEpochs(
-                network=s.network.name,
-                station=s.station.name,
-                location=s.location,
-                channel=s.channel,
-                epochs=[(s.starttime, end)])
+                network=net,
+                station=sta,
+                location=loc,
+                channel=cha,
+                epochs=[(starttime, end)])
             se.modify_with_temporal_constraints(
-                start=sql_stream_epoch.starttime,
-                end=sql_stream_epoch.endtime)
+                start=stream_epoch.starttime,
+                end=stream_epoch.endtime)
             sliced_ses.append(se)
 
     logger.debug(
-        'Found {0!r} matching {0!r}'.format(sorted(sliced_ses),
+        'Found {0!r} matching {1!r}'.format(sorted(sliced_ses),
                                             stream_epoch))
 
     return [se for ses in sliced_ses for se in ses]
 
-# resolve_vnetwork ()
+# vnetwork_stream_epochs_from_rows ()
+
+def resolve_vnetworks(session, stream_epochs, like_escape='/'):
+    """
+    Resolve multiple stream epochs regarding virtual networks.
+
+    The names of the virtual networks available are fetched once. Stream
+    epochs with a network code which cannot refer to any of them are skipped
+    without issuing a query.
+
+    :returns: List of :py:class:`eidangservices.utils.sncl.StreamEpoch` object
+        instances.
+    :rtype: list
+    """
+    vnets = set(name for name, in session.query(orm.StreamEpochGroup.name))
+    if not vnets:
+        return []
+
+    retval = []
+    for stream_epoch in stream_epochs:
+        if (not _has_wildcards(stream_epoch.network) and
+                stream_epoch.network not in vnets):
+            continue
+        retval.extend(resolve_vnetwork(session, stream_epoch,
+                                       like_escape=like_escape))
+
+    return retval
+
+# resolve_vnetworks ()
 
 def find_streamepochs_and_routes(session, stream_epoch, service,
                                  level='channel',
                                  minlat=-90., maxlat=90., minlon=-180.,
-                                 maxlon=180., like_escape='/'):
+                                 maxlon=180., latitude=None, longitude=None,
+                                 minradius=0., maxradius=180.,
+                                 like_escape='/'):
     """
     Return routes for a given stream epoch.
 
@@ -131,6 +214,13 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
         minimum
     :param float maxlon: Longitude smaller than or equal to the specified
         maximum
+    :param latitude: Latitude of the center of a circular spatial constraint
+    :type latitude: float or None
+    :param longitude: Longitude of the center of a circular spatial
+        constraint
+    :type longitude: float or None
+    :param float minradius: Minimum distance in degrees from the center
+    :param float maxradius: Maximum distance in degrees from the center
     :param str like_escape: Character used for the `SQL ESCAPE` statement
     :return: List of :py:class:`eidangservices.utils.Route` objects
     :rtype: list
@@ -150,7 +240,10 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
                           orm.Station.name,
                           orm.Routing.starttime,
                           orm.Routing.endtime,
-                          orm.Endpoint.url).\
+                          orm.Endpoint.url,
+                          orm.StationEpoch.latitude,
+                          orm.StationEpoch.longitude).\
+        select_from(orm.ChannelEpoch).\
         join(orm.Routing).\
         join(orm.Endpoint).\
         join(orm.Service).\
@@ -162,28 +255,312 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
         filter(orm.Network.name.like(sql_stream_epoch.network,
                                      escape=like_escape)).\
         filter(orm.Station.name.like(sta, escape=like_escape)).\
-        filter((orm.StationEpoch.latitude >= minlat) &
-               (orm.StationEpoch.latitude <= maxlat)).\
-        filter((orm.StationEpoch.longitude >= minlon) &
-               (orm.StationEpoch.longitude <= maxlon)).\
         filter(orm.ChannelEpoch.channel.like(cha, escape=like_escape)).\
         filter(orm.ChannelEpoch.locationcode.like(loc, escape=like_escape)).\
         filter(orm.Service.name == service)
 
     if sql_stream_epoch.starttime:
-        # NOTE(damb): compare to None for undefined endtime (i.e. device
-        # currently operating)
+        # NOTE: undefined endtime (i.e. device currently operating) is
+        # taken into account
         query = query.\
-            filter((orm.ChannelEpoch.endtime > sql_stream_epoch.starttime) |
-                   (orm.ChannelEpoch.endtime == None))  # noqa
+            filter(orm.epoch_ends_after(orm.ChannelEpoch.endtime,
+                                        sql_stream_epoch.starttime))
     if sql_stream_epoch.endtime:
         query = query.\
             filter(orm.ChannelEpoch.starttime < sql_stream_epoch.endtime)
 
+    box, located = spatial_constraints(
+        minlat=minlat, maxlat=maxlat, minlon=minlon, maxlon=maxlon,
+        latitude=latitude, longitude=longitude, minradius=minradius,
+        maxradius=maxradius)
+    query = _filter_spatial(session, query, *box)
+
+    return routes_from_rows(_filter_located(query.all(), located, 9),
+                            level=level)
+
+# find_streamepochs_and_routes ()
+
+def find_streamepochs_and_routes_batch(session, stream_epochs, service,
+                                       level='channel', minlat=-90.,
+                                       maxlat=90., minlon=-180., maxlon=180.,
+                                       latitude=None, longitude=None,
+                                       minradius=0., maxradius=180.,
+                                       like_escape='/'):
+    """
+    Return routes for multiple stream epochs by means of set-based queries.
+
+    The stream epochs are loaded into a temporary table which is joined with
+    the routing tables. Rows are tagged with the originating request line.
+    Stream epochs with exact network and station codes are resolved by
+    equality (i.e. index lookups), the remaining ones by means of `SQL LIKE`
+    i.e. at most two queries are issued.
+
+    :param session: SQLAlchemy session
+    :type session: :py:class:`sqlalchemy.orm.sessionSession`
+    :param list stream_epochs: List of
+        :py:class:`eidangservices.utils.sncl.StreamEpoch` objects
+    :param str service: String specifying the webservice
+
+    See :py:func:`find_streamepochs_and_routes` for the remaining parameters.
+
+    :return: List of routes lists. The routes at position *i* correspond to
+        :code:`stream_epochs[i]`, i.e. the result equals
+        :code:`[find_streamepochs_and_routes(session, se, ...) for se in
+        stream_epochs]`.
+    :rtype: list
+    """
+    logger.debug('Processing batch request for {} stream epochs.'.format(
+        len(stream_epochs)))
+
+    values = []
+    for line, stream_epoch in enumerate(stream_epochs):
+        sql_stream_epoch = stream_epoch.fdsnws_to_sql_wildcards()
+        exact = not (_has_wildcards(stream_epoch.network) or
+                     _has_wildcards(stream_epoch.station))
+        values.append({
+            'line': line,
+            'exact': exact,
+            'network': (stream_epoch.network if exact else
+                        sql_stream_epoch.network),
+            'station': (stream_epoch.station if exact else
+                        sql_stream_epoch.station),
+            'location': sql_stream_epoch.location,
+            'channel': sql_stream_epoch.channel,
+            # NOTE: Undefined temporal constraints are replaced by
+            # boundaries such that no NULL comparisons are required.
+            'starttime': stream_epoch.starttime or datetime.datetime.min,
+            'endtime': stream_epoch.endtime or datetime.datetime.max})
+
+    box, located = spatial_constraints(
+        minlat=minlat, maxlat=maxlat, minlon=minlon, maxlon=maxlon,
+        latitude=latitude, longitude=longitude, minradius=minradius,
+        maxradius=maxradius)
+
+    req = _request_table
+    conn = session.connection()
+    req.create(conn, checkfirst=True)
+    try:
+        if values:
+            conn.execute(req.insert(), values)
+
+        rows = collections.defaultdict(list)
+        for exact in set(v['exact'] for v in values):
+            if exact:
+                codes = and_(orm.Network.name == req.c.network,
+                             orm.Station.name == req.c.station)
+            else:
+                codes = and_(
+                    orm.Network.name.like(req.c.network, escape=like_escape),
+                    orm.Station.name.like(req.c.station, escape=like_escape))
+
+            query = session.query(req.c.line,
+                                  orm.ChannelEpoch.channel,
+                                  orm.ChannelEpoch.locationcode,
+                                  orm.ChannelEpoch.starttime,
+                                  orm.ChannelEpoch.endtime,
+                                  orm.Network.name,
+                                  orm.Station.name,
+                                  orm.Routing.starttime,
+                                  orm.Routing.endtime,
+                                  orm.Endpoint.url,
+                                  orm.StationEpoch.latitude,
+                                  orm.StationEpoch.longitude).\
+                select_from(orm.ChannelEpoch).\
+                join(orm.Routing).\
+                join(orm.Endpoint).\
+                join(orm.Service).\
+                join(orm.Network).\
+                join(orm.Station).\
+                join(orm.StationEpoch).\
+                join(req, and_(
+                    req.c.exact == exact,
+                    codes,
+                    orm.ChannelEpoch.channel.like(req.c.channel,
+                                                  escape=like_escape),
+                    orm.ChannelEpoch.locationcode.like(req.c.location,
+                                                       escape=like_escape),
+                    orm.epoch_ends_after(orm.ChannelEpoch.endtime,
+                                         req.c.starttime),
+                    orm.ChannelEpoch.starttime < req.c.endtime)).\
+                filter(orm.Service.name == service)
+
+            query = _filter_spatial(session, query, *box)
+            for row in _filter_located(query, located, 10):
+                rows[row[0]].append(row[1:])
+    finally:
+        req.drop(conn)
+
+    return [routes_from_rows(rows[line], level=level)
+            for line in range(len(stream_epochs))]
+
+# find_streamepochs_and_routes_batch ()
+
+def spatial_constraints(minlat=-90., maxlat=90., minlon=-180., maxlon=180.,
+                        latitude=None, longitude=None, minradius=0.,
+                        maxradius=180.):
+    """
+    Combine rectangular and circular spatial constraints.
+
+    :returns: Tuple of the rectangular bounding box :code:`(minlat, maxlat,
+        minlon, maxlon)` and a function :code:`located(lat, lon)` testing the
+        exact constraints. The function is :code:`None` if the constraints
+        cover the globe.
+    :rtype: tuple
+    """
+    circular = not (latitude is None or longitude is None or
+                    (minradius <= 0. and maxradius >= 180.))
+    if circular:
+        _minlat, _maxlat, _minlon, _maxlon = circle_to_box(
+            latitude, longitude, maxradius)
+        minlat, maxlat = max(minlat, _minlat), min(maxlat, _maxlat)
+        minlon, maxlon = max(minlon, _minlon), min(maxlon, _maxlon)
+
+    box = (minlat, maxlat, minlon, maxlon)
+    if not circular and is_global(*box):
+        return box, None
+
+    def located(lat, lon):
+        return (minlat <= lat <= maxlat and minlon <= lon <= maxlon and
+                (not circular or
+                 minradius <= great_circle_distance(
+                     latitude, longitude, lat, lon) <= maxradius))
+
+    return box, located
+
+# spatial_constraints ()
+
+def is_global(minlat, maxlat, minlon, maxlon):
+    """
+    Return :code:`True` if the rectangular spatial constraint covers the
+    globe.
+    """
+    return (minlat <= -90. and maxlat >= 90. and
+            minlon <= -180. and maxlon >= 180.)
+
+# is_global ()
+
+def circle_to_box(latitude, longitude, radius):
+    """
+    Compute the bounding box of a spherical circle.
+
+    :param float latitude: Latitude of the circle's center
+    :param float longitude: Longitude of the circle's center
+    :param float radius: Radius in degrees
+    :returns: Bounding box :code:`(minlat, maxlat, minlon, maxlon)`
+    :rtype: tuple
+    """
+    minlat = latitude - radius
+    maxlat = latitude + radius
+    if minlat <= -90. or maxlat >= 90.:
+        # NOTE: The circle includes a pole.
+        return max(minlat, -90.), min(maxlat, 90.), -180., 180.
+
+    dlon = math.degrees(math.asin(min(1., math.sin(math.radians(radius)) /
+                                      math.cos(math.radians(latitude)))))
+    minlon = longitude - dlon
+    maxlon = longitude + dlon
+    if minlon < -180. or maxlon > 180.:
+        # XXX: Circles crossing the antimeridian are not split.
+        minlon, maxlon = -180., 180.
+
+    return minlat, maxlat, minlon, maxlon
+
+# circle_to_box ()
+
+def great_circle_distance(lat1, lon1, lat2, lon2):
+    """
+    Return the great circle distance in degrees (haversine formula).
+    """
+    lat1, lon1, lat2, lon2 = (math.radians(v)
+                              for v in (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2.) ** 2 +
+         math.cos(lat1) * math.cos(lat2) *
+         math.sin((lon2 - lon1) / 2.) ** 2)
+    return math.degrees(2. * math.asin(min(1., math.sqrt(a))))
+
+# great_circle_distance ()
+
+def has_spatial_index(session):
+    """
+    Return :code:`True` if the routing DB provides a spatial index.
+    """
+    if session.bind.dialect.name != 'sqlite':
+        return False
+
+    return session.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type='table' AND "
+        "name=:name", {'name': orm.STATIONEPOCH_RTREE}).scalar() > 0
+
+# has_spatial_index ()
+
+def _filter_spatial(session, query, minlat, maxlat, minlon, maxlon):
+    """
+    Apply a rectangular spatial constraint to a query joining
+    :py:class:`eidangservices.stationlite.engine.orm.StationEpoch`. If
+    available, the spatial index is used.
+
+    .. note::
+
+        The constraint applied is not necessarily exact. Rows must be
+        filtered additionally by means of the function returned by
+        :py:func:`spatial_constraints`.
+    """
+    if is_global(minlat, maxlat, minlon, maxlon):
+        return query
+
+    if not has_spatial_index(session):
+        return query.\
+            filter((orm.StationEpoch.latitude >= minlat) &
+                   (orm.StationEpoch.latitude <= maxlat)).\
+            filter((orm.StationEpoch.longitude >= minlon) &
+                   (orm.StationEpoch.longitude <= maxlon))
+
+    # NOTE: The R*Tree stores 32 bit floating point values which are
+    # rounded outwards. Hence, the index is queried for overlapping boxes.
+    # The exact constraint is not expressed in SQL, such that the query
+    # planner does not prefer the B-tree indexes on the StationEpoch columns.
+    rtree = orm.StationEpochRTree
+    return query.\
+        join(rtree, rtree.c.id == orm.StationEpoch.oid).\
+        filter(rtree.c.maxlat >= minlat).\
+        filter(rtree.c.minlat <= maxlat).\
+        filter(rtree.c.maxlon >= minlon).\
+        filter(rtree.c.minlon <= maxlon)
+
+# _filter_spatial ()
+
+def _filter_located(rows, located, pos):
+    """
+    Filter rows regarding exact spatial constraints. Latitude and longitude
+    are expected at :code:`row[pos]` and :code:`row[pos + 1]`.
+    """
+    if located is None:
+        return rows
+    return (row for row in rows if located(row[pos], row[pos + 1]))
+
+# _filter_located ()
+
+def _has_wildcards(code):
+    return (settings.FDSNWS_QUERY_WILDCARD_MULT_CHAR in code or
+            settings.FDSNWS_QUERY_WILDCARD_SINGLE_CHAR in code)
+
+# _has_wildcards ()
+
+def routes_from_rows(rows, level='channel'):
+    """
+    Create routes from routing rows.
+
+    :param rows: Iterable of tuples :code:`(channel, location,
+        channel_starttime, channel_endtime, network, station,
+        routing_starttime, routing_endtime, url)`. Additional items are
+        ignored.
+    :param str level: Optional `fdsnws-station` *level* parameter
+    :return: List of :py:class:`eidangservices.utils.Route` objects
+    :rtype: list
+    """
     routes = collections.defaultdict(StreamEpochsHandler)
 
-    for row in query.all():
-        #print('Query response: {0!r}'.format(row))
+    for row in rows:
         # NOTE(damb): Adjust epoch in case the ChannelEpoch is smaller than the
         # RoutingEpoch (regarding time constraints).
         starttime = row[2] if row[2] > row[6] else row[6]
@@ -220,7 +597,7 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
     return [utils.Route(url=url, streams=streams)
             for url, streams in routes.items()]
 
-# find_streamepochs_and_routes ()
+# routes_from_rows ()
 
 
 # ---- END OF <dbquery.py> ----
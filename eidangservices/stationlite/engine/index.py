@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <index.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/11        V0.1    Daniel Armbruster
+# =============================================================================
+"""
+In-memory routing index for the stationlite web service.
+
+The index answers the same queries as the functions from
+:py:mod:`eidangservices.stationlite.engine.dbquery` but without issuing SQL
+statements.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import bisect
+import logging
+import re
+import threading
+import time
+
+from sqlalchemy import func
+
+from eidangservices import settings
+from eidangservices.stationlite.engine import dbquery, orm
+
+
+logger = logging.getLogger('flask.app.stationlite.index')
+
+_PATTERNS_MAX = 1024
+_patterns = {}
+
+# ----------------------------------------------------------------------------
+def fingerprint(session):
+    """
+    Compute a fingerprint of the routing DB's current generation. The
+    fingerprint changes whenever the harvester commits (i.e. rows are
+    inserted, updated or removed).
+
+    :param session: SQLAlchemy session
+    :type session: :py:class:`sqlalchemy.orm.sessionSession`
+    :rtype: tuple
+    """
+    return tuple(
+        tuple(session.query(func.count(m.oid), func.max(m.lastseen)).one())
+        for m in (orm.ChannelEpoch, orm.Routing, orm.StationEpoch,
+                  orm.StreamEpoch))
+
+# fingerprint ()
+
+def _compile(pattern):
+    """
+    Compile a FDSNWS code pattern (supporting the FDSNWS wildcard characters)
+    into a matching function. Results are memoized.
+    """
+    try:
+        return _patterns[pattern]
+    except KeyError:
+        pass
+
+    regex = re.escape(pattern).\
+        replace(re.escape(settings.FDSNWS_QUERY_WILDCARD_MULT_CHAR), '.*').\
+        replace(re.escape(settings.FDSNWS_QUERY_WILDCARD_SINGLE_CHAR), '.')
+
+    if len(_patterns) >= _PATTERNS_MAX:
+        _patterns.clear()
+    _patterns[pattern] = re.compile('(?:{})\\Z'.format(regex)).match
+
+    return _patterns[pattern]
+
+# _compile ()
+
+def _match_keys(d, pattern):
+    """
+    Yield the values of :code:`d` with keys matching the FDSNWS code pattern
+    :code:`pattern`.
+    """
+    if (settings.FDSNWS_QUERY_WILDCARD_MULT_CHAR not in pattern and
+            settings.FDSNWS_QUERY_WILDCARD_SINGLE_CHAR not in pattern):
+        try:
+            yield pattern, d[pattern]
+        except KeyError:
+            pass
+        return
+
+    match = _compile(pattern)
+    for k, v in d.items():
+        if match(k):
+            yield k, v
+
+# _match_keys ()
+
+# ----------------------------------------------------------------------------
+class RoutingIndex(object):
+    """
+    In-memory routing index.
+
+    Routed channel epochs are organized per service by means of a code trie
+    (:code:`network -> station -> rows`). A row is a compact tuple
+    :code:`(location, channel, channel_starttime, channel_endtime,
+    routing_starttime, routing_endtime, url_index, station_ref)`. Station
+    epoch coordinates are kept sorted by latitude such that spatial
+    constraints are resolved by means of a binary search.
+
+    Use :py:meth:`load` to create an index from the routing DB.
+    """
+
+    def __init__(self, fingerprint=None):
+        self.fingerprint = fingerprint
+
+        self._urls = []
+        self._services = {}
+        self._vnets = {}
+
+        # spatial index
+        self._lats = []
+        self._coordinates = []
+        self._stations = frozenset()
+
+    # __init__ ()
+
+    @classmethod
+    def load(cls, session):
+        """
+        Load the routing index from the routing DB.
+
+        :param session: SQLAlchemy session
+        :type session: :py:class:`sqlalchemy.orm.sessionSession`
+        :rtype: :py:class:`RoutingIndex`
+        """
+        t_start = time.time()
+        index = cls(fingerprint=fingerprint(session))
+
+        urls = {}
+        query = session.query(orm.Service.name,
+                              orm.Network.name,
+                              orm.Station.name,
+                              orm.ChannelEpoch.station_ref,
+                              orm.ChannelEpoch.locationcode,
+                              orm.ChannelEpoch.channel,
+                              orm.ChannelEpoch.starttime,
+                              orm.ChannelEpoch.endtime,
+                              orm.Routing.starttime,
+                              orm.Routing.endtime,
+                              orm.Endpoint.url).\
+            select_from(orm.ChannelEpoch).\
+            join(orm.Routing).\
+            join(orm.Endpoint).\
+            join(orm.Service).\
+            join(orm.Network).\
+            join(orm.Station)
+
+        num_rows = 0
+        for (service, net, sta, sta_ref, loc, cha, cha_start, cha_end,
+             routing_start, routing_end, url) in query:
+            try:
+                url_idx = urls[url]
+            except KeyError:
+                url_idx = urls[url] = len(index._urls)
+                index._urls.append(url)
+
+            index._services.setdefault(service, {}).\
+                setdefault(net, {}).\
+                setdefault(sta, []).append(
+                    (loc, cha, cha_start, cha_end, routing_start, routing_end,
+                     url_idx, sta_ref))
+            num_rows += 1
+
+        index._coordinates = sorted(
+            tuple(row) for row in session.query(orm.StationEpoch.latitude,
+                                                orm.StationEpoch.longitude,
+                                                orm.StationEpoch.station_ref))
+        index._lats = [c[0] for c in index._coordinates]
+        index._stations = frozenset(c[2] for c in index._coordinates)
+
+        query = session.query(orm.StreamEpochGroup.name,
+                              orm.Network.name,
+                              orm.Station.name,
+                              orm.StreamEpoch.location,
+                              orm.StreamEpoch.channel,
+                              orm.StreamEpoch.starttime,
+                              orm.StreamEpoch.endtime).\
+            select_from(orm.StreamEpoch).\
+            join(orm.StreamEpochGroup).\
+            join(orm.Network).\
+            join(orm.Station)
+
+        for row in query:
+            index._vnets.setdefault(row[0], []).append(tuple(row[1:]))
+
+        logger.info(
+            'Routing index loaded ({} routed channel epochs, {} endpoints, '
+            '{} virtual networks; {:.3f}s).'.format(
+                num_rows, len(index._urls), len(index._vnets),
+                time.time() - t_start))
+
+        return index
+
+    # load ()
+
+    def resolve_vnetwork(self, stream_epoch):
+        """
+        Resolve a stream epoch regarding virtual networks.
+
+        See :py:func:`eidangservices.stationlite.engine.dbquery.\
+resolve_vnetwork`.
+        """
+        if not dbquery.is_vnetwork_candidate(stream_epoch):
+            return []
+
+        match_sta = _compile(stream_epoch.station)
+        match_loc = _compile(stream_epoch.location)
+        match_cha = _compile(stream_epoch.channel)
+        starttime = stream_epoch.starttime
+        endtime = stream_epoch.endtime
+
+        def rows():
+            for _, vnet_rows in _match_keys(self._vnets, stream_epoch.network):
+                for row in vnet_rows:
+                    if starttime and not (row[5] is None or
+                                          row[5] > starttime):
+                        continue
+                    if endtime and not row[4] < endtime:
+                        continue
+                    if (match_sta(row[1]) and match_loc(row[2]) and
+                            match_cha(row[3])):
+                        yield row
+
+        return dbquery.vnetwork_stream_epochs_from_rows(rows(), stream_epoch)
+
+    # resolve_vnetwork ()
+
+    def located_stations(self, minlat=-90., maxlat=90., minlon=-180.,
+                         maxlon=180., located=None):
+        """
+        Return the references of stations with at least a single station
+        epoch located within the spatial constraints.
+
+        :param located: Optional function :code:`located(lat, lon)` testing
+            an additional (e.g. circular) spatial constraint
+        :rtype: set
+        """
+        if located is None and dbquery.is_global(minlat, maxlat, minlon,
+                                                 maxlon):
+            return self._stations
+
+        lo = bisect.bisect_left(self._lats, minlat)
+        hi = bisect.bisect_right(self._lats, maxlat)
+        return set(sta_ref for lat, lon, sta_ref in self._coordinates[lo:hi]
+                   if minlon <= lon <= maxlon and
+                   (located is None or located(lat, lon)))
+
+    # located_stations ()
+
+    def find_streamepochs_and_routes(self, stream_epoch, service,
+                                     level='channel', minlat=-90.,
+                                     maxlat=90., minlon=-180., maxlon=180.,
+                                     latitude=None, longitude=None,
+                                     minradius=0., maxradius=180.):
+        """
+        Return routes for a given stream epoch.
+
+        See :py:func:`eidangservices.stationlite.engine.dbquery.\
+find_streamepochs_and_routes`.
+        """
+        match_loc = _compile(stream_epoch.location)
+        match_cha = _compile(stream_epoch.channel)
+        starttime = stream_epoch.starttime
+        endtime = stream_epoch.endtime
+
+        box, located = dbquery.spatial_constraints(
+            minlat=minlat, maxlat=maxlat, minlon=minlon, maxlon=maxlon,
+            latitude=latitude, longitude=longitude, minradius=minradius,
+            maxradius=maxradius)
+        sta_refs = self.located_stations(*box, located=located)
+
+        def rows():
+            networks = self._services.get(service, {})
+            for net, stations in _match_keys(networks, stream_epoch.network):
+                for sta, sta_rows in _match_keys(stations,
+                                                 stream_epoch.station):
+                    for (loc, cha, cha_start, cha_end, routing_start,
+                         routing_end, url_idx, sta_ref) in sta_rows:
+                        if starttime and not (cha_end is None or
+                                              cha_end > starttime):
+                            continue
+                        if endtime and not cha_start < endtime:
+                            continue
+                        if not (sta_ref in sta_refs and match_loc(loc) and
+                                match_cha(cha)):
+                            continue
+
+                        yield (cha, loc, cha_start, cha_end, net, sta,
+                               routing_start, routing_end,
+                               self._urls[url_idx])
+
+        return dbquery.routes_from_rows(rows(), level=level)
+
+    # find_streamepochs_and_routes ()
+
+# class RoutingIndex
+
+
+class RoutingIndexManager(object):
+    """
+    Provides the current :py:class:`RoutingIndex`.
+
+    At most every :code:`check_interval` seconds the routing DB's generation
+    is checked. If the harvester committed a new generation the index is
+    reloaded by the requesting thread while concurrent requests keep on using
+    the previous index. Finally, the index is swapped atomically.
+
+    :param float check_interval: Minimum interval in seconds between checks
+        for a new generation
+    """
+
+    def __init__(self, check_interval=30):
+        self.check_interval = check_interval
+
+        self._index = None
+        self._lock = threading.Lock()
+        self._last_check = None
+
+    # __init__ ()
+
+    def get(self, session):
+        """
+        Return the current routing index.
+
+        :param session: SQLAlchemy session
+        :type session: :py:class:`sqlalchemy.orm.sessionSession`
+        :rtype: :py:class:`RoutingIndex`
+        """
+        index = self._index
+        if index is None:
+            # NOTE: Block until the initial index is loaded.
+            with self._lock:
+                if self._index is None:
+                    self._index = RoutingIndex.load(session)
+                    self._last_check = time.time()
+                return self._index
+
+        if (time.time() - self._last_check >= self.check_interval and
+                self._lock.acquire(False)):
+            try:
+                self._last_check = time.time()
+                if fingerprint(session) != index.fingerprint:
+                    logger.info('New routing DB generation detected.')
+                    self._index = RoutingIndex.load(session)
+            finally:
+                self._lock.release()
+
+        return self._index
+
+    # get ()
+
+# class RoutingIndexManager
+
+
+# ---- END OF <index.py> ----
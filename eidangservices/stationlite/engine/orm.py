@@ -34,9 +34,15 @@ from builtins import * # noqa
 import datetime
 
 from sqlalchemy import (Column, Integer, Float, String, Unicode, DateTime,
-                        ForeignKey)
+                        ForeignKey, Index, MetaData, Table, event, literal)
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declared_attr, declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import ClauseElement, ColumnElement
+from sqlalchemy.types import NullType, TypeDecorator
+
+from eidangservices.utils.error import Error
 
 # -----------------------------------------------------------------------------
 LENGTH_CHANNEL_CODE = 3
@@ -45,6 +51,202 @@ LENGTH_LOCATION_CODE = 2
 LENGTH_STD_CODE = 32
 LENGTH_URL = 256
 
+# NOTE: Epochs are optionally stored as integer microseconds since
+# 1970-01-01 (SQLite only). Such DBs are marked by means of the SQLite
+# *user_version* pragma. Open epochs (i.e. an undefined endtime) are stored as
+# EPOCH_OPEN instead of NULL.
+EPOCH_OPEN = 2 ** 63 - 1
+USER_VERSION_INTEGER_EPOCHS = 0x1
+
+_EPOCH_ORIGIN = datetime.datetime(1970, 1, 1)
+_DIALECT_ATTR_INTEGER_EPOCHS = 'stationlite_integer_epochs'
+
+
+class EpochStorageChanged(Error):
+    """The epoch storage of the DB was converted (integer epochs: {}). The
+    engine must be recreated."""
+
+# -----------------------------------------------------------------------------
+def datetime_to_epoch(dt):
+    """
+    Convert a :py:class:`datetime.datetime` object into integer microseconds.
+    :code:`None` is converted into :py:data:`EPOCH_OPEN`.
+    """
+    if dt is None:
+        return EPOCH_OPEN
+    delta = dt - _EPOCH_ORIGIN
+    return ((delta.days * 86400 + delta.seconds) * 1000000 +
+            delta.microseconds)
+
+# datetime_to_epoch ()
+
+def epoch_to_datetime(epoch):
+    """
+    Convert integer microseconds into a :py:class:`datetime.datetime` object.
+    :py:data:`EPOCH_OPEN` is converted into :code:`None`.
+    """
+    if epoch is None or epoch == EPOCH_OPEN:
+        return None
+    return _EPOCH_ORIGIN + datetime.timedelta(microseconds=epoch)
+
+# epoch_to_datetime ()
+
+def uses_integer_epochs(dialect):
+    """
+    Return :code:`True` if epochs are stored as integers for the DB the
+    dialect is bound to.
+    """
+    return getattr(dialect, _DIALECT_ATTR_INTEGER_EPOCHS, False)
+
+# uses_integer_epochs ()
+
+
+def detect_integer_epochs(dbapi_connection):
+    """
+    Detect the epoch storage of a (SQLite) DB by means of a DBAPI
+    connection.
+
+    :rtype: bool
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA user_version')
+        user_version = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    return bool(user_version & USER_VERSION_INTEGER_EPOCHS)
+
+# detect_integer_epochs ()
+
+
+@event.listens_for(Engine, 'engine_connect')
+def _configure_epoch_storage(connection, branch):
+    # NOTE: The epoch storage is detected when the engine connects for the
+    # first time, i.e. before any statement is compiled. Since bind and
+    # result processors are cached per dialect, the storage is verified
+    # whenever a connection is checked out. Hence, a DB converted (or
+    # replaced by a DB using a different storage) while the engine is in use
+    # is not decoded with the wrong type.
+    dialect = connection.dialect
+    if branch:
+        return
+    if dialect.name != 'sqlite':
+        setattr(dialect, _DIALECT_ATTR_INTEGER_EPOCHS, False)
+        return
+
+    # XXX: Use the DBAPI connection. A connection of a connectionless
+    # execution would be closed with the result.
+    integer_epochs = detect_integer_epochs(connection.connection)
+    if not hasattr(dialect, _DIALECT_ATTR_INTEGER_EPOCHS):
+        setattr(dialect, _DIALECT_ATTR_INTEGER_EPOCHS, integer_epochs)
+    elif integer_epochs != uses_integer_epochs(dialect):
+        connection.close()
+        raise EpochStorageChanged(integer_epochs)
+
+# _configure_epoch_storage ()
+
+
+class EpochDateTime(TypeDecorator):
+    """
+    :py:class:`sqlalchemy.types.DateTime` transparently stored either as
+    ISO string (default) or as integer microseconds.
+
+    Comparing an epoch column to :code:`None` tests for an open epoch
+    regardless of the storage.
+    """
+    impl = DateTime
+
+    class comparator_factory(DateTime.Comparator):
+
+        def __eq__(self, other):
+            if other is None:
+                return epoch_is_open(self.expr)
+            return super(EpochDateTime.comparator_factory,
+                         self).__eq__(other)
+
+        def __ne__(self, other):
+            if other is None:
+                return ~epoch_is_open(self.expr)
+            return super(EpochDateTime.comparator_factory,
+                         self).__ne__(other)
+
+    # class comparator_factory
+
+    def bind_processor(self, dialect):
+        if uses_integer_epochs(dialect):
+            return datetime_to_epoch
+        return super(EpochDateTime, self).bind_processor(dialect)
+
+    def result_processor(self, dialect, coltype):
+        if uses_integer_epochs(dialect):
+            return epoch_to_datetime
+        return super(EpochDateTime, self).result_processor(dialect, coltype)
+
+# class EpochDateTime
+
+
+class epoch_is_open(ColumnElement):
+    """
+    SQL expression testing if an epoch is open (i.e. the endtime is
+    undefined).
+    """
+    type = NullType()
+
+    def __init__(self, endtime):
+        self.endtime = endtime
+
+    @property
+    def _from_objects(self):
+        return self.endtime._from_objects
+
+# class epoch_is_open
+
+
+class epoch_ends_after(ColumnElement):
+    """
+    SQL expression testing if an epoch ends after :code:`value`, i.e.
+    :code:`endtime > value OR endtime IS NULL`. With integer epochs the
+    expression is rendered without the :code:`OR` branch.
+
+    :param endtime: Epoch endtime column
+    :param value: Column or :py:class:`datetime.datetime` object
+    """
+    type = NullType()
+
+    def __init__(self, endtime, value):
+        self.endtime = endtime
+        if not isinstance(value, ClauseElement):
+            value = literal(value, EpochDateTime())
+        self.value = value
+
+    @property
+    def _from_objects(self):
+        return self.endtime._from_objects + self.value._from_objects
+
+# class epoch_ends_after
+
+
+@compiles(epoch_is_open)
+def _compile_epoch_is_open(element, compiler, **kwargs):
+    endtime = compiler.process(element.endtime, **kwargs)
+    if uses_integer_epochs(compiler.dialect):
+        return '({} = {})'.format(endtime, EPOCH_OPEN)
+    return '({} IS NULL)'.format(endtime)
+
+# _compile_epoch_is_open ()
+
+
+@compiles(epoch_ends_after)
+def _compile_epoch_ends_after(element, compiler, **kwargs):
+    endtime = compiler.process(element.endtime, **kwargs)
+    value = compiler.process(element.value, **kwargs)
+    if uses_integer_epochs(compiler.dialect):
+        # NOTE: EPOCH_OPEN is larger than any other epoch.
+        return '({} > {})'.format(endtime, value)
+    return '({0} > {1} OR {0} IS NULL)'.format(endtime, value)
+
+# _compile_epoch_ends_after ()
+
 # -----------------------------------------------------------------------------
 class Base(object):
 
@@ -61,11 +263,11 @@ class EpochMixin(object):
 
     @declared_attr
     def starttime(cls):
-        return Column(DateTime, nullable=False, index=True)
+        return Column(EpochDateTime, nullable=False, index=True)
 
     @declared_attr
     def endtime(cls):
-        return Column(DateTime, index=True)
+        return Column(EpochDateTime, index=True)
 
 # class EpochMixin
 
@@ -121,6 +323,13 @@ class ChannelEpoch(EpochMixin, LastSeenMixin, ORMBase):
     locationcode = Column(String(LENGTH_LOCATION_CODE), nullable=False,
                           index=True)
 
+    # NOTE: Covering index for the routing query's typical access
+    # pattern (i.e. network, station, channel, location, epoch).
+    __table_args__ = (
+        Index('ix_channelepoch_station_network_cha_loc_epoch',
+              'station_ref', 'network_ref', 'channel', 'locationcode',
+              'starttime', 'endtime'),)
+
     network = relationship('Network',
                            back_populates='channel_epochs')
     station = relationship('Station',
@@ -161,11 +370,85 @@ class StationEpoch(EpochMixin, LastSeenMixin, ORMBase):
     longitude = Column(Float, nullable=False, index=True)
     latitude = Column(Float, nullable=False, index=True)
 
+    __table_args__ = (
+        Index('ix_stationepoch_station_coordinates',
+              'station_ref', 'latitude', 'longitude'),)
+
     station = relationship('Station', back_populates='station_epochs')
 
 # class StationEpoch
 
 
+# NOTE: SQLite R*Tree spatial index on the station epochs' coordinates.
+# The virtual table is not part of ORMBase.metadata since it is created by
+# means of DDL (see create_spatial_index ()). It is kept in sync with the
+# stationepoch table by triggers, i.e. while harvesting.
+STATIONEPOCH_RTREE = 'stationepoch_rtree'
+
+StationEpochRTree = Table(
+    STATIONEPOCH_RTREE, MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('minlat', Float),
+    Column('maxlat', Float),
+    Column('minlon', Float),
+    Column('maxlon', Float))
+
+_SPATIAL_INDEX_DDL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} '
+    'USING rtree(id, minlat, maxlat, minlon, maxlon)',
+    'CREATE TRIGGER IF NOT EXISTS {rtree}_insert '
+    'AFTER INSERT ON {table} BEGIN '
+    'INSERT INTO {rtree} VALUES (new.oid, new.latitude, new.latitude, '
+    'new.longitude, new.longitude); END',
+    'CREATE TRIGGER IF NOT EXISTS {rtree}_update '
+    'AFTER UPDATE OF latitude, longitude ON {table} BEGIN '
+    'UPDATE {rtree} SET minlat=new.latitude, maxlat=new.latitude, '
+    'minlon=new.longitude, maxlon=new.longitude WHERE id=new.oid; END',
+    'CREATE TRIGGER IF NOT EXISTS {rtree}_delete '
+    'AFTER DELETE ON {table} BEGIN '
+    'DELETE FROM {rtree} WHERE id=old.oid; END',
+    # populate the index for station epochs already available
+    'INSERT INTO {rtree} SELECT oid, latitude, latitude, longitude, '
+    'longitude FROM {table} WHERE oid NOT IN (SELECT id FROM {rtree})')
+
+
+def create_spatial_index(bind):
+    """
+    Create the spatial index (including the triggers keeping it in sync) for
+    station epochs. The index is only available for SQLite.
+
+    :param bind: SQLAlchemy engine or connection
+    :returns: :code:`True` if the dialect supports a spatial index else
+        :code:`False`
+    :rtype: bool
+    """
+    if bind.dialect.name != 'sqlite':
+        return False
+
+    for ddl in _SPATIAL_INDEX_DDL:
+        bind.execute(ddl.format(rtree=STATIONEPOCH_RTREE,
+                                table=StationEpoch.__tablename__))
+    return True
+
+# create_spatial_index ()
+
+
+@event.listens_for(StationEpoch.__table__, 'after_create')
+def _create_spatial_index(target, connection, **kwargs):
+    create_spatial_index(connection)
+
+# _create_spatial_index ()
+
+
+@event.listens_for(StationEpoch.__table__, 'before_drop')
+def _drop_spatial_index(target, connection, **kwargs):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(
+            'DROP TABLE IF EXISTS {}'.format(STATIONEPOCH_RTREE))
+
+# _drop_spatial_index ()
+
+
 class Routing(EpochMixin, LastSeenMixin, ORMBase):
 
     channel_epoch_ref = Column(Integer, ForeignKey('channelepoch.oid'),
@@ -173,6 +456,10 @@ class Routing(EpochMixin, LastSeenMixin, ORMBase):
     endpoint_ref = Column(Integer, ForeignKey('endpoint.oid'),
                           index=True)
 
+    __table_args__ = (
+        Index('ix_routing_channelepoch_endpoint_epoch',
+              'channel_epoch_ref', 'endpoint_ref', 'starttime', 'endtime'),)
+
     channel_epoch = relationship('ChannelEpoch', back_populates='endpoints')
     endpoint = relationship('Endpoint', back_populates='channel_epochs')
 
@@ -240,6 +527,11 @@ class StreamEpoch(EpochMixin, LastSeenMixin, ORMBase):
     location = Column(String(LENGTH_LOCATION_CODE), nullable=False,
                       index=True)
 
+    __table_args__ = (
+        Index('ix_streamepoch_group_station_network_cha_loc_epoch',
+              'stream_epoch_group_ref', 'station_ref', 'network_ref',
+              'channel', 'location', 'starttime', 'endtime'),)
+
     station = relationship('Station',
                            back_populates='stream_epochs')
     network = relationship('Network',
@@ -256,4 +548,23 @@ class StreamEpoch(EpochMixin, LastSeenMixin, ORMBase):
 # class StreamEpoch
 
 
+class HTTPValidator(LastSeenMixin, ORMBase):
+    """
+    HTTP validators (and the content hash) of a resource harvested. Used for
+    conditional harvesting.
+    """
+    url = Column(String(LENGTH_URL), nullable=False, unique=True)
+    etag = Column(String(LENGTH_STD_CODE * 4))
+    last_modified = Column(String(LENGTH_STD_CODE))
+    content_hash = Column(String(64))
+    # start of the harvesting run the resource was processed the last time
+    harvested = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return ('<HTTPValidator(url=%s, etag=%s, last_modified=%s)>' %
+                (self.url, self.etag, self.last_modified))
+
+# class HTTPValidator
+
+
 # ---- END OF <orm.py> ----
@@ -32,31 +32,40 @@ from __future__ import (absolute_import, division, print_function,
 
 from builtins import * # noqa
 
+import collections
 import datetime
+import fnmatch
 import functools
 import logging
+import queue
 import sys
+import threading
+import time
 import traceback
 import warnings
 
+from multiprocessing.pool import ThreadPool
+
 import requests
 
 from fasteners import InterProcessLock
 from lxml import etree
-from obspy import read_inventory, UTCDateTime
-from sqlalchemy import inspect
+from obspy import UTCDateTime
+from sqlalchemy import bindparam, inspect, select
 from sqlalchemy.orm.exc import MultipleResultsFound
 from sqlalchemy.exc import OperationalError
 
 from eidangservices import settings
 from eidangservices.stationlite import __version__
 from eidangservices.stationlite.engine import db, orm
-from eidangservices.stationlite.misc import db_engine, node_generator
+from eidangservices.stationlite.harvest import stationxml
+from eidangservices.stationlite.misc import (db_engine, node_generator,
+                                             positive_int)
 from eidangservices.utils.app import CustomParser, App, AppError
 from eidangservices.utils.error import Error, ExitCodes
 from eidangservices.utils.sncl import Stream, StreamEpoch
-from eidangservices.utils.request import (binary_request, RequestsError,
-                                          NoContent)
+from eidangservices.utils.request import (conditional_request, RequestsError,
+                                          NoContent, NotModified, Validators)
 
 # TODO(damb):
 #   - fix *cached_services* issue
@@ -98,10 +107,17 @@ class Harvester(object):
     class IntegrityError(HarvesterError):
         """IntegrityError ({})."""
 
-    def __init__(self, node_id, url_routing_config):
+    def __init__(self, node_id, url_routing_config, validators=None):
         self.node_id = node_id
         self._url_config = url_routing_config
         self._config = None
+        # NOTE: Validators of the resources harvested previously (see
+        # load_validators()). If None, conditional harvesting is disabled.
+        self._validators = validators
+        # validators of the resources fetched
+        self.validators = {}
+        self.config_unchanged = False
+        self.stats = collections.Counter()
 
         self.logger = logging.getLogger(self.LOGGER)
 
@@ -118,23 +134,189 @@ class Harvester(object):
         # proxy for fetching the config from the EIDA node
         if self._config is None:
             req = functools.partial(requests.get, self.url)
-            with binary_request(req) as resp:
+            with conditional_request(req) as (resp, validators):
                 self._config = resp
 
+            self.validators[self.url] = validators
+            previous, _ = self.previous_validators(self.url)
+            self.config_unchanged = (
+                previous is not None and
+                previous.content_hash == validators.content_hash)
+
         return self._config
 
     # config ()
 
+    def previous_validators(self, url):
+        """
+        Return the validators of a resource harvested previously.
+
+        :param str url: URL of the resource
+        :returns: Tuple of the validators and the start of the harvesting
+            run the resource was processed the last time (i.e.
+            :code:`(None, None)` if not available or if conditional
+            harvesting is disabled)
+        """
+        if self._validators is None:
+            return None, None
+        return self._validators.get(url, (None, None))
+
+    # previous_validators ()
+
+    @staticmethod
+    def load_validators(session):
+        """
+        Load the validators of the resources harvested previously.
+
+        :param :cls:`sqlalchemy.orm.session.Session` session: SQLAlchemy
+            session
+        :returns: Dictionary mapping URLs to :code:`(validators, harvested)`
+            tuples
+        :rtype: dict
+        """
+        return dict(
+            (v.url, (Validators(etag=v.etag, last_modified=v.last_modified,
+                                content_hash=v.content_hash), v.harvested))
+            for v in session.query(orm.HTTPValidator))
+
+    # load_validators ()
+
+    def _store_validators(self, session, harvested):
+        """
+        Store the validators of the resources fetched.
+
+        :param :cls:`sqlalchemy.orm.session.Session` session: SQLAlchemy
+            session
+        :param harvested: Start of the harvesting run
+        :type harvested: :py:class:`datetime.datetime`
+        """
+        urls = list(self.validators)
+        available = {}
+        for i in range(0, len(urls), 500):
+            for v in session.query(orm.HTTPValidator).filter(
+                    orm.HTTPValidator.url.in_(urls[i:i + 500])):
+                available[v.url] = v
+
+        for url, validators in self.validators.items():
+            v = available.get(url)
+            if v is None:
+                v = orm.HTTPValidator(url=url)
+                session.add(v)
+
+            v.etag = validators.etag
+            v.last_modified = validators.last_modified
+            v.content_hash = validators.content_hash
+            v.harvested = harvested
+            self._update_lastseen(v)
+
+    # _store_validators ()
+
     @staticmethod
     def _update_lastseen(obj):
         obj.lastseen = datetime.datetime.utcnow()
 
-    def harvest(self, session):
+    def fetch(self):
+        """
+        Fetch the data to be harvested from the EIDA node. Implementations
+        must not access the DB.
+
+        :returns: Iterable of items to be passed to :py:meth:`harvest`
+        """
+        raise NotImplementedError
+
+    def harvest(self, session, items=None):
         raise NotImplementedError
 
 # class Harvester
 
 
+class PrefetchQueue(object):
+    """
+    Bounded queue decoupling fetching (i.e. network I/O, performed by a worker
+    thread) from harvesting (i.e. DB writes, performed by a single writer
+    thread) for a :py:class:`Harvester`.
+
+    Fetching errors are passed through and reraised when iterating over the
+    queue.
+
+    :param harvester: Harvester instance
+    :type harvester: :py:class:`Harvester`
+    :param int maxsize: Maximum number of prefetched items
+    """
+    TIMEOUT_PUT = 1
+
+    class _End(object):
+        """Sentinel indicating fetching is done."""
+
+        def __init__(self, err=None):
+            self.err = err
+
+    # class _End
+
+    def __init__(self, harvester,
+                 maxsize=settings.EIDA_STATIONLITE_HARVEST_PREFETCH_SIZE):
+        self.harvester = harvester
+        self._queue = queue.Queue(maxsize=maxsize)
+
+        self.time_fetch = 0.
+        self.time_wait = 0.
+
+    def fetch(self, canceled):
+        """
+        Fetch items by means of the harvester. Intended to be run by a worker
+        thread.
+
+        :param canceled: Event indicating the writer stopped consuming
+        :type canceled: :py:class:`threading.Event`
+        """
+        if canceled.is_set():
+            return
+
+        t_start = time.time()
+        end = self._End()
+        try:
+            for item in self.harvester.fetch():
+                if not self._put(item, canceled):
+                    return
+        except Exception as err:
+            end.err = err
+        finally:
+            self.time_fetch = time.time() - t_start
+
+        self._put(end, canceled)
+
+    # fetch ()
+
+    def __iter__(self):
+        while True:
+            t_start = time.time()
+            item = self._queue.get()
+            self.time_wait += time.time() - t_start
+
+            if isinstance(item, self._End):
+                if item.err is not None:
+                    raise item.err
+                return
+
+            yield item
+
+    # __iter__ ()
+
+    def _put(self, item, canceled):
+        while not canceled.is_set():
+            try:
+                self._queue.put(item, timeout=self.TIMEOUT_PUT)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    # _put ()
+
+# class PrefetchQueue
+
+
 class RoutingHarvester(Harvester):
     """
     Implementation of an harvester harvesting the routing information from an
@@ -155,17 +337,94 @@ class RoutingHarvester(Harvester):
     """
     STATION_TAG = 'station'
 
+    # NOTE: Marks the inventory of a route whose StationXML did not
+    # change since the previous harvesting run.
+    Unchanged = collections.namedtuple('Unchanged', ['url', 'harvested'])
+
     class StationXMLParsingError(Harvester.HarvesterError):
         """Error while parsing StationXML: ({})"""
 
-    def harvest(self, session):
-        """Harvest the routing configuration."""
+    def __init__(self, node_id, url_routing_config,
+                 stationxml_extractor='obspy', validators=None,
+                 coalesce=False):
+        super().__init__(node_id, url_routing_config, validators=validators)
+        self._extract_stationxml = stationxml.EXTRACTORS[
+            stationxml_extractor]
+        self._coalesce = coalesce
+
+    def fetch(self):
+        """
+        Fetch the routing configuration and resolve the routes by means of
+        the FDSN station services referenced. The DB is not accessed. Hence,
+        fetching may be performed by a worker thread.
+
+        If the harvester was configured to coalesce routes, the routes are
+        resolved by means of a single request per FDSN station service and
+        network code. The channel epochs returned are mapped back onto the
+        individual routes.
+
+        :returns: Generator of :code:`(stream, inventory, services)` tuples
+            where :code:`inventory` is a list of
+            :py:class:`eidangservices.stationlite.harvest.stationxml.Network`
+            objects and :code:`services` is a list of :code:`(service_tag,
+            endpoint_url, starttime, endtime)` tuples
+        """
+        self.logger.debug('Fetching routes for %s.' % self.node)
+        if not self._coalesce:
+            for stream, url, services in self._parse_routes():
+                inventory = self._resolve(url, stream)
+                if inventory is not None:
+                    self._count_route(inventory)
+                    yield stream, inventory, services
+            return
+
+        groups = collections.OrderedDict()
+        for stream, url, services in self._parse_routes():
+            groups.setdefault((url, stream.network), []).append(
+                (stream, services))
+
+        for (url, net), routes in groups.items():
+            if len(routes) == 1:
+                query_stream = routes[0][0]
+            else:
+                query_stream = Stream(network=net, station='*',
+                                      location='*', channel='*')
+
+            inventory = self._resolve(url, query_stream)
+            if inventory is None:
+                continue
+
+            for stream, services in routes:
+                if isinstance(inventory, self.Unchanged):
+                    _inventory = inventory
+                else:
+                    _inventory = self._filter_inventory(inventory, stream)
+                    if not _inventory:
+                        self.logger.debug(
+                            'No channel epochs available for %r.' % (stream, ))
+                        continue
+
+                self._count_route(_inventory)
+                yield stream, _inventory, services
+
+    # fetch ()
+
+    def _count_route(self, inventory):
+        self.stats['routes'] += 1
+        if isinstance(inventory, self.Unchanged):
+            self.stats['routes_unchanged'] += 1
 
+    def _parse_routes(self):
+        """
+        Parse the routing configuration.
+
+        :returns: Generator of :code:`(stream, url, services)` tuples where
+            :code:`url` is the URL of the route's FDSN station service
+        """
         route_tag = '{}route'.format(self.NS_ROUTINGXML)
         _cached_services = get_cached_services()
         _cached_services = ['{}{}'.format(self.NS_ROUTINGXML, s)
                             for s in _cached_services]
-        self.logger.debug('Harvesting routes for %s.' % self.node)
         # event driven parsing
         for event, route_element in etree.iterparse(self.config,
                                                     events=('end',),
@@ -174,11 +433,6 @@ class RoutingHarvester(Harvester):
             if event == 'end' and len(route_element):
 
                 stream = Stream.from_route_attrs(**dict(route_element.attrib))
-                attrs = dict(stream._asdict())
-                # create query parameters from stream attrs
-                query_params = '&'.join(['{}={}'.format(query_param, query_val)
-                                        for query_param, query_val in
-                                        attrs.items()])
 
                 # extract fdsn-station service url for each route
                 urls = set([
@@ -200,31 +454,7 @@ class RoutingHarvester(Harvester):
                         ('Missing <station></station> element for '
                          '{} ({}).'.format(route_element, urls)))
 
-                _url_fdsn_station = '{}?{}&level=channel'.format(
-                    urls.pop(), query_params)
-
-                # XXX(damb): For every single route resolve FDSN wildcards
-                # using the route's station service.
-                # XXX(damb): Use the station service's GET method since the
-                # POST method requires temporal constraints (both starttime and
-                # endtime).
-                # ----
-                self.logger.debug('Resolving routing: (Request: %r).' %
-                                  _url_fdsn_station)
-                nets = []
-                stas = []
-                chas = []
-                try:
-                    # TODO(damb): Request might be too large. Implement fix.
-                    req = functools.partial(requests.get, _url_fdsn_station)
-                    with binary_request(req) as station_xml:
-                        nets, stas, chas = \
-                            self._harvest_from_stationxml(session, station_xml)
-
-                except NoContent as err:
-                    self.logger.warning(str(err))
-                    continue
-
+                services = []
                 # NOTE(damb): currently only consider CACHED_SERVICEs
                 for service_element in route_element.iter(*_cached_services):
                     # only consider priority=1
@@ -242,15 +472,6 @@ class RoutingHarvester(Harvester):
                         raise self.RoutingConfigXMLParsingError(
                             "Missing 'address' attrib.")
 
-                    service = self._emerge_service(session, service_tag)
-                    endpoint = self._emerge_endpoint(session, endpoint_url,
-                                                     service)
-
-                    self.logger.debug('Processing routes for %r '
-                                      '(service=%s, endpoint=%s).' %
-                                      (stream, service_element.tag,
-                                       endpoint.url))
-
                     try:
                         routing_starttime = UTCDateTime(
                             service_element.get('start'),
@@ -265,50 +486,276 @@ class RoutingHarvester(Harvester):
                     except Exception as err:
                         raise self.RoutingConfigXMLParsingError(err)
 
-                    # configure routings
-                    for cha_epoch in chas:
+                    services.append((service_tag, endpoint_url,
+                                     routing_starttime, routing_endtime))
 
-                        if inspect(cha_epoch).deleted:
-                            # In case a orm.ChannelEpoch object is marked as
-                            # deleted but harvested within the same harvesting
-                            # run this is a strong hint for an integrity issue
-                            # within the FDSN station InventoryXML.
-                            msg = ('InventoryXML integrity issue for '
-                                   '{0!r}'.format(cha_epoch))
-                            warnings.warn(msg)
-                            self.logger.warning(msg)
-                            continue
+                yield stream, urls.pop(), services
 
-                        self.logger.debug(
-                            'Checking ChannelEpoch<->Endpoint relation '
-                            '{}<->{} ...'.format(cha_epoch, endpoint))
+    # _parse_routes ()
+
+    def _resolve(self, url, stream):
+        """
+        Resolve FDSN wildcards by means of an FDSN station service.
+
+        :param str url: URL of the FDSN station service
+        :param stream: Stream to be resolved
+        :type stream: :py:class:`eidangservices.utils.sncl.Stream`
+        :returns: Inventory, :py:class:`Unchanged` if the StationXML did not
+            change since the previous harvesting run or :code:`None` if no
+            data is available
+        """
+        # create query parameters from stream attrs
+        query_params = '&'.join(['{}={}'.format(query_param, query_val)
+                                 for query_param, query_val in
+                                 stream._asdict().items()])
+        _url_fdsn_station = '{}?{}&level=channel'.format(url, query_params)
+
+        # XXX(damb): Use the station service's GET method since the POST
+        # method requires temporal constraints (both starttime and endtime).
+        # ----
+        self.logger.debug('Resolving routing: (Request: %r).' %
+                          _url_fdsn_station)
+        # XXX: Conditional requests are exclusively performed if the
+        # routing configuration did not change, too.
+        validators, harvested = (
+            self.previous_validators(_url_fdsn_station) if
+            self.config_unchanged else (None, None))
+        self.stats['requests'] += 1
+        try:
+            # TODO(damb): Request might be too large. Implement fix.
+            req = functools.partial(requests.get, _url_fdsn_station)
+            with conditional_request(req, validators) as (
+                    station_xml, validators):
+                inventory = self._read_inventory(station_xml)
+
+        except NoContent as err:
+            self.logger.warning(str(err))
+            return None
+        except NotModified as err:
+            self.logger.debug(str(err))
+            validators = err.validators
+            inventory = self.Unchanged(_url_fdsn_station, harvested)
+
+        self.validators[_url_fdsn_station] = validators
+        return inventory
+
+    # _resolve ()
+
+    @staticmethod
+    def _filter_inventory(inventory, stream):
+        """
+        Filter an inventory regarding the codes of :code:`stream`. FDSN
+        wildcards are resolved.
+
+        :param list inventory: Inventory extracted from a StationXML document
+        :param stream: Stream the inventory is filtered with
+        :type stream: :py:class:`eidangservices.utils.sncl.Stream`
+        :returns: Filtered inventory (without empty networks and stations)
+        :rtype: list
+        """
+        def match(patterns, code):
+            for pattern in patterns.split(','):
+                pattern = pattern.strip()
+                # NOTE: FDSNWS specifies '--' for an empty location
+                if pattern == '--':
+                    pattern = ''
+                if fnmatch.fnmatchcase(code, pattern):
+                    return True
+            return False
+
+        nets = []
+        for net in inventory:
+            if not match(stream.network, net.code):
+                continue
+
+            stas = []
+            for sta in net.stations:
+                if not match(stream.station, sta.code):
+                    continue
+
+                chas = [cha for cha in sta.channels if
+                        match(stream.location, cha.location_code) and
+                        match(stream.channel, cha.code)]
+                if chas:
+                    stas.append(sta._replace(channels=chas))
+
+            if stas:
+                nets.append(net._replace(stations=stas))
+
+        return nets
 
-                        _ = self._emerge_routing(
-                            session, cha_epoch, endpoint, routing_starttime,
-                            routing_endtime)
+    # _filter_inventory ()
+
+    def harvest(self, session, routes=None):
+        """
+        Harvest the routing configuration.
+
+        :param :cls:`sqlalchemy.orm.session.Session` session: SQLAlchemy
+            session
+        :param routes: Iterable of routes previously fetched by means of
+            :py:meth:`fetch`. If :code:`None` routes are fetched on the fly.
+        """
+        if routes is None:
+            routes = self.fetch()
+
+        harvested = datetime.datetime.utcnow()
+        self.logger.debug('Harvesting routes for %s.' % self.node)
+        for stream, inventory, services in routes:
+            if isinstance(inventory, self.Unchanged):
+                self._refresh_route(session, stream, services,
+                                    inventory.harvested)
+                continue
+
+            nets, stas, chas = self._harvest_from_inventory(session,
+                                                            inventory)
+
+            for (service_tag, endpoint_url, routing_starttime,
+                 routing_endtime) in services:
+
+                service = self._emerge_service(session, service_tag)
+                endpoint = self._emerge_endpoint(session, endpoint_url,
+                                                 service)
+
+                self.logger.debug('Processing routes for %r '
+                                  '(service=%s, endpoint=%s).' %
+                                  (stream, service_tag, endpoint.url))
+
+                # configure routings
+                for cha_epoch in chas:
+
+                    if inspect(cha_epoch).deleted:
+                        # In case a orm.ChannelEpoch object is marked as
+                        # deleted but harvested within the same harvesting
+                        # run this is a strong hint for an integrity issue
+                        # within the FDSN station InventoryXML.
+                        msg = ('InventoryXML integrity issue for '
+                               '{0!r}'.format(cha_epoch))
+                        warnings.warn(msg)
+                        self.logger.warning(msg)
+                        continue
+
+                    self.logger.debug(
+                        'Checking ChannelEpoch<->Endpoint relation '
+                        '{}<->{} ...'.format(cha_epoch, endpoint))
+
+                    _ = self._emerge_routing(
+                        session, cha_epoch, endpoint, routing_starttime,
+                        routing_endtime)
+
+        self._store_validators(session, harvested)
+        self._log_stats()
 
         # TODO(damb): Show stats for updated/inserted elements
 
     # harvest ()
 
-    def _harvest_from_stationxml(self, session, station_xml):
+    def _refresh_route(self, session, stream, services, since):
+        """
+        Refresh the :code:`lastseen` attribute of the objects harvested
+        previously for a route whose StationXML did not change, by means of
+        bulk statements.
+
+        :param :cls:`sqlalchemy.orm.session.Session` session: SQLAlchemy
+            session
+        :param stream: Stream of the route
+        :type stream: :py:class:`eidangservices.utils.sncl.Stream`
+        :param list services: Services of the route
+        :param since: Start of the harvesting run the route was processed
+            the last time. Objects not seen since then are not refreshed.
+        :type since: :py:class:`datetime.datetime`
         """
-        Create/update Network, Station and ChannelEpoch objects from a
-        station.xml file.
+        now = datetime.datetime.utcnow()
+        sql_stream_epoch = StreamEpoch(stream=stream).fdsnws_to_sql_wildcards()
+
+        cha_table = orm.ChannelEpoch.__table__
+        net_table = orm.Network.__table__
+        sta_table = orm.Station.__table__
+        cha_oids = select([cha_table.c.oid]).\
+            select_from(cha_table.join(net_table).join(sta_table)).\
+            where(net_table.c.name.like(sql_stream_epoch.network,
+                                        escape='/')).\
+            where(sta_table.c.name.like(sql_stream_epoch.station,
+                                        escape='/')).\
+            where(cha_table.c.locationcode.like(sql_stream_epoch.location,
+                                                escape='/')).\
+            where(cha_table.c.channel.like(sql_stream_epoch.channel,
+                                           escape='/')).\
+            where(cha_table.c.lastseen >= since)
+
+        endpoint_table = orm.Endpoint.__table__
+        endpoint_oids = select([endpoint_table.c.oid]).where(
+            endpoint_table.c.url.in_(
+                [endpoint_url for _, endpoint_url, _, _ in services]))
+
+        num_rows = 0
+        for table, ref_column, oids in (
+                (orm.Routing.__table__, orm.Routing.channel_epoch_ref,
+                 cha_oids),
+                (orm.NetworkEpoch.__table__, orm.NetworkEpoch.network_ref,
+                 select([cha_table.c.network_ref]).where(
+                     cha_table.c.oid.in_(cha_oids))),
+                (orm.StationEpoch.__table__, orm.StationEpoch.station_ref,
+                 select([cha_table.c.station_ref]).where(
+                     cha_table.c.oid.in_(cha_oids))),
+                (cha_table, cha_table.c.oid, cha_oids)):
+            stmt = table.update().\
+                where(ref_column.in_(oids)).\
+                where(table.c.lastseen >= since)
+            if table is orm.Routing.__table__:
+                stmt = stmt.where(table.c.endpoint_ref.in_(endpoint_oids))
+
+            num_rows += session.execute(stmt.values(lastseen=now)).rowcount
+
+        self.stats['rows_refreshed'] += num_rows
+
+    # _refresh_route ()
+
+    def _log_stats(self):
+        self.logger.debug(
+            'Resolved %d routes for %s by means of %d FDSN station '
+            'requests.' % (self.stats['routes'], self.node,
+                           self.stats['requests']))
+        if self._validators is None:
+            return
+
+        self.logger.info(
+            'Conditional harvesting for %s: configuration %s, %d of %d '
+            'routes unchanged (%d rows refreshed).' %
+            (self.node, 'unchanged' if self.config_unchanged else 'changed',
+             self.stats['routes_unchanged'], self.stats['routes'],
+             self.stats['rows_refreshed']))
+
+    # _log_stats ()
+
+    def _read_inventory(self, station_xml):
+        """
+        Extract a StationXML document by means of the StationXML extractor
+        configured.
 
-        :param :cls:`sqlalchemy.orm.sessionSession` session: SQLAlchemy session
         :param :cls:`io.BinaryIO` station_xml: Station XML file stream
+        :returns: List of
+            :py:class:`eidangservices.stationlite.harvest.stationxml.Network`
+            objects
         """
-
         try:
-            inventory = read_inventory(station_xml, format='STATIONXML')
-        except Exception as err:
+            return self._extract_stationxml(station_xml)
+        except stationxml.StationXMLError as err:
             raise self.StationXMLParsingError(err)
 
+    # _read_inventory ()
+
+    def _harvest_from_inventory(self, session, inventory):
+        """
+        Create/update Network, Station and ChannelEpoch objects from an
+        inventory.
+
+        :param :cls:`sqlalchemy.orm.sessionSession` session: SQLAlchemy session
+        :param list inventory: Inventory extracted from a StationXML document
+        """
         nets = []
         stas = []
         chas = []
-        for inv_network in inventory.networks:
+        for inv_network in inventory:
             self.logger.debug("Processing network: {0!r}".format(
                               inv_network))
             net = self._emerge_network(session, inv_network)
@@ -329,7 +776,7 @@ class RoutingHarvester(Harvester):
 
         return nets, stas, chas
 
-    # _harvest_from_stationxml ()
+    # _harvest_from_inventory ()
 
     def _emerge_service(self, session, service_tag):
         """
@@ -389,15 +836,13 @@ class RoutingHarvester(Harvester):
             raise self.IntegrityError(err)
 
         end_date = network.end_date
-        if end_date is not None:
-            end_date = end_date.datetime
 
         # check if network already available - else create a new one
         if net is None:
             net = orm.Network(name=network.code)
             net_epoch = orm.NetworkEpoch(
                 description=network.description,
-                starttime=network.start_date.datetime,
+                starttime=network.start_date,
                 endtime=end_date)
             net.network_epochs.append(net_epoch)
             self.logger.debug("Created new network object '{}'".format(net))
@@ -413,7 +858,7 @@ class RoutingHarvester(Harvester):
                     filter(orm.NetworkEpoch.description ==
                            network.description).\
                     filter(orm.NetworkEpoch.starttime ==
-                           network.start_date.datetime).\
+                           network.start_date).\
                     filter(orm.NetworkEpoch.endtime == end_date).\
                     one_or_none()
             except MultipleResultsFound as err:
@@ -422,7 +867,7 @@ class RoutingHarvester(Harvester):
             if net_epoch is None:
                 net_epoch = orm.NetworkEpoch(
                     description=network.description,
-                    starttime=network.start_date.datetime,
+                    starttime=network.start_date,
                     endtime=end_date)
                 net.network_epochs.append(net_epoch)
                 self.logger.debug(
@@ -447,15 +892,13 @@ class RoutingHarvester(Harvester):
             raise self.IntegrityError(err)
 
         end_date = station.end_date
-        if end_date is not None:
-            end_date = end_date.datetime
 
         # check if station already available - else create a new one
         if sta is None:
             sta = orm.Station(name=station.code)
             station_epoch = orm.StationEpoch(
                 description=station.description,
-                starttime=station.start_date.datetime,
+                starttime=station.start_date,
                 endtime=end_date,
                 latitude=station.latitude,
                 longitude=station.longitude)
@@ -473,7 +916,7 @@ class RoutingHarvester(Harvester):
                     filter(orm.StationEpoch.description ==
                            station.description).\
                     filter(orm.StationEpoch.starttime ==
-                           station.start_date.datetime).\
+                           station.start_date).\
                     filter(orm.StationEpoch.endtime == end_date).\
                     filter(orm.StationEpoch.latitude == station.latitude).\
                     filter(orm.StationEpoch.longitude == station.longitude).\
@@ -484,7 +927,7 @@ class RoutingHarvester(Harvester):
             if sta_epoch is None:
                 station_epoch = orm.StationEpoch(
                     description=station.description,
-                    starttime=station.start_date.datetime,
+                    starttime=station.start_date,
                     endtime=end_date,
                     latitude=station.latitude,
                     longitude=station.longitude)
@@ -504,8 +947,6 @@ class RoutingHarvester(Harvester):
         Factory method for a orm.ChannelEpoch object.
         """
         end_date = channel.end_date
-        if end_date is not None:
-            end_date = end_date.datetime
 
         # check for available, overlapping channel_epoch (not identical)
         # XXX(damb) Overlapping orm.ChannelEpochs regarding time constraints
@@ -520,21 +961,19 @@ class RoutingHarvester(Harvester):
         if end_date is None:
             query = query.\
                 filter(((orm.ChannelEpoch.starttime <
-                         channel.start_date.datetime) &
-                        ((orm.ChannelEpoch.endtime == None) |  # noqa
-                         (channel.start_date.datetime <
-                          orm.ChannelEpoch.endtime))) |
+                         channel.start_date) &
+                        orm.epoch_ends_after(orm.ChannelEpoch.endtime,
+                                             channel.start_date)) |
                        (orm.ChannelEpoch.starttime >
-                        channel.start_date.datetime))
+                        channel.start_date))
         else:
             query = query.\
                 filter(((orm.ChannelEpoch.starttime <
-                         channel.start_date.datetime) &
-                       ((orm.ChannelEpoch.endtime == None) |  # noqa
-                        (channel.start_date.datetime <
-                         orm.ChannelEpoch.endtime))) |
+                         channel.start_date) &
+                        orm.epoch_ends_after(orm.ChannelEpoch.endtime,
+                                             channel.start_date)) |
                        ((orm.ChannelEpoch.starttime >
-                         channel.start_date.datetime) &
+                         channel.start_date) &
                         (end_date > orm.ChannelEpoch.starttime)))
 
         cha_epochs = query.all()
@@ -560,7 +999,7 @@ class RoutingHarvester(Harvester):
                 filter(orm.ChannelEpoch.locationcode ==
                        channel.location_code).\
                 filter(orm.ChannelEpoch.starttime ==
-                       channel.start_date.datetime).\
+                       channel.start_date).\
                 filter(orm.ChannelEpoch.endtime == end_date).\
                 filter(orm.ChannelEpoch.station == station).\
                 filter(orm.ChannelEpoch.network == network).\
@@ -572,7 +1011,7 @@ class RoutingHarvester(Harvester):
             cha_epoch = orm.ChannelEpoch(
                 channel=channel.code,
                 locationcode=channel.location_code,
-                starttime=channel.start_date.datetime,
+                starttime=channel.start_date,
                 endtime=end_date,
                 station=station,
                 network=network)
@@ -601,14 +1040,12 @@ class RoutingHarvester(Harvester):
         if end is None:
             query = query.\
                 filter(((orm.Routing.starttime < start) &
-                        ((orm.Routing.endtime == None) |  # noqa
-                         (start < orm.Routing.endtime))) |
+                        orm.epoch_ends_after(orm.Routing.endtime, start)) |
                        (orm.Routing.starttime > start))
         else:
             query = query.\
                 filter(((orm.Routing.starttime < start) &
-                       ((orm.Routing.endtime == None) |  # noqa
-                        (start < orm.Routing.endtime))) |
+                        orm.epoch_ends_after(orm.Routing.endtime, start)) |
                        ((orm.Routing.starttime > start) &
                         (end > orm.Routing.starttime)))
 
@@ -653,6 +1090,456 @@ class RoutingHarvester(Harvester):
 # class RoutingHarvester
 
 
+class BulkRoutingHarvester(RoutingHarvester):
+    """
+    Implementation of a routing harvester applying the harvested information
+    by means of bulk statements.
+
+    The routes of an EIDA node are collected into rows. Then, the node's
+    rows already available are loaded at once and the inserts, deletes and
+    :code:`lastseen` refreshes are computed in memory. Overlapping
+    orm.ChannelEpoch and orm.Routing epochs are replaced exactly as by
+    :py:class:`RoutingHarvester` (i.e. implemented as: delete - insert).
+    """
+    # NOTE: Limits the number of SQL variables per statement.
+    CHUNK_SIZE = 500
+
+    class _Epoch(object):
+        """
+        In-memory representation of a orm.ChannelEpoch or orm.Routing epoch.
+        A :code:`oid` of :code:`None` indicates a new epoch.
+        """
+        __slots__ = ('oid', 'starttime', 'endtime', 'seen', 'deleted',
+                     'routings')
+
+        def __init__(self, oid, starttime, endtime):
+            self.oid = oid
+            self.starttime = starttime
+            self.endtime = endtime
+            self.seen = False
+            self.deleted = False
+            self.routings = None
+
+        def routings_for(self, endpoint_oid):
+            if self.routings is None:
+                self.routings = {}
+            return self.routings.setdefault(endpoint_oid, [])
+
+        def overlaps(self, starttime, endtime):
+            return ((self.starttime < starttime and
+                     (self.endtime is None or self.endtime > starttime)) or
+                    (self.starttime > starttime and
+                     (endtime is None or endtime > self.starttime)))
+
+        def __repr__(self):
+            return '<Epoch(oid={}, starttime={}, endtime={})>'.format(
+                self.oid, self.starttime, self.endtime)
+
+    # class _Epoch
+
+    def harvest(self, session, routes=None):
+        """
+        Harvest the routing configuration.
+
+        :param :cls:`sqlalchemy.orm.session.Session` session: SQLAlchemy
+            session
+        :param routes: Iterable of routes previously fetched by means of
+            :py:meth:`fetch`. If :code:`None` routes are fetched on the fly.
+        """
+        if routes is None:
+            routes = self.fetch()
+
+        harvested = datetime.datetime.utcnow()
+        self.logger.debug('Harvesting routes for %s (bulk).' % self.node)
+
+        net_epochs = collections.OrderedDict()
+        sta_epochs = collections.OrderedDict()
+        _routes = []
+        unchanged = []
+        for stream, inventory, services in routes:
+            if isinstance(inventory, self.Unchanged):
+                unchanged.append((stream, services, inventory.harvested))
+                continue
+
+            nets, stas, chas = self._rows_from_inventory(inventory)
+            for net, row in nets:
+                net_epochs.setdefault(net, []).append(row)
+            for sta, row in stas:
+                sta_epochs.setdefault(sta, []).append(row)
+            _routes.append((stream, chas, services))
+
+        if _routes:
+            self._merge_routes(session, net_epochs, sta_epochs, _routes)
+
+        for stream, services, since in unchanged:
+            self._refresh_route(session, stream, services, since)
+
+        self._store_validators(session, harvested)
+        self._log_stats()
+
+    # harvest ()
+
+    def _merge_routes(self, session, net_epochs, sta_epochs, routes):
+        """
+        Merge the rows of the routes fetched into the DB.
+
+        :param :cls:`sqlalchemy.orm.session.Session` session: SQLAlchemy
+            session
+        :param dict net_epochs: Network epoch rows by network code
+        :param dict sta_epochs: Station epoch rows by station code
+        :param list routes: List of :code:`(stream, chas, services)` tuples
+        """
+        net_oids = self._emerge_names(session, orm.Network, net_epochs)
+        sta_oids = self._emerge_names(session, orm.Station, sta_epochs)
+
+        self._merge_epochs(
+            session, orm.NetworkEpoch, orm.NetworkEpoch.network_ref,
+            ('description', 'starttime', 'endtime'), net_oids, net_epochs)
+        self._merge_epochs(
+            session, orm.StationEpoch, orm.StationEpoch.station_ref,
+            ('description', 'starttime', 'endtime', 'latitude', 'longitude'),
+            sta_oids, sta_epochs)
+
+        cha_epochs = self._load_channel_epochs(session, net_oids.values())
+        deleted_cha_epochs = []
+        deleted_routings = []
+        endpoints = {}
+        for stream, chas, services in routes:
+            records = []
+            for net, sta, cha, loc, starttime, endtime in chas:
+                epochs = cha_epochs[(net_oids[net], sta_oids[sta], cha, loc)]
+                record, removed = self._merge_epoch(epochs, starttime,
+                                                    endtime)
+                if removed:
+                    self.logger.warning(
+                        'Found overlapping orm.ChannelEpoch objects '
+                        '{} ({}.{}.{}.{}).'.format(removed, net, sta, loc,
+                                                   cha))
+                    deleted_cha_epochs.extend(e for e in removed
+                                              if e.oid is not None)
+                records.append(((net, sta, cha, loc), record))
+
+            for (service_tag, endpoint_url, routing_starttime,
+                 routing_endtime) in services:
+                if endpoint_url not in endpoints:
+                    service = self._emerge_service(session, service_tag)
+                    endpoint = self._emerge_endpoint(session, endpoint_url,
+                                                     service)
+                    session.flush()
+                    endpoints[endpoint_url] = endpoint.oid
+
+                self.logger.debug('Processing routes for %r '
+                                  '(service=%s, endpoint=%s).' %
+                                  (stream, service_tag, endpoint_url))
+
+                for key, record in records:
+                    if record.deleted:
+                        # NOTE: See also RoutingHarvester.harvest.
+                        msg = ('InventoryXML integrity issue for '
+                               '{} {!r}'.format('.'.join(key), record))
+                        warnings.warn(msg)
+                        self.logger.warning(msg)
+                        continue
+
+                    _, removed = self._merge_epoch(
+                        record.routings_for(endpoints[endpoint_url]),
+                        routing_starttime, routing_endtime)
+                    if removed:
+                        self.logger.warning(
+                            'Found overlapping orm.Routing objects '
+                            '{}'.format(removed))
+                        deleted_routings.extend(e for e in removed
+                                                if e.oid is not None)
+
+        self._apply(session, net_oids, cha_epochs, deleted_cha_epochs,
+                    deleted_routings)
+
+    # _merge_routes ()
+
+    @staticmethod
+    def _rows_from_inventory(inventory):
+        """
+        Convert an inventory into rows.
+
+        :param list inventory: Inventory extracted from a StationXML document
+        :returns: Tuple of network epoch, station epoch and channel epoch
+            rows
+        """
+        nets = []
+        stas = []
+        chas = []
+        for inv_network in inventory:
+            nets.append((inv_network.code,
+                         (inv_network.description,
+                          inv_network.start_date,
+                          inv_network.end_date)))
+
+            for inv_station in inv_network.stations:
+                stas.append((inv_station.code,
+                             (inv_station.description,
+                              inv_station.start_date,
+                              inv_station.end_date,
+                              inv_station.latitude,
+                              inv_station.longitude)))
+
+                for inv_channel in inv_station.channels:
+                    chas.append((inv_network.code, inv_station.code,
+                                 inv_channel.code,
+                                 inv_channel.location_code,
+                                 inv_channel.start_date,
+                                 inv_channel.end_date))
+
+        return nets, stas, chas
+
+    # _rows_from_inventory ()
+
+    def _chunks(self, seq):
+        seq = list(seq)
+        for i in range(0, len(seq), self.CHUNK_SIZE):
+            yield seq[i:i + self.CHUNK_SIZE]
+
+    # _chunks ()
+
+    def _emerge_names(self, session, cls, names):
+        """
+        Bulk factory method for orm.Network and orm.Station objects.
+
+        :returns: Dictionary mapping names to object identifiers
+        :rtype: dict
+        """
+        table = cls.__table__
+
+        def load(names):
+            retval = {}
+            for chunk in self._chunks(names):
+                for oid, name in session.execute(
+                        select([table.c.oid, table.c.name]).where(
+                            table.c.name.in_(chunk))):
+                    if name in retval:
+                        raise self.IntegrityError(
+                            'Multiple {} objects named {!r}.'.format(
+                                cls.__name__, name))
+                    retval[name] = oid
+            return retval
+
+        oids = load(names)
+        missing = [name for name in names if name not in oids]
+        if missing:
+            session.execute(table.insert(),
+                            [{'name': name} for name in missing])
+            self.logger.debug('Created {} new {} objects.'.format(
+                len(missing), cls.__name__))
+            oids.update(load(missing))
+
+        return oids
+
+    # _emerge_names ()
+
+    def _merge_epochs(self, session, cls, ref_column, columns, oids,
+                      epochs):
+        """
+        Bulk factory method for orm.NetworkEpoch and orm.StationEpoch
+        objects. Identical epochs are refreshed, else inserted.
+        """
+        table = cls.__table__
+        ref = ref_column.name
+
+        available = collections.defaultdict(list)
+        for chunk in self._chunks(oids.values()):
+            for row in session.execute(
+                    select([table.c.oid, ref_column] +
+                           [table.c[c] for c in columns]).where(
+                        ref_column.in_(chunk))):
+                available[tuple(row[1:])].append(row[0])
+
+        refresh = []
+        insert = []
+        for name, rows in epochs.items():
+            for row in rows:
+                key = (oids[name], ) + tuple(row)
+                if key in available:
+                    if len(available[key]) > 1:
+                        raise self.IntegrityError(
+                            'Multiple {} objects {}.'.format(cls.__name__,
+                                                             key))
+                    refresh.extend(available[key])
+                    continue
+
+                available[key] = []
+                insert.append(dict(zip((ref, ) + columns, key)))
+
+        if insert:
+            session.execute(table.insert(), insert)
+            self.logger.debug('Created {} new {} objects.'.format(
+                len(insert), cls.__name__))
+        self._update_lastseen_bulk(session, table, refresh)
+
+    # _merge_epochs ()
+
+    def _load_channel_epochs(self, session, net_oids):
+        """
+        Load the orm.ChannelEpoch objects (including the corresponding
+        orm.Routing objects) for a set of networks.
+
+        :returns: Dictionary mapping :code:`(network_ref, station_ref,
+            channel, locationcode)` to lists of epochs
+        :rtype: dict
+        """
+        cha_table = orm.ChannelEpoch.__table__
+        routing_table = orm.Routing.__table__
+
+        retval = collections.defaultdict(list)
+        epochs = {}
+        for chunk in self._chunks(net_oids):
+            for row in session.execute(
+                    select([cha_table.c.oid, cha_table.c.network_ref,
+                            cha_table.c.station_ref, cha_table.c.channel,
+                            cha_table.c.locationcode, cha_table.c.starttime,
+                            cha_table.c.endtime]).where(
+                        cha_table.c.network_ref.in_(chunk))):
+                epoch = self._Epoch(row[0], row[5], row[6])
+                retval[tuple(row[1:5])].append(epoch)
+                epochs[row[0]] = epoch
+
+            for row in session.execute(
+                    select([routing_table.c.oid,
+                            routing_table.c.channel_epoch_ref,
+                            routing_table.c.endpoint_ref,
+                            routing_table.c.starttime,
+                            routing_table.c.endtime]).
+                    select_from(routing_table.join(cha_table)).where(
+                        cha_table.c.network_ref.in_(chunk))):
+                epochs[row[1]].routings_for(row[2]).append(
+                    self._Epoch(row[0], row[3], row[4]))
+
+        return retval
+
+    # _load_channel_epochs ()
+
+    def _merge_epoch(self, epochs, starttime, endtime):
+        """
+        Merge an epoch into a list of epochs. Overlapping epochs are removed.
+        An identical epoch is marked as seen, else a new epoch is appended.
+
+        :returns: Tuple of the merged epoch and a list of removed epochs
+        """
+        removed = [e for e in epochs if e.overlaps(starttime, endtime)]
+        for e in removed:
+            e.deleted = True
+            epochs.remove(e)
+
+        identical = [e for e in epochs
+                     if e.starttime == starttime and e.endtime == endtime]
+        if len(identical) > 1:
+            raise self.IntegrityError(
+                'Multiple identical epochs {}.'.format(identical))
+        elif identical:
+            epoch = identical[0]
+            epoch.seen = True
+        else:
+            epoch = self._Epoch(None, starttime, endtime)
+            epochs.append(epoch)
+
+        return epoch, removed
+
+    # _merge_epoch ()
+
+    def _apply(self, session, net_oids, cha_epochs, deleted_cha_epochs,
+               deleted_routings):
+        """
+        Apply the changes computed by means of bulk statements.
+        """
+        cha_table = orm.ChannelEpoch.__table__
+        routing_table = orm.Routing.__table__
+
+        # delete overlapping epochs including the corresponding orm.Routing
+        # entries
+        if deleted_routings:
+            session.execute(
+                routing_table.delete().where(
+                    routing_table.c.oid == bindparam('b_oid')),
+                [{'b_oid': e.oid} for e in deleted_routings])
+        if deleted_cha_epochs:
+            session.execute(
+                routing_table.delete().where(
+                    routing_table.c.channel_epoch_ref == bindparam('b_oid')),
+                [{'b_oid': e.oid} for e in deleted_cha_epochs])
+            session.execute(
+                cha_table.delete().where(
+                    cha_table.c.oid == bindparam('b_oid')),
+                [{'b_oid': e.oid} for e in deleted_cha_epochs])
+            self.logger.info('Removed {} orm.ChannelEpoch objects.'.format(
+                len(deleted_cha_epochs)))
+
+        new_cha_epochs = {}
+        refreshed_cha_epochs = []
+        refreshed_routings = []
+        for key, epochs in cha_epochs.items():
+            for e in epochs:
+                if e.oid is None:
+                    new_cha_epochs[key + (e.starttime, e.endtime)] = e
+                elif e.seen:
+                    refreshed_cha_epochs.append(e.oid)
+
+                for routings in (e.routings or {}).values():
+                    refreshed_routings.extend(
+                        r.oid for r in routings
+                        if r.oid is not None and r.seen)
+
+        if new_cha_epochs:
+            session.execute(
+                cha_table.insert(),
+                [dict(zip(('network_ref', 'station_ref', 'channel',
+                           'locationcode', 'starttime', 'endtime'), key))
+                 for key in new_cha_epochs])
+            self.logger.debug(
+                'Created {} new orm.ChannelEpoch objects.'.format(
+                    len(new_cha_epochs)))
+
+            # fetch the identifiers assigned
+            for chunk in self._chunks(net_oids.values()):
+                for row in session.execute(
+                        select([cha_table.c.oid, cha_table.c.network_ref,
+                                cha_table.c.station_ref, cha_table.c.channel,
+                                cha_table.c.locationcode,
+                                cha_table.c.starttime,
+                                cha_table.c.endtime]).where(
+                            cha_table.c.network_ref.in_(chunk))):
+                    e = new_cha_epochs.get(tuple(row[1:]))
+                    if e is not None:
+                        e.oid = row[0]
+
+        new_routings = [
+            {'channel_epoch_ref': e.oid, 'endpoint_ref': endpoint_oid,
+             'starttime': r.starttime, 'endtime': r.endtime}
+            for epochs in cha_epochs.values() for e in epochs
+            for endpoint_oid, routings in (e.routings or {}).items()
+            for r in routings if r.oid is None]
+        if new_routings:
+            session.execute(routing_table.insert(), new_routings)
+            self.logger.debug('Created {} new orm.Routing objects.'.format(
+                len(new_routings)))
+
+        self._update_lastseen_bulk(session, cha_table, refreshed_cha_epochs)
+        self._update_lastseen_bulk(session, routing_table, refreshed_routings)
+
+    # _apply ()
+
+    @staticmethod
+    def _update_lastseen_bulk(session, table, oids):
+        if not oids:
+            return
+
+        session.execute(
+            table.update().where(table.c.oid == bindparam('b_oid')).values(
+                lastseen=datetime.datetime.utcnow()),
+            [{'b_oid': oid} for oid in oids])
+
+    # _update_lastseen_bulk ()
+
+# class BulkRoutingHarvester
+
+
 class VNetHarvester(Harvester):
     """
     Implementation of an harvester harvesting the virtual network information
@@ -668,12 +1555,17 @@ class VNetHarvester(Harvester):
     def __init__(self, node_id, url_vnet_config):
         super().__init__(node_id, url_vnet_config)
 
-    def harvest(self, session):
+    def fetch(self):
+        """
+        Fetch and parse the virtual network configuration. The DB is not
+        accessed. Hence, fetching may be performed by a worker thread.
 
+        :returns: Generator of :code:`(net_code, stream_epochs)` tuples
+        """
         vnet_tag = '{}vnetwork'.format(self.NS_ROUTINGXML)
         stream_tag = '{}stream'.format(self.NS_ROUTINGXML)
 
-        self.logger.debug('Harvesting virtual networks for %s.' % self.node)
+        self.logger.debug('Fetching virtual networks for %s.' % self.node)
 
         # event driven parsing
         for event, vnet_element in etree.iterparse(self.config,
@@ -681,8 +1573,12 @@ class VNetHarvester(Harvester):
                                                    tag=vnet_tag):
             if event == 'end' and len(vnet_element):
 
-                vnet = self._emerge_streamepoch_group(session, vnet_element)
+                net_code = vnet_element.get('networkCode')
+                if not net_code:
+                    raise self.VNetHarvesterError(
+                        "Missing 'networkCode' attribute.")
 
+                stream_epochs = []
                 for stream_element in vnet_element.iter(tag=stream_tag):
                     self.logger.debug("Processing stream element: {}".\
                                       format(stream_element))
@@ -703,63 +1599,83 @@ class VNetHarvester(Harvester):
                         raise self.RoutingConfigXMLParsingError(err)
 
                     # deserialize to StreamEpoch object
-                    stream_epoch = StreamEpoch(stream=stream,
-                                               starttime=stream_starttime,
-                                               endtime=stream_endtime)
-
-                    self.logger.debug("Processing {0!r} ...".format(
-                        stream_epoch))
-
-                    sql_stream_epoch = stream_epoch.fdsnws_to_sql_wildcards()
-
-                    # check if the stream epoch definition is valid i.e. there
-                    # must be at least one matching ChannelEpoch
-                    query = session.query(orm.ChannelEpoch).\
-                        join(orm.Network).\
-                        join(orm.Station).\
-                        filter(orm.Network.name.like(
-                               sql_stream_epoch.network)).\
-                        filter(orm.Station.name.like(
-                               sql_stream_epoch.station)).\
-                        filter(orm.ChannelEpoch.locationcode.like(
-                               sql_stream_epoch.location)).\
-                        filter(orm.ChannelEpoch.channel.like(
-                               sql_stream_epoch.channel)).\
-                        filter((orm.ChannelEpoch.endtime == None) |  # noqa
-                               (orm.ChannelEpoch.endtime >
-                                sql_stream_epoch.starttime))
-
-                    if sql_stream_epoch.endtime:
-                        query = query.\
-                            filter(orm.ChannelEpoch.starttime <
-                                   sql_stream_epoch.endtime)
-
-                    cha_epochs = query.all()
-                    if not cha_epochs:
-                        self.logger.warn(
-                            'No ChannelEpoch matching stream epoch '
-                            '{0!r}'.format(stream_epoch))
-                        continue
+                    stream_epochs.append(
+                        StreamEpoch(stream=stream,
+                                    starttime=stream_starttime,
+                                    endtime=stream_endtime))
 
-                    for cha_epoch in cha_epochs:
-                        self.logger.debug(
-                            'Processing virtual network configuration for '
-                            'ChannelEpoch object {0!r}.'.format(cha_epoch))
-                        self._emerge_streamepoch(
-                            session, cha_epoch, stream_epoch, vnet)
+                yield net_code, stream_epochs
+
+    # fetch ()
+
+    def harvest(self, session, vnets=None):
+        """
+        Harvest the virtual network configuration.
+
+        :param :cls:`sqlalchemy.orm.session.Session` session: SQLAlchemy
+            session
+        :param vnets: Iterable of virtual networks previously fetched by means
+            of :py:meth:`fetch`. If :code:`None` virtual networks are fetched
+            on the fly.
+        """
+        if vnets is None:
+            vnets = self.fetch()
+
+        self.logger.debug('Harvesting virtual networks for %s.' % self.node)
+        for net_code, stream_epochs in vnets:
+
+            vnet = self._emerge_streamepoch_group(session, net_code)
+
+            for stream_epoch in stream_epochs:
+                self.logger.debug("Processing {0!r} ...".format(
+                    stream_epoch))
+
+                sql_stream_epoch = stream_epoch.fdsnws_to_sql_wildcards()
+
+                # check if the stream epoch definition is valid i.e. there
+                # must be at least one matching ChannelEpoch
+                query = session.query(orm.ChannelEpoch).\
+                    join(orm.Network).\
+                    join(orm.Station).\
+                    filter(orm.Network.name.like(
+                           sql_stream_epoch.network)).\
+                    filter(orm.Station.name.like(
+                           sql_stream_epoch.station)).\
+                    filter(orm.ChannelEpoch.locationcode.like(
+                           sql_stream_epoch.location)).\
+                    filter(orm.ChannelEpoch.channel.like(
+                           sql_stream_epoch.channel)).\
+                    filter(orm.epoch_ends_after(
+                           orm.ChannelEpoch.endtime,
+                           sql_stream_epoch.starttime))
+
+                if sql_stream_epoch.endtime:
+                    query = query.\
+                        filter(orm.ChannelEpoch.starttime <
+                               sql_stream_epoch.endtime)
+
+                cha_epochs = query.all()
+                if not cha_epochs:
+                    self.logger.warn(
+                        'No ChannelEpoch matching stream epoch '
+                        '{0!r}'.format(stream_epoch))
+                    continue
+
+                for cha_epoch in cha_epochs:
+                    self.logger.debug(
+                        'Processing virtual network configuration for '
+                        'ChannelEpoch object {0!r}.'.format(cha_epoch))
+                    self._emerge_streamepoch(
+                        session, cha_epoch, stream_epoch, vnet)
 
         # TODO(damb): Show stats for updated/inserted elements
 
     # harvest ()
 
-    def _emerge_streamepoch_group(self, session, element):
+    def _emerge_streamepoch_group(self, session, net_code):
         """
         Factory method for a orm.StreamEpochGroup
         """
-        net_code = element.get('networkCode')
-        if not net_code:
-            raise self.VNetHarvesterError("Missing 'networkCode' attribute.")
-
         try:
             vnet = session.query(orm.StreamEpochGroup).\
                 filter(orm.StreamEpochGroup.name == net_code).\
@@ -803,14 +1719,14 @@ class VNetHarvester(Harvester):
         if stream_epoch.endtime is None:
             query = query.\
                 filter(((orm.StreamEpoch.starttime < stream_epoch.starttime) &
-                        ((orm.StreamEpoch.endtime == None) |  # noqa
-                         (stream_epoch.starttime < orm.StreamEpoch.endtime))) |
+                        orm.epoch_ends_after(orm.StreamEpoch.endtime,
+                                             stream_epoch.starttime)) |
                        (orm.StreamEpoch.starttime > stream_epoch.starttime))
         else:
             query = query.\
                 filter(((orm.StreamEpoch.starttime < stream_epoch.starttime) &
-                        ((orm.StreamEpoch.endtime == None) |  # noqa
-                         (stream_epoch.starttime < orm.StreamEpoch.endtime))) |
+                        orm.epoch_ends_after(orm.StreamEpoch.endtime,
+                                             stream_epoch.starttime)) |
                        ((orm.StreamEpoch.starttime > stream_epoch.starttime) &
                         (stream_epoch.endtime > orm.StreamEpoch.starttime)))
 
@@ -907,6 +1823,69 @@ class StationLiteHarvestApp(App):
                             default=False, dest='no_vnetworks',
                             help=('Do not harvest <vnetwork></vnetwork> '
                                   'information.'))
+        parser.add_argument('--stationxml-extractor', type=str,
+                            metavar='EXTRACTOR', default='obspy',
+                            choices=sorted(stationxml.EXTRACTORS),
+                            dest='stationxml_extractor',
+                            help=('Extractor used for StationXML documents. '
+                                  'The lxml extractor streams documents '
+                                  'instead of creating ObsPy inventories. '
+                                  '(choices: {%(choices)s}, '
+                                  'default: %(default)s)'))
+        parser.add_argument('-w', '--workers', type=positive_int,
+                            metavar='NUM',
+                            default=settings.EIDA_STATIONLITE_HARVEST_WORKERS,
+                            help=('Number of worker threads fetching '
+                                  'concurrently from EIDA nodes. DB writes '
+                                  'are performed by a single writer. '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--bulk', action='store_true', default=False,
+                            help=('Harvest <route></route> information by '
+                                  'means of bulk DB statements (i.e. load '
+                                  'the data available per EIDA node at once '
+                                  'and apply the changes computed in '
+                                  'memory).'))
+        parser.add_argument('--conditional', action='store_true',
+                            default=False,
+                            help=('Harvest <route></route> information '
+                                  'conditionally (i.e. skip routes whose '
+                                  'StationXML did not change since the '
+                                  'previous run by means of ETag and '
+                                  'Last-Modified validators).'))
+        parser.add_argument('--coalesce', action='store_true',
+                            default=False,
+                            help=('Coalesce <route></route> elements '
+                                  'sharing both the FDSN station service '
+                                  'and the network code into a single FDSN '
+                                  'station request per network. The channel '
+                                  'epochs returned are mapped back onto the '
+                                  'individual routes.'))
+        parser.add_argument('--staging', action='store_true', default=False,
+                            help=('Harvest into a staging DB (i.e. a copy of '
+                                  'the SQLite DB) which is analyzed, '
+                                  'vacuumed and finally renamed atomically '
+                                  'into place. The copy is created by means '
+                                  'of VACUUM INTO which requires SQLite >= '
+                                  '3.27.0; with older SQLite versions the DB '
+                                  'is copied by means of the backup API '
+                                  '(Python >= 3.7) or as a file while '
+                                  'writers are locked out. The DB is served '
+                                  'in rollback '
+                                  'journal mode. The DB cannot be replaced '
+                                  'while it is in WAL mode and opened by '
+                                  'StationLite workers; harvesting then '
+                                  'fails after --staging-timeout. Afterwards, '
+                                  'workers keep on reading the DB replaced '
+                                  'until they detect the replacement (see '
+                                  'the StationLite --db-check-interval '
+                                  'option).'))
+        parser.add_argument('--staging-timeout', type=positive_int,
+                            metavar='SECONDS',
+                            default=(settings.
+                                     EIDA_STATIONLITE_HARVEST_STAGING_TIMEOUT),
+                            help=('Timeout in seconds waiting for the DB to '
+                                  'leave WAL mode before it is replaced by '
+                                  'the staging DB. (default: %(default)s)'))
         parser.add_argument('-t', '--truncate', type=UTCDateTime,
                             metavar='TIMESTAMP',
                             help=('Truncate DB (delete outdated information). '
@@ -946,13 +1925,21 @@ class StationLiteHarvestApp(App):
 
             harvesting = not (self.args.no_routes and self.args.no_vnetworks)
 
-            Session = db.ScopedSession()
-            Session.configure(bind=self.args.db_engine)
+            engine = self.args.db_engine
+            if self.args.staging:
+                t_start = time.time()
+                engine = db.create_staging_db(self.args.db_engine)
+                self.logger.info('Created staging DB %r (%.3fs).' %
+                                 (db.sqlite_path(engine),
+                                  time.time() - t_start))
+            else:
+                # XXX: A staging DB is served in rollback journal
+                # mode (see db.swap_staging_db()).
+                db.configure_db(self.DB_PRAGMAS)
 
-            db.configure_db(self.DB_PRAGMAS)
+            Session = db.ScopedSession()
+            Session.configure(bind=engine)
 
-            # TODO(damb): Implement multithreaded harvesting using a thread
-            # pool.
             try:
                 if harvesting:
                     self.logger.info('Start harvesting.')
@@ -983,6 +1970,15 @@ class StationLiteHarvestApp(App):
                             'Number of rows removed: {}'.format(
                                 num_removed_rows))
 
+                if self.args.staging:
+                    t_start = time.time()
+                    db.finalize_staging_db(engine)
+                    db.swap_staging_db(self.args.db_engine, engine,
+                                       timeout=self.args.staging_timeout)
+                    self.logger.info(
+                        'Replaced DB with staging DB (%.3fs).' %
+                        (time.time() - t_start))
+
             except OperationalError as err:
                 raise db.StationLiteDBEngineError(err)
 
@@ -998,6 +1994,14 @@ class StationLiteHarvestApp(App):
                                      exc_type, exc_value, exc_traceback)))
             exit_code = ExitCodes.EXIT_ERROR
         finally:
+            try:
+                if self.args.staging and engine is not self.args.db_engine:
+                    # NOTE: No-op if the staging DB was swapped.
+                    engine.dispose()
+                    db.remove_staging_db(db.sqlite_path(engine))
+            except NameError:
+                pass
+
             try:
                 if pid_lock_gotten:
                     pid_lock.release()
@@ -1015,6 +2019,18 @@ class StationLiteHarvestApp(App):
         :param :cls:`sqlalchemy.orm.session.Session` Session: A configured
         Session class reference.
         """
+        harvester_cls = (BulkRoutingHarvester if self.args.bulk else
+                         RoutingHarvester)
+        validators = None
+        if self.args.conditional:
+            session = Session()
+            try:
+                validators = Harvester.load_validators(session)
+            finally:
+                session.close()
+            self.logger.debug('Loaded %d validators.' % len(validators))
+
+        harvesters = []
         for node_name, node_par in node_generator(
                 exclude=self.args.nodes_exclude):
             url_routing_config = (
@@ -1022,19 +2038,23 @@ class StationLiteHarvestApp(App):
                 node_par['services']['eida']['routing']\
                         ['uri_path_config'])
 
-            self.logger.info(
-                'Processing routes from EIDA node %r.' % node_name)
-            try:
-                h = RoutingHarvester(node_name, url_routing_config)
+            harvesters.append(harvester_cls(
+                node_name, url_routing_config,
+                stationxml_extractor=self.args.stationxml_extractor,
+                validators=validators, coalesce=self.args.coalesce))
 
-                session=Session()
-                # XXX(damb): Maintain sessions within the scope of a
-                # harvesting process.
-                with db.session_guard(session) as _session:
-                    h.harvest(_session)
+        self._harvest(Session, harvesters, 'routes')
 
-            except RequestsError as err:
-                self.logger.warning(str(err))
+        stats = sum((h.stats for h in harvesters), collections.Counter())
+        self.logger.info(
+            'Resolved %d routes by means of %d FDSN station requests.' %
+            (stats['routes'], stats['requests']))
+        if self.args.conditional:
+            self.logger.info(
+                'Conditional harvesting: %d of %d routes unchanged '
+                '(%d rows refreshed).' %
+                (stats['routes_unchanged'], stats['routes'],
+                 stats['rows_refreshed']))
 
     # _harvest_routes ()
 
@@ -1045,6 +2065,7 @@ class StationLiteHarvestApp(App):
         :param :cls:`sqlalchemy.orm.session.Session` Session: A configured
         Session class reference.
         """
+        harvesters = []
         for node_name, node_par in node_generator(
                 exclude=self.args.nodes_exclude):
             url_vnet_config = (
@@ -1052,11 +2073,31 @@ class StationLiteHarvestApp(App):
                 node_par['services']['eida']['routing']\
                         ['uri_path_config_vnet'])
 
+            harvesters.append(VNetHarvester(node_name, url_vnet_config))
+
+        self._harvest(Session, harvesters, 'vnetworks')
+
+    # _harvest_vnetworks ()
+
+    def _harvest(self, Session, harvesters, what):
+        """
+        Run harvesters. With more than a single worker configured, fetching
+        is performed concurrently by means of a thread pool while the DB
+        writes are funneled through the calling thread.
+
+        :param :cls:`sqlalchemy.orm.session.Session` Session: A configured
+        Session class reference.
+        :param list harvesters: List of :py:class:`Harvester` objects
+        :param str what: Description of the information harvested
+        """
+        if self.args.workers > 1 and len(harvesters) > 1:
+            return self._harvest_concurrently(Session, harvesters, what)
+
+        for h in harvesters:
             self.logger.info(
-                'Processing vnetworks from EIDA node %r.' % node_name)
+                'Processing %s from EIDA node %r.' % (what, h.node))
+            t_start = time.time()
             try:
-                # harvest virtual network configuration
-                h = VNetHarvester(node_name, url_vnet_config)
                 session=Session()
                 # XXX(damb): Maintain sessions within the scope of a
                 # harvesting process.
@@ -1065,8 +2106,59 @@ class StationLiteHarvestApp(App):
 
             except RequestsError as err:
                 self.logger.warning(str(err))
+            else:
+                self.logger.info(
+                    'Harvested %s from EIDA node %r (total: %.3fs).' %
+                    (what, h.node, time.time() - t_start))
 
-    # _harvest_vnetworks ()
+    # _harvest ()
+
+    def _harvest_concurrently(self, Session, harvesters, what):
+        """
+        Fetch concurrently and write the harvested information by means of a
+        single writer (i.e. the calling thread). Nodes are written one after
+        another, within a session per node. Meanwhile, the remaining nodes
+        keep on prefetching (bounded by
+        :code:`settings.EIDA_STATIONLITE_HARVEST_PREFETCH_SIZE`).
+        """
+        # NOTE: Since the thread pool processes tasks in FIFO order,
+        # the node currently written is always being fetched. Hence, the
+        # writer cannot deadlock waiting for a node without a worker.
+        prefetch_queues = [PrefetchQueue(h) for h in harvesters]
+        canceled = threading.Event()
+
+        self.logger.debug('Fetching %s with %d workers.' %
+                          (what, self.args.workers))
+        pool = ThreadPool(processes=self.args.workers)
+        for q in prefetch_queues:
+            pool.apply_async(q.fetch, (canceled, ))
+        pool.close()
+
+        try:
+            for q in prefetch_queues:
+                h = q.harvester
+                self.logger.info(
+                    'Processing %s from EIDA node %r.' % (what, h.node))
+                t_start = time.time()
+                try:
+                    session=Session()
+                    with db.session_guard(session) as _session:
+                        h.harvest(_session, q)
+
+                except RequestsError as err:
+                    self.logger.warning(str(err))
+                else:
+                    t_total = time.time() - t_start
+                    self.logger.info(
+                        'Harvested %s from EIDA node %r (fetch: %.3fs, '
+                        'write: %.3fs, waiting: %.3fs).' %
+                        (what, h.node, q.time_fetch, t_total - q.time_wait,
+                         q.time_wait))
+        finally:
+            canceled.set()
+            pool.join()
+
+    # _harvest_concurrently ()
 
 # class StationLiteHarvestApp
 
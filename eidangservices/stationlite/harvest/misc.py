@@ -29,6 +29,7 @@ EIDA NG stationlite utils.
 
 Functions which might be used as *executables*:
     - :code:`db_init()` -- create and initialize a SQLite DB
+    - :code:`db_migrate()` -- migrate an existing DB to the current schema
 """
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
@@ -45,7 +46,8 @@ from sqlalchemy import create_engine
 
 from eidangservices import settings
 from eidangservices.stationlite import __version__
-from eidangservices.stationlite.engine import orm
+from eidangservices.stationlite.engine import db, orm
+from eidangservices.stationlite.misc import db_engine
 from eidangservices.utils.app import CustomParser, App, AppError
 from eidangservices.utils.error import Error, ExitCodes
 
@@ -89,6 +91,10 @@ class StationLiteDBInitApp(App):
                             default=False,
                             help=('overwrite the SQLite DB file if already '
                                   'existent'))
+        parser.add_argument('--integer-epochs', action='store_true',
+                            default=False,
+                            help=('store epochs as integer microseconds '
+                                  'instead of ISO strings'))
 
         # positional arguments
         parser.add_argument('path_db', type=path_relative, metavar='PATH',
@@ -123,6 +129,8 @@ class StationLiteDBInitApp(App):
             # create db tables
             self.logger.debug('Creating database tables ...')
             orm.ORMBase.metadata.create_all(engine)
+            if self.args.integer_epochs:
+                db.convert_epochs(engine, integer=True)
 
             self.logger.info(
                 "DB '{}' successfully initialized.".format(self.args.path_db))
@@ -144,6 +152,87 @@ class StationLiteDBInitApp(App):
 
 # class StationLiteDBInitApp
 
+
+class StationLiteDBMigrateApp(App):
+    """
+    Implementation of an utility application migrating an existing EIDA
+    StationLite DB to the current schema (e.g. adding indexes introduced
+    recently). Optionally, the epoch storage is converted.
+    """
+
+    def build_parser(self, parents=[]):
+        """
+        Configure a parser.
+
+        :param list parents: list of parent parsers
+        :returns: parser
+        :rtype: :py:class:`argparse.ArgumentParser`
+        """
+        parser = CustomParser(
+            prog="eida-stationlite-db-migrate",
+            description=('Migrate an existing EIDA StationLite DB to the '
+                         'current schema.'),
+            parents=parents)
+
+        # optional arguments
+        parser.add_argument('--version', '-V', action='version',
+                            version='%(prog)s version ' + __version__)
+        parser.add_argument('--epochs', choices=('datetime', 'integer'),
+                            default=None,
+                            help=('convert the epoch storage (SQLite '
+                                  'only): either integer microseconds or '
+                                  'ISO strings (datetime)'))
+
+        # positional arguments
+        parser.add_argument('db_engine', type=db_engine, metavar='URL',
+                            help=('DB URL indicating the database dialect and '
+                                  'connection arguments.'))
+
+        return parser
+
+    # build_parser ()
+
+    def run(self):
+        """
+        Run application.
+        """
+        exit_code = ExitCodes.EXIT_SUCCESS
+        try:
+            self.logger.info('{}: Version {}'.format(type(self).__name__,
+                                                     __version__))
+            created = db.migrate(self.args.db_engine)
+            if created:
+                self.logger.info(
+                    'DB successfully migrated (created: {}).'.format(
+                        ', '.join(created)))
+            else:
+                self.logger.info('DB already up to date.')
+
+            if self.args.epochs is not None:
+                num_rows = db.convert_epochs(
+                    self.args.db_engine,
+                    integer=(self.args.epochs == 'integer'))
+                self.logger.info(
+                    'Epoch storage: {} ({} rows converted).'.format(
+                        self.args.epochs, num_rows))
+
+        except Error as err:
+            self.logger.error(err)
+            exit_code = ExitCodes.EXIT_ERROR
+        except Exception as err:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            self.logger.critical('Local Exception: %s' % err)
+            self.logger.critical('Traceback information: ' +
+                                 repr(traceback.format_exception(
+                                     exc_type, exc_value, exc_traceback)))
+            exit_code = ExitCodes.EXIT_ERROR
+
+        sys.exit(exit_code)
+
+    # run ()
+
+# class StationLiteDBMigrateApp
+
 # ----------------------------------------------------------------------------
 def db_init():
     """
@@ -167,6 +256,28 @@ def db_init():
 
 # db_init ()
 
+def db_migrate():
+    """
+    main function for EIDA stationlite DB migration
+    """
+
+    app = StationLiteDBMigrateApp(log_id='STL')
+
+    try:
+        app.configure(
+            settings.PATH_EIDANGWS_CONF,
+            positional_required_args=['db_engine'],
+            config_section=settings.EIDA_STATIONLITE_HARVEST_CONFIG_SECTION)
+    except AppError as err:
+        # handle errors during the application configuration
+        print('ERROR: Application configuration failed "%s".' % err,
+              file=sys.stderr)
+        sys.exit(ExitCodes.EXIT_ERROR)
+
+    app.run()
+
+# db_migrate ()
+
 
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <stationxml.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# EIDA NG webservices are free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EIDA NG webservices are distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/18        V0.1    Daniel Armbruster
+# =============================================================================
+"""
+EIDA NG stationlite StationXML extraction facilities.
+
+The harvester exclusively requires network, station and channel codes,
+epochs, descriptions and coordinates. Both extractors provided return the
+same lightweight representation:
+
+    - :code:`obspy` -- parse by means of :py:func:`obspy.read_inventory`
+    - :code:`lxml` -- stream the document by means of
+      :py:func:`lxml.etree.iterparse`. Processed elements are cleared such
+      that memory usage stays flat even for huge :code:`level=channel`
+      documents.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import collections
+import datetime
+import re
+
+from lxml import etree
+from obspy import read_inventory, UTCDateTime
+
+from eidangservices.utils.error import Error
+
+
+NS_STATIONXML = '{http://www.fdsn.org/xml/station/1}'
+
+Network = collections.namedtuple(
+    'Network', ['code', 'description', 'start_date', 'end_date',
+                'stations'])
+Station = collections.namedtuple(
+    'Station', ['code', 'description', 'start_date', 'end_date',
+                'latitude', 'longitude', 'channels'])
+Channel = collections.namedtuple(
+    'Channel', ['code', 'location_code', 'start_date', 'end_date'])
+
+
+class StationXMLError(Error):
+    """Error while extracting StationXML ({})."""
+
+
+# -----------------------------------------------------------------------------
+def extract_obspy(station_xml):
+    """
+    Extract a StationXML document by means of ObsPy.
+
+    :param station_xml: StationXML file stream
+    :type station_xml: :py:class:`io.BinaryIO`
+    :returns: List of :py:class:`Network` objects
+    :rtype: list
+    """
+    def to_datetime(t):
+        return None if t is None else t.datetime
+
+    try:
+        inventory = read_inventory(station_xml, format='STATIONXML')
+    except Exception as err:
+        raise StationXMLError(err)
+
+    return [
+        Network(
+            code=net.code, description=net.description,
+            start_date=to_datetime(net.start_date),
+            end_date=to_datetime(net.end_date),
+            stations=[
+                Station(
+                    code=sta.code, description=sta.description,
+                    start_date=to_datetime(sta.start_date),
+                    end_date=to_datetime(sta.end_date),
+                    latitude=float(sta.latitude),
+                    longitude=float(sta.longitude),
+                    channels=[
+                        Channel(code=cha.code,
+                                location_code=cha.location_code,
+                                start_date=to_datetime(cha.start_date),
+                                end_date=to_datetime(cha.end_date))
+                        for cha in sta.channels])
+                for sta in net.stations])
+        for net in inventory.networks]
+
+# extract_obspy ()
+
+
+_DATETIME = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})(?:T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?)?'
+    r'Z?$')
+
+
+def parse_datetime(value):
+    """
+    Convert a StationXML date(time) into a :py:class:`datetime.datetime`
+    object. Unusual formats are handled by means of
+    :py:class:`obspy.UTCDateTime`.
+
+    :param str value: StationXML date(time)
+    :rtype: :py:class:`datetime.datetime` or None
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    m = _DATETIME.match(value)
+    if m is None:
+        return UTCDateTime(value).datetime
+
+    year, month, day, hour, minute, second, fraction = m.groups()
+    return datetime.datetime(
+        int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+        int(second or 0), int((fraction or '0').ljust(6, '0')))
+
+# parse_datetime ()
+
+def extract_lxml(station_xml):
+    """
+    Extract a StationXML document by means of streamed parsing.
+
+    :param station_xml: StationXML file stream
+    :type station_xml: :py:class:`io.BinaryIO`
+    :returns: List of :py:class:`Network` objects
+    :rtype: list
+    """
+    try:
+        return list(iterextract(station_xml))
+    except (etree.LxmlError, AttributeError, TypeError, ValueError) as err:
+        raise StationXMLError(err)
+
+# extract_lxml ()
+
+def iterextract(station_xml):
+    """
+    Generator streaming the :py:class:`Network` objects of a StationXML
+    document.
+
+    :param station_xml: StationXML file stream
+    :type station_xml: :py:class:`io.BinaryIO`
+    """
+    net_tag = '{}Network'.format(NS_STATIONXML)
+    sta_tag = '{}Station'.format(NS_STATIONXML)
+    cha_tag = '{}Channel'.format(NS_STATIONXML)
+    description_tag = '{}Description'.format(NS_STATIONXML)
+    # NOTE: ObsPy skips channels without coordinates.
+    required_tags = tuple(
+        '{}{}'.format(NS_STATIONXML, tag)
+        for tag in ('Latitude', 'Longitude', 'Elevation', 'Depth'))
+
+    def release(element):
+        # remove the processed element's predecessors of the same kind
+        element.clear()
+        parent = element.getparent()
+        while (element.getprevious() is not None and
+               element.getprevious().tag == element.tag):
+            parent.remove(element.getprevious())
+
+    stations = []
+    channels = []
+    for event, element in etree.iterparse(station_xml, events=('end', ),
+                                          tag=(net_tag, sta_tag, cha_tag)):
+        if element.tag == cha_tag:
+            if all(element.find(tag) is not None for tag in required_tags):
+                channels.append(Channel(
+                    code=element.get('code').strip(),
+                    location_code=element.get('locationCode').strip(),
+                    start_date=parse_datetime(element.get('startDate')),
+                    end_date=parse_datetime(element.get('endDate'))))
+
+        elif element.tag == sta_tag:
+            stations.append(Station(
+                code=element.get('code').strip(),
+                description=element.findtext(description_tag),
+                start_date=parse_datetime(element.get('startDate')),
+                end_date=parse_datetime(element.get('endDate')),
+                latitude=float(element.findtext(required_tags[0])),
+                longitude=float(element.findtext(required_tags[1])),
+                channels=channels))
+            channels = []
+
+        else:
+            yield Network(
+                code=element.get('code').strip(),
+                description=element.findtext(description_tag),
+                start_date=parse_datetime(element.get('startDate')),
+                end_date=parse_datetime(element.get('endDate')),
+                stations=stations)
+            stations = []
+
+        release(element)
+
+# iterextract ()
+
+
+EXTRACTORS = collections.OrderedDict([
+    ('obspy', extract_obspy),
+    ('lxml', extract_lxml)])
+
+# ---- END OF <stationxml.py> ----
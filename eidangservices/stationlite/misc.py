@@ -35,7 +35,7 @@ from __future__ import (absolute_import, division, print_function,
 from builtins import * # noqa
 
 import argparse
-from flask import make_response
+from flask import make_response, Response
 
 from sqlalchemy import create_engine
 
@@ -51,6 +51,17 @@ def get_response(output, mimetype):
 
 # get_response ()
 
+def get_streamed_response(output, mimetype):
+    """
+    Return a streamed Response object for an iterable output and mimetype.
+    """
+
+    response = Response(output)
+    response.headers['Content-Type'] = mimetype
+    return response
+
+# get_streamed_response ()
+
 def db_engine(url):
     """
     check if url is a valid url
@@ -62,6 +73,21 @@ def db_engine(url):
 
 # db_engine ()
 
+def positive_int(value):
+    """
+    check if value is a positive integer
+    """
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise argparse.ArgumentTypeError('Invalid integer.')
+
+    if value < 1:
+        raise argparse.ArgumentTypeError('Integer must be positive.')
+    return value
+
+# positive_int ()
+
 def node_generator(exclude=[]):
 
     nodes = list(settings.EIDA_NODES)
@@ -36,16 +36,36 @@ from builtins import * # noqa
 import datetime
 
 from flask import Flask, make_response, g
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import get_state, SQLAlchemy
+from sqlalchemy.engine.url import make_url
 
 from eidangservices import settings
 from eidangservices.utils import httperrors
 from eidangservices.utils.fdsnws import register_parser_errorhandler
 from eidangservices.stationlite import __version__
+from eidangservices.stationlite.engine.db import DBFileWatcher
+from eidangservices.stationlite.engine.index import RoutingIndexManager
 
 
 db = SQLAlchemy()
 
+def recreate_engine(app):
+    """
+    Recreate the SQLAlchemy engine of the application. Disposing the engine's
+    connection pool is not sufficient since the epoch storage of a DB is
+    detected per engine (see
+    :py:func:`eidangservices.stationlite.engine.orm.uses_integer_epochs`).
+
+    :param app: Flask application
+    :type app: :py:class:`flask.Flask`
+    """
+    engine = db.get_engine(app)
+    # NOTE: The engine is recreated lazily by the next call of get_engine ().
+    get_state(app).connectors.pop(None, None)
+    engine.dispose()
+
+# recreate_engine ()
+
 def create_app(config_dict, service_version=__version__):
     """
     Factory function for Flask application.
@@ -86,6 +106,30 @@ def create_app(config_dict, service_version=__version__):
 
     db.init_app(app)
 
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    check_interval = app.config.get(
+        'STATIONLITE_DB_CHECK_INTERVAL',
+        settings.EIDA_STATIONLITE_DB_CHECK_INTERVAL)
+    if (url.drivername.startswith('sqlite') and check_interval and
+            url.database not in (None, '', ':memory:')):
+        db_file_watcher = DBFileWatcher(url.database,
+                                        check_interval=check_interval)
+
+        @app.before_request
+        def reopen_db():
+            # NOTE: The harvester atomically replaced the DB file or
+            # converted its epoch storage. Connections still checked out keep
+            # on using the generation replaced until they are returned.
+            if db_file_watcher.replaced():
+                app.logger.info('DB file replaced or converted. Reopening DB.')
+                recreate_engine(app)
+
+    if app.config.get('STATIONLITE_ROUTING_INDEX'):
+        app.extensions['stationlite_routing_index'] = RoutingIndexManager(
+            check_interval=app.config.get(
+                'STATIONLITE_ROUTING_INDEX_CHECK_INTERVAL',
+                settings.EIDA_STATIONLITE_ROUTING_INDEX_CHECK_INTERVAL))
+
     return app
 
 # create_app ()
@@ -105,6 +105,29 @@ class StationLiteWebservice(App):
                             help=('server port (only considered when serving '
                                   'locally i.e. with --start-local)'))
 
+        parser.add_argument('--routing-index', action='store_true',
+                            default=False,
+                            help=('answer routing queries from an in-memory '
+                                  'routing index instead of querying the DB '
+                                  'for every request'))
+        parser.add_argument('--routing-index-check-interval',
+                            metavar='SECONDS', type=float,
+                            default=settings.\
+                            EIDA_STATIONLITE_ROUTING_INDEX_CHECK_INTERVAL,
+                            help=('minimum interval in seconds between '
+                                  'checks for a newly harvested routing DB '
+                                  'generation; if detected the routing index '
+                                  'is reloaded (default: %(default)s)'))
+        parser.add_argument('--db-check-interval', metavar='SECONDS',
+                            type=float,
+                            default=settings.\
+                            EIDA_STATIONLITE_DB_CHECK_INTERVAL,
+                            help=('minimum interval in seconds between '
+                                  'checks if the SQLite DB file was '
+                                  'replaced (e.g. by a staging harvest); if '
+                                  'detected the DB is reopened; 0 disables '
+                                  'checking (default: %(default)s)'))
+
         # positional arguments
         parser.add_argument('db_url', type=url, metavar='URL',
                             help=('DB URL indicating the database dialect and '
@@ -170,7 +193,11 @@ class StationLiteWebservice(App):
             'PROPAGATE_EXCEPTIONS': True,
             'PORT': self.args.port,
             'SQLALCHEMY_DATABASE_URI': self.args.db_url,
-            'SQLALCHEMY_TRACK_MODIFICATIONS': False
+            'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+            'STATIONLITE_ROUTING_INDEX': self.args.routing_index,
+            'STATIONLITE_ROUTING_INDEX_CHECK_INTERVAL':
+                self.args.routing_index_check_interval,
+            'STATIONLITE_DB_CHECK_INTERVAL': self.args.db_check_interval,
         }
         # query method
         api.add_resource(
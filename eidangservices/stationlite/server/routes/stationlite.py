@@ -34,9 +34,10 @@ from __future__ import (absolute_import, division, print_function,
 from builtins import * # noqa
 
 import collections
+import functools
 import logging
 
-from flask import request
+from flask import current_app, request
 from flask_restful import Resource
 from webargs.flaskparser import use_args
 
@@ -82,7 +83,7 @@ class StationLiteResource(Resource):
         if not response:
             self._handle_nodata(args)
 
-        return misc.get_response(response, settings.MIMETYPE_TEXT)
+        return misc.get_streamed_response(response, settings.MIMETYPE_TEXT)
 
     # get ()
 
@@ -104,7 +105,7 @@ class StationLiteResource(Resource):
         if not response:
             self._handle_nodata(args)
 
-        return misc.get_response(response, settings.MIMETYPE_TEXT)
+        return misc.get_streamed_response(response, settings.MIMETYPE_TEXT)
 
     # post ()
 
@@ -117,32 +118,65 @@ class StationLiteResource(Resource):
     # _handle_204 ()
 
     def _process_request(self, args, stream_epochs):
+        routing_index = current_app.extensions.get(
+            'stationlite_routing_index')
+        if routing_index is not None:
+            routing_index = routing_index.get(db.session)
+            resolve_vnetwork = routing_index.resolve_vnetwork
+            find_streamepochs_and_routes = \
+                routing_index.find_streamepochs_and_routes
+        else:
+            resolve_vnetwork = functools.partial(dbquery.resolve_vnetwork,
+                                                 db.session)
+            find_streamepochs_and_routes = functools.partial(
+                dbquery.find_streamepochs_and_routes, db.session)
+
+        # NOTE: Multi-line requests are resolved by means of set-based
+        # DB queries.
+        batch = routing_index is None and len(stream_epochs) > 1
+
         # resolve virtual network streamepochs
-        vnet_stream_epochs = []
-        for stream_epoch in stream_epochs:
-            self.logger.debug(
-                'Resolving {0!r} regarding VNET.'.format(stream_epoch))
-            vnet_stream_epochs.extend(
-                dbquery.resolve_vnetwork(db.session, stream_epoch))
+        if batch:
+            vnet_stream_epochs = dbquery.resolve_vnetworks(db.session,
+                                                           stream_epochs)
+        else:
+            vnet_stream_epochs = []
+            for stream_epoch in stream_epochs:
+                self.logger.debug(
+                    'Resolving {0!r} regarding VNET.'.format(stream_epoch))
+                vnet_stream_epochs.extend(resolve_vnetwork(stream_epoch))
 
         self.logger.debug('Stream epochs from VNETs: '
                           '{0!r}'.format(vnet_stream_epochs))
 
         stream_epochs.extend(vnet_stream_epochs)
 
+        query_kwargs = {'level': args['level'],
+                        'minlat': args['minlatitude'],
+                        'maxlat': args['maxlatitude'],
+                        'minlon': args['minlongitude'],
+                        'maxlon': args['maxlongitude']}
+        for key in ('latitude', 'longitude', 'minradius', 'maxradius'):
+            if key in args:
+                query_kwargs[key] = args[key]
+
+        # query
+        if batch:
+            routes_per_stream_epoch = \
+                dbquery.find_streamepochs_and_routes_batch(
+                    db.session, stream_epochs, args['service'],
+                    **query_kwargs)
+        else:
+            routes_per_stream_epoch = (
+                find_streamepochs_and_routes(stream_epoch, args['service'],
+                                             **query_kwargs)
+                for stream_epoch in stream_epochs)
+
         # collect results for each stream epoch
         routes = []
-        for stream_epoch in stream_epochs:
-            self.logger.debug('Processing request for %r' % (stream_epoch,))
-            # query
-            _routes = dbquery.find_streamepochs_and_routes(
-                db.session, stream_epoch, args['service'],
-                level=args['level'],
-                minlat=args['minlatitude'],
-                maxlat=args['maxlatitude'],
-                minlon=args['minlongitude'],
-                maxlon=args['maxlongitude'])
-
+        for stream_epoch, _routes in zip(stream_epochs,
+                                         routes_per_stream_epoch):
+            self.logger.debug('Processing routes for %r' % (stream_epoch,))
             # adjust stream_epoch regarding time_constraints
             for url, streams in _routes:
                 streams.modify_with_temporal_constraints(
@@ -176,8 +210,9 @@ class StationLiteResource(Resource):
         # sort additionally by url
         routes.sort()
 
-        ostream = OutputStream.create(args['format'], routes=routes)
-        return str(ostream)
+        # NOTE: The output stream is rendered while the response is
+        # streamed.
+        return OutputStream.create(args['format'], routes=routes)
 
     # _process_request ()
 
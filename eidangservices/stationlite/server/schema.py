@@ -37,7 +37,7 @@ from marshmallow import (Schema, fields, validate, validates_schema,
                          pre_load, ValidationError)
 
 from eidangservices.utils.schema import (FDSNWSBool, Latitude, Longitude,
-                                         NoData)
+                                         NoData, Radius)
 
 # ----------------------------------------------------------------------------
 class StationLiteSchema(Schema):
@@ -72,9 +72,17 @@ class StationLiteSchema(Schema):
     maxlatitude = Latitude()
     maxlat = Latitude(load_only=True)
     minlongitude = Longitude()
-    minlon = Latitude(load_only=True)
+    minlon = Longitude(load_only=True)
     maxlongitude = Longitude()
-    maxlon = Latitude(load_only=True)
+    maxlon = Longitude(load_only=True)
+
+    # geographic (circular spatial) options
+    latitude = Latitude()
+    lat = Latitude(load_only=True)
+    longitude = Longitude()
+    lon = Longitude(load_only=True)
+    minradius = Radius()
+    maxradius = Radius()
 
     @pre_load
     def merge_keys(self, data):
@@ -101,9 +109,14 @@ class StationLiteSchema(Schema):
             elif alt_key in data and key not in data:
                 data[key] = data[alt_key]
                 data.pop(alt_key)
-            else:
+            elif key not in data:
                 data[key] = missing
 
+        for alt_key, key in (('lat', 'latitude'), ('lon', 'longitude')):
+            if alt_key in data and key not in data:
+                data[key] = data[alt_key]
+            data.pop(alt_key, None)
+
     # merge_keys ()
 
     @validates_schema
@@ -112,6 +125,24 @@ class StationLiteSchema(Schema):
                 data['minlongitude'] >= data['maxlongitude']):
             raise ValidationError('Bad Request: Invalid spatial constraints.')
 
+        circular_spatial = ('latitude', 'longitude', 'minradius', 'maxradius')
+        if not any(k in data for k in circular_spatial):
+            return
+
+        # NOTE(damb): Allow either rectangular or circular spatial parameters
+        if (data['minlatitude'] > -90. or data['maxlatitude'] < 90. or
+                data['minlongitude'] > -180. or
+                data['maxlongitude'] < 180.):
+            raise ValidationError(
+                'Bad Request: Both rectangular spatial and circular spatial' +
+                ' parameters defined.')
+        if 'latitude' not in data or 'longitude' not in data:
+            raise ValidationError(
+                'Bad Request: Circular spatial constraints require both '
+                'latitude and longitude.')
+        if data.get('minradius', 0.) >= data.get('maxradius', 180.):
+            raise ValidationError('Bad Request: Invalid spatial constraints.')
+
     class Meta:
         strict = True
 
@@ -33,15 +33,21 @@ from __future__ import (absolute_import, division, print_function,
 
 from builtins import * # noqa
 
-import eidangservices as eidangws
+from eidangservices.utils import sncl
 
 
 class OutputStream(object):
     """
     Base class for the StationLite ouput stream format.
 
+    Output streams are iterables generating the output in chunks of
+    approximately :code:`CHUNK_SIZE` characters such that the output may be
+    streamed without being built in memory entirely.
+
     :param list routes: List of :py:class:`eidangservices.utils.Route` objects
     """
+    CHUNK_SIZE = 64 * 1024
+
     def __init__(self, routes=[]):
         self.routes = routes
 
@@ -56,9 +62,35 @@ class OutputStream(object):
 
     # create ()
 
-    def __str__(self):
+    def _lines(self):
+        """
+        Generator emerging the output line by line (including the line
+        terminator).
+        """
         raise NotImplementedError
 
+    def __iter__(self):
+        chunk = []
+        size = 0
+        for line in self._lines():
+            chunk.append(line)
+            size += len(line)
+            if size >= self.CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+
+        if chunk:
+            yield ''.join(chunk)
+
+    # __iter__ ()
+
+    def __bool__(self):
+        return bool(self.routes)
+
+    def __str__(self):
+        return ''.join(self)
+
 # class OutputStream
 
 
@@ -66,52 +98,37 @@ class PostStream(OutputStream):
     """
     StationLite output stream for `format=post`.
     """
-    DESERIALIZER = eidangws.utils.schema.StreamEpochSchema(
-        context={'routing': True})
-
     @staticmethod
     def _deserialize(stream_epoch):
-        return ' '.join(PostStream.DESERIALIZER.dump(stream_epoch).values())
+        return sncl.to_postline(stream_epoch, routing=True)
 
-    def __str__(self):
-        retval =''
-        for url, stream_epoch_lst in self.routes:
-            if retval:
-                retval += '\n\n'
-            retval += url + '\n' + '\n'.join(self._deserialize(se)
-                                             for se in stream_epoch_lst)
-
-        if retval:
-            retval += '\n'
-
-        return retval
+    def _lines(self):
+        for i, (url, stream_epoch_lst) in enumerate(self.routes):
+            if i:
+                yield '\n'
+            yield url + '\n'
+            for se in stream_epoch_lst:
+                yield self._deserialize(se) + '\n'
 
-    # __str__ ()
+    # _lines ()
 
 # class PostStream
 
 
 class GetStream(OutputStream):
     """
-    StationLite output stream for `format=post`.
+    StationLite output stream for `format=get`.
     """
-    DESERIALIZER = eidangws.utils.schema.StreamEpochSchema(
-        context={'routing': True})
-
     @staticmethod
     def _deserialize(stream_epoch):
-        return '&'.join(['{}={}'.format(k, v) for k, v in
-                         GetStream.DESERIALIZER.dump(stream_epoch).items()])
+        return sncl.to_query_string(stream_epoch, routing=True)
 
-    def __str__(self):
-        retval =''
+    def _lines(self):
         for url, stream_epoch_lst in self.routes:
             for se in stream_epoch_lst:
-                retval += '{}?{}\n'.format(url, self._deserialize(se))
-
-        return retval
+                yield '{}?{}\n'.format(url, self._deserialize(se))
 
-    # __str__ ()
+    # _lines ()
 
 # class GetStream
 
@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <db.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/13        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+StationLite DB schema and query plan test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask_restful import Api
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import Query
+
+from eidangservices import settings
+from eidangservices.stationlite.engine import db, dbquery, orm
+from eidangservices.stationlite.server import create_app, db as server_db
+from eidangservices.stationlite.server.routes.stationlite import \
+    StationLiteResource
+from eidangservices.stationlite.tests.misc import create_session, populate
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+
+# -----------------------------------------------------------------------------
+class MigrateTestCase(unittest.TestCase):
+
+    INDEXES = ('ix_channelepoch_station_network_cha_loc_epoch',
+               'ix_routing_channelepoch_endpoint_epoch')
+
+    def setUp(self):
+        self.session = create_session()
+        populate(self.session)
+        self.engine = self.session.get_bind()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_migrate(self):
+        self.session.close()
+        num_routings = self.engine.execute(
+            'SELECT count(*) FROM routing').scalar()
+        for idx in self.INDEXES:
+            self.engine.execute('DROP INDEX {}'.format(idx))
+
+        self.assertEqual(sorted(db.migrate(self.engine)),
+                         sorted(self.INDEXES))
+
+        inspector = inspect(self.engine)
+        self.assertIn(
+            self.INDEXES[0],
+            [idx['name'] for idx in inspector.get_indexes('channelepoch')])
+        # data is preserved
+        self.assertEqual(
+            self.engine.execute(
+                'SELECT count(*) FROM routing').scalar(), num_routings)
+
+    # test_migrate ()
+
+    def test_migrate_spatial_index(self):
+        self.session.close()
+        self.engine.execute(
+            'DROP TABLE {}'.format(orm.STATIONEPOCH_RTREE))
+
+        self.assertEqual(db.migrate(self.engine), [orm.STATIONEPOCH_RTREE])
+        self.assertEqual(
+            self.engine.execute('SELECT count(*) FROM {}'.format(
+                orm.STATIONEPOCH_RTREE)).scalar(),
+            self.engine.execute(
+                'SELECT count(*) FROM stationepoch').scalar())
+
+    # test_migrate_spatial_index ()
+
+    def test_migrate_up_to_date(self):
+        self.assertEqual(db.migrate(self.engine), [])
+
+    # test_migrate_up_to_date ()
+
+# class MigrateTestCase
+
+
+class EpochStorageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.url = 'sqlite:///{}'.format(self.path)
+
+        session = create_session(self.url)
+        populate(session)
+        session.close()
+
+        self.stream_epochs = [
+            StreamEpoch(Stream(network='*', station='*', location='*',
+                               channel='*'),
+                        starttime=starttime, endtime=endtime)
+            for starttime, endtime in (
+                (None, None),
+                (datetime.datetime(2005, 6, 1), None),
+                (None, datetime.datetime(2005, 6, 1)),
+                (datetime.datetime(2011, 1, 1),
+                 datetime.datetime(2013, 1, 1)))]
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def routes(self):
+        session = create_session(self.url)
+        try:
+            return [sorted(str(se) for url, streams in
+                           dbquery.find_streamepochs_and_routes(
+                               session, stream_epoch, 'dataselect')
+                           for ses in streams for se in ses)
+                    for stream_epoch in self.stream_epochs]
+        finally:
+            session.close()
+            session.get_bind().dispose()
+
+    def raw_epochs(self):
+        session = create_session(self.url)
+        try:
+            return session.execute(
+                'SELECT starttime, endtime FROM channelepoch').fetchall()
+        finally:
+            session.close()
+            session.get_bind().dispose()
+
+    def test_convert(self):
+        reference_result = self.routes()
+        self.assertTrue(all(reference_result[:2]))
+
+        session = create_session(self.url)
+        engine = session.get_bind()
+        self.assertFalse(db.uses_integer_epochs(engine))
+        num_rows = db.convert_epochs(engine, integer=True)
+        self.assertGreater(num_rows, 0)
+        self.assertTrue(db.uses_integer_epochs(engine))
+        self.assertEqual(db.convert_epochs(engine, integer=True), 0)
+        engine.dispose()
+
+        self.assertTrue(all(isinstance(v, int) for row in self.raw_epochs()
+                            for v in row))
+        self.assertIn(orm.EPOCH_OPEN,
+                      [endtime for _, endtime in self.raw_epochs()])
+        self.assertEqual(self.routes(), reference_result)
+
+        # convert back
+        raw_epochs = self.raw_epochs()
+        engine = create_session(self.url).get_bind()
+        self.assertEqual(db.convert_epochs(engine, integer=False), num_rows)
+        engine.dispose()
+
+        self.assertIn(None, [endtime for _, endtime in self.raw_epochs()])
+        self.assertEqual(self.routes(), reference_result)
+        self.assertEqual(len(self.raw_epochs()), len(raw_epochs))
+
+    # test_convert ()
+
+    def test_convert_live(self):
+        engine = create_session(self.url).get_bind()
+        engine.execute('SELECT count(*) FROM channelepoch').scalar()
+        watcher = db.DBFileWatcher(self.path, check_interval=0)
+
+        converter = create_session(self.url).get_bind()
+        self.assertGreater(db.convert_epochs(converter, integer=True), 0)
+        converter.dispose()
+
+        self.assertTrue(watcher.replaced())
+        self.assertFalse(watcher.replaced())
+        # the dialect of a stale engine does not match the storage anymore
+        with self.assertRaises(orm.EpochStorageChanged):
+            engine.execute('SELECT count(*) FROM channelepoch')
+        engine.dispose()
+
+    # test_convert_live ()
+
+    def test_convert_live_app(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url,
+                          'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+                          'STATIONLITE_DB_CHECK_INTERVAL': 1e-6})
+        Api(app).add_resource(
+            StationLiteResource,
+            settings.EIDA_ROUTING_PATH + settings.FDSN_QUERY_METHOD_TOKEN)
+        client = app.test_client()
+        path = (settings.EIDA_ROUTING_PATH +
+                settings.FDSN_QUERY_METHOD_TOKEN +
+                '?net=CH&start=2005-01-01')
+
+        reference_result = client.get(path)
+        self.assertEqual(reference_result.status_code, 200)
+
+        engine = create_session(self.url).get_bind()
+        self.assertGreater(db.convert_epochs(engine, integer=True), 0)
+        engine.dispose()
+
+        result = client.get(path)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.data, reference_result.data)
+        with app.app_context():
+            self.assertTrue(db.uses_integer_epochs(server_db.engine))
+            server_db.engine.dispose()
+
+    # test_convert_live_app ()
+
+    def test_epoch_conversion(self):
+        for dt in (datetime.datetime(1970, 1, 1),
+                   datetime.datetime(1960, 5, 3, 1, 2, 3, 4),
+                   datetime.datetime(2018, 9, 14, 12, 0, 0, 999999),
+                   datetime.datetime.max, None):
+            self.assertEqual(
+                orm.epoch_to_datetime(orm.datetime_to_epoch(dt)), dt)
+
+        self.assertEqual(orm.datetime_to_epoch(None), orm.EPOCH_OPEN)
+        self.assertLess(orm.datetime_to_epoch(datetime.datetime.max),
+                        orm.EPOCH_OPEN)
+        self.assertEqual(
+            orm.datetime_to_epoch(datetime.datetime(1970, 1, 1, 0, 0, 1)),
+            1000000)
+
+    # test_epoch_conversion ()
+
+    def test_open_epoch_expressions(self):
+        for integer_epochs, expected in ((False, 'IS NULL'),
+                                         (True, str(orm.EPOCH_OPEN))):
+            session = create_session(integer_epochs=integer_epochs)
+            populate(session)
+
+            query = session.query(orm.ChannelEpoch).\
+                filter(orm.ChannelEpoch.endtime == None)  # noqa
+            self.assertIn(expected, str(query.statement.compile(
+                dialect=session.bind.dialect)))
+            self.assertEqual(query.count(), 10)
+
+            query = session.query(orm.ChannelEpoch).\
+                filter(orm.epoch_ends_after(orm.ChannelEpoch.endtime,
+                                            datetime.datetime(2010, 1, 1)))
+            sql = str(query.statement.compile(dialect=session.bind.dialect))
+            self.assertEqual('OR' in sql, not integer_epochs)
+            self.assertEqual(query.count(), 15)
+            session.close()
+
+    # test_open_epoch_expressions ()
+
+# class EpochStorageTestCase
+
+
+class StagingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'stationlite.sqlite')
+
+        session = create_session('sqlite:///{}'.format(self.path))
+        populate(session)
+        session.execute('PRAGMA journal_mode=WAL')
+        session.close()
+        self.engine = session.get_bind()
+        self.engine.dispose()
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def count_routings(self, engine):
+        return engine.execute('SELECT count(*) FROM routing').scalar()
+
+    def test_swap(self):
+        num_routings = self.count_routings(self.engine)
+        watcher = db.DBFileWatcher(self.path, check_interval=0)
+
+        for generation in range(2):
+            staging_engine = db.create_staging_db(self.engine)
+            self.assertEqual(db.sqlite_path(staging_engine),
+                             self.path + db.STAGING_SUFFIX)
+            self.assertEqual(self.count_routings(staging_engine),
+                             num_routings - generation)
+            staging_engine.execute(
+                'DELETE FROM routing WHERE oid = '
+                '(SELECT max(oid) FROM routing)')
+            db.finalize_staging_db(staging_engine)
+            self.assertEqual(staging_engine.execute(
+                'PRAGMA journal_mode').scalar(), 'delete')
+
+            # a reader of the current generation
+            reader = create_engine('sqlite:///{}'.format(
+                self.path)).connect()
+            self.assertEqual(self.count_routings(reader),
+                             num_routings - generation)
+            if not generation:
+                # the reader prevents the DB from leaving WAL mode
+                with self.assertRaises(db.StagingDBError) as cm:
+                    db.swap_staging_db(self.engine, staging_engine,
+                                       timeout=0)
+                self.assertIn('WAL mode', str(cm.exception))
+                # the DB is not replaced
+                self.assertTrue(os.path.exists(self.path + db.STAGING_SUFFIX))
+                self.assertEqual(self.count_routings(self.engine),
+                                 num_routings)
+                reader.close()
+            self.assertFalse(watcher.replaced())
+
+            db.swap_staging_db(self.engine, staging_engine)
+            self.assertFalse(os.path.exists(self.path + db.STAGING_SUFFIX))
+            self.assertFalse(os.path.exists(self.path + '-wal'))
+            self.assertTrue(watcher.replaced())
+            self.assertFalse(watcher.replaced())
+
+            if generation:
+                # readers keep on reading the generation replaced
+                self.assertEqual(self.count_routings(reader),
+                                 num_routings - generation)
+                reader.close()
+            self.assertEqual(self.count_routings(self.engine),
+                             num_routings - generation - 1)
+
+    # test_swap ()
+
+    def test_create_staging_db_fallback(self):
+        num_routings = self.count_routings(self.engine)
+        # a committed transaction not yet checkpointed
+        writer = create_engine('sqlite:///{}'.format(self.path)).connect()
+        writer.execute('DELETE FROM routing WHERE oid = '
+                       '(SELECT max(oid) FROM routing)')
+
+        with mock.patch.object(db.sqlite3, 'sqlite_version_info',
+                               (3, 26, 0)):
+            staging_engine = db.create_staging_db(self.engine)
+        writer.close()
+
+        self.assertEqual(self.count_routings(staging_engine),
+                         num_routings - 1)
+        db.finalize_staging_db(staging_engine)
+        self.assertEqual(staging_engine.execute(
+            'PRAGMA integrity_check').scalar(), 'ok')
+        staging_engine.dispose()
+
+    # test_create_staging_db_fallback ()
+
+    def test_create_staging_db_invalid(self):
+        with self.assertRaises(db.InvalidDBUrl):
+            db.create_staging_db(create_engine('sqlite://'))
+        with self.assertRaises(db.StagingDBError):
+            db.create_staging_db(create_engine('sqlite:///{}'.format(
+                os.path.join(self.tmpdir, 'missing.sqlite'))))
+
+    # test_create_staging_db_invalid ()
+
+# class StagingTestCase
+
+
+class QueryPlanTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = create_session()
+        populate(cls.session)
+        cls.session.execute('ANALYZE')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.close()
+
+    def explain(self, func, *args, **kwargs):
+        """
+        Run :code:`func` and collect the query plans of the queries
+        executed by means of :py:class:`sqlalchemy.orm.Query`.
+        """
+        plans = []
+        orig_iter = Query.__iter__
+        session = self.session
+
+        def explain_iter(query):
+            compiled = query.statement.compile(
+                dialect=session.bind.dialect)
+            params = [compiled.params[k] for k in compiled.positiontup]
+            cursor = session.connection().connection.cursor()
+            plans.append(
+                ' '.join(str(row[-1]) for row in cursor.execute(
+                    'EXPLAIN QUERY PLAN ' + str(compiled), params)))
+            return orig_iter(query)
+
+        with mock.patch.object(Query, '__iter__', explain_iter):
+            func(*args, **kwargs)
+
+        return plans
+
+    def test_find_streamepochs_and_routes(self):
+        plans = self.explain(
+            dbquery.find_streamepochs_and_routes, self.session,
+            StreamEpoch(Stream(network='CH', station='DAVOX', location='*',
+                               channel='HH?'),
+                        starttime=datetime.datetime(2010, 1, 1)),
+            'dataselect')
+
+        self.assertEqual(len(plans), 1)
+        self.assertIn(
+            'COVERING INDEX ix_channelepoch_station_network_cha_loc_epoch',
+            plans[0])
+        self.assertIn(
+            'COVERING INDEX ix_routing_channelepoch_endpoint_epoch',
+            plans[0])
+
+    # test_find_streamepochs_and_routes ()
+
+    def test_find_streamepochs_and_routes_spatial(self):
+        plans = self.explain(
+            dbquery.find_streamepochs_and_routes, self.session,
+            StreamEpoch(Stream(network='*', station='*', location='*',
+                               channel='*')),
+            'dataselect', minlat=47., maxlat=49., minlon=7., maxlon=9.)
+
+        self.assertEqual(len(plans), 1)
+        self.assertIn('{} VIRTUAL TABLE'.format(orm.STATIONEPOCH_RTREE),
+                      plans[0])
+
+    # test_find_streamepochs_and_routes_spatial ()
+
+    def test_find_streamepochs_and_routes_batch(self):
+        plans = self.explain(
+            dbquery.find_streamepochs_and_routes_batch, self.session,
+            [StreamEpoch(Stream(network='CH', station='DAVOX',
+                                location=loc, channel='HHZ'))
+             for loc in ('', '*')],
+            'dataselect')
+
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertIn('ix_channelepoch_station_network_cha_loc_epoch',
+                          plan)
+            self.assertIn('ix_routing_channelepoch_endpoint_epoch', plan)
+
+    # test_find_streamepochs_and_routes_batch ()
+
+# class QueryPlanTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <db.py> ----
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <dbquery.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/12        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+StationLite DB query test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+import unittest
+
+from eidangservices.stationlite.engine import dbquery, orm
+from eidangservices.stationlite.tests.misc import create_session, populate
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+
+# -----------------------------------------------------------------------------
+class BatchQueryTestCase(unittest.TestCase):
+
+    INTEGER_EPOCHS = False
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = create_session(integer_epochs=cls.INTEGER_EPOCHS)
+        populate(cls.session)
+
+        t = datetime.datetime
+        cls.stream_epochs = [
+            StreamEpoch(Stream(network=net, station=sta, location=loc,
+                               channel=cha),
+                        starttime=start, endtime=end)
+            for net, sta, loc, cha, start, end in (
+                ('*', '*', '*', '*', None, None),
+                ('CH', 'DAVOX', '*', 'HHZ', t(2011, 1, 1), t(2013, 1, 1)),
+                ('CH', 'DAVOX', '*', 'HHZ', t(2011, 1, 1), t(2013, 1, 1)),
+                ('C?', 'DAV*', '*', 'HH?', None, None),
+                ('GR', 'BFO', '', 'HHZ', t(2005, 6, 1), None),
+                ('GR', 'BFO', '00', 'BH*', None, t(2005, 6, 1)),
+                ('GR', '*', '1?', 'LH_', None, None),
+                ('GR', 'BFO', '*', 'LHZ', None, None),
+                ('XX', 'FOO', '*', '*', None, None))]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.close()
+
+    @staticmethod
+    def normalize(routes):
+        return sorted((url, sorted(str(se) for ses in streams for se in ses))
+                      for url, streams in routes)
+
+    def assertBatchEqual(self, stream_epochs, service='dataselect',
+                         **kwargs):
+        reference_result = [
+            self.normalize(dbquery.find_streamepochs_and_routes(
+                self.session, se, service, **kwargs))
+            for se in stream_epochs]
+
+        result = dbquery.find_streamepochs_and_routes_batch(
+            self.session, stream_epochs, service, **kwargs)
+
+        self.assertEqual([self.normalize(r) for r in result],
+                         reference_result)
+        return reference_result
+
+    def test_batch(self):
+        reference_result = self.assertBatchEqual(self.stream_epochs)
+        self.assertTrue(reference_result[1])
+        self.assertFalse(reference_result[-1])
+
+    # test_batch ()
+
+    def test_batch_level(self):
+        for level in ('network', 'station'):
+            self.assertBatchEqual(self.stream_epochs, service='station',
+                                  level=level)
+
+    # test_batch_level ()
+
+    def test_batch_geographic(self):
+        self.assertBatchEqual(self.stream_epochs, minlat=47., maxlat=49.,
+                              minlon=7., maxlon=9.)
+
+    # test_batch_geographic ()
+
+    def test_batch_circular(self):
+        self.assertBatchEqual(self.stream_epochs, latitude=48.3,
+                              longitude=8.3, minradius=0.5, maxradius=2.)
+
+    # test_batch_circular ()
+
+    def test_batch_repeated(self):
+        # the temporary table is dropped
+        self.assertBatchEqual(self.stream_epochs[:2])
+        self.assertBatchEqual(self.stream_epochs[2:])
+        self.assertEqual(
+            dbquery.find_streamepochs_and_routes_batch(
+                self.session, [], 'dataselect'), [])
+
+    # test_batch_repeated ()
+
+    def test_resolve_vnetworks(self):
+        stream_epochs = [
+            StreamEpoch(Stream(network=net, station='*', location='*',
+                               channel='*'))
+            for net in ('_ALPARRAY', '_ALP*', 'CH', '*')]
+
+        reference_result = []
+        for se in stream_epochs:
+            reference_result.extend(
+                dbquery.resolve_vnetwork(self.session, se))
+
+        self.assertEqual(
+            sorted(dbquery.resolve_vnetworks(self.session, stream_epochs)),
+            sorted(reference_result))
+        self.assertEqual(len(reference_result), 4)
+
+    # test_resolve_vnetworks ()
+
+# class BatchQueryTestCase
+
+
+class BatchQueryIntegerEpochsTestCase(BatchQueryTestCase):
+
+    INTEGER_EPOCHS = True
+
+# class BatchQueryIntegerEpochsTestCase
+
+
+class SpatialQueryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.session = create_session()
+        populate(self.session)
+        self.stream_epoch = StreamEpoch(
+            Stream(network='*', station='*', location='*', channel='*'))
+
+    def tearDown(self):
+        self.session.close()
+
+    def stations(self, **kwargs):
+        return sorted(set(
+            se.station
+            for url, streams in dbquery.find_streamepochs_and_routes(
+                self.session, self.stream_epoch, 'dataselect', **kwargs)
+            for ses in streams for se in ses))
+
+    def num_indexed(self):
+        return self.session.execute(
+            'SELECT count(*) FROM {}'.format(
+                orm.STATIONEPOCH_RTREE)).scalar()
+
+    def test_spatial_index_sync(self):
+        self.assertTrue(dbquery.has_spatial_index(self.session))
+        num_station_epochs = self.session.query(orm.StationEpoch).count()
+        self.assertEqual(self.num_indexed(), num_station_epochs)
+
+        self.session.query(orm.StationEpoch).\
+            filter(orm.StationEpoch.latitude > 48.).\
+            update({'latitude': 0.}, synchronize_session=False)
+        self.assertEqual(self.stations(minlat=-1., maxlat=1.),
+                         ['BFO', 'BUG'])
+
+        self.session.query(orm.StationEpoch).\
+            filter(orm.StationEpoch.latitude == 0.).\
+            delete(synchronize_session=False)
+        self.assertEqual(self.num_indexed(), num_station_epochs - 2)
+        self.assertEqual(self.stations(minlat=-1., maxlat=1.), [])
+
+    # test_spatial_index_sync ()
+
+    def test_rectangular(self):
+        for box in ((47., 49., 7., 9.),
+                    # boundaries equal to station coordinates
+                    (46.8, 47.3, 7.7, 9.9),
+                    (46.8, 46.8000001, 9., 9.0000001),
+                    (0., 1., 0., 1.)):
+            kwargs = dict(zip(('minlat', 'maxlat', 'minlon', 'maxlon'), box))
+            reference_result = self.stations(**kwargs)
+            with mock.patch.object(dbquery, 'has_spatial_index',
+                                   return_value=False):
+                self.assertEqual(self.stations(**kwargs), reference_result)
+
+        self.assertEqual(
+            self.stations(minlat=46.8, maxlat=47.3, minlon=7.7, maxlon=9.9),
+            ['BALST', 'DAVOX', 'LLS'])
+
+    # test_rectangular ()
+
+    def test_circular(self):
+        self.assertEqual(
+            self.stations(latitude=48.3, longitude=8.3, maxradius=1.),
+            ['BFO'])
+        self.assertEqual(
+            self.stations(latitude=48.3, longitude=8.3, minradius=1e-3,
+                          maxradius=2.),
+            ['BALST', 'DAVOX', 'LLS'])
+        self.assertEqual(
+            self.stations(latitude=-48.3, longitude=8.3, maxradius=10.), [])
+
+    # test_circular ()
+
+    def test_circle_to_box(self):
+        self.assertEqual(dbquery.circle_to_box(0., 0., 10.),
+                         (-10., 10., -10., 10.))
+        # pole
+        self.assertEqual(dbquery.circle_to_box(85., 0., 10.),
+                         (75., 90., -180., 180.))
+        # antimeridian
+        self.assertEqual(dbquery.circle_to_box(0., 175., 10.),
+                         (-10., 10., -180., 180.))
+
+        minlat, maxlat, minlon, maxlon = dbquery.circle_to_box(60., 0., 10.)
+        self.assertAlmostEqual(maxlon, -minlon)
+        self.assertGreater(maxlon, 10.)
+
+    # test_circle_to_box ()
+
+    def test_great_circle_distance(self):
+        self.assertAlmostEqual(
+            dbquery.great_circle_distance(0., 0., 0., 90.), 90.)
+        self.assertAlmostEqual(
+            dbquery.great_circle_distance(90., 0., -90., 0.), 180.)
+        self.assertAlmostEqual(
+            dbquery.great_circle_distance(45., 10., 45., 10.), 0.)
+
+    # test_great_circle_distance ()
+
+# class SpatialQueryTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <dbquery.py> ----
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <harvest.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/17        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+StationLite harvesting test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import argparse
+import fnmatch
+import io
+import logging
+import unittest
+
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from sqlalchemy.orm import sessionmaker
+
+from eidangservices.stationlite.engine import orm
+from eidangservices.stationlite.harvest import harvest
+from eidangservices.stationlite.tests.misc import create_session
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+
+ROUTING_XML = """<?xml version="1.0" encoding="utf-8"?>
+<ns0:routing xmlns:ns0="http://geofon.gfz-potsdam.de/ns/Routing/1.0/">
+  <ns0:route networkCode="{net}" stationCode="*" locationCode="*"
+             streamCode="*">
+    <ns0:station address="http://{node}/fdsnws/station/1/query"
+                 priority="1" start="1980-01-01T00:00:00" end=""/>
+    <ns0:dataselect address="http://{node}/fdsnws/dataselect/1/query"
+                    priority="1" start="1980-01-01T00:00:00" end=""/>
+    <ns0:dataselect address="http://backup/fdsnws/dataselect/1/query"
+                    priority="2" start="1980-01-01T00:00:00" end=""/>
+  </ns0:route>
+</ns0:routing>
+"""
+
+ROUTING_XML_STATIONS = """<?xml version="1.0" encoding="utf-8"?>
+<ns0:routing xmlns:ns0="http://geofon.gfz-potsdam.de/ns/Routing/1.0/">
+{routes}
+</ns0:routing>
+"""
+
+ROUTE = """  <ns0:route networkCode="{{net}}" stationCode="{sta}"
+             locationCode="*" streamCode="{cha}">
+    <ns0:station address="http://{{node}}/fdsnws/station/1/query"
+                 priority="1" start="1980-01-01T00:00:00" end=""/>
+    <ns0:dataselect address="http://{dataselect}/fdsnws/dataselect/1/query"
+                    priority="1" start="1980-01-01T00:00:00" end=""/>
+  </ns0:route>"""
+
+VNET_XML = """<?xml version="1.0" encoding="utf-8"?>
+<ns0:routing xmlns:ns0="http://geofon.gfz-potsdam.de/ns/Routing/1.0/">
+  <ns0:vnetwork networkCode="_{net}">
+    <ns0:stream networkCode="{net}" stationCode="*" locationCode="*"
+                streamCode="HH?" start="1980-01-01T00:00:00" end=""/>
+  </ns0:vnetwork>
+</ns0:routing>
+"""
+
+STATION_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" schemaVersion="1.0">
+  <Source>{node}</Source>
+  <Created>2018-09-17T00:00:00</Created>
+  <Network code="{net}" startDate="1980-01-01T00:00:00">
+    <Description>{net} network</Description>
+{stations}
+  </Network>
+</FDSNStationXML>
+"""
+
+STATION = """    <Station code="{sta}" startDate="1990-01-01T00:00:00">
+      <Latitude>{lat}</Latitude>
+      <Longitude>8.0</Longitude>
+      <Elevation>500.0</Elevation>
+      <Site><Name>{sta}</Name></Site>
+      <CreationDate>1990-01-01T00:00:00</CreationDate>
+{channels}
+    </Station>"""
+
+CHANNEL = """      <Channel code="{cha}" locationCode="" {epoch}>
+        <Latitude>{lat}</Latitude>
+        <Longitude>8.0</Longitude>
+        <Elevation>500.0</Elevation>
+        <Depth>0.0</Depth>
+      </Channel>"""
+
+NODES = {'node1': ('N1', ('STA1', 'STA2')),
+         'node2': ('N2', ('STA3', ))}
+
+CHANNEL_EPOCHS = [('1990-01-01T00:00:00', None)]
+
+
+def station_xml(node, station='*', channel='*'):
+    net, stas = NODES[node]
+    if not any(fnmatch.fnmatchcase(sta, station) for sta in stas):
+        return None
+    return STATION_XML.format(node=node, net=net, stations='\n'.join(
+        STATION.format(sta=sta, lat=40. + i, channels='\n'.join(
+            CHANNEL.format(cha=cha, lat=40. + i, epoch=' '.join(
+                '{}="{}"'.format(attr, t) for attr, t in
+                zip(('startDate', 'endDate'), epoch) if t))
+            for cha in ('HHZ', 'BHZ') for epoch in CHANNEL_EPOCHS
+            if fnmatch.fnmatchcase(cha, channel)))
+        for i, sta in enumerate(stas)
+        if fnmatch.fnmatchcase(sta, station)))
+
+
+def get(url, **kwargs):
+    """Fake :py:func:`requests.get` serving the EIDA node fixtures."""
+    node = url.split('/')[2]
+    resp = requests.Response()
+    resp.url = url
+    resp.status_code = 200
+    resp.raw = io.BytesIO()
+    if node not in NODES:
+        resp.status_code = 500
+    elif url.endswith('routing.xml'):
+        resp._content = ROUTING_XML.format(
+            node=node, net=NODES[node][0]).encode('utf-8')
+    elif url.endswith('vnetworks.xml'):
+        resp._content = VNET_XML.format(net=NODES[node][0]).encode('utf-8')
+    else:
+        params = dict((k, v[0]) for k, v in
+                      parse_qs(urlparse(url).query).items())
+        content = station_xml(node, params.get('station', '*'),
+                              params.get('channel', '*'))
+        if content is None:
+            resp.status_code = 204
+        else:
+            resp._content = content.encode('utf-8')
+    return resp
+
+
+# -----------------------------------------------------------------------------
+class HarvestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.session = create_session()
+        self.Session = sessionmaker(bind=self.session.get_bind())
+
+        self.app = harvest.StationLiteHarvestApp()
+        self.app.logger = logging.getLogger(__name__)
+
+    def tearDown(self):
+        self.session.close()
+
+    def harvest(self, workers, nodes=sorted(NODES), bulk=False,
+                stationxml_extractor='obspy', conditional=False,
+                coalesce=False):
+        self.app.args = argparse.Namespace(workers=workers)
+        harvester_cls = (harvest.BulkRoutingHarvester if bulk else
+                         harvest.RoutingHarvester)
+        validators = None
+        if conditional:
+            # NOTE: An unclosed session's connection might be garbage
+            # collected by a worker thread, which discards the in-memory DB.
+            session = self.Session()
+            try:
+                validators = harvest.Harvester.load_validators(session)
+            finally:
+                session.close()
+
+        harvesters = [
+            harvester_cls(
+                node, 'http://{}/eidaws/routing/1/routing.xml'.format(node),
+                stationxml_extractor=stationxml_extractor,
+                validators=validators, coalesce=coalesce)
+            for node in nodes]
+        with mock.patch.object(harvest.requests, 'get', side_effect=get):
+            self.app._harvest(self.Session, harvesters, 'routes')
+            self.app._harvest(
+                self.Session,
+                [harvest.VNetHarvester(
+                    node, 'http://{}/eidaws/routing/1/vnetworks.xml'.format(
+                        node)) for node in nodes],
+                'vnetworks')
+        return harvesters
+
+    def dump(self):
+        return {
+            'channels': sorted(
+                (cha.network.name, cha.station.name, cha.channel,
+                 str(cha.starttime), str(cha.endtime))
+                for cha in self.session.query(orm.ChannelEpoch)),
+            'routings': sorted(
+                (r.channel_epoch.station.name, r.channel_epoch.channel,
+                 str(r.channel_epoch.starttime), r.endpoint.url)
+                for r in self.session.query(orm.Routing)),
+            'station_epochs': sorted(
+                (sta.station.name, sta.latitude)
+                for sta in self.session.query(orm.StationEpoch)),
+            'stream_epochs': sorted(
+                (se.stream_epoch_group.name, se.station.name, se.channel)
+                for se in self.session.query(orm.StreamEpoch))}
+
+    def test_sequential(self):
+        self.harvest(workers=1)
+        result = self.dump()
+
+        self.assertEqual(len(result['channels']), 6)
+        # routed both to the station and the dataselect endpoint
+        self.assertEqual(len(result['routings']), 12)
+        self.assertNotIn('backup', str(result['routings']))
+        self.assertEqual(
+            result['stream_epochs'],
+            [('_N1', 'STA1', 'HHZ'), ('_N1', 'STA2', 'HHZ'),
+             ('_N2', 'STA3', 'HHZ')])
+
+    # test_sequential ()
+
+    def test_concurrent(self):
+        self.harvest(workers=1)
+        reference_result = self.dump()
+        self.session.close()
+
+        self.session = create_session()
+        self.Session = sessionmaker(bind=self.session.get_bind())
+        self.harvest(workers=4)
+        self.assertEqual(self.dump(), reference_result)
+
+    # test_concurrent ()
+
+    def test_concurrent_node_unavailable(self):
+        self.harvest(workers=2, nodes=['node1', 'unavailable', 'node2'])
+
+        self.assertEqual(
+            sorted(set(cha[0] for cha in self.dump()['channels'])),
+            ['N1', 'N2'])
+
+    # test_concurrent_node_unavailable ()
+
+    def test_bulk(self):
+        split_epochs = [('1990-01-01T00:00:00', '2000-01-01T00:00:00'),
+                        ('2000-01-01T00:00:00', None)]
+
+        reference_result = []
+        for bulk in (False, True):
+            self.session = create_session()
+            self.Session = sessionmaker(bind=self.session.get_bind())
+
+            result = []
+            for epochs in (CHANNEL_EPOCHS, split_epochs, split_epochs):
+                with mock.patch('{}.CHANNEL_EPOCHS'.format(__name__),
+                                epochs):
+                    self.harvest(workers=1, bulk=bulk)
+                result.append(self.dump())
+            self.session.close()
+
+            if not bulk:
+                reference_result = result
+        self.assertEqual(result, reference_result)
+
+        # the overlapping open epoch was replaced
+        self.assertEqual(len(result[0]['channels']), 6)
+        self.assertEqual(len(result[1]['channels']), 12)
+        self.assertNotIn(('N1', 'STA1', 'HHZ', '1990-01-01 00:00:00', 'None'),
+                         result[1]['channels'])
+        self.assertEqual(result[2], result[1])
+
+    # test_bulk ()
+
+    def test_bulk_lastseen(self):
+        self.harvest(workers=1, bulk=True)
+        lastseen = dict(self.session.query(orm.Routing.oid,
+                                           orm.Routing.lastseen))
+        self.session.commit()
+
+        self.harvest(workers=2, bulk=True)
+        self.assertEqual(
+            sorted(self.session.query(orm.Routing.oid)), sorted(
+                (oid, ) for oid in lastseen))
+        for oid, t in self.session.query(orm.Routing.oid,
+                                         orm.Routing.lastseen):
+            self.assertGreater(t, lastseen[oid])
+
+    # test_bulk_lastseen ()
+
+    def test_conditional(self):
+        for bulk in (False, True):
+            self.session = create_session()
+            self.Session = sessionmaker(bind=self.session.get_bind())
+
+            harvesters = self.harvest(workers=1, bulk=bulk, conditional=True)
+            self.assertEqual(
+                [h.stats['routes_unchanged'] for h in harvesters], [0, 0])
+            reference_result = self.dump()
+            lastseen = dict(self.session.query(orm.Routing.oid,
+                                               orm.Routing.lastseen))
+            self.assertEqual(self.session.query(orm.HTTPValidator).count(),
+                             4)
+            self.session.commit()
+
+            harvesters = self.harvest(workers=2, bulk=bulk, conditional=True)
+            for h in harvesters:
+                self.assertTrue(h.config_unchanged)
+                self.assertEqual(h.stats['routes_unchanged'], 1)
+                self.assertEqual(h.stats['routes'], 1)
+            self.assertEqual(self.dump(), reference_result)
+            for oid, t in self.session.query(orm.Routing.oid,
+                                             orm.Routing.lastseen):
+                self.assertGreater(t, lastseen[oid])
+            self.session.commit()
+
+            # changed StationXML
+            with mock.patch('{}.CHANNEL_EPOCHS'.format(__name__),
+                            [('2000-01-01T00:00:00', None)]):
+                harvesters = self.harvest(workers=1, bulk=bulk,
+                                          conditional=True)
+            self.assertEqual(
+                [h.stats['routes_unchanged'] for h in harvesters], [0, 0])
+            self.assertNotEqual(self.dump(), reference_result)
+            self.session.close()
+
+    # test_conditional ()
+
+    def test_coalesce(self):
+        routing_xml = ROUTING_XML_STATIONS.format(routes='\n'.join(
+            ROUTE.format(sta=sta, cha=cha, dataselect=dataselect)
+            for sta, cha, dataselect in (('STA1', 'HH?', 'ds1'),
+                                         ('STA1', 'BH?', 'ds2'),
+                                         ('STA?', '*', 'ds3'),
+                                         ('STA9', '*', 'ds4'))))
+
+        results = []
+        for coalesce in (False, True):
+            self.session = create_session()
+            self.Session = sessionmaker(bind=self.session.get_bind())
+            with mock.patch('{}.ROUTING_XML'.format(__name__), routing_xml):
+                harvesters = self.harvest(workers=1, coalesce=coalesce)
+            results.append(self.dump())
+            self.session.close()
+
+            # neither STA9 (node1) nor STA1 (node2) are available
+            self.assertEqual([h.stats['routes'] for h in harvesters], [3, 1])
+            self.assertEqual([h.stats['requests'] for h in harvesters],
+                             [1, 1] if coalesce else [4, 4])
+
+        self.assertEqual(results[0], results[1])
+        self.assertIn(('STA1', 'HHZ', '1990-01-01 00:00:00',
+                       'http://ds1/fdsnws/dataselect/1/query'),
+                      results[1]['routings'])
+        self.assertNotIn(('STA1', 'HHZ', '1990-01-01 00:00:00',
+                          'http://ds2/fdsnws/dataselect/1/query'),
+                         results[1]['routings'])
+
+    # test_coalesce ()
+
+    def test_stationxml_extractor(self):
+        self.harvest(workers=1)
+        reference_result = self.dump()
+        self.session.close()
+
+        self.session = create_session()
+        self.Session = sessionmaker(bind=self.session.get_bind())
+        self.harvest(workers=1, stationxml_extractor='lxml')
+        self.assertEqual(self.dump(), reference_result)
+
+    # test_stationxml_extractor ()
+
+    def test_concurrent_prefetch_bounded(self):
+        with mock.patch.object(harvest.PrefetchQueue, 'TIMEOUT_PUT', 0.01):
+            prefetch_queue = harvest.PrefetchQueue(
+                harvest.VNetHarvester('node1', None), maxsize=1)
+            prefetch_queue.harvester.fetch = lambda: iter(range(5))
+            canceled = mock.Mock()
+            canceled.is_set.side_effect = [False, False, False, True]
+
+            # the queue is full and the consumer gone
+            prefetch_queue.fetch(canceled)
+            self.assertEqual(list(prefetch_queue._queue.queue), [0])
+
+    # test_concurrent_prefetch_bounded ()
+
+# class HarvestTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <harvest.py> ----
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <index.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/11        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+StationLite routing index test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+import unittest
+
+from eidangservices.stationlite.engine import dbquery, orm
+from eidangservices.stationlite.engine.index import (RoutingIndex,
+                                                     RoutingIndexManager)
+from eidangservices.stationlite.tests.misc import create_session, populate
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+# -----------------------------------------------------------------------------
+class RoutingIndexTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = create_session()
+        populate(cls.session)
+        cls.index = RoutingIndex.load(cls.session)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.close()
+
+    @staticmethod
+    def normalize(routes):
+        return sorted((url, sorted(str(se) for ses in streams for se in ses))
+                      for url, streams in routes)
+
+    def assertRoutesEqual(self, stream_epoch, service='dataselect',
+                          **kwargs):
+        reference_result = self.normalize(
+            dbquery.find_streamepochs_and_routes(
+                self.session, stream_epoch, service, **kwargs))
+        self.assertEqual(
+            self.normalize(self.index.find_streamepochs_and_routes(
+                stream_epoch, service, **kwargs)),
+            reference_result)
+        return reference_result
+
+    def stream_epoch(self, net='*', sta='*', loc='*', cha='*',
+                     starttime=None, endtime=None):
+        return StreamEpoch(Stream(network=net, station=sta, location=loc,
+                                  channel=cha),
+                           starttime=starttime, endtime=endtime)
+
+    def test_wildcards(self):
+        for net, sta, loc, cha in (
+                ('*', '*', '*', '*'),
+                ('CH', '*', '*', '*'),
+                ('C?', 'DAV*', '*', 'HH?'),
+                ('GR', 'BFO', '', 'HHZ'),
+                ('GR', 'BFO', '00', 'BH*'),
+                ('*', '*', '1?', 'LH_'),
+                ('*', '*', '*', 'LHZ'),
+                ('XX', '*', '*', '*')):
+            self.assertRoutesEqual(self.stream_epoch(net, sta, loc, cha))
+
+    # test_wildcards ()
+
+    def test_temporal(self):
+        t = datetime.datetime
+        for starttime, endtime in (
+                (t(2005, 6, 1), None),
+                (None, t(2005, 6, 1)),
+                (t(2005, 6, 1), t(2005, 7, 1)),
+                (t(2011, 1, 1), t(2013, 1, 1)),
+                (t(1980, 1, 1), t(1990, 1, 1))):
+            self.assertRoutesEqual(
+                self.stream_epoch(starttime=starttime, endtime=endtime))
+
+    # test_temporal ()
+
+    def test_geographic(self):
+        self.assertTrue(self.assertRoutesEqual(
+            self.stream_epoch(), minlat=47., maxlat=49., minlon=7.,
+            maxlon=9.))
+        self.assertFalse(self.assertRoutesEqual(
+            self.stream_epoch(), minlat=0., maxlat=1.))
+
+    # test_geographic ()
+
+    def test_circular(self):
+        for minradius, maxradius in ((0., 1.), (0.5, 2.), (1e-3, 180.)):
+            self.assertRoutesEqual(
+                self.stream_epoch(), latitude=48.3, longitude=8.3,
+                minradius=minradius, maxradius=maxradius)
+
+    # test_circular ()
+
+    def test_level(self):
+        for level in ('network', 'station', 'channel'):
+            self.assertRoutesEqual(self.stream_epoch(), level=level)
+            self.assertRoutesEqual(self.stream_epoch(), service='station',
+                                   level=level)
+
+    # test_level ()
+
+    def test_vnetwork(self):
+        t = datetime.datetime
+        for stream_epoch in (
+                self.stream_epoch('_ALPARRAY'),
+                self.stream_epoch('_ALP*', 'BFO', starttime=t(2016, 1, 1)),
+                self.stream_epoch('_ALPARRAY', endtime=t(2010, 1, 1)),
+                self.stream_epoch('*')):
+            self.assertEqual(
+                sorted(self.index.resolve_vnetwork(stream_epoch)),
+                sorted(dbquery.resolve_vnetwork(self.session, stream_epoch)))
+
+        self.assertEqual(
+            len(self.index.resolve_vnetwork(
+                self.stream_epoch('_ALPARRAY'))), 2)
+
+    # test_vnetwork ()
+
+# class RoutingIndexTestCase
+
+
+class RoutingIndexManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.session = create_session()
+        populate(self.session)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_reload(self):
+        manager = RoutingIndexManager(check_interval=0)
+        index = manager.get(self.session)
+        self.assertIs(manager.get(self.session), index)
+
+        # harvest a new generation
+        self.session.query(orm.Routing).delete()
+        self.session.commit()
+
+        reloaded = manager.get(self.session)
+        self.assertIsNot(reloaded, index)
+        self.assertEqual(
+            reloaded.find_streamepochs_and_routes(
+                StreamEpoch(Stream(network='*', station='*', location='*',
+                                   channel='*')), 'dataselect'), [])
+
+    # test_reload ()
+
+    def test_check_interval(self):
+        manager = RoutingIndexManager(check_interval=3600)
+        index = manager.get(self.session)
+
+        self.session.query(orm.Routing).delete()
+        self.session.commit()
+
+        self.assertIs(manager.get(self.session), index)
+
+    # test_check_interval ()
+
+# class RoutingIndexManagerTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <index.py> ----
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <misc.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/12        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+StationLite test fixtures.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from eidangservices.stationlite.engine import orm
+
+
+# -----------------------------------------------------------------------------
+def create_session(url='sqlite://', integer_epochs=False):
+    engine = create_engine(url)
+
+    @event.listens_for(engine, 'connect')
+    def configure_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA case_sensitive_like=on')
+        if integer_epochs:
+            dbapi_connection.execute('PRAGMA user_version={}'.format(
+                orm.USER_VERSION_INTEGER_EPOCHS))
+
+    orm.ORMBase.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+# create_session ()
+
+def populate(session):
+    """
+    Populate a routing DB with a few networks, stations and channels.
+    """
+    t = datetime.datetime
+    services = dict((name, orm.Service(name=name))
+                    for name in ('dataselect', 'station'))
+    endpoints = {
+        ('CH', 'dataselect'): orm.Endpoint(
+            url='http://eida.ethz.ch/fdsnws/dataselect/1/query',
+            service=services['dataselect']),
+        ('CH', 'station'): orm.Endpoint(
+            url='http://eida.ethz.ch/fdsnws/station/1/query',
+            service=services['station']),
+        ('GR', 'dataselect'): orm.Endpoint(
+            url='http://eida.bgr.de/fdsnws/dataselect/1/query',
+            service=services['dataselect'])}
+
+    stations = {}
+    for net, sta, lat, lon, epochs in (
+            ('CH', 'DAVOX', 46.8, 9.9, [(t(2000, 1, 1), None)]),
+            ('CH', 'BALST', 47.3, 7.7, [(t(2000, 1, 1), t(2010, 1, 1)),
+                                        (t(2010, 1, 1), None)]),
+            ('CH', 'LLS', 46.8, 9.0, [(t(2005, 1, 1), None)]),
+            ('GR', 'BFO', 48.3, 8.3, [(t(1990, 1, 1), None)]),
+            ('GR', 'BUG', 51.4, 7.2, [(t(1990, 1, 1), None)])):
+        network = session.query(orm.Network).filter_by(name=net).first()
+        if network is None:
+            network = orm.Network(name=net)
+            session.add(network)
+        station = orm.Station(name=sta)
+        for start, end in epochs:
+            orm.StationEpoch(station=station, latitude=lat, longitude=lon,
+                             starttime=start, endtime=end)
+        stations[(net, sta)] = (network, station)
+
+    for (net, sta), (network, station) in stations.items():
+        for loc, cha, start, end in (
+                ('', 'HHZ', t(2000, 1, 1), t(2012, 1, 1)),
+                ('', 'HHZ', t(2012, 1, 1), None),
+                ('00', 'BHZ', t(2005, 1, 1), None),
+                ('10', 'LH_', t(2005, 1, 1), t(2006, 1, 1))):
+            cha_epoch = orm.ChannelEpoch(
+                network=network, station=station, locationcode=loc,
+                channel=cha, starttime=start, endtime=end)
+            for (_net, service), endpoint in endpoints.items():
+                if _net != net:
+                    continue
+                # NOTE: the routing epoch is narrower than the channel epoch
+                orm.Routing(channel_epoch=cha_epoch, endpoint=endpoint,
+                            starttime=t(2001, 1, 1), endtime=None)
+
+    vnet = orm.StreamEpochGroup(name='_ALPARRAY')
+    for net, sta in (('CH', 'DAVOX'), ('GR', 'BFO')):
+        network, station = stations[(net, sta)]
+        orm.StreamEpoch(network=network, station=station,
+                        stream_epoch_group=vnet, location='',
+                        channel='HH?', starttime=t(2015, 1, 1),
+                        endtime=t(2018, 1, 1))
+
+    session.add_all(list(services.values()))
+    session.add(vnet)
+    session.commit()
+
+# populate ()
+
+
+# ---- END OF <misc.py> ----
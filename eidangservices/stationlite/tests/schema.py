@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <schema.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/14        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+StationLite schema related test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import unittest
+
+import marshmallow as ma
+
+from eidangservices.stationlite.server.schema import StationLiteSchema
+
+
+# -----------------------------------------------------------------------------
+class StationLiteSchemaTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = StationLiteSchema()
+
+    def test_rectangular(self):
+        result = self.schema.load({'minlatitude': 0., 'maxlatitude': 45.,
+                                   'minlongitude': 120.})
+
+        self.assertEqual(result['minlatitude'], 0.)
+        self.assertEqual(result['maxlatitude'], 45.)
+        self.assertEqual(result['minlongitude'], 120.)
+        self.assertEqual(result['maxlongitude'], 180.)
+
+    # test_rectangular ()
+
+    def test_rectangular_lon_alias(self):
+        result = self.schema.load({'minlon': -120., 'maxlon': 120.})
+
+        self.assertEqual(result['minlongitude'], -120.)
+        self.assertEqual(result['maxlongitude'], 120.)
+        self.assertNotIn('minlon', result)
+        self.assertNotIn('maxlon', result)
+
+    # test_rectangular_lon_alias ()
+
+    def test_circular(self):
+        result = self.schema.load({'latitude': 46.8, 'longitude': 120.,
+                                   'maxradius': 1.5})
+
+        self.assertEqual(result['latitude'], 46.8)
+        self.assertEqual(result['longitude'], 120.)
+        self.assertEqual(result['maxradius'], 1.5)
+
+    # test_circular ()
+
+    def test_circular_lon_alias(self):
+        for lon in (120., -120.):
+            result = self.schema.load({'lat': 46.8, 'lon': lon})
+
+            self.assertEqual(result['latitude'], 46.8)
+            self.assertEqual(result['longitude'], lon)
+            self.assertNotIn('lon', result)
+
+    # test_circular_lon_alias ()
+
+    def test_circular_lon_invalid(self):
+        with self.assertRaises(ma.ValidationError):
+            self.schema.load({'lat': 46.8, 'lon': 190.})
+
+    # test_circular_lon_invalid ()
+
+    def test_rect_and_circular(self):
+        with self.assertRaises(ma.ValidationError):
+            self.schema.load({'minlatitude': 0., 'latitude': 45.,
+                              'longitude': 8.})
+
+    # test_rect_and_circular ()
+
+# class StationLiteSchemaTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <schema.py> ----
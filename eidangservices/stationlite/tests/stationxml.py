@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <stationxml.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/18        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+StationXML extraction test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+import io
+import unittest
+
+from eidangservices.stationlite.harvest import stationxml
+
+
+STATION_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" schemaVersion="1.0">
+  <Source>SED</Source>
+  <Created>2018-09-18T00:00:00</Created>
+  <Network code="CH" startDate="1980-01-01T00:00:00">
+    <Description>Switzerland Seismological Network</Description>
+    <Station code="DAVOX" startDate="2002-07-24T00:00:00.000000Z">
+      <Description>Davos, Dischmatal, GR</Description>
+      <Latitude>46.7805</Latitude>
+      <Longitude>9.87952</Longitude>
+      <Elevation>1830.0</Elevation>
+      <Site><Name>Davos</Name></Site>
+      <CreationDate>2002-07-24T00:00:00</CreationDate>
+      <Channel code="HHZ" locationCode="" startDate="2002-07-24T00:00:00"
+               endDate="2010-11-16T12:30:00.5Z">
+        <Latitude>46.7805</Latitude>
+        <Longitude>9.87952</Longitude>
+        <Elevation>1830.0</Elevation>
+        <Depth>0.0</Depth>
+        <Response>
+          <InstrumentSensitivity>
+            <Value>6.0e8</Value>
+            <Frequency>1.0</Frequency>
+            <InputUnits><Name>M/S</Name></InputUnits>
+            <OutputUnits><Name>COUNTS</Name></OutputUnits>
+          </InstrumentSensitivity>
+        </Response>
+      </Channel>
+      <Channel code="HHZ" locationCode="" startDate="2010-11-16T12:30:00.5">
+        <Latitude>46.7805</Latitude>
+        <Longitude>9.87952</Longitude>
+        <Elevation>1830.0</Elevation>
+        <Depth>0.0</Depth>
+      </Channel>
+      <Channel code="LHZ" locationCode="00" startDate="2002-07-24">
+        <Latitude>46.7805</Latitude>
+        <Longitude>9.87952</Longitude>
+        <Elevation>1830.0</Elevation>
+      </Channel>
+    </Station>
+    <Station code="LLS" startDate="2005-01-01T00:00:00"
+             endDate="2015-01-01T00:00:00">
+      <Latitude>46.8</Latitude>
+      <Longitude>9.0</Longitude>
+      <Elevation>500.0</Elevation>
+      <Site><Name>Linthal</Name></Site>
+    </Station>
+  </Network>
+  <Network code="GR" startDate="1976-02-17T00:00:00">
+    <Station code="BFO" startDate="1991-01-01T00:00:00">
+      <Latitude>48.3301</Latitude>
+      <Longitude>8.3296</Longitude>
+      <Elevation>589.0</Elevation>
+      <Site><Name>Black Forest Observatory</Name></Site>
+      <Channel code="BHZ" locationCode=" " startDate="1991-01-01T00:00:00">
+        <Latitude>48.3301</Latitude>
+        <Longitude>8.3296</Longitude>
+        <Elevation>589.0</Elevation>
+        <Depth>0.0</Depth>
+      </Channel>
+    </Station>
+  </Network>
+</FDSNStationXML>
+"""
+
+
+# -----------------------------------------------------------------------------
+class StationXMLTestCase(unittest.TestCase):
+
+    def extract(self, extractor, station_xml=STATION_XML):
+        return stationxml.EXTRACTORS[extractor](io.BytesIO(station_xml))
+
+    def test_extract(self):
+        reference_result = self.extract('obspy')
+        self.assertEqual(self.extract('lxml'), reference_result)
+
+        self.assertEqual([net.code for net in reference_result],
+                         ['CH', 'GR'])
+        davox = reference_result[0].stations[0]
+        self.assertEqual(davox.description, 'Davos, Dischmatal, GR')
+        self.assertEqual((davox.latitude, davox.longitude),
+                         (46.7805, 9.87952))
+        # channels without coordinates are skipped
+        self.assertEqual(
+            davox.channels,
+            [stationxml.Channel(
+                'HHZ', '', datetime.datetime(2002, 7, 24),
+                datetime.datetime(2010, 11, 16, 12, 30, 0, 500000)),
+             stationxml.Channel(
+                'HHZ', '', datetime.datetime(2010, 11, 16, 12, 30, 0,
+                                             500000), None)])
+        self.assertEqual(reference_result[1].stations[0].channels[0].
+                         location_code, '')
+
+    # test_extract ()
+
+    def test_extract_invalid(self):
+        for extractor in stationxml.EXTRACTORS:
+            with self.assertRaises(stationxml.StationXMLError):
+                self.extract(extractor, STATION_XML[:-100])
+            with self.assertRaises(stationxml.StationXMLError):
+                self.extract(extractor, STATION_XML.replace(
+                    b'<Latitude>48.3301</Latitude>',
+                    b'<Latitude>north</Latitude>'))
+
+    # test_extract_invalid ()
+
+    def test_parse_datetime(self):
+        for value, expected in (
+                ('2018-09-18', datetime.datetime(2018, 9, 18)),
+                ('2018-09-18T01:02:03', datetime.datetime(2018, 9, 18, 1, 2,
+                                                          3)),
+                ('2018-09-18T01:02:03.000004Z',
+                 datetime.datetime(2018, 9, 18, 1, 2, 3, 4)),
+                # handled by means of obspy.UTCDateTime
+                ('2018-09-18T01:02:03+01:00',
+                 datetime.datetime(2018, 9, 18, 0, 2, 3)),
+                (None, None)):
+            self.assertEqual(stationxml.parse_datetime(value), expected)
+
+    # test_parse_datetime ()
+
+# class StationXMLTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <stationxml.py> ----
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <stream.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices (eida-stationlite).
+#
+# eida-stationlite is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# eida-stationlite is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/10        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+StationLite output stream test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+import unittest
+
+from eidangservices import utils
+from eidangservices.stationlite.server.stream import GetStream, PostStream
+from eidangservices.utils.schema import StreamEpochSchema
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+# -----------------------------------------------------------------------------
+class OutputStreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.routes = [
+            utils.Route(
+                'http://eida.ethz.ch/fdsnws/dataselect/1/query',
+                streams=[
+                    StreamEpoch(
+                        Stream(network='CH', station='DAVOX', location='',
+                               channel='HHZ'),
+                        starttime=datetime.datetime(2018, 1, 1),
+                        endtime=datetime.datetime(2018, 1, 2, 0, 0, 0, 10)),
+                    StreamEpoch(
+                        Stream(network='CH', station='BALST', location='00',
+                               channel='HHZ'),
+                        starttime=datetime.datetime(2018, 1, 1),
+                        endtime=datetime.datetime.max)]),
+            utils.Route(
+                'http://eida.bgr.de/fdsnws/dataselect/1/query',
+                streams=[
+                    StreamEpoch(
+                        Stream(network='GR', station='BFO', location='',
+                               channel='HHZ'),
+                        starttime=datetime.datetime(2018, 1, 1))])]
+
+        self.se_schema = StreamEpochSchema(context={'routing': True})
+
+    def test_post(self):
+        reference_result = '\n\n'.join(
+            url + '\n' + '\n'.join(
+                ' '.join(self.se_schema.dump(se).values())
+                for se in stream_epochs)
+            for url, stream_epochs in self.routes) + '\n'
+
+        self.assertEqual(str(PostStream(self.routes)), reference_result)
+
+    # test_post ()
+
+    def test_get(self):
+        reference_result = ''.join(
+            '{}?{}\n'.format(url, '&'.join(
+                '{}={}'.format(k, v)
+                for k, v in self.se_schema.dump(se).items()))
+            for url, stream_epochs in self.routes for se in stream_epochs)
+
+        self.assertEqual(str(GetStream(self.routes)), reference_result)
+
+    # test_get ()
+
+    def test_chunked(self):
+        ostream = PostStream(self.routes)
+        ostream.CHUNK_SIZE = 64
+
+        chunks = list(ostream)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(c) < 64 + 100 for c in chunks))
+        self.assertEqual(''.join(chunks), str(ostream))
+
+    # test_chunked ()
+
+    def test_empty(self):
+        for ostream in (PostStream([]), GetStream([])):
+            self.assertFalse(ostream)
+            self.assertEqual(list(ostream), [])
+            self.assertEqual(str(ostream), '')
+
+        self.assertTrue(PostStream(self.routes))
+
+    # test_empty ()
+
+# class OutputStreamTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <stream.py> ----
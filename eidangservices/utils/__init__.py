@@ -119,6 +119,11 @@ def from_fdsnws_datetime(datestring, use_dateutil=True):
     Parse a datestring from a string specified by the FDSNWS datetime
     specification.
 
+    The fixed FDSNWS formats (i.e. :code:`YYYY-mm-dd`,
+    :code:`YYYY-mm-ddTHH:MM:SS` and :code:`YYYY-mm-ddTHH:MM:SS.ffffff`) are
+    decoded without regular expressions and :code:`dateutil`. Results are
+    memoized.
+
     :param str datestring: String to be parsed
     :param bool use_dateutil: Make use of the :code:`dateutil` package if set
         to :code:`True`
@@ -127,6 +132,84 @@ def from_fdsnws_datetime(datestring, use_dateutil=True):
 
     See: http://www.fdsn.org/webservices/FDSN-WS-Specifications-1.1.pdf
     """
+    if not use_dateutil:
+        return _from_fdsnws_datetime(datestring, use_dateutil)
+
+    try:
+        return _fdsnws_datetime_memo[datestring]
+    except KeyError:
+        pass
+
+    dt = _decode_fdsnws_datetime(datestring)
+    if dt is None:
+        dt = _from_fdsnws_datetime(datestring, use_dateutil)
+
+    # NOTE: datetime objects are immutable; the memo is bounded
+    if len(_fdsnws_datetime_memo) >= FDSNWS_DATETIME_MEMO_SIZE:
+        _fdsnws_datetime_memo.clear()
+    _fdsnws_datetime_memo[datestring] = dt
+
+    return dt
+
+# from_fdsnws_datetime ()
+
+
+FDSNWS_DATETIME_MEMO_SIZE = 4096
+_fdsnws_datetime_memo = {}
+
+
+def _decode_fdsnws_datetime(datestring):
+    """
+    Decode the fixed FDSNWS datetime formats.
+
+    :returns: Datetime or :code:`None` if :code:`datestring` does not
+        correspond to one of the fixed formats.
+    :rtype: :py:class:`datetime.datetime` or None
+    """
+    length = len(datestring)
+
+    if length == 10:
+        if (datestring[4] != '-' or datestring[7] != '-' or
+                not (datestring[:4] + datestring[5:7] +
+                     datestring[8:10]).isdigit()):
+            return None
+        return datetime.datetime(int(datestring[:4]), int(datestring[5:7]),
+                                 int(datestring[8:10]))
+
+    if (length < 19 or length == 20 or length > 32 or
+            datestring[4] != '-' or datestring[7] != '-' or
+            datestring[10] not in 'T ' or datestring[13] != ':' or
+            datestring[16] != ':'):
+        return None
+
+    digits = (datestring[:4] + datestring[5:7] + datestring[8:10] +
+              datestring[11:13] + datestring[14:16] + datestring[17:19])
+    microsecond = 0
+    if length > 19:
+        if datestring[19] != '.':
+            return None
+        fraction = datestring[20:]
+        digits += fraction
+        # NOTE: Digits beyond microsecond precision are ignored.
+        microsecond = int(fraction[:6].ljust(6, '0'))
+
+    if not digits.isdigit():
+        return None
+
+    return datetime.datetime(int(datestring[:4]), int(datestring[5:7]),
+                             int(datestring[8:10]), int(datestring[11:13]),
+                             int(datestring[14:16]), int(datestring[17:19]),
+                             microsecond)
+
+# _decode_fdsnws_datetime ()
+
+
+def _from_fdsnws_datetime(datestring, use_dateutil=True):
+    """
+    Parse a datestring from a string specified by the FDSNWS datetime
+    specification by means of regular expressions and (optionally)
+    :code:`dateutil`.
+    """
     IGNORE_TZ = True
 
     if len(datestring) == 10:
@@ -145,7 +228,7 @@ def from_fdsnws_datetime(datestring, use_dateutil=True):
             return datetime.datetime.strptime(datestring[:19],
                                               '%Y-%m-%dT%H:%M:%S')
 
-# from_fdsnws_datetime ()
+# _from_fdsnws_datetime ()
 
 
 def fdsnws_isoformat(dt, localtime=False, *args, **kwargs):
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark decoding routing lines (FDSN POST format) by means of
+:py:meth:`eidangservices.utils.sncl.StreamEpoch.from_snclline`.
+
+Compares the regex/dateutil based FDSNWS datetime parser with the fixed format
+codec (including its memo) and prints lines/second.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import random
+import timeit
+
+from eidangservices import utils
+from eidangservices.utils.sncl import StreamEpoch
+
+
+def create_lines(num_lines, num_epochs):
+    """
+    Create routing lines. Timestamps are drawn from :code:`num_epochs`
+    different epochs such that they repeat as in real routing output.
+    """
+    epochs = []
+    t = datetime.datetime(2018, 1, 1)
+    for i in range(num_epochs):
+        epochs.append((utils.fdsnws_isoformat(t),
+                       utils.fdsnws_isoformat(t + datetime.timedelta(
+                           hours=1, microseconds=i))))
+        t += datetime.timedelta(days=1)
+
+    return ['CH STA{:05d} -- HH{} {} {}'.format(
+            i, random.choice('ZNE'), *random.choice(epochs))
+            for i in range(num_lines)]
+
+
+def run(lines, repeat):
+    def decode():
+        for line in lines:
+            StreamEpoch.from_snclline(line)
+
+    return min(timeit.repeat(decode, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lines', type=int, default=10000,
+                        help='Number of routing lines (default: %(default)s)')
+    parser.add_argument('--epochs', type=int, default=100,
+                        help=('Number of distinct epochs '
+                              '(default: %(default)s)'))
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of repetitions (default: %(default)s)')
+    args = parser.parse_args()
+
+    lines = create_lines(args.lines, args.epochs)
+
+    from_fdsnws_datetime = utils.from_fdsnws_datetime
+    try:
+        utils.from_fdsnws_datetime = utils._from_fdsnws_datetime
+        t_legacy = run(lines, args.repeat)
+    finally:
+        utils.from_fdsnws_datetime = from_fdsnws_datetime
+
+    utils._fdsnws_datetime_memo.clear()
+    t_codec = run(lines, args.repeat)
+
+    print('regex/dateutil: {:12.0f} lines/s'.format(len(lines) / t_legacy))
+    print('codec (memo):   {:12.0f} lines/s'.format(len(lines) / t_codec))
+    print('speedup:        {:12.1f}x'.format(t_legacy / t_codec))
+
+
+if __name__ == '__main__':
+    main()
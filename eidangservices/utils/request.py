@@ -32,8 +32,17 @@ from __future__ import (absolute_import, division, print_function,
 
 from builtins import * # noqa
 
+from future.standard_library import install_aliases
+install_aliases()
+
+import collections
 import contextlib
+import hashlib
 import io
+import threading
+
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
 
 import requests
 
@@ -54,20 +63,193 @@ class ClientError(RequestsError):
 class NoContent(RequestsError):
     """The request '{}' is returning no content ({})."""
 
+class NotModified(RequestsError):
+    """The resource '{}' was not modified ({})."""
+
+
+# HTTP validators (RFC 7232) of a resource including a hash of its content
+Validators = collections.namedtuple('Validators',
+                                    ['etag', 'last_modified',
+                                     'content_hash'])
+
+
+# -----------------------------------------------------------------------------
+class SessionRegistry(object):
+    """
+    Thread-safe registry of :py:class:`requests.Session` objects. Sessions
+    are keyed by the endpoint's scheme and netloc. Hence, connections to the
+    same endpoint are kept alive and reused.
+
+    :param int pool_connections: Number of connection pools cached per
+        session
+    :param int pool_maxsize: Maximum number of connections kept per endpoint
+    :param bool pool_block: Block if no free connection is available (instead
+        of creating an additional, non-persistent connection)
+    """
+
+    def __init__(self,
+                 pool_connections=settings.EIDA_ENDPOINT_POOL_CONNECTIONS,
+                 pool_maxsize=settings.EIDA_ENDPOINT_POOL_MAXSIZE,
+                 pool_block=False):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.configure(pool_connections, pool_maxsize, pool_block)
+
+    # __init__ ()
+
+    def configure(self, pool_connections=None, pool_maxsize=None,
+                  pool_block=None):
+        """
+        (Re-)configure the registry. Already existing sessions are closed.
+        """
+        with self._lock:
+            if pool_connections is not None:
+                self.pool_connections = pool_connections
+            if pool_maxsize is not None:
+                self.pool_maxsize = pool_maxsize
+            if pool_block is not None:
+                self.pool_block = pool_block
+
+            self._close()
+
+    # configure ()
+
+    def get(self, url):
+        """
+        Return the session for the endpoint :code:`url` refers to.
+
+        :param str url: URL
+        :rtype: :py:class:`requests.Session`
+        """
+        url = urlparse(url)
+        key = (url.scheme, url.netloc)
+        with self._lock:
+            try:
+                return self._sessions[key]
+            except KeyError:
+                session = self._create_session()
+                self._sessions[key] = session
+                return session
+
+    # get ()
+
+    def stats(self):
+        """
+        Return connection pool statistics per endpoint netloc.
+
+        :returns: Dictionary mapping netlocs to dictionaries with the keys
+            :code:`requests` (number of requests issued), :code:`connections`
+            (number of connections established), :code:`idle` (number of idle
+            connections) and :code:`maxsize`.
+        :rtype: dict
+        """
+        retval = {}
+        with self._lock:
+            for (scheme, netloc), session in self._sessions.items():
+                stats = {'requests': 0, 'connections': 0, 'idle': 0,
+                         'maxsize': self.pool_maxsize}
+                adapter = session.get_adapter('{}://'.format(scheme))
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools[key]
+                    stats['requests'] += pool.num_requests
+                    stats['connections'] += pool.num_connections
+                    # NOTE: urllib3 fills the pool's queue with
+                    # placeholders
+                    if pool.pool is not None:
+                        stats['idle'] += sum(1 for conn in pool.pool.queue
+                                             if conn is not None)
+
+                retval[netloc] = stats
+
+        return retval
+
+    # stats ()
+
+    def close(self):
+        """
+        Close all sessions.
+        """
+        with self._lock:
+            self._close()
+
+    # close ()
+
+    def _close(self):
+        for session in self._sessions.values():
+            session.close()
+        self._sessions = {}
+
+    # _close ()
+
+    def _create_session(self):
+        session = requests.Session()
+        # NOTE: Sessions are shared between requests. Do not persist
+        # cookies.
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    # _create_session ()
+
+# class SessionRegistry
+
+
+SESSIONS = SessionRegistry()
+
+
+def send(request, sessions=None, **kwargs):
+    """
+    Send a request.
+
+    :param request: Request to be sent. Either a :py:class:`requests.Request`
+        object or a callable. :py:class:`requests.Request` objects are sent by
+        means of the pooled sessions from :code:`sessions`.
+    :param sessions: Session registry (default: :code:`SESSIONS`)
+    :type sessions: :py:class:`SessionRegistry`
+    :param kwargs: Keyword arguments passed to
+        :py:meth:`requests.Session.send` or to the callable, respectively.
+    :rtype: :py:class:`requests.Response`
+
+    .. note::
+
+        Environment settings (i.e. proxies, CA bundles and :file:`.netrc`)
+        are taken into account the same way :py:meth:`requests.request` does.
+    """
+    if isinstance(request, requests.Request):
+        session = (sessions or SESSIONS).get(request.url)
+        prep = session.prepare_request(request)
+        send_kwargs = session.merge_environment_settings(
+            prep.url, kwargs.pop('proxies', {}), kwargs.pop('stream', None),
+            kwargs.pop('verify', None), kwargs.pop('cert', None))
+        send_kwargs.update(kwargs)
+        return session.send(prep, **send_kwargs)
+
+    return request(**kwargs)
+
+# send ()
+
 
 @contextlib.contextmanager
 def binary_request(request,
-                   timeout=settings.EIDA_FEDERATOR_ENDPOINT_TIMEOUT):
+                   timeout=settings.EIDA_FEDERATOR_ENDPOINT_TIMEOUT,
+                   sessions=None):
     """
     Make a request.
 
     :param request: Request object to be used
     :type request: :py:class:`requests.Request`
     :param float timeout: Timeout in seconds
+    :param sessions: Session registry (default: :code:`SESSIONS`)
+    :type sessions: :py:class:`SessionRegistry`
     :rtype: io.BytesIO
     """
     try:
-        with request(timeout=timeout) as r:
+        with send(request, sessions=sessions, timeout=timeout) as r:
 
             if r.status_code in settings.FDSN_NO_CONTENT_CODES:
                 raise NoContent(r.url, r.status_code, response=r)
@@ -85,19 +267,97 @@ def binary_request(request,
 
 # binary_request ()
 
+@contextlib.contextmanager
+def conditional_request(request, validators=None,
+                        timeout=settings.EIDA_FEDERATOR_ENDPOINT_TIMEOUT,
+                        sessions=None):
+    """
+    Make a conditional request by means of the validators of a previous
+    response. The content is compared by means of its hash, too, since not
+    all servers support conditional requests.
+
+    :param request: Request object to be used
+    :type request: :py:class:`requests.Request`
+    :param validators: Validators of a previous response. If :code:`None` an
+        unconditional request is made.
+    :type validators: :py:class:`Validators`
+    :param float timeout: Timeout in seconds
+    :param sessions: Session registry (default: :code:`SESSIONS`)
+    :type sessions: :py:class:`SessionRegistry`
+    :returns: Tuple of the content (:py:class:`io.BytesIO`) and the
+        validators of the response
+    :raises: :py:class:`NotModified` carrying the current validators (i.e.
+        :code:`err.validators`)
+    """
+    headers = {}
+    if validators is not None:
+        if validators.etag:
+            headers['If-None-Match'] = validators.etag
+        if validators.last_modified:
+            headers['If-Modified-Since'] = validators.last_modified
+
+    kwargs = {}
+    if isinstance(request, requests.Request):
+        request.headers.update(headers)
+    else:
+        kwargs['headers'] = headers
+
+    try:
+        with send(request, sessions=sessions, timeout=timeout,
+                  **kwargs) as r:
+
+            if r.status_code in settings.FDSN_NO_CONTENT_CODES:
+                raise NoContent(r.url, r.status_code, response=r)
+
+            if r.status_code == 304 and validators is not None:
+                err = NotModified(r.url, r.status_code, response=r)
+                err.validators = validators._replace(
+                    etag=r.headers.get('ETag', validators.etag),
+                    last_modified=r.headers.get('Last-Modified',
+                                                validators.last_modified))
+                raise err
+
+            r.raise_for_status()
+            if r.status_code != 200:
+                raise ClientError(r.status_code, response=r)
+
+            _validators = Validators(
+                etag=r.headers.get('ETag'),
+                last_modified=r.headers.get('Last-Modified'),
+                content_hash=hashlib.sha256(r.content).hexdigest())
+
+            if (validators is not None and
+                    validators.content_hash == _validators.content_hash):
+                err = NotModified(r.url, r.status_code, response=r)
+                err.validators = _validators
+                raise err
+
+            yield io.BytesIO(r.content), _validators
+
+    except (NoContent, NotModified, ClientError) as err:
+        raise err
+    except requests.exceptions.RequestException as err:
+        raise RequestsError(err, response=err.response)
+
+# conditional_request ()
+
 @contextlib.contextmanager
 def raw_request(request,
-                timeout=settings.EIDA_FEDERATOR_ENDPOINT_TIMEOUT):
+                timeout=settings.EIDA_FEDERATOR_ENDPOINT_TIMEOUT,
+                sessions=None):
     """
     Make a request. Return the raw, streamed response.
 
     :param request: Request object to be used
     :type request: :py:class:`requests.Request`
     :param float timeout: Timeout in seconds
+    :param sessions: Session registry (default: :code:`SESSIONS`)
+    :type sessions: :py:class:`SessionRegistry`
     :rtype: io.BytesIO
     """
     try:
-        with request(stream=True, timeout=timeout) as r:
+        with send(request, sessions=sessions, stream=True,
+                  timeout=timeout) as r:
 
             if r.status_code in settings.FDSN_NO_CONTENT_CODES:
                 raise NoContent(r.url, r.status_code, response=r)
@@ -119,7 +379,8 @@ def stream_request(request,
                    timeout=settings.EIDA_FEDERATOR_ENDPOINT_TIMEOUT,
                    chunk_size=1024,
                    decode_unicode=False,
-                   method='iter_content'):
+                   method='iter_content',
+                   sessions=None):
     """
     Generator function making a streamed request.
 
@@ -131,6 +392,8 @@ def stream_request(request,
         available encoding based on the response.
     :param string method: Streaming depending on method. Valid values are
         `iter_content` (default), `iter_lines`, `raw`
+    :param sessions: Session registry (default: :code:`SESSIONS`)
+    :type sessions: :py:class:`SessionRegistry`
 
     .. note::
 
@@ -143,7 +406,8 @@ def stream_request(request,
         raise ValueError('Invalid method chosen: {!r}.'.format(method))
 
     try:
-        with request(stream=True, timeout=timeout) as r:
+        with send(request, sessions=sessions, stream=True,
+                  timeout=timeout) as r:
 
             if r.status_code in settings.FDSN_NO_CONTENT_CODES:
                 raise NoContent(r.url, r.status_code, response=r)
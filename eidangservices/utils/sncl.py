@@ -41,8 +41,6 @@ from collections import namedtuple, OrderedDict
 
 from intervaltree import IntervalTree
 
-import eidangservices as eidangws
-
 from eidangservices import settings, utils
 
 Epochs = IntervalTree
@@ -136,6 +134,79 @@ def fdsnws_to_sql_wildcards(str_old, like_multiple='%', like_single='_', # noqa
 
 # fdsnws_to_sql_wildcards ()
 
+def dump_stream_epoch(stream_epoch, routing=False, method=None): # noqa
+    """
+    Serialize a stream epoch like object. Produces the same output as
+    :py:class:`eidangservices.utils.schema.StreamEpochSchema` does but
+    without :py:mod:`marshmallow`.
+
+    :param stream_epoch: Stream epoch like object to be serialized
+    :param bool routing: Emulates the :code:`routing` schema context i.e.
+        open endtimes (:code:`None` or :py:obj:`datetime.datetime.max`) are
+        omitted
+    :param method: Emulates the :code:`request` schema context i.e. if
+        :code:`'GET'` empty datetimes are omitted. Takes precedence over
+        :code:`routing`.
+    :type method: str or None
+    :returns: Serialized stream epoch
+    :rtype: :py:class:`collections.OrderedDict`
+    """
+    location = stream_epoch.location
+    if location == '':
+        location = '--'
+
+    retval = OrderedDict((('network', stream_epoch.network),
+                          ('station', stream_epoch.station),
+                          ('location', location),
+                          ('channel', stream_epoch.channel)))
+
+    starttime = stream_epoch.starttime
+    endtime = stream_epoch.endtime
+    if method == 'GET':
+        if starttime is not None:
+            retval['starttime'] = utils.fdsnws_isoformat(starttime)
+        if endtime is not None:
+            retval['endtime'] = utils.fdsnws_isoformat(endtime)
+        return retval
+
+    retval['starttime'] = (None if starttime is None else
+                           utils.fdsnws_isoformat(starttime))
+    if not (routing and
+            (endtime is None or endtime == datetime.datetime.max)):
+        retval['endtime'] = (None if endtime is None else
+                             utils.fdsnws_isoformat(endtime))
+
+    return retval
+
+# dump_stream_epoch ()
+
+def to_postline(stream_epoch, routing=False): # noqa
+    """
+    Serialize a stream epoch like object to a FDSNWS **POST** line.
+
+    :param stream_epoch: Stream epoch like object to be serialized
+    :param bool routing: Omit open endtimes (see :py:func:`dump_stream_epoch`)
+    :rtype: str
+    """
+    return ' '.join(str(v) for v in
+                    dump_stream_epoch(stream_epoch, routing=routing).values())
+
+# to_postline ()
+
+def to_query_string(stream_epoch, routing=False): # noqa
+    """
+    Serialize a stream epoch like object to a FDSNWS **GET** query string
+    (without leading :code:`?`).
+
+    :param stream_epoch: Stream epoch like object to be serialized
+    :param bool routing: Omit open endtimes (see :py:func:`dump_stream_epoch`)
+    :rtype: str
+    """
+    return '&'.join('{}={}'.format(k, v) for k, v in
+                    dump_stream_epoch(stream_epoch, routing=routing).items())
+
+# to_query_string ()
+
 # ----------------------------------------------------------------------------
 @functools.total_ordering # noqa
 class Stream(namedtuple('Stream',
@@ -434,9 +505,7 @@ class StreamEpoch(namedtuple('StreamEpoch',
                 (self.stream, self.starttime, self.endtime))
 
     def __str__(self):
-        se_schema = eidangws.utils.schema.StreamEpochSchema()
-        stream_epoch = se_schema.dump(self)
-        return ' '.join(str(v) for v in stream_epoch.values())
+        return to_postline(self)
 
 # class StreamEpoch
 
@@ -657,10 +726,8 @@ class StreamEpochs(object):
                 (self._stream, self.starttime, self.endtime))
 
     def __str__(self):
-        se_schema = eidangws.utils.schema.StreamEpochSchema(many=True)
-        stream_epochs = se_schema.dump(list(self))
-        return '\n'.join([' '.join(stream_epoch.values())
-                         for stream_epoch in stream_epochs])
+        return '\n'.join(' '.join(dump_stream_epoch(stream_epoch).values())
+                         for stream_epoch in self)
 
     # __str__ ()
 
@@ -29,7 +29,8 @@ Provides testsuite loading methods.
 """
 import unittest
 
-from eidangservices.utils.tests import schema, sncl, fdsnws
+from eidangservices.utils.tests import (schema, sncl, fdsnws, request,
+                                        utils)
 
 federator_available = False
 mediator_available = False
@@ -68,6 +69,8 @@ def general_testsuite():
     general_testsuite.addTests(loader.loadTestsFromModule(schema))
     general_testsuite.addTests(loader.loadTestsFromModule(sncl))
     general_testsuite.addTests(loader.loadTestsFromModule(fdsnws))
+    general_testsuite.addTests(loader.loadTestsFromModule(request))
+    general_testsuite.addTests(loader.loadTestsFromModule(utils))
     return general_testsuite
 
 # general_testsuite ()
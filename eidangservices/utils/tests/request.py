@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <request.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices.
+#
+# EIDA NG webservices is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EIDA NG webservices is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/04        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+EIDA NG webservices request handling test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+from future.standard_library import install_aliases
+install_aliases()
+
+import os
+import threading
+import unittest
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+from eidangservices.utils.request import (binary_request,
+                                          conditional_request, NoContent,
+                                          NotModified, SessionRegistry)
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+
+        if body == b'nodata':
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        type(self).last_path = self.path
+        # serve a static resource; with validators for '/etag' paths
+        body = b'foo'
+        etag = '"v1"'
+        if (self.path.startswith('/etag') and
+                self.headers.get('If-None-Match') == etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        if self.path.startswith('/etag'):
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+# class _Handler
+
+
+# -----------------------------------------------------------------------------
+class SessionRegistryTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), _Handler)
+        cls.url = 'http://127.0.0.1:{}/fdsnws/station/1/query'.format(
+            cls.server.server_address[1])
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.sessions = SessionRegistry(pool_maxsize=2)
+
+    def tearDown(self):
+        self.sessions.close()
+
+    def test_get_per_netloc(self):
+        s = self.sessions.get('http://foo.bar/fdsnws/station/1/query')
+        self.assertIs(
+            s, self.sessions.get('http://foo.bar/fdsnws/dataselect/1/query'))
+        self.assertIsNot(
+            s, self.sessions.get('http://baz.bar/fdsnws/station/1/query'))
+        self.assertIsNot(
+            s, self.sessions.get('https://foo.bar/fdsnws/station/1/query'))
+
+    # test_get_per_netloc ()
+
+    def test_configure(self):
+        s = self.sessions.get(self.url)
+        self.sessions.configure(pool_maxsize=5)
+        self.assertEqual(self.sessions.pool_maxsize, 5)
+        self.assertIsNot(s, self.sessions.get(self.url))
+
+    # test_configure ()
+
+    def test_keep_alive(self):
+        for i in range(3):
+            req = requests.Request('POST', self.url, data=b'foo')
+            with binary_request(req, sessions=self.sessions) as ifd:
+                self.assertEqual(ifd.read(), b'foo')
+
+        stats = self.sessions.stats()
+        netloc = '127.0.0.1:{}'.format(self.server.server_address[1])
+        self.assertEqual(stats[netloc]['requests'], 3)
+        self.assertEqual(stats[netloc]['connections'], 1)
+        self.assertEqual(stats[netloc]['idle'], 1)
+        self.assertEqual(stats[netloc]['maxsize'], 2)
+
+    # test_keep_alive ()
+
+    def test_no_content(self):
+        req = requests.Request('POST', self.url, data=b'nodata')
+        with self.assertRaises(NoContent):
+            with binary_request(req, sessions=self.sessions):
+                pass
+
+    # test_no_content ()
+
+    def test_callable(self):
+        def req(**kwargs):
+            return requests.post(self.url, data=b'foo', **kwargs)
+
+        with binary_request(req) as ifd:
+            self.assertEqual(ifd.read(), b'foo')
+
+    # test_callable ()
+
+    def test_proxy_from_environment(self):
+        proxy = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        url = 'http://eida.invalid/fdsnws/station/1/query'
+        env = {'http_proxy': proxy, 'HTTP_PROXY': proxy,
+               'no_proxy': '', 'NO_PROXY': ''}
+
+        with mock.patch.dict(os.environ, env):
+            with binary_request(requests.Request('GET', url),
+                                sessions=self.sessions) as ifd:
+                self.assertEqual(ifd.read(), b'foo')
+
+        # the proxy receives the absolute URL
+        self.assertEqual(_Handler.last_path, url)
+
+    # test_proxy_from_environment ()
+
+    def test_ca_bundle_from_environment(self):
+        env = {'REQUESTS_CA_BUNDLE': '/etc/ssl/certs/eida.pem',
+               'CURL_CA_BUNDLE': ''}
+        send = requests.Session.send
+
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(requests.Session, 'send', autospec=True,
+                                  side_effect=send) as mock_send:
+            with binary_request(requests.Request('GET', self.url),
+                                sessions=self.sessions) as ifd:
+                self.assertEqual(ifd.read(), b'foo')
+
+        self.assertEqual(mock_send.call_args[1]['verify'],
+                         '/etc/ssl/certs/eida.pem')
+
+    # test_ca_bundle_from_environment ()
+
+    def test_conditional(self):
+        netloc = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        for path, status_code in (('/etag', 304), ('/', 200)):
+            url = netloc + path
+            with conditional_request(requests.Request('GET', url),
+                                     sessions=self.sessions) as (ifd, v):
+                self.assertEqual(ifd.read(), b'foo')
+
+            self.assertEqual(v.etag, '"v1"' if path == '/etag' else None)
+            with self.assertRaises(NotModified) as cm:
+                with conditional_request(requests.Request('GET', url), v,
+                                         sessions=self.sessions):
+                    pass
+            self.assertEqual(cm.exception.response.status_code, status_code)
+            self.assertEqual(cm.exception.validators, v)
+
+        # modified content
+        with conditional_request(
+                requests.Request('GET', netloc), v._replace(
+                    content_hash='outdated'),
+                sessions=self.sessions) as (ifd, _v):
+            self.assertEqual(ifd.read(), b'foo')
+        self.assertEqual(_v, v)
+
+    # test_conditional ()
+
+# class SessionRegistryTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__': # noqa
+    unittest.main()
+
+# ---- END OF <request.py> ----
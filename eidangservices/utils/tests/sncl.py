@@ -36,7 +36,7 @@ from builtins import * # noqa
 import datetime
 import unittest
 
-from eidangservices.utils import sncl
+from eidangservices.utils import schema, sncl
 
 # -----------------------------------------------------------------------------
 class StreamEpochsHandlerTestCase(unittest.TestCase):
@@ -194,6 +194,77 @@ class StreamEpochTestCase(unittest.TestCase):
 # class StreamEpochTestCase
 
 
+class DumpStreamEpochTestCase(unittest.TestCase):
+
+    class GET(object):
+        method = 'GET'
+
+    def setUp(self):
+        self.stream_epochs = [
+            sncl.StreamEpoch(
+                stream=sncl.Stream(network='GR', station='BFO', location=loc,
+                                   channel='LHZ'),
+                starttime=start, endtime=end)
+            for loc in ('', '--', '00')
+            for start, end in (
+                (datetime.datetime(2018, 1, 1),
+                 datetime.datetime(2018, 1, 8)),
+                (datetime.datetime(2018, 1, 1, 0, 0, 0, 1), None),
+                (datetime.datetime(2018, 1, 1), datetime.datetime.max),
+                (None, None))]
+
+    def assertDumpEqual(self, context, **kwargs):
+        se_schema = schema.StreamEpochSchema(context=context)
+        for stream_epoch in self.stream_epochs:
+            self.assertEqual(
+                list(sncl.dump_stream_epoch(stream_epoch, **kwargs).items()),
+                list(se_schema.dump(stream_epoch).items()))
+
+    def test_dump(self):
+        self.assertDumpEqual({})
+
+    # test_dump ()
+
+    def test_dump_routing(self):
+        self.assertDumpEqual({'routing': True}, routing=True)
+
+    # test_dump_routing ()
+
+    def test_dump_get(self):
+        self.assertDumpEqual({'request': self.GET}, method='GET')
+        self.assertDumpEqual({'request': self.GET, 'routing': True},
+                             routing=True, method='GET')
+
+    # test_dump_get ()
+
+    def test_str(self):
+        se_schema = schema.StreamEpochSchema()
+        for stream_epoch in self.stream_epochs:
+            reference_result = ' '.join(
+                str(v) for v in se_schema.dump(stream_epoch).values())
+            self.assertEqual(str(stream_epoch), reference_result)
+
+    # test_str ()
+
+    def test_str_stream_epochs(self):
+        stream_epochs = sncl.StreamEpochs(
+            network='GR', station='BFO', location='', channel='LHZ',
+            epochs=[(datetime.datetime(2018, 1, 1),
+                     datetime.datetime(2018, 1, 7)),
+                    (datetime.datetime(2018, 1, 14, 0, 0, 0, 500),
+                     datetime.datetime(2018, 1, 15))])
+
+        se_schema = schema.StreamEpochSchema(many=True)
+        self.assertEqual(
+            str(stream_epochs),
+            '\n'.join(' '.join(stream_epoch.values())
+                      for stream_epoch in se_schema.dump(list(stream_epochs))))
+
+    # test_str_stream_epochs ()
+
+# class DumpStreamEpochTestCase
+
+
 # -----------------------------------------------------------------------------
 if __name__ == '__main__': # noqa
     unittest.main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# This is <utils.py>
+# -----------------------------------------------------------------------------
+#
+# This file is part of EIDA NG webservices.
+#
+# EIDA NG webservices is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EIDA NG webservices is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# ----
+#
+# Copyright (c) Daniel Armbruster (ETH), Fabian Euchner (ETH)
+#
+# REVISION AND CHANGES
+# 2018/09/07        V0.1    Daniel Armbruster
+#
+# =============================================================================
+"""
+EIDA NG webservices utils test facilities.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from builtins import * # noqa
+
+import datetime
+import unittest
+
+from eidangservices import utils
+
+
+# -----------------------------------------------------------------------------
+class FdsnwsDatetimeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        utils._fdsnws_datetime_memo.clear()
+
+    def tearDown(self):
+        utils._fdsnws_datetime_memo.clear()
+
+    def test_fixed_formats(self):
+        for datestring, reference_result in (
+            ('2018-01-01', datetime.datetime(2018, 1, 1)),
+            ('2018-01-01T01:02:03', datetime.datetime(2018, 1, 1, 1, 2, 3)),
+            ('2018-01-01 01:02:03', datetime.datetime(2018, 1, 1, 1, 2, 3)),
+            ('2018-01-01T01:02:03.5',
+             datetime.datetime(2018, 1, 1, 1, 2, 3, 500000)),
+            ('2018-01-01T01:02:03.123456',
+             datetime.datetime(2018, 1, 1, 1, 2, 3, 123456)),
+            ('2018-01-01T01:02:03.123456789',
+             datetime.datetime(2018, 1, 1, 1, 2, 3, 123456))):
+            self.assertEqual(utils._decode_fdsnws_datetime(datestring),
+                             reference_result)
+            self.assertEqual(utils.from_fdsnws_datetime(datestring),
+                             reference_result)
+            self.assertEqual(utils._from_fdsnws_datetime(datestring),
+                             reference_result)
+
+    # test_fixed_formats ()
+
+    def test_fallback(self):
+        for datestring in ('2018-1-1T1:2:3', '2018-01-01T01:02'):
+            self.assertIsNone(utils._decode_fdsnws_datetime(datestring))
+            self.assertEqual(utils.from_fdsnws_datetime(datestring),
+                             utils._from_fdsnws_datetime(datestring))
+
+    # test_fallback ()
+
+    def test_invalid(self):
+        for datestring in ('2018-01-0a', '2018-13-01', '2018-01-01T25:00:00',
+                           '2018-01-01T01:02:03.', '2018-01-01T01:02:03Z',
+                           'foo'):
+            with self.assertRaises(ValueError):
+                utils.from_fdsnws_datetime(datestring)
+            self.assertNotIn(datestring, utils._fdsnws_datetime_memo)
+
+    # test_invalid ()
+
+    def test_memo(self):
+        dt = utils.from_fdsnws_datetime('2018-01-01T01:02:03')
+        self.assertIs(utils.from_fdsnws_datetime('2018-01-01T01:02:03'), dt)
+
+        for i in range(utils.FDSNWS_DATETIME_MEMO_SIZE + 1):
+            utils.from_fdsnws_datetime(
+                utils.fdsnws_isoformat(datetime.datetime(2018, 1, 1) +
+                                       datetime.timedelta(seconds=i)))
+        self.assertLessEqual(len(utils._fdsnws_datetime_memo),
+                             utils.FDSNWS_DATETIME_MEMO_SIZE)
+
+    # test_memo ()
+
+# class FdsnwsDatetimeTestCase
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
+
+# ---- END OF <utils.py> ----
@@ -61,6 +61,8 @@ _entry_points_stationlite = {
          'eidangservices.stationlite.harvest.harvest:main'),
         ('eida-stationlite-db-init = '
          'eidangservices.stationlite.harvest.misc:db_init'),
+        ('eida-stationlite-db-migrate = '
+         'eidangservices.stationlite.harvest.misc:db_migrate'),
     ]}
 _entry_points = _entry_points_federator.copy()
 _entry_points['console_scripts'].append(